@@ -0,0 +1,33 @@
+"""add chunk fingerprints to document
+
+Revision ID: 3b1f6a2d9c47
+Revises: a7688ab35c45
+Create Date: 2025-05-09 10:12:31.402117
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = "3b1f6a2d9c47"
+down_revision = "a7688ab35c45"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "document", sa.Column("content_fingerprint", sa.String(), nullable=True)
+    )
+    op.add_column(
+        "document",
+        sa.Column("chunk_fingerprints", postgresql.ARRAY(sa.String()), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("document", "chunk_fingerprints")
+    op.drop_column("document", "content_fingerprint")
@@ -1,5 +1,10 @@
+import time
+
+from prometheus_client import Histogram
 from sqlalchemy.orm import Session
 
+from ee.onyx.access.acl_cache import cache_acl_for_user
+from ee.onyx.access.acl_cache import get_cached_acl_for_user
 from ee.onyx.db.external_perm import fetch_external_groups_for_user
 from ee.onyx.db.external_perm import fetch_public_external_group_ids
 from ee.onyx.db.user_group import fetch_user_groups_for_documents
@@ -19,6 +24,15 @@ from onyx.db.document import get_document_sources
 from onyx.db.document import get_documents_by_ids
 from onyx.db.models import User
 
+ACL_SOURCE_DB = "db"
+
+acl_resolution_latency = Histogram(
+    "onyx_acl_resolution_seconds",
+    "Time spent resolving the ACL entries of a user, by where they were found",
+    ["source"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1),
+)
+
 
 def _get_access_for_document(
     document_id: str,
@@ -117,14 +131,33 @@ def _get_acl_for_user(user: User | None, db_session: Session) -> set[str]:
 
     NOTE: is imported in onyx.access.access by `fetch_versioned_implementation`
     DO NOT REMOVE."""
-    db_user_groups = fetch_user_groups_for_user(db_session, user.id) if user else []
+    start_time = time.monotonic()
+    if user is None:
+        return get_acl_for_user_without_groups(user, db_session)
+
+    cached = get_cached_acl_for_user(user.id)
+    if cached is not None:
+        user_acl, source = cached
+        acl_resolution_latency.labels(source=source).observe(
+            time.monotonic() - start_time
+        )
+        return user_acl
+
+    user_acl = _fetch_acl_for_user(user, db_session)
+    cache_acl_for_user(user.id, user_acl)
+    acl_resolution_latency.labels(source=ACL_SOURCE_DB).observe(
+        time.monotonic() - start_time
+    )
+    return user_acl
+
+
+def _fetch_acl_for_user(user: User, db_session: Session) -> set[str]:
+    db_user_groups = fetch_user_groups_for_user(db_session, user.id)
     prefixed_user_groups = [
         prefix_user_group(db_user_group.name) for db_user_group in db_user_groups
     ]
 
-    db_external_groups = (
-        fetch_external_groups_for_user(db_session, user.id) if user else []
-    )
+    db_external_groups = fetch_external_groups_for_user(db_session, user.id)
     prefixed_external_groups = [
         prefix_external_group(db_external_group.external_user_group_id)
         for db_external_group in db_external_groups
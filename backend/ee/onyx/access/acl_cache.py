@@ -0,0 +1,167 @@
+"""Cache of the ACL entries of each user, see `_get_acl_for_user`.
+
+Resolving the ACL of a user loads all of their user groups and external groups from
+Postgres (thousands for some Google Drive / Confluence users) and every search, agent
+sub-question and document lookup needs it. The ACL only changes through user group
+membership changes, the user group syncs and the external group syncs, which
+invalidate the cached entries.
+
+A small process local cache with a short TTL sits in front of a Redis hash per tenant
+which is shared by all api server workers. Invalidations clear the Redis entries and
+the local entries of the current process, the local entries of other processes age
+out through their TTL.
+"""
+
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import cast
+from uuid import UUID
+
+from redis.exceptions import RedisError
+
+from ee.onyx.configs.app_configs import ACL_CACHE_ENABLED
+from ee.onyx.configs.app_configs import ACL_CACHE_LOCAL_MAX_ENTRIES
+from ee.onyx.configs.app_configs import ACL_CACHE_LOCAL_TTL_SECONDS
+from ee.onyx.configs.app_configs import ACL_CACHE_TTL_SECONDS
+from onyx.redis.redis_pool import get_redis_client
+from onyx.utils.logger import setup_logger
+from shared_configs.contextvars import get_current_tenant_id
+
+logger = setup_logger()
+
+ACL_CACHE_KEY = "acl_cache"
+
+ACL_SOURCE_LOCAL = "local"
+ACL_SOURCE_REDIS = "redis"
+
+
+class _LocalACLCache:
+    """Process local LRU cache with a TTL."""
+
+    def __init__(self, max_entries: int, ttl_seconds: float) -> None:
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        # (tenant id, user id) -> (insert time, acl)
+        self._entries: OrderedDict[tuple[str, UUID], tuple[float, frozenset[str]]] = (
+            OrderedDict()
+        )
+
+    def get(self, tenant_id: str, user_id: UUID) -> frozenset[str] | None:
+        key = (tenant_id, user_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            inserted_at, acl = entry
+            if time.monotonic() - inserted_at > self.ttl_seconds:
+                del self._entries[key]
+                return None
+
+            self._entries.move_to_end(key)
+            return acl
+
+    def put(self, tenant_id: str, user_id: UUID, acl: frozenset[str]) -> None:
+        key = (tenant_id, user_id)
+        with self._lock:
+            self._entries[key] = (time.monotonic(), acl)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, tenant_id: str, user_ids: list[UUID] | None) -> None:
+        with self._lock:
+            if user_ids is not None:
+                for user_id in user_ids:
+                    self._entries.pop((tenant_id, user_id), None)
+                return
+
+            for key in [key for key in self._entries if key[0] == tenant_id]:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+_local_acl_cache = _LocalACLCache(
+    max_entries=ACL_CACHE_LOCAL_MAX_ENTRIES,
+    ttl_seconds=ACL_CACHE_LOCAL_TTL_SECONDS,
+)
+
+
+def get_cached_acl_for_user(
+    user_id: UUID, tenant_id: str | None = None
+) -> tuple[set[str], str] | None:
+    """Returns the cached ACL of the user and where it was found (local / redis), or
+    None on a miss. Failures to talk to Redis are treated as misses."""
+    if not ACL_CACHE_ENABLED:
+        return None
+
+    tenant_id = tenant_id or get_current_tenant_id()
+    acl = _local_acl_cache.get(tenant_id, user_id)
+    if acl is not None:
+        return set(acl), ACL_SOURCE_LOCAL
+
+    try:
+        raw_entry = cast(
+            bytes | None,
+            get_redis_client(tenant_id=tenant_id).hget(ACL_CACHE_KEY, str(user_id)),
+        )
+    except RedisError:
+        logger.exception("Failed to read from the ACL cache")
+        return None
+
+    if raw_entry is None:
+        return None
+
+    entry = json.loads(raw_entry)
+    if time.time() - entry["cached_at"] > ACL_CACHE_TTL_SECONDS:
+        return None
+
+    acl = frozenset(entry["acl"])
+    _local_acl_cache.put(tenant_id, user_id, acl)
+    return set(acl), ACL_SOURCE_REDIS
+
+
+def cache_acl_for_user(
+    user_id: UUID, acl: set[str], tenant_id: str | None = None
+) -> None:
+    if not ACL_CACHE_ENABLED:
+        return
+
+    tenant_id = tenant_id or get_current_tenant_id()
+    _local_acl_cache.put(tenant_id, user_id, frozenset(acl))
+    try:
+        get_redis_client(tenant_id=tenant_id).hset(
+            ACL_CACHE_KEY,
+            str(user_id),
+            json.dumps({"acl": sorted(acl), "cached_at": time.time()}),
+        )
+    except RedisError:
+        logger.exception("Failed to write to the ACL cache")
+
+
+def invalidate_acl_cache(
+    user_ids: list[UUID] | None = None, tenant_id: str | None = None
+) -> None:
+    """Drops the cached ACLs of the given users, or of every user of the tenant if
+    `user_ids` is None. Should be called after the change is committed, otherwise a
+    concurrent search can cache the previous ACL again."""
+    if not ACL_CACHE_ENABLED or user_ids == []:
+        return
+
+    tenant_id = tenant_id or get_current_tenant_id()
+    _local_acl_cache.invalidate(tenant_id, user_ids)
+    try:
+        redis_client = get_redis_client(tenant_id=tenant_id)
+        if user_ids is None:
+            redis_client.delete(ACL_CACHE_KEY)
+        else:
+            redis_client.hdel(ACL_CACHE_KEY, *[str(user_id) for user_id in user_ids])
+    except RedisError:
+        logger.exception("Failed to invalidate the ACL cache")
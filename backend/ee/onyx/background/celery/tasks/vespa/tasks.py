@@ -3,6 +3,7 @@ from typing import cast
 from redis import Redis
 from sqlalchemy.orm import Session
 
+from ee.onyx.access.acl_cache import invalidate_acl_cache
 from ee.onyx.db.user_group import delete_user_group
 from ee.onyx.db.user_group import fetch_user_group
 from ee.onyx.db.user_group import mark_user_group_as_synced
@@ -79,6 +80,11 @@ def monitor_usergroup_taskset(
                 )
             else:
                 mark_user_group_as_synced(db_session=db_session, user_group=user_group)
+                # drops ACLs which searches racing the membership update cached again
+                invalidate_acl_cache(
+                    user_ids=[user.id for user in user_group.users],
+                    tenant_id=tenant_id,
+                )
 
                 update_sync_record_status(
                     db_session=db_session,
@@ -71,6 +71,22 @@ SLACK_PERMISSION_DOC_SYNC_FREQUENCY = int(
 NUM_PERMISSION_WORKERS = int(os.environ.get("NUM_PERMISSION_WORKERS") or 2)
 
 
+#####
+# Access
+#####
+# Cache of the ACL entries of each user (user groups + external groups), used to build
+# the access filters of every search. Entries are invalidated on user group membership
+# changes and by the user group / external group syncs, the TTLs bound how stale an
+# entry can get if an invalidation races with a search.
+ACL_CACHE_ENABLED = (os.environ.get("ACL_CACHE_ENABLED") or "true").lower() == "true"
+ACL_CACHE_LOCAL_MAX_ENTRIES = int(
+    os.environ.get("ACL_CACHE_LOCAL_MAX_ENTRIES") or 10_000
+)
+# kept short, local entries of other processes are only invalidated through the TTL
+ACL_CACHE_LOCAL_TTL_SECONDS = int(os.environ.get("ACL_CACHE_LOCAL_TTL_SECONDS") or 10)
+ACL_CACHE_TTL_SECONDS = int(os.environ.get("ACL_CACHE_TTL_SECONDS") or 60 * 10)
+
+
 ####
 # Celery Job Frequency
 ####
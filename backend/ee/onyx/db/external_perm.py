@@ -6,6 +6,7 @@ from sqlalchemy import delete
 from sqlalchemy import select
 from sqlalchemy.orm import Session
 
+from ee.onyx.access.acl_cache import invalidate_acl_cache
 from onyx.access.utils import build_ext_group_name_for_onyx
 from onyx.configs.constants import DocumentSource
 from onyx.db.models import PublicExternalUserGroup
@@ -133,6 +134,8 @@ def replace_user__ext_group_for_cc_pair(
     db_session.add_all(new_external_permissions)
     db_session.add_all(new_public_external_groups)
     db_session.commit()
+    # members can have been added to or removed from any of the groups
+    invalidate_acl_cache()
 
 
 def fetch_external_groups_for_user(
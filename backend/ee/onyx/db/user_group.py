@@ -10,6 +10,7 @@ from sqlalchemy import select
 from sqlalchemy import update
 from sqlalchemy.orm import Session
 
+from ee.onyx.access.acl_cache import invalidate_acl_cache
 from ee.onyx.server.user_group.models import SetCuratorRequest
 from ee.onyx.server.user_group.models import UserGroupCreate
 from ee.onyx.server.user_group.models import UserGroupUpdate
@@ -392,6 +393,7 @@ def insert_user_group(db_session: Session, user_group: UserGroupCreate) -> UserG
     )
 
     db_session.commit()
+    invalidate_acl_cache(user_ids=user_group.user_ids)
     return db_user_group
 
 
@@ -566,6 +568,7 @@ def update_user_curator_relationship(
 
     _validate_curator_status__no_commit(db_session, [target_user])
     db_session.commit()
+    invalidate_acl_cache(user_ids=[target_user.id])
 
 
 def update_user_group(
@@ -646,6 +649,7 @@ def update_user_group(
     db_user_group.time_last_modified_by_user = func.now()
 
     db_session.commit()
+    invalidate_acl_cache(user_ids=added_user_ids + removed_user_ids)
     return db_user_group
 
 
@@ -657,6 +661,8 @@ def prepare_user_group_for_deletion(db_session: Session, user_group_id: int) ->
 
     _check_user_group_is_modifiable(db_user_group)
 
+    member_ids = [user.id for user in db_user_group.users]
+
     _mark_user_group__cc_pair_relationships_outdated__no_commit(
         db_session=db_session, user_group_id=user_group_id
     )
@@ -688,6 +694,7 @@ def prepare_user_group_for_deletion(db_session: Session, user_group_id: int) ->
     db_user_group.is_up_to_date = False
     db_user_group.is_up_for_deletion = True
     db_session.commit()
+    invalidate_acl_cache(user_ids=member_ids)
 
 
 def delete_user_group(db_session: Session, user_group: UserGroup) -> None:
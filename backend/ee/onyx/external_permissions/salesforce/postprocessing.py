@@ -107,6 +107,8 @@ def _create_empty_censored_chunk(uncensored_chunk: InferenceChunk) -> InferenceC
         **uncensored_chunk.model_dump(),
     )
     empty_censored_chunk.content = ""
+    # the token counts of the uncensored content no longer apply
+    empty_censored_chunk.content_token_counts = {}
     empty_censored_chunk.blurb = ""
     empty_censored_chunk.source_links = {}
     return empty_censored_chunk
@@ -24,6 +24,9 @@ from onyx.chat.models import PersonaOverrideConfig
 from onyx.chat.process_message import ChatPacketStream
 from onyx.chat.process_message import stream_chat_message_objects
 from onyx.configs.onyxbot_configs import MAX_THREAD_CONTEXT_PERCENTAGE
+from onyx.context.search.models import InferenceSection
+from onyx.context.search.models import RerankedSectionsUpdate
+from onyx.context.search.models import RetrievedSectionsUpdate
 from onyx.context.search.models import SavedSearchDocWithContent
 from onyx.context.search.models import SearchRequest
 from onyx.context.search.pipeline import SearchPipeline
@@ -52,21 +55,16 @@ class DocumentSearchResponse(BaseModel):
     llm_indices: list[int]
 
 
-@basic_router.post("/document-search")
-def handle_search_request(
+def _build_document_search_pipeline(
     search_request: DocumentSearchRequest,
-    user: User | None = Depends(current_user),
-    db_session: Session = Depends(get_session),
-) -> DocumentSearchResponse:
-    """Simple search endpoint, does not create a new message or records in the DB"""
-    query = search_request.message
-    logger.notice(f"Received document search query: {query}")
-
+    user: User | None,
+    db_session: Session,
+) -> SearchPipeline:
     llm, fast_llm = get_default_llms()
 
-    search_pipeline = SearchPipeline(
+    return SearchPipeline(
         search_request=SearchRequest(
-            query=query,
+            query=search_request.message,
             search_type=search_request.search_type,
             human_selected_filters=search_request.retrieval_options.filters,
             enable_auto_detect_filters=search_request.retrieval_options.enable_auto_detect_filters,
@@ -86,34 +84,47 @@ def handle_search_request(
         db_session=db_session,
         bypass_acl=False,
     )
+
+
+def _section_to_search_doc(section: InferenceSection) -> SavedSearchDocWithContent:
+    return SavedSearchDocWithContent(
+        document_id=section.center_chunk.document_id,
+        chunk_ind=section.center_chunk.chunk_id,
+        content=section.center_chunk.content,
+        semantic_identifier=section.center_chunk.semantic_identifier or "Unknown",
+        link=(
+            section.center_chunk.source_links.get(0)
+            if section.center_chunk.source_links
+            else None
+        ),
+        blurb=section.center_chunk.blurb,
+        source_type=section.center_chunk.source_type,
+        boost=section.center_chunk.boost,
+        hidden=section.center_chunk.hidden,
+        metadata=section.center_chunk.metadata,
+        score=section.center_chunk.score or 0.0,
+        match_highlights=section.center_chunk.match_highlights,
+        updated_at=section.center_chunk.updated_at,
+        primary_owners=section.center_chunk.primary_owners,
+        secondary_owners=section.center_chunk.secondary_owners,
+        is_internet=False,
+        db_doc_id=0,
+    )
+
+
+@basic_router.post("/document-search")
+def handle_search_request(
+    search_request: DocumentSearchRequest,
+    user: User | None = Depends(current_user),
+    db_session: Session = Depends(get_session),
+) -> DocumentSearchResponse:
+    """Simple search endpoint, does not create a new message or records in the DB"""
+    logger.notice(f"Received document search query: {search_request.message}")
+
+    search_pipeline = _build_document_search_pipeline(search_request, user, db_session)
     top_sections = search_pipeline.reranked_sections
     relevance_sections = search_pipeline.section_relevance
-    top_docs = [
-        SavedSearchDocWithContent(
-            document_id=section.center_chunk.document_id,
-            chunk_ind=section.center_chunk.chunk_id,
-            content=section.center_chunk.content,
-            semantic_identifier=section.center_chunk.semantic_identifier or "Unknown",
-            link=(
-                section.center_chunk.source_links.get(0)
-                if section.center_chunk.source_links
-                else None
-            ),
-            blurb=section.center_chunk.blurb,
-            source_type=section.center_chunk.source_type,
-            boost=section.center_chunk.boost,
-            hidden=section.center_chunk.hidden,
-            metadata=section.center_chunk.metadata,
-            score=section.center_chunk.score or 0.0,
-            match_highlights=section.center_chunk.match_highlights,
-            updated_at=section.center_chunk.updated_at,
-            primary_owners=section.center_chunk.primary_owners,
-            secondary_owners=section.center_chunk.secondary_owners,
-            is_internet=False,
-            db_doc_id=0,
-        )
-        for section in top_sections
-    ]
+    top_docs = [_section_to_search_doc(section) for section in top_sections]
 
     # Deduping happens at the last step to avoid harming quality by dropping content early on
     deduped_docs = top_docs
@@ -248,6 +259,41 @@ def stream_answer_with_citation(
     return StreamingResponse(stream_generator(), media_type="application/json")
 
 
+@basic_router.post("/stream-document-search")
+def stream_search_request(
+    search_request: DocumentSearchRequest,
+    user: User | None = Depends(current_user),
+    db_session: Session = Depends(get_session),
+) -> StreamingResponse:
+    """Streaming version of the document search. The first line holds the retrieved
+    documents as soon as retrieval is done, the next one their reranked order (indices
+    into the retrieved documents) and then a line per LLM relevance verdict as soon as it
+    completes. The documents are not deduped."""
+    logger.notice(f"Received streaming document search query: {search_request.message}")
+
+    def stream_generator() -> Generator[str, None, None]:
+        try:
+            search_pipeline = _build_document_search_pipeline(
+                search_request, user, db_session
+            )
+            for update in search_pipeline.stream_search_results():
+                if isinstance(update, RetrievedSectionsUpdate):
+                    top_docs = [
+                        _section_to_search_doc(section).model_dump()
+                        for section in update.sections
+                    ]
+                    yield get_json_line({"top_documents": top_docs})
+                elif isinstance(update, RerankedSectionsUpdate):
+                    yield get_json_line({"reranked_order": update.model_dump()})
+                else:
+                    yield get_json_line({"section_relevance": update.model_dump()})
+        except Exception as e:
+            logger.exception("Error in document search streaming")
+            yield json.dumps({"error": str(e)})
+
+    return StreamingResponse(stream_generator(), media_type="application/json")
+
+
 @basic_router.get("/standard-answer")
 def get_standard_answer(
     request: StandardAnswerRequest,
@@ -1,6 +1,7 @@
 from collections import defaultdict
 from collections.abc import Sequence
 from datetime import datetime
+from functools import partial
 from itertools import groupby
 from typing import Dict
 from typing import List
@@ -22,8 +23,9 @@ from onyx.db.models import User
 from onyx.db.models import User__UserGroup
 from onyx.db.models import UserGroup
 from onyx.db.token_limit import fetch_all_user_token_rate_limits
-from onyx.server.query_and_chat.token_limit import _get_cutoff_time
-from onyx.server.query_and_chat.token_limit import _is_rate_limited
+from onyx.redis.redis_token_budget import user_group_token_budget_scope
+from onyx.redis.redis_token_budget import user_token_budget_scope
+from onyx.server.query_and_chat.token_limit import _is_over_token_budget
 from onyx.server.query_and_chat.token_limit import _user_is_rate_limited_by_global
 from onyx.utils.threadpool_concurrency import run_functions_tuples_in_parallel
 
@@ -58,15 +60,15 @@ def _user_is_rate_limited(user_id: UUID) -> None:
             db_session=db_session, enabled_only=True, ordered=False
         )
 
-        if user_rate_limits:
-            user_cutoff_time = _get_cutoff_time(user_rate_limits)
-            user_usage = _fetch_user_usage(user_id, user_cutoff_time, db_session)
-
-            if _is_rate_limited(user_rate_limits, user_usage):
-                raise HTTPException(
-                    status_code=429,
-                    detail="Token budget exceeded for user. Try again later.",
-                )
+        if user_rate_limits and _is_over_token_budget(
+            user_token_budget_scope(user_id),
+            user_rate_limits,
+            lambda cutoff_time: _fetch_user_usage(user_id, cutoff_time, db_session),
+        ):
+            raise HTTPException(
+                status_code=429,
+                detail="Token budget exceeded for user. Try again later.",
+            )
 
 
 def _fetch_user_usage(
@@ -98,23 +100,13 @@ def _user_is_rate_limited_by_group(user_id: UUID) -> None:
         group_rate_limits = _fetch_all_user_group_rate_limits(user_id, db_session)
 
         if group_rate_limits:
-            # Group cutoff time is the same for all groups.
-            # This could be optimized to only fetch the maximum cutoff time for
-            # a specific group, but seems unnecessary for now.
-            group_cutoff_time = _get_cutoff_time(
-                [e for sublist in group_rate_limits.values() for e in sublist]
-            )
-
-            user_group_ids = list(group_rate_limits.keys())
-            group_usage = _fetch_user_group_usage(
-                user_group_ids, group_cutoff_time, db_session
-            )
-
             has_at_least_one_untriggered_limit = False
             for user_group_id, rate_limits in group_rate_limits.items():
-                usage = group_usage.get(user_group_id, [])
-
-                if not _is_rate_limited(rate_limits, usage):
+                if not _is_over_token_budget(
+                    user_group_token_budget_scope(user_group_id),
+                    rate_limits,
+                    partial(_fetch_single_user_group_usage, user_group_id, db_session),
+                ):
                     has_at_least_one_untriggered_limit = True
                     break
 
@@ -157,6 +149,14 @@ def _fetch_all_user_group_rate_limits(
     return group_rate_limits
 
 
+def _fetch_single_user_group_usage(
+    user_group_id: int, db_session: Session, cutoff_time: datetime
+) -> list[Tuple[datetime, int]]:
+    return _fetch_user_group_usage([user_group_id], cutoff_time, db_session).get(
+        user_group_id, []
+    )
+
+
 def _fetch_user_group_usage(
     user_group_ids: list[int], cutoff_time: datetime, db_session: Session
 ) -> dict[int, list[Tuple[datetime, int]]]:
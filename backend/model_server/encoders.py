@@ -2,8 +2,8 @@ import asyncio
 import json
 import time
 from types import TracebackType
+from typing import Any
 from typing import cast
-from typing import Optional
 
 import aioboto3  # type: ignore
 import httpx
@@ -29,11 +29,19 @@ from model_server.constants import DEFAULT_VERTEX_MODEL
 from model_server.constants import DEFAULT_VOYAGE_MODEL
 from model_server.constants import EmbeddingModelTextType
 from model_server.constants import EmbeddingProvider
+from model_server.micro_batching import MicroBatcher
 from model_server.utils import pass_aws_key
 from model_server.utils import simple_log_function_time
 from onyx.utils.logger import setup_logger
 from shared_configs.configs import API_BASED_EMBEDDING_TIMEOUT
+from shared_configs.configs import EMBEDDING_BATCH_MAX_TOKENS
+from shared_configs.configs import EMBEDDING_LENGTH_BUCKETED_MAX_BATCH_SIZE
+from shared_configs.configs import EMBEDDING_LENGTH_BUCKETING_ENABLED
 from shared_configs.configs import INDEXING_ONLY
+from shared_configs.configs import MODEL_SERVER_EMBED_MICRO_BATCH_SIZE
+from shared_configs.configs import MODEL_SERVER_MICRO_BATCH_MAX_WAIT_MS
+from shared_configs.configs import MODEL_SERVER_MICRO_BATCHING_ENABLED
+from shared_configs.configs import MODEL_SERVER_RERANK_MICRO_BATCH_SIZE
 from shared_configs.configs import OPENAI_EMBEDDING_TIMEOUT
 from shared_configs.configs import VERTEXAI_EMBEDDING_LOCAL_BATCH_SIZE
 from shared_configs.enums import EmbedTextType
@@ -43,6 +51,7 @@ from shared_configs.model_server_models import EmbedRequest
 from shared_configs.model_server_models import EmbedResponse
 from shared_configs.model_server_models import RerankRequest
 from shared_configs.model_server_models import RerankResponse
+from shared_configs.utils import batch_indices_by_token_budget
 from shared_configs.utils import batch_list
 
 
@@ -51,7 +60,16 @@ logger = setup_logger()
 router = APIRouter(prefix="/encoder")
 
 _GLOBAL_MODELS_DICT: dict[str, "SentenceTransformer"] = {}
-_RERANK_MODEL: Optional["CrossEncoder"] = None
+_RERANK_MODELS: dict[str, "CrossEncoder"] = {}
+
+# SentenceTransformer.encode's default batch size
+_ST_DEFAULT_BATCH_SIZE = 32
+
+# (model name, max context length, normalize, prefix) -> batcher
+_EMBED_BATCHERS: dict[
+    tuple[str, int, bool, str | None], MicroBatcher[str, Embedding]
+] = {}
+_RERANK_BATCHERS: dict[str, MicroBatcher[tuple[str, str], float]] = {}
 
 # If we are not only indexing, dont want retry very long
 _RETRY_DELAY = 10 if INDEXING_ONLY else 0.1
@@ -388,12 +406,96 @@ def get_embedding_model(
 def get_local_reranking_model(
     model_name: str,
 ) -> CrossEncoder:
-    global _RERANK_MODEL
-    if _RERANK_MODEL is None:
+    # keyed by name, a cheap cascade model may be served next to the main one
+    if model_name not in _RERANK_MODELS:
         logger.notice(f"Loading {model_name}")
-        model = CrossEncoder(model_name)
-        _RERANK_MODEL = model
-    return _RERANK_MODEL
+        _RERANK_MODELS[model_name] = CrossEncoder(model_name)
+    return _RERANK_MODELS[model_name]
+
+
+def _to_embedding_list(embeddings_vectors: Any) -> list[Embedding]:
+    return [
+        embedding if isinstance(embedding, list) else embedding.tolist()
+        for embedding in embeddings_vectors
+    ]
+
+
+def local_encode(
+    local_model: "SentenceTransformer",
+    texts: list[str],
+    normalize_embeddings: bool,
+) -> list[Embedding]:
+    """SentenceTransformer pads each batch to its longest text. When length bucketing
+    is enabled, texts are grouped by token count under a token budget instead of
+    the fixed (count based) batches `encode` uses, and the order is restored after."""
+    if not EMBEDDING_LENGTH_BUCKETING_ENABLED or len(texts) == 1:
+        return _to_embedding_list(
+            local_model.encode(texts, normalize_embeddings=normalize_embeddings)
+        )
+
+    token_ids = local_model.tokenizer(
+        texts, truncation=True, max_length=local_model.max_seq_length
+    )["input_ids"]
+    index_batches = batch_indices_by_token_budget(
+        [len(ids) for ids in token_ids],
+        max_batch_tokens=EMBEDDING_BATCH_MAX_TOKENS
+        or _ST_DEFAULT_BATCH_SIZE * local_model.max_seq_length,
+        max_batch_size=EMBEDDING_LENGTH_BUCKETED_MAX_BATCH_SIZE,
+    )
+
+    embeddings: list[Embedding] = [[] for _ in texts]
+    for batch in index_batches:
+        batch_embeddings = _to_embedding_list(
+            local_model.encode(
+                [texts[idx] for idx in batch],
+                batch_size=len(batch),
+                normalize_embeddings=normalize_embeddings,
+            )
+        )
+        for idx, embedding in zip(batch, batch_embeddings):
+            embeddings[idx] = embedding
+    return embeddings
+
+
+def _get_embed_batcher(
+    model_name: str,
+    max_context_length: int,
+    normalize_embeddings: bool,
+    prefix: str | None,
+) -> MicroBatcher[str, Embedding]:
+    key = (model_name, max_context_length, normalize_embeddings, prefix)
+    if key not in _EMBED_BATCHERS:
+
+        def _encode(texts: list[str]) -> list[Embedding]:
+            local_model = get_embedding_model(
+                model_name=model_name, max_context_length=max_context_length
+            )
+            prefixed_texts = [f"{prefix}{text}" for text in texts] if prefix else texts
+            return local_encode(local_model, prefixed_texts, normalize_embeddings)
+
+        _EMBED_BATCHERS[key] = MicroBatcher(
+            run_batch=_encode,
+            max_batch_size=MODEL_SERVER_EMBED_MICRO_BATCH_SIZE,
+            max_wait_seconds=MODEL_SERVER_MICRO_BATCH_MAX_WAIT_MS / 1000,
+            kind="embed",
+        )
+    return _EMBED_BATCHERS[key]
+
+
+def _get_rerank_batcher(model_name: str) -> MicroBatcher[tuple[str, str], float]:
+    if model_name not in _RERANK_BATCHERS:
+
+        def _predict(pairs: list[tuple[str, str]]) -> list[float]:
+            cross_encoder = get_local_reranking_model(model_name)
+            return cross_encoder.predict(pairs).tolist()  # type: ignore
+
+        _RERANK_BATCHERS[model_name] = MicroBatcher(
+            run_batch=_predict,
+            max_batch_size=MODEL_SERVER_RERANK_MICRO_BATCH_SIZE,
+            max_wait_seconds=MODEL_SERVER_MICRO_BATCH_MAX_WAIT_MS / 1000,
+            kind="rerank",
+        )
+    return _RERANK_BATCHERS[model_name]
 
 
 @simple_log_function_time()
@@ -476,22 +578,26 @@ async def embed_text(
             f"Embedding {len(texts)} texts with {total_chars} total characters with local model: {model_name}"
         )
 
-        prefixed_texts = [f"{prefix}{text}" for text in texts] if prefix else texts
+        if MODEL_SERVER_MICRO_BATCHING_ENABLED:
+            # coalesced with concurrent requests for the same model settings,
+            # run in a thread pool
+            embeddings = await _get_embed_batcher(
+                model_name=model_name,
+                max_context_length=max_context_length,
+                normalize_embeddings=normalize_embeddings,
+                prefix=prefix,
+            ).submit(texts)
+        else:
+            prefixed_texts = [f"{prefix}{text}" for text in texts] if prefix else texts
 
-        local_model = get_embedding_model(
-            model_name=model_name, max_context_length=max_context_length
-        )
-        # Run CPU-bound embedding in a thread pool
-        embeddings_vectors = await asyncio.get_event_loop().run_in_executor(
-            None,
-            lambda: local_model.encode(
-                prefixed_texts, normalize_embeddings=normalize_embeddings
-            ),
-        )
-        embeddings = [
-            embedding if isinstance(embedding, list) else embedding.tolist()
-            for embedding in embeddings_vectors
-        ]
+            local_model = get_embedding_model(
+                model_name=model_name, max_context_length=max_context_length
+            )
+            # Run CPU-bound embedding in a thread pool
+            embeddings = await asyncio.get_event_loop().run_in_executor(
+                None,
+                lambda: local_encode(local_model, prefixed_texts, normalize_embeddings),
+            )
 
         elapsed = time.monotonic() - start
         logger.info(
@@ -517,6 +623,11 @@ async def embed_text(
 
 @simple_log_function_time()
 async def local_rerank(query: str, docs: list[str], model_name: str) -> list[float]:
+    if MODEL_SERVER_MICRO_BATCHING_ENABLED:
+        return await _get_rerank_batcher(model_name).submit(
+            [(query, doc) for doc in docs]
+        )
+
     cross_encoder = get_local_reranking_model(model_name)
     # Run CPU-bound reranking in a thread pool
     return await asyncio.get_event_loop().run_in_executor(
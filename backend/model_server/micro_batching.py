@@ -0,0 +1,163 @@
+"""Coalesces concurrent requests against local models into a single forward pass.
+
+Query embeddings from chat and small indexing batches from several workers tend to
+arrive at the same time, each asking for a handful of texts. Running one `encode` per
+HTTP request means paying for a forward pass (and the python / tokenizer overhead
+around it) per request. A `MicroBatcher` instead holds requests for up to
+`max_wait_seconds`, or until `max_batch_size` items are queued, runs them as one
+batch and scatters the results back to the callers.
+"""
+
+import asyncio
+import time
+from collections.abc import Callable
+from collections.abc import Sequence
+from dataclasses import dataclass
+from typing import Generic
+from typing import TypeVar
+
+from prometheus_client import Counter
+from prometheus_client import Histogram
+
+from onyx.utils.logger import setup_logger
+
+logger = setup_logger()
+
+InputT = TypeVar("InputT")
+OutputT = TypeVar("OutputT")
+
+
+micro_batch_items = Counter(
+    "model_server_micro_batch_items_total",
+    "Number of items (texts / query-document pairs) run through micro batches",
+    ["kind"],
+)
+micro_batch_size = Histogram(
+    "model_server_micro_batch_size",
+    "Number of items in each micro batch",
+    ["kind"],
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024),
+)
+micro_batch_requests_per_batch = Histogram(
+    "model_server_micro_batch_requests",
+    "Number of coalesced requests in each micro batch",
+    ["kind"],
+    buckets=(1, 2, 4, 8, 16, 32, 64),
+)
+micro_batch_request_latency = Histogram(
+    "model_server_micro_batch_request_latency_seconds",
+    "Time from a request being queued until its results are available",
+    ["kind"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+
+
+@dataclass
+class _PendingRequest(Generic[InputT, OutputT]):
+    items: Sequence[InputT]
+    future: "asyncio.Future[list[OutputT]]"
+    queued_at: float
+
+
+class MicroBatcher(Generic[InputT, OutputT]):
+    """Queues requests and runs them together through `run_batch`, which must return
+    exactly one output per input, in order. `run_batch` is blocking (CPU / GPU bound)
+    and is run in the default thread pool.
+
+    A single request larger than `max_batch_size` is never split, it is just run as
+    its own batch. If `run_batch` raises, every request in the batch gets the error.
+    """
+
+    def __init__(
+        self,
+        run_batch: Callable[[list[InputT]], Sequence[OutputT]],
+        max_batch_size: int,
+        max_wait_seconds: float,
+        kind: str,
+    ) -> None:
+        if max_batch_size <= 0:
+            raise ValueError("max_batch_size must be positive")
+
+        self.run_batch = run_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait_seconds = max_wait_seconds
+        self.kind = kind
+
+        self._pending: list[_PendingRequest[InputT, OutputT]] = []
+        self._pending_size = 0
+        self._flush_handle: asyncio.TimerHandle | None = None
+        # keep references to running batches so they are not garbage collected
+        self._running: set[asyncio.Task] = set()
+
+    async def submit(self, items: Sequence[InputT]) -> list[OutputT]:
+        if not items:
+            return []
+
+        loop = asyncio.get_running_loop()
+        future: asyncio.Future[list[OutputT]] = loop.create_future()
+        queued_at = time.monotonic()
+
+        self._pending.append(_PendingRequest(items, future, queued_at))
+        self._pending_size += len(items)
+
+        if self._pending_size >= self.max_batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.max_wait_seconds, self._flush)
+
+        try:
+            return await future
+        finally:
+            micro_batch_request_latency.labels(kind=self.kind).observe(
+                time.monotonic() - queued_at
+            )
+
+    def _flush(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        if not self._pending:
+            return
+
+        requests = self._pending
+        self._pending = []
+        self._pending_size = 0
+
+        task = asyncio.get_running_loop().create_task(self._run(requests))
+        self._running.add(task)
+        task.add_done_callback(self._running.discard)
+
+    async def _run(self, requests: list[_PendingRequest[InputT, OutputT]]) -> None:
+        items = [item for request in requests for item in request.items]
+
+        micro_batch_items.labels(kind=self.kind).inc(len(items))
+        micro_batch_size.labels(kind=self.kind).observe(len(items))
+        micro_batch_requests_per_batch.labels(kind=self.kind).observe(len(requests))
+
+        try:
+            outputs = await asyncio.get_running_loop().run_in_executor(
+                None, self.run_batch, items
+            )
+            if len(outputs) != len(items):
+                raise RuntimeError(
+                    f"Micro batch returned {len(outputs)} results for {len(items)} items"
+                )
+        except Exception as e:
+            for request in requests:
+                if not request.future.done():
+                    request.future.set_exception(e)
+            return
+
+        offset = 0
+        for request in requests:
+            num_items = len(request.items)
+            # the caller may have been cancelled (e.g. client disconnected)
+            if not request.future.done():
+                request.future.set_result(list(outputs[offset : offset + num_items]))
+            offset += num_items
+
+        logger.debug(
+            f"Ran micro batch: kind={self.kind} requests={len(requests)} "
+            f"items={len(items)}"
+        )
@@ -17,6 +17,7 @@ from onyx.configs.agent_configs import AGENT_MAX_STATIC_HISTORY_WORD_LENGTH
 from onyx.configs.constants import MessageType
 from onyx.context.search.models import InferenceSection
 from onyx.llm.interfaces import LLMConfig
+from onyx.natural_language_processing.token_count_cache import count_tokens
 from onyx.natural_language_processing.utils import get_tokenizer
 from onyx.natural_language_processing.utils import tokenizer_trim_content
 from onyx.prompts.agent_search import HISTORY_FRAMING_PROMPT
@@ -74,7 +75,7 @@ def trim_prompt_piece(config: LLMConfig, prompt_piece: str, reserved_str: str) -
     return tokenizer_trim_content(
         content=prompt_piece,
         desired_length=config.max_input_tokens
-        - len(llm_tokenizer.encode(reserved_str)),
+        - count_tokens(reserved_str, llm_tokenizer),
         tokenizer=llm_tokenizer,
     )
 
@@ -20,10 +20,11 @@ from onyx.background.celery.celery_redis import celery_find_task
 from onyx.background.celery.celery_redis import celery_get_queue_length
 from onyx.background.celery.celery_redis import celery_get_queued_task_ids
 from onyx.background.celery.celery_redis import celery_get_unacked_task_ids
-from onyx.background.celery.celery_utils import extract_ids_from_runnable_connector
+from onyx.background.celery.celery_utils import iterate_ids_from_runnable_connector
 from onyx.background.celery.tasks.indexing.utils import IndexingCallbackBase
 from onyx.configs.app_configs import ALLOW_SIMULTANEOUS_PRUNING
 from onyx.configs.app_configs import JOB_TIMEOUT
+from onyx.configs.app_configs import PRUNING_SORT_RUN_SIZE
 from onyx.configs.constants import CELERY_GENERIC_BEAT_LOCK_TIMEOUT
 from onyx.configs.constants import CELERY_PRUNING_LOCK_TIMEOUT
 from onyx.configs.constants import CELERY_TASK_WAIT_FOR_FENCE_TIMEOUT
@@ -40,7 +41,7 @@ from onyx.db.connector import mark_ccpair_as_pruned
 from onyx.db.connector_credential_pair import get_connector_credential_pair
 from onyx.db.connector_credential_pair import get_connector_credential_pair_from_id
 from onyx.db.connector_credential_pair import get_connector_credential_pairs
-from onyx.db.document import get_documents_for_connector_credential_pair
+from onyx.db.document import get_sorted_document_ids_for_connector_credential_pair
 from onyx.db.engine import get_session_with_current_tenant
 from onyx.db.enums import ConnectorCredentialPairStatus
 from onyx.db.enums import SyncStatus
@@ -56,6 +57,8 @@ from onyx.redis.redis_connector_prune import RedisConnectorPrunePayload
 from onyx.redis.redis_pool import get_redis_client
 from onyx.redis.redis_pool import get_redis_replica_client
 from onyx.server.utils import make_short_id
+from onyx.utils.external_sort import ExternalIdSorter
+from onyx.utils.external_sort import sorted_difference
 from onyx.utils.logger import format_error_for_logging
 from onyx.utils.logger import LoggerContextVars
 from onyx.utils.logger import pruning_ctx
@@ -460,43 +463,48 @@ def connector_pruning_generator_task(
                 r,
             )
 
-            # a list of docs in the source
-            all_connector_doc_ids: set[str] = extract_ids_from_runnable_connector(
-                runnable_connector, callback
-            )
+            # the ids in the source and in our index can each number in the millions,
+            # so rather than diffing two sets in memory, the source ids are sorted into
+            # runs spilled to disk and merge-diffed against the indexed ids, which are
+            # streamed from Postgres in the same order
+            with ExternalIdSorter(run_size=PRUNING_SORT_RUN_SIZE) as connector_doc_ids:
+                for doc_id_batch in iterate_ids_from_runnable_connector(
+                    runnable_connector, callback
+                ):
+                    connector_doc_ids.add_many(doc_id_batch)
+
+                task_logger.info(
+                    "Pruning source ids collected: "
+                    f"cc_pair={cc_pair_id} "
+                    f"connector_source={cc_pair.connector.source} "
+                    f"sorted_runs={connector_doc_ids.num_runs}"
+                )
 
-            # a list of docs in our local index
-            all_indexed_document_ids = {
-                doc.id
-                for doc in get_documents_for_connector_credential_pair(
-                    db_session=db_session,
-                    connector_id=connector_id,
-                    credential_id=credential_id,
+                # docs in our local index which are no longer in the source.
+                # Tasks are generated as these are found.
+                doc_ids_to_remove = sorted_difference(
+                    get_sorted_document_ids_for_connector_credential_pair(
+                        db_session=db_session,
+                        connector_id=connector_id,
+                        credential_id=credential_id,
+                    ),
+                    connector_doc_ids.iter_sorted(),
                 )
-            }
 
-            # generate list of docs to remove (no longer in the source)
-            doc_ids_to_remove = list(all_indexed_document_ids - all_connector_doc_ids)
+                task_logger.info(
+                    f"RedisConnector.prune.generate_tasks starting. cc_pair={cc_pair_id}"
+                )
+                tasks_generated = redis_connector.prune.generate_tasks(
+                    doc_ids_to_remove, self.app, db_session, None
+                )
+                if tasks_generated is None:
+                    return None
 
             task_logger.info(
-                "Pruning set collected: "
+                "RedisConnector.prune.generate_tasks finished. "
                 f"cc_pair={cc_pair_id} "
                 f"connector_source={cc_pair.connector.source} "
-                f"docs_to_remove={len(doc_ids_to_remove)}"
-            )
-
-            task_logger.info(
-                f"RedisConnector.prune.generate_tasks starting. cc_pair={cc_pair_id}"
-            )
-            tasks_generated = redis_connector.prune.generate_tasks(
-                set(doc_ids_to_remove), self.app, db_session, None
-            )
-            if tasks_generated is None:
-                return None
-
-            task_logger.info(
-                "RedisConnector.prune.generate_tasks finished. "
-                f"cc_pair={cc_pair_id} tasks_generated={tasks_generated}"
+                f"tasks_generated={tasks_generated}"
             )
 
             redis_connector.prune.generator_complete = tasks_generated
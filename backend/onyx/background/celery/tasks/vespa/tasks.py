@@ -15,12 +15,14 @@ from sqlalchemy.orm import Session
 from tenacity import RetryError
 
 from onyx.access.access import get_access_for_document
+from onyx.access.access import get_access_for_documents
 from onyx.background.celery.apps.app_base import task_logger
 from onyx.background.celery.tasks.shared.RetryDocumentIndex import RetryDocumentIndex
 from onyx.background.celery.tasks.shared.tasks import LIGHT_SOFT_TIME_LIMIT
 from onyx.background.celery.tasks.shared.tasks import LIGHT_TIME_LIMIT
 from onyx.background.celery.tasks.shared.tasks import OnyxCeleryTaskCompletionStatus
 from onyx.configs.app_configs import JOB_TIMEOUT
+from onyx.configs.app_configs import VESPA_SYNC_BATCH_CONCURRENCY
 from onyx.configs.app_configs import VESPA_SYNC_MAX_TASKS
 from onyx.configs.constants import CELERY_VESPA_SYNC_BEAT_LOCK_TIMEOUT
 from onyx.configs.constants import OnyxCeleryTask
@@ -29,10 +31,13 @@ from onyx.configs.constants import OnyxRedisLocks
 from onyx.db.connector_credential_pair import get_connector_credential_pairs
 from onyx.db.document import count_documents_by_needs_sync
 from onyx.db.document import get_document
+from onyx.db.document import get_documents_by_ids
 from onyx.db.document import mark_document_as_synced
+from onyx.db.document import mark_documents_as_synced
 from onyx.db.document_set import delete_document_set
 from onyx.db.document_set import fetch_document_sets
 from onyx.db.document_set import fetch_document_sets_for_document
+from onyx.db.document_set import fetch_document_sets_for_documents
 from onyx.db.document_set import get_document_set_by_id
 from onyx.db.document_set import mark_document_set_as_synced
 from onyx.db.engine import get_session_with_current_tenant
@@ -57,6 +62,7 @@ from onyx.redis.redis_pool import get_redis_replica_client
 from onyx.redis.redis_pool import redis_lock_dump
 from onyx.redis.redis_usergroup import RedisUserGroup
 from onyx.utils.logger import setup_logger
+from onyx.utils.threadpool_concurrency import run_functions_tuples_in_parallel
 from onyx.utils.variable_functionality import fetch_versioned_implementation
 from onyx.utils.variable_functionality import (
     fetch_versioned_implementation_with_fallback,
@@ -641,3 +647,200 @@ def vespa_metadata_sync_task(self: Task, document_id: str, *, tenant_id: str) ->
         )
 
     return completion_status == OnyxCeleryTaskCompletionStatus.SUCCEEDED
+
+
+# a batch task does several documents worth of work, so give it more room than a
+# single document task
+VESPA_METADATA_SYNC_BATCH_SOFT_TIME_LIMIT = LIGHT_SOFT_TIME_LIMIT * 3
+VESPA_METADATA_SYNC_BATCH_TIME_LIMIT = VESPA_METADATA_SYNC_BATCH_SOFT_TIME_LIMIT + 15
+
+
+def _is_non_retryable_sync_exception(ex: Exception) -> bool:
+    e: BaseException | None = ex
+    if isinstance(ex, RetryError):
+        e = ex.last_attempt.exception()
+
+    return (
+        isinstance(e, httpx.HTTPStatusError)
+        and e.response.status_code == HTTPStatus.BAD_REQUEST
+    )
+
+
+@shared_task(
+    name=OnyxCeleryTask.VESPA_METADATA_SYNC_BATCH_TASK,
+    bind=True,
+    soft_time_limit=VESPA_METADATA_SYNC_BATCH_SOFT_TIME_LIMIT,
+    time_limit=VESPA_METADATA_SYNC_BATCH_TIME_LIMIT,
+    max_retries=3,
+)
+def vespa_metadata_sync_batch_task(
+    self: Task, document_ids: list[str], *, tenant_id: str
+) -> bool:
+    """Batched version of vespa_metadata_sync_task. Fetches the metadata for all
+    documents in the batch with set based queries, updates Vespa concurrently and
+    marks the synced documents in a single statement.
+
+    If only some documents fail, the task is retried with just those documents."""
+    start = time.monotonic()
+
+    completion_status = OnyxCeleryTaskCompletionStatus.UNDEFINED
+    num_synced = 0
+    num_skipped = 0
+    num_chunks = 0
+    # set if only some of the documents failed, these are retried on their own
+    retryable_doc_ids: list[str] = []
+    first_exception: Exception | None = None
+
+    try:
+        with get_session_with_current_tenant() as db_session:
+            active_search_settings = get_active_search_settings(db_session)
+            doc_index = get_default_document_index(
+                search_settings=active_search_settings.primary,
+                secondary_search_settings=active_search_settings.secondary,
+                httpx_client=HttpxPool.get("vespa"),
+            )
+
+            retry_index = RetryDocumentIndex(doc_index)
+
+            doc_id_to_doc = {
+                doc.id: doc for doc in get_documents_by_ids(db_session, document_ids)
+            }
+            existing_doc_ids = [
+                doc_id for doc_id in document_ids if doc_id in doc_id_to_doc
+            ]
+            num_skipped = len(document_ids) - len(existing_doc_ids)
+
+            # document set sync
+            doc_id_to_doc_sets = {
+                doc_id: set(doc_set_names)
+                for doc_id, doc_set_names in fetch_document_sets_for_documents(
+                    existing_doc_ids, db_session
+                )
+            }
+            # User group sync
+            doc_id_to_access = get_access_for_documents(
+                document_ids=existing_doc_ids, db_session=db_session
+            )
+
+            # built here rather than in the worker threads, they can't use the session
+            doc_id_to_fields: dict[str, VespaDocumentFields] = {}
+            for doc_id in existing_doc_ids:
+                doc_access = doc_id_to_access.get(doc_id)
+                if doc_access is None:
+                    task_logger.warning(
+                        f"No access in the batch lookup, falling back to the single "
+                        f"document lookup: doc={doc_id}"
+                    )
+                    doc_access = get_access_for_document(
+                        document_id=doc_id, db_session=db_session
+                    )
+
+                doc = doc_id_to_doc[doc_id]
+                doc_id_to_fields[doc_id] = VespaDocumentFields(
+                    document_sets=doc_id_to_doc_sets.get(doc_id, set()),
+                    access=doc_access,
+                    boost=doc.boost,
+                    hidden=doc.hidden,
+                )
+
+            def _sync_document(document_id: str) -> int | Exception:
+                try:
+                    # update Vespa. OK if doc doesn't exist. Raises exception otherwise.
+                    return retry_index.update_single(
+                        document_id,
+                        tenant_id=tenant_id,
+                        chunk_count=doc_id_to_doc[document_id].chunk_count,
+                        fields=doc_id_to_fields[document_id],
+                        user_fields=None,
+                    )
+                except Exception as e:
+                    task_logger.exception(f"Failed to sync doc={document_id}")
+                    return e
+
+            results = run_functions_tuples_in_parallel(
+                [(_sync_document, (doc_id,)) for doc_id in existing_doc_ids],
+                max_workers=VESPA_SYNC_BATCH_CONCURRENCY,
+            )
+
+            synced_doc_ids: list[str] = []
+            failed_doc_ids: list[str] = []
+            for doc_id, result in zip(existing_doc_ids, results):
+                if isinstance(result, Exception):
+                    failed_doc_ids.append(doc_id)
+                    if not _is_non_retryable_sync_exception(result):
+                        retryable_doc_ids.append(doc_id)
+                    first_exception = first_exception or result
+                    continue
+
+                synced_doc_ids.append(doc_id)
+                num_chunks += result
+
+            # update db last. Worst case = we crash right before this and
+            # the sync might repeat again later
+            mark_documents_as_synced(synced_doc_ids, db_session)
+            num_synced = len(synced_doc_ids)
+
+            if not failed_doc_ids:
+                completion_status = OnyxCeleryTaskCompletionStatus.SUCCEEDED
+            elif not retryable_doc_ids or (
+                self.max_retries is not None
+                and self.request.retries >= self.max_retries
+            ):
+                task_logger.error(
+                    f"vespa_metadata_sync_batch_task giving up on docs: "
+                    f"failed={failed_doc_ids}"
+                )
+                retryable_doc_ids = []
+                completion_status = (
+                    OnyxCeleryTaskCompletionStatus.NON_RETRYABLE_EXCEPTION
+                )
+            else:
+                completion_status = OnyxCeleryTaskCompletionStatus.RETRYABLE_EXCEPTION
+    except SoftTimeLimitExceeded:
+        task_logger.info(
+            f"SoftTimeLimitExceeded exception. num_docs={len(document_ids)}"
+        )
+        completion_status = OnyxCeleryTaskCompletionStatus.SOFT_TIME_LIMIT
+    except Exception as ex:
+        # the batch as a whole failed (db, index lookup, ...), retry all of it
+        task_logger.exception(
+            f"vespa_metadata_sync_batch_task exceptioned: num_docs={len(document_ids)}"
+        )
+
+        if _is_non_retryable_sync_exception(ex) or (
+            self.max_retries is not None and self.request.retries >= self.max_retries
+        ):
+            completion_status = OnyxCeleryTaskCompletionStatus.NON_RETRYABLE_EXCEPTION
+        else:
+            completion_status = OnyxCeleryTaskCompletionStatus.RETRYABLE_EXCEPTION
+
+            # Exponential backoff from 2^4 to 2^6 ... i.e. 16, 32, 64
+            countdown = 2 ** (self.request.retries + 4)
+            self.retry(
+                exc=ex, countdown=countdown
+            )  # this will raise a celery exception
+    else:
+        # outside of the try, the celery exception raised by retry must not be caught
+        if retryable_doc_ids:
+            # Exponential backoff from 2^4 to 2^6 ... i.e. 16, 32, 64
+            countdown = 2 ** (self.request.retries + 4)
+            # only the docs that failed need to be retried. The task id stays
+            # the same, so the taskset accounting is unaffected.
+            self.retry(
+                exc=first_exception,
+                countdown=countdown,
+                kwargs=dict(document_ids=retryable_doc_ids, tenant_id=tenant_id),
+            )  # this will raise a celery exception
+    finally:
+        elapsed = time.monotonic() - start
+        task_logger.info(
+            f"vespa_metadata_sync_batch_task completed: "
+            f"status={completion_status.value} "
+            f"docs={len(document_ids)} "
+            f"synced={num_synced} "
+            f"skipped={num_skipped} "
+            f"chunks={num_chunks} "
+            f"elapsed={elapsed:.2f}"
+        )
+
+    return completion_status == OnyxCeleryTaskCompletionStatus.SUCCEEDED
@@ -27,6 +27,7 @@ from onyx.db.models import Tool
 from onyx.db.models import User
 from onyx.db.prompts import get_prompts_by_ids
 from onyx.llm.models import PreviousMessage
+from onyx.natural_language_processing.token_count_cache import count_tokens
 from onyx.natural_language_processing.utils import BaseTokenizer
 from onyx.server.query_and_chat.models import CreateChatMessageRequest
 from onyx.tools.tool_implementations.custom.custom_tool import (
@@ -125,7 +126,7 @@ def combine_message_thread(
             role_str = message.role.value.upper()
 
         msg_str = f"{role_str}:\n{message.message}"
-        message_token_count = len(llm_tokenizer.encode(msg_str))
+        message_token_count = count_tokens(msg_str, llm_tokenizer)
 
         if (
             max_tokens is not None
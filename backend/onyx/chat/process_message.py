@@ -1,9 +1,13 @@
+import threading
 import time
 import traceback
+import weakref
 from collections import defaultdict
+from collections.abc import AsyncIterator
 from collections.abc import Callable
 from collections.abc import Generator
 from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
 from typing import cast
 from typing import Protocol
 from uuid import UUID
@@ -43,6 +47,9 @@ from onyx.chat.models import UserKnowledgeFilePacket
 from onyx.chat.prompt_builder.answer_prompt_builder import AnswerPromptBuilder
 from onyx.chat.prompt_builder.answer_prompt_builder import default_build_system_message
 from onyx.chat.prompt_builder.answer_prompt_builder import default_build_user_message
+from onyx.configs.app_configs import POSTGRES_API_SERVER_POOL_OVERFLOW
+from onyx.configs.app_configs import POSTGRES_API_SERVER_POOL_SIZE
+from onyx.configs.chat_configs import CHAT_STREAM_MAX_THREADS
 from onyx.configs.chat_configs import CHAT_TARGET_CHUNK_PERCENTAGE
 from onyx.configs.chat_configs import DISABLE_LLM_CHOOSE_SEARCH
 from onyx.configs.chat_configs import MAX_CHUNKS_FED_TO_CHAT
@@ -156,6 +163,7 @@ from onyx.tools.tool_runner import ToolCallFinalResult
 from onyx.utils.logger import setup_logger
 from onyx.utils.long_term_log import LongTermLogger
 from onyx.utils.telemetry import mt_cloud_telemetry
+from onyx.utils.threadpool_concurrency import iterate_in_executor
 from onyx.utils.timing import log_function_time
 from onyx.utils.timing import log_generator_function_time
 from shared_configs.contextvars import get_current_tenant_id
@@ -163,6 +171,51 @@ from shared_configs.contextvars import get_current_tenant_id
 logger = setup_logger()
 ERROR_TYPE_CANCELLED = "cancelled"
 
+# every stream holds a db session until it is done, streams beyond the size of the
+# api server's pool would only wait for (and time out getting) a connection. They are
+# rejected instead, see `reserve_chat_stream_slot`
+_API_SERVER_POOL_MAX_CONNECTIONS = (
+    POSTGRES_API_SERVER_POOL_SIZE + POSTGRES_API_SERVER_POOL_OVERFLOW
+)
+_MAX_CHAT_STREAMS = min(
+    CHAT_STREAM_MAX_THREADS or _API_SERVER_POOL_MAX_CONNECTIONS,
+    _API_SERVER_POOL_MAX_CONNECTIONS,
+)
+_CHAT_STREAM_EXECUTOR = ThreadPoolExecutor(
+    max_workers=_MAX_CHAT_STREAMS, thread_name_prefix="chat_stream"
+)
+_chat_stream_slots = threading.BoundedSemaphore(_MAX_CHAT_STREAMS)
+
+
+class ChatStreamSlot:
+    """A chat stream thread reserved for one chat message. Reserved before the response
+    starts, so that the message can still be rejected when every thread is taken."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._released = False
+
+    def release(self) -> None:
+        with self._lock:
+            if self._released:
+                return
+            self._released = True
+        _chat_stream_slots.release()
+
+    def release_when_dropped(self, stream: object) -> None:
+        """Also releases the slot once `stream` is garbage collected. A stream dropped
+        before it starts (e.g. the client disconnected right away) never runs the
+        pipeline, which releases the slot otherwise."""
+        weakref.finalize(stream, self.release)
+
+
+def reserve_chat_stream_slot() -> ChatStreamSlot | None:
+    """None if every chat stream thread of this process is taken"""
+    if not _chat_stream_slots.acquire(blocking=False):
+        return None
+    return ChatStreamSlot()
+
+
 COMMON_TOOL_RESPONSE_TYPES = {
     "image": ChatFileType.IMAGE,
     "csv": ChatFileType.CSV,
@@ -1523,6 +1576,62 @@ def stream_chat_message(
             yield get_json_line(obj.model_dump())
 
 
+async def astream_chat_message_objects(
+    new_msg_req: CreateChatMessageRequest,
+    user: User | None,
+    slot: ChatStreamSlot,
+    litellm_additional_headers: dict[str, str] | None = None,
+    custom_tool_additional_headers: dict[str, str] | None = None,
+) -> AsyncIterator[ChatPacket]:
+    """Async variant of `stream_chat_message_objects`. The pipeline runs on the chat
+    stream thread reserved with `slot` and is cancelled once the caller stops iterating,
+    e.g. when the client disconnects.
+
+    NOTE: the pipeline itself (search, tools, LLM calls, db writes) is still sync, so a
+    stream holds its thread and db session while waiting on the LLM."""
+
+    def _stream(stopped: threading.Event) -> ChatPacketStream:
+        try:
+            with get_session_context_manager() as db_session:
+                yield from stream_chat_message_objects(
+                    new_msg_req=new_msg_req,
+                    user=user,
+                    db_session=db_session,
+                    litellm_additional_headers=litellm_additional_headers,
+                    custom_tool_additional_headers=custom_tool_additional_headers,
+                    is_connected=lambda: not stopped.is_set(),
+                )
+        finally:
+            # the pipeline runs to completion even after a disconnect, only then is
+            # the thread free for the next message
+            slot.release()
+
+    async for packet in iterate_in_executor(_stream, _CHAT_STREAM_EXECUTOR):
+        yield packet
+
+
+async def astream_chat_message(
+    new_msg_req: CreateChatMessageRequest,
+    user: User | None,
+    slot: ChatStreamSlot,
+    litellm_additional_headers: dict[str, str] | None = None,
+    custom_tool_additional_headers: dict[str, str] | None = None,
+) -> AsyncIterator[str]:
+    start_time = time.time()
+    async for obj in astream_chat_message_objects(
+        new_msg_req=new_msg_req,
+        user=user,
+        slot=slot,
+        litellm_additional_headers=litellm_additional_headers,
+        custom_tool_additional_headers=custom_tool_additional_headers,
+    ):
+        if isinstance(obj, QADocsResponse):
+            document_retrieval_latency = time.time() - start_time
+            logger.debug(f"First doc time: {document_retrieval_latency}")
+
+        yield get_json_line(obj.model_dump())
+
+
 @log_function_time()
 def gather_stream_for_slack(
     packets: ChatPacketStream,
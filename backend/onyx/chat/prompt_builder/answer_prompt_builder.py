@@ -1,5 +1,4 @@
 from collections.abc import Callable
-from typing import cast
 
 from langchain_core.messages import BaseMessage
 from langchain_core.messages import HumanMessage
@@ -18,6 +17,7 @@ from onyx.llm.utils import build_content_with_imgs
 from onyx.llm.utils import check_message_tokens
 from onyx.llm.utils import message_to_prompt_and_imgs
 from onyx.llm.utils import model_supports_image_input
+from onyx.natural_language_processing.token_count_cache import count_tokens
 from onyx.natural_language_processing.utils import get_tokenizer
 from onyx.prompts.chat_prompts import CHAT_USER_CONTEXT_FREE_PROMPT
 from onyx.prompts.chat_prompts import CODE_BLOCK_MARKDOWN
@@ -106,8 +106,8 @@ class AnswerPromptBuilder:
             model_name=llm_config.model_name,
         )
         self.llm_config = llm_config
-        self.llm_tokenizer_encode_func = cast(
-            Callable[[str], list[int]], llm_tokenizer.encode
+        self.llm_token_count_func: Callable[[str], int] = lambda text: count_tokens(
+            text, llm_tokenizer
         )
 
         self.raw_message_history = message_history
@@ -139,18 +139,18 @@ class AnswerPromptBuilder:
 
         self.system_message_and_token_cnt = (
             system_message,
-            check_message_tokens(system_message, self.llm_tokenizer_encode_func),
+            check_message_tokens(system_message, self.llm_token_count_func),
         )
 
     def update_user_prompt(self, user_message: HumanMessage) -> None:
         self.user_message_and_token_cnt = (
             user_message,
-            check_message_tokens(user_message, self.llm_tokenizer_encode_func),
+            check_message_tokens(user_message, self.llm_token_count_func),
         )
 
     def append_message(self, message: BaseMessage) -> None:
         """Append a new message to the message history."""
-        token_count = check_message_tokens(message, self.llm_tokenizer_encode_func)
+        token_count = check_message_tokens(message, self.llm_token_count_func)
         self.new_messages_and_token_cnts.append((message, token_count))
 
     def get_user_message_content(self) -> str:
@@ -16,6 +16,8 @@ from onyx.configs.model_configs import DOC_EMBEDDING_CONTEXT_SIZE
 from onyx.context.search.models import InferenceChunk
 from onyx.context.search.models import InferenceSection
 from onyx.llm.interfaces import LLMConfig
+from onyx.natural_language_processing.token_count_cache import count_tokens
+from onyx.natural_language_processing.utils import BaseTokenizer
 from onyx.natural_language_processing.utils import get_tokenizer
 from onyx.natural_language_processing.utils import tokenizer_trim_content
 from onyx.prompts.prompt_utils import build_doc_context_str
@@ -131,6 +133,66 @@ def _remove_sections_to_ignore(
     ]
 
 
+def _count_section_content_tokens(
+    section: InferenceSection, llm_tokenizer: BaseTokenizer
+) -> int:
+    """Uses the token counts of the chunks computed at indexing time if the content of
+    the section is still exactly its chunks joined by newlines (counted as one token
+    each), otherwise counts the content."""
+    tokenizer_family = llm_tokenizer.family
+    if (
+        tokenizer_family is not None
+        and section.chunks
+        and all(
+            tokenizer_family in chunk.content_token_counts for chunk in section.chunks
+        )
+        and section.combined_content
+        == "\n".join(chunk.content for chunk in section.chunks)
+    ):
+        return (
+            sum(
+                chunk.content_token_counts[tokenizer_family] for chunk in section.chunks
+            )
+            + len(section.chunks)
+            - 1
+        )
+
+    return count_tokens(section.combined_content, llm_tokenizer)
+
+
+def _count_section_tokens(
+    section: InferenceSection,
+    ind: int,
+    using_tool_message: bool,
+    llm_tokenizer: BaseTokenizer,
+) -> int:
+    """The document wrapper (title, metadata, position) and the content are counted
+    separately so that the content count can be reused wherever the section ends up in
+    the prompt. Tokens merging across the boundary make this off by a token or two."""
+    if using_tool_message:
+        # If using tool message, it will be a bit of an overestimate as the extra json text around the section
+        # will be counted towards the token count. However, once the Sections are merged, the extra json parts
+        # that overlap will not be counted multiple times like it is in the pruning step.
+        section_dict = section_to_dict(section, ind)
+        section_dict["content"] = ""
+        # the content is escaped in the json, so the chunk counts do not apply
+        return count_tokens(json.dumps(section_dict), llm_tokenizer) + count_tokens(
+            json.dumps(section.combined_content)[1:-1], llm_tokenizer
+        )
+
+    wrapper_str = build_doc_context_str(
+        semantic_identifier=section.center_chunk.semantic_identifier,
+        source_type=section.center_chunk.source_type,
+        content="",
+        metadata_dict=section.center_chunk.metadata,
+        updated_at=section.center_chunk.updated_at,
+        ind=ind,
+    )
+    return count_tokens(wrapper_str, llm_tokenizer) + _count_section_content_tokens(
+        section, llm_tokenizer
+    )
+
+
 def _apply_pruning(
     sections: list[InferenceSection],
     section_relevance_list: list[bool] | None,
@@ -159,23 +221,12 @@ def _apply_pruning(
     final_section_ind = None
     total_tokens = 0
     for ind, section in enumerate(sections):
-        section_str = (
-            # If using tool message, it will be a bit of an overestimate as the extra json text around the section
-            # will be counted towards the token count. However, once the Sections are merged, the extra json parts
-            # that overlap will not be counted multiple times like it is in the pruning step.
-            json.dumps(section_to_dict(section, ind))
-            if using_tool_message
-            else build_doc_context_str(
-                semantic_identifier=section.center_chunk.semantic_identifier,
-                source_type=section.center_chunk.source_type,
-                content=section.combined_content,
-                metadata_dict=section.center_chunk.metadata,
-                updated_at=section.center_chunk.updated_at,
-                ind=ind,
-            )
+        section_token_count = _count_section_tokens(
+            section=section,
+            ind=ind,
+            using_tool_message=using_tool_message,
+            llm_tokenizer=llm_tokenizer,
         )
-
-        section_token_count = len(llm_tokenizer.encode(section_str))
         # if not using sections (specifically, using Sections where each section maps exactly to the one center chunk),
         # truncate chunks that are way too long. This can happen if the embedding model tokenizer is different
         # than the LLM tokenizer
@@ -241,8 +292,8 @@ def _apply_pruning(
             amount_to_truncate = total_tokens - token_limit
             # NOTE: need to recalculate the length here, since the previous calculation included
             # overhead from JSON-fying the doc / the metadata
-            final_doc_content_length = len(
-                llm_tokenizer.encode(sections[final_section_ind].combined_content)
+            final_doc_content_length = _count_section_content_tokens(
+                sections[final_section_ind], llm_tokenizer
             ) - (amount_to_truncate)
             # this could occur if we only have space for the title / metadata
             # not ideal, but it's the most reasonable thing to do
@@ -9,6 +9,7 @@ from onyx.auth.schemas import AuthBackend
 from onyx.configs.constants import AuthType
 from onyx.configs.constants import DocumentIndexType
 from onyx.configs.constants import QueryHistoryType
+from onyx.db.enums import EmbeddingPrecision
 from onyx.file_processing.enums import HtmlBasedConnectorTransformLinksStrategy
 from onyx.prompts.image_analysis import DEFAULT_IMAGE_ANALYSIS_SYSTEM_PROMPT
 from onyx.prompts.image_analysis import DEFAULT_IMAGE_SUMMARIZATION_SYSTEM_PROMPT
@@ -311,6 +312,10 @@ except ValueError:
 
 # The maximum number of tasks that can be queued up to sync to Vespa in a single pass
 VESPA_SYNC_MAX_TASKS = 1024
+# The number of documents synced by a single metadata sync task
+VESPA_SYNC_BATCH_SIZE = int(os.environ.get("VESPA_SYNC_BATCH_SIZE") or 64)
+# The number of documents within a batch that are updated in Vespa concurrently
+VESPA_SYNC_BATCH_CONCURRENCY = int(os.environ.get("VESPA_SYNC_BATCH_CONCURRENCY") or 8)
 
 DB_YIELD_PER_DEFAULT = 64
 
@@ -490,6 +495,11 @@ MAX_PRUNING_DOCUMENT_RETRIEVAL_PER_MINUTE = int(
     os.environ.get("MAX_PRUNING_DOCUMENT_RETRIEVAL_PER_MINUTE", 0)
 )
 
+# Pruning diffs the ids in the source against the indexed ids with an external sort.
+# This is the max number of source ids held in memory before a sorted run is spilled
+# to disk, which bounds the memory used by a pruning job regardless of connector size.
+PRUNING_SORT_RUN_SIZE = int(os.environ.get("PRUNING_SORT_RUN_SIZE") or 100_000)
+
 # comma delimited list of zendesk article labels to skip indexing for
 ZENDESK_CONNECTOR_SKIP_ARTICLE_LABELS = os.environ.get(
     "ZENDESK_CONNECTOR_SKIP_ARTICLE_LABELS", ""
@@ -550,6 +560,108 @@ INDEXING_EMBEDDING_MODEL_NUM_THREADS = int(
     os.environ.get("INDEXING_EMBEDDING_MODEL_NUM_THREADS") or 1
 )
 
+# If set, the chunk / embed / write stages of the indexing pipeline run on separate
+# threads so that consecutive batches overlap (e.g. batch N+1 is chunked while batch N
+# is embedded and batch N-1 is written to Vespa).
+ENABLE_PIPELINED_INDEXING = (
+    os.environ.get("ENABLE_PIPELINED_INDEXING", "").lower() == "true"
+)
+# Max number of batches waiting in front of each stage of the pipelined indexer.
+# Once the chunking queue is full, the connector is blocked until there is room.
+INDEXING_PIPELINE_CHUNK_QUEUE_DEPTH = int(
+    os.environ.get("INDEXING_PIPELINE_CHUNK_QUEUE_DEPTH") or 1
+)
+INDEXING_PIPELINE_EMBED_QUEUE_DEPTH = int(
+    os.environ.get("INDEXING_PIPELINE_EMBED_QUEUE_DEPTH") or 1
+)
+INDEXING_PIPELINE_WRITE_QUEUE_DEPTH = int(
+    os.environ.get("INDEXING_PIPELINE_WRITE_QUEUE_DEPTH") or 1
+)
+
+# If set, documents which were indexed before are only partially re-indexed: chunks
+# whose fingerprint (text + position) is unchanged since the last indexing are neither
+# re-embedded nor rewritten, only their access / metadata fields are updated in Vespa.
+# Not used with contextual RAG or when re-indexing from the beginning.
+INCREMENTAL_CHUNKING_ENABLED = (
+    os.environ.get("INCREMENTAL_CHUNKING_ENABLED", "").lower() == "true"
+)
+
+# Cache for indexing embeddings keyed on the model config + exact chunk text, so that
+# unchanged chunks of updated documents are not re-embedded. One of "redis" (shared
+# across all indexing workers), "memory" (process local) or "" to disable.
+EMBEDDING_CACHE_BACKEND = (os.environ.get("EMBEDDING_CACHE_BACKEND") or "").lower()
+# Max number of embeddings stored per tenant, least recently used ones are evicted first
+EMBEDDING_CACHE_MAX_ENTRIES = int(
+    os.environ.get("EMBEDDING_CACHE_MAX_ENTRIES") or 1_000_000
+)
+# Same for the "memory" backend, which keeps the embeddings of every tenant in the
+# memory of each indexing process (~25KB per 768 dim embedding, as a list of floats)
+EMBEDDING_CACHE_MEMORY_MAX_ENTRIES = int(
+    os.environ.get("EMBEDDING_CACHE_MEMORY_MAX_ENTRIES") or 10_000
+)
+# 0 means embeddings only expire through eviction
+EMBEDDING_CACHE_TTL_SECONDS = int(
+    os.environ.get("EMBEDDING_CACHE_TTL_SECONDS") or 60 * 60 * 24 * 30
+)
+
+# Cache for search query embeddings, keyed on the search settings + normalized query
+# text. A small process local cache sits in front of a Redis cache shared by all
+# api server workers.
+QUERY_EMBEDDING_CACHE_ENABLED = (
+    os.environ.get("QUERY_EMBEDDING_CACHE_ENABLED") or "true"
+).lower() == "true"
+QUERY_EMBEDDING_CACHE_LOCAL_MAX_ENTRIES = int(
+    os.environ.get("QUERY_EMBEDDING_CACHE_LOCAL_MAX_ENTRIES") or 2048
+)
+QUERY_EMBEDDING_CACHE_LOCAL_TTL_SECONDS = int(
+    os.environ.get("QUERY_EMBEDDING_CACHE_LOCAL_TTL_SECONDS") or 60 * 10
+)
+QUERY_EMBEDDING_CACHE_MAX_ENTRIES = int(
+    os.environ.get("QUERY_EMBEDDING_CACHE_MAX_ENTRIES") or 100_000
+)
+QUERY_EMBEDDING_CACHE_TTL_SECONDS = int(
+    os.environ.get("QUERY_EMBEDDING_CACHE_TTL_SECONDS") or 60 * 60 * 24 * 7
+)
+
+# Token rate limits are checked against per-minute token counters in Redis instead of
+# aggregating the chat history in Postgres before every chat message. Postgres is only
+# used to reconstruct a counter which does not exist yet / expired.
+TOKEN_BUDGET_COUNTERS_ENABLED = (
+    os.environ.get("TOKEN_BUDGET_COUNTERS_ENABLED") or "true"
+).lower() == "true"
+
+# Process local cache of cross-encoder scores, keyed on the rerank model, the normalized
+# query and the chunk + its content. Agent search reranks the same chunks for many
+# similar sub-queries and refined answers rerank the same pairs again.
+RERANK_SCORE_CACHE_ENABLED = (
+    os.environ.get("RERANK_SCORE_CACHE_ENABLED") or "true"
+).lower() == "true"
+RERANK_SCORE_CACHE_MAX_ENTRIES = int(
+    os.environ.get("RERANK_SCORE_CACHE_MAX_ENTRIES") or 50_000
+)
+# 0 means scores only expire through eviction
+RERANK_SCORE_CACHE_TTL_SECONDS = int(
+    os.environ.get("RERANK_SCORE_CACHE_TTL_SECONDS") or 60 * 30
+)
+
+# Process local cache of token counts, keyed on the tokenizer family and a hash of the
+# text. Prompts, chat history and sections are counted again on every chat turn and for
+# every sub-question of agent search.
+TOKEN_COUNT_CACHE_ENABLED = (
+    os.environ.get("TOKEN_COUNT_CACHE_ENABLED") or "true"
+).lower() == "true"
+TOKEN_COUNT_CACHE_MAX_ENTRIES = int(
+    os.environ.get("TOKEN_COUNT_CACHE_MAX_ENTRIES") or 100_000
+)
+
+# Optional cheap reranking model (served by the local model server) which scores all
+# rerank candidates first, only the best RERANK_CASCADE_NUM_CANDIDATES of them are
+# then passed to the configured (more expensive) reranking model
+RERANK_CASCADE_MODEL_NAME = os.environ.get("RERANK_CASCADE_MODEL_NAME") or None
+RERANK_CASCADE_NUM_CANDIDATES = int(
+    os.environ.get("RERANK_CASCADE_NUM_CANDIDATES") or 20
+)
+
 # During an indexing attempt, specifies the number of batches which are allowed to
 # exception without aborting the attempt.
 INDEXING_EXCEPTION_LIMIT = int(os.environ.get("INDEXING_EXCEPTION_LIMIT") or 0)
@@ -616,6 +728,42 @@ CUSTOM_ANSWER_VALIDITY_CONDITIONS = json.loads(
 
 VESPA_REQUEST_TIMEOUT = int(os.environ.get("VESPA_REQUEST_TIMEOUT") or "15")
 
+# Connection pool of the process wide client used for searches / visits against Vespa.
+# Connections are kept alive between queries instead of a new one per request
+VESPA_QUERY_MAX_CONNECTIONS = int(os.environ.get("VESPA_QUERY_MAX_CONNECTIONS") or 64)
+VESPA_QUERY_MAX_KEEPALIVE_CONNECTIONS = int(
+    os.environ.get("VESPA_QUERY_MAX_KEEPALIVE_CONNECTIONS") or 16
+)
+# Seconds an idle connection is kept open
+VESPA_QUERY_KEEPALIVE_EXPIRY = float(
+    os.environ.get("VESPA_QUERY_KEEPALIVE_EXPIRY") or 30
+)
+# Max number of concurrent Vespa requests of a single id based chunk retrieval (the
+# batched searches and the visits it is split into)
+VESPA_ID_RETRIEVAL_MAX_CONCURRENCY = int(
+    os.environ.get("VESPA_ID_RETRIEVAL_MAX_CONCURRENCY") or 8
+)
+
+# If set to "float" or "bfloat16", embeddings are sent to Vespa in the compact hex tensor
+# form instead of JSON lists of floats. Query embeddings are sent with this cell type (the
+# rank profiles declare a matching query input, deployed by `ensure_indices_exist`),
+# fed embeddings always with the cell type of the index they are written to
+VESPA_HEX_TENSOR_CELL_TYPE = (
+    EmbeddingPrecision(os.environ["VESPA_HEX_TENSOR_CELL_TYPE"].lower())
+    if os.environ.get("VESPA_HEX_TENSOR_CELL_TYPE")
+    else None
+)
+
+# If set, index / update / delete operations are streamed to Vespa over a few HTTP/2
+# connections with many requests in flight, instead of one blocking request per
+# chunk from a thread pool
+ENABLE_VESPA_BULK_FEED = os.environ.get("ENABLE_VESPA_BULK_FEED", "").lower() == "true"
+# Upper bound on the number of feed operations in flight at once. The feed backs
+# off below this if Vespa starts throttling (429 / 503 / 507)
+VESPA_FEED_MAX_INFLIGHT = int(os.environ.get("VESPA_FEED_MAX_INFLIGHT") or 256)
+VESPA_FEED_MAX_CONNECTIONS = int(os.environ.get("VESPA_FEED_MAX_CONNECTIONS") or 4)
+VESPA_FEED_MAX_RETRIES = int(os.environ.get("VESPA_FEED_MAX_RETRIES") or 10)
+
 SYSTEM_RECURSION_LIMIT = int(os.environ.get("SYSTEM_RECURSION_LIMIT") or "1000")
 
 PARSE_WITH_TRAFILATURA = os.environ.get("PARSE_WITH_TRAFILATURA", "").lower() == "true"
@@ -1,5 +1,7 @@
 import os
 
+from onyx.context.search.enums import RetrievalFusionMethod
+
 INPUT_PROMPT_YAML = "./onyx/seeding/input_prompts.yaml"
 PROMPTS_YAML = "./onyx/seeding/prompts.yaml"
 PERSONAS_YAML = "./onyx/seeding/personas.yaml"
@@ -31,6 +33,13 @@ FAVOR_RECENT_DECAY_MULTIPLIER = 2.0
 # Currently only applies to search flow not chat
 CONTEXT_CHUNKS_ABOVE = int(os.environ.get("CONTEXT_CHUNKS_ABOVE") or 1)
 CONTEXT_CHUNKS_BELOW = int(os.environ.get("CONTEXT_CHUNKS_BELOW") or 1)
+# Fetch the surrounding chunks (and the chunks referenced by large chunks) of the hits as
+# part of each retrieval call, instead of in separate round trips after all retrievals
+# finish. Those separate round trips remain as the fallback. Off by default: the context
+# is fetched for every hit before fusion / pruning, also for hits which are then dropped
+INLINE_CONTEXT_EXPANSION = (
+    os.environ.get("INLINE_CONTEXT_EXPANSION", "").lower() == "true"
+)
 # Whether the LLM should be used to decide if a search would help given the chat history
 DISABLE_LLM_CHOOSE_SEARCH = (
     os.environ.get("DISABLE_LLM_CHOOSE_SEARCH", "").lower() == "true"
@@ -46,6 +55,17 @@ HYBRID_ALPHA = max(0, min(1, float(os.environ.get("HYBRID_ALPHA") or 0.5)))
 HYBRID_ALPHA_KEYWORD = max(
     0, min(1, float(os.environ.get("HYBRID_ALPHA_KEYWORD") or 0.4))
 )
+# How the results of the retrievals of a search (the original query, its keyword /
+# semantic expansions and multilingual rephrases) are combined, one of "max", "rrf"
+# and "weighted", see `RetrievalFusionMethod`. Parsed here so that an invalid value
+# fails at startup instead of on every search
+RETRIEVAL_FUSION_METHOD = RetrievalFusionMethod(
+    (
+        os.environ.get("RETRIEVAL_FUSION_METHOD") or RetrievalFusionMethod.MAX.value
+    ).lower()
+)
+# The k of reciprocal rank fusion, larger values flatten the differences between ranks
+RRF_K = int(os.environ.get("RRF_K") or 60)
 # Weighting factor between Title and Content of documents during search, 1 for completely
 # Title based. Default heavily favors Content because Title is also included at the top of
 # Content. This is to avoid cases where the Content is very relevant but it may not be clear
@@ -95,6 +115,20 @@ BING_API_KEY = os.environ.get("BING_API_KEY") or None
 # Enable in-house model for detecting connector-based filtering in queries
 ENABLE_CONNECTOR_CLASSIFIER = os.environ.get("ENABLE_CONNECTOR_CLASSIFIER", False)
 
+# Time / source filters are first extracted from the query with rules (e.g. "last week",
+# "in Slack"), the LLM is only asked when the rules are unsure about the query
+ENABLE_RULE_BASED_FILTER_EXTRACTION = (
+    os.environ.get("ENABLE_RULE_BASED_FILTER_EXTRACTION") or "true"
+).lower() == "true"
+# Process local cache of the filters extracted by the LLM, per normalized query.
+# 0 entries disables it, the TTL bounds how stale relative cutoffs ("last week") get
+FILTER_EXTRACTION_CACHE_MAX_ENTRIES = int(
+    os.environ.get("FILTER_EXTRACTION_CACHE_MAX_ENTRIES") or 10_000
+)
+FILTER_EXTRACTION_CACHE_TTL_SECONDS = int(
+    os.environ.get("FILTER_EXTRACTION_CACHE_TTL_SECONDS") or 60 * 60
+)
+
 VESPA_SEARCHER_THREADS = int(os.environ.get("VESPA_SEARCHER_THREADS") or 2)
 
 # Whether or not to use the semantic & keyword search expansions for Basic Search
@@ -102,3 +136,10 @@ USE_SEMANTIC_KEYWORD_EXPANSIONS_BASIC_SEARCH = (
     os.environ.get("USE_SEMANTIC_KEYWORD_EXPANSIONS_BASIC_SEARCH", "false").lower()
     == "true"
 )
+
+# Max number of chat messages streamed concurrently by an api server process. The chat
+# pipeline runs on threads of its own, so streams do not hold the threads that serve
+# the other (sync) endpoints. Each stream holds a db session until it is done, so this
+# defaults to (and is capped at) the size of the api server's db pool. Messages beyond
+# the limit are rejected with a 503 instead of waiting for a thread.
+CHAT_STREAM_MAX_THREADS = int(os.environ.get("CHAT_STREAM_MAX_THREADS") or 0)
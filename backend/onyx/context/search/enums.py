@@ -25,6 +25,15 @@ class SearchType(str, Enum):
     SEMANTIC = "semantic"
 
 
+class RetrievalFusionMethod(str, Enum):
+    # keeps the highest score of each chunk
+    MAX = "max"
+    # reciprocal rank fusion, sums 1 / (k + rank) over the retrievals
+    RRF = "rrf"
+    # sums the min-max normalized scores of the retrievals
+    WEIGHTED = "weighted"
+
+
 class LLMEvaluationType(str, Enum):
     AGENTIC = "agentic"  # applies agentic evaluation
     BASIC = "basic"  # applies boolean evaluation
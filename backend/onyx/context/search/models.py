@@ -10,6 +10,7 @@ from onyx.configs.chat_configs import NUM_RETURNED_HITS
 from onyx.configs.constants import DocumentSource
 from onyx.context.search.enums import LLMEvaluationType
 from onyx.context.search.enums import OptionalSearchSetting
+from onyx.context.search.enums import RetrievalFusionMethod
 from onyx.context.search.enums import SearchType
 from onyx.db.models import Persona
 from onyx.db.models import SearchSettings
@@ -160,6 +161,8 @@ class SearchRequest(ChunkContext):
     multilingual_expansion: list[str] | None = None
     recency_bias_multiplier: float = 1.0
     hybrid_alpha: float | None = None
+    # if None, uses RETRIEVAL_FUSION_METHOD
+    fusion_method: RetrievalFusionMethod | None = None
     rerank_settings: RerankingDetails | None = None
     evaluation_type: LLMEvaluationType = LLMEvaluationType.UNSPECIFIED
     model_config = ConfigDict(arbitrary_types_allowed=True)
@@ -185,6 +188,8 @@ class SearchQuery(ChunkContext):
     rerank_settings: RerankingDetails | None
     hybrid_alpha: float
     recency_bias_multiplier: float
+    # how the results of the retrievals of the query are combined
+    fusion_method: RetrievalFusionMethod = RetrievalFusionMethod.MAX
 
     # Only used if LLM evaluation type is not skip, None to use default settings
     max_llm_filter_sections: int
@@ -194,6 +199,8 @@ class SearchQuery(ChunkContext):
     model_config = ConfigDict(frozen=True)
 
     precomputed_query_embedding: Embedding | None = None
+    # embeddings of the `semantic_expansions` which are searched with
+    precomputed_semantic_expansion_embeddings: list[Embedding] | None = None
 
     expanded_queries: QueryExpansions | None = None
 
@@ -316,6 +323,21 @@ class InferenceSection(BaseModel):
     combined_content: str
 
 
+class RetrievedSectionsUpdate(BaseModel):
+    """First update of an incremental search, the sections in retrieval order"""
+
+    sections: list[InferenceSection]
+
+
+class RerankedSectionsUpdate(BaseModel):
+    """The final order of the sections of the `RetrievedSectionsUpdate`"""
+
+    # indices into the retrieved sections, best first
+    section_indices: list[int]
+    # scores of the center chunks after reranking, in the same order
+    scores: list[float | None]
+
+
 class SearchDoc(BaseModel):
     document_id: str
     chunk_ind: int
@@ -396,3 +418,10 @@ class RerankMetricsContainer(BaseModel):
 
     metrics: list[ChunkMetric]
     raw_similarity_scores: list[float]
+    # seconds spent waiting on each reranking model ("cascade", "rerank"), only
+    # contains the stages which ran
+    stage_latencies: dict[str, float] = Field(default_factory=dict)
+    # scores served from the rerank score cache, per stage
+    num_cached_scores: dict[str, int] = Field(default_factory=dict)
+    # candidates which the cascade model dropped before the reranking model
+    num_pruned: int = 0
@@ -19,13 +19,20 @@ from onyx.context.search.enums import SearchType
 from onyx.context.search.models import IndexFilters
 from onyx.context.search.models import InferenceChunk
 from onyx.context.search.models import InferenceSection
+from onyx.context.search.models import RerankedSectionsUpdate
 from onyx.context.search.models import RerankMetricsContainer
 from onyx.context.search.models import RetrievalMetricsContainer
+from onyx.context.search.models import RetrievedSectionsUpdate
 from onyx.context.search.models import SearchQuery
 from onyx.context.search.models import SearchRequest
+from onyx.context.search.postprocessing.postprocessing import build_section_relevance
 from onyx.context.search.postprocessing.postprocessing import cleanup_chunks
 from onyx.context.search.postprocessing.postprocessing import search_postprocessing
+from onyx.context.search.postprocessing.postprocessing import (
+    stream_search_postprocessing,
+)
 from onyx.context.search.preprocessing.preprocessing import retrieval_preprocessing
+from onyx.context.search.retrieval.search_runner import PrefetchedChunkContext
 from onyx.context.search.retrieval.search_runner import (
     retrieve_chunks,
 )
@@ -34,17 +41,23 @@ from onyx.context.search.utils import relevant_sections_to_indices
 from onyx.db.models import User
 from onyx.db.search_settings import get_current_search_settings
 from onyx.document_index.factory import get_default_document_index
+from onyx.document_index.interfaces import DocumentIndexPartialRetrievalError
 from onyx.document_index.interfaces import VespaChunkRequest
 from onyx.llm.interfaces import LLM
 from onyx.secondary_llm_flows.agentic_evaluation import evaluate_inference_section
 from onyx.utils.logger import setup_logger
 from onyx.utils.threadpool_concurrency import FunctionCall
 from onyx.utils.threadpool_concurrency import run_functions_in_parallel
+from onyx.utils.threadpool_concurrency import run_functions_in_parallel_as_completed
 from onyx.utils.timing import log_function_time
 from onyx.utils.variable_functionality import fetch_ee_implementation_or_noop
 
 logger = setup_logger()
 
+SearchResultsUpdate = (
+    RetrievedSectionsUpdate | RerankedSectionsUpdate | SectionRelevancePiece
+)
+
 
 class SearchPipeline:
     def __init__(
@@ -91,6 +104,8 @@ class SearchPipeline:
 
         # Initial document index retrieval chunks
         self._retrieved_chunks: list[InferenceChunk] | None = None
+        # Surrounding chunks already fetched along with the retrieved chunks
+        self._prefetched_context: PrefetchedChunkContext | None = None
         # Another call made to the document index to get surrounding sections
         self._retrieved_sections: list[InferenceSection] | None = None
 
@@ -155,12 +170,17 @@ class SearchPipeline:
         if self._retrieved_chunks is not None:
             return self._retrieved_chunks
 
+        # Full docs are fetched separately anyway, no use in fetching the surroundings
+        if not self.search_query.full_doc:
+            self._prefetched_context = PrefetchedChunkContext()
+
         # These chunks do not include large chunks and have been deduped
         self._retrieved_chunks = retrieve_chunks(
             query=self.search_query,
             document_index=self.document_index,
             db_session=self.db_session,
             retrieval_metrics_callback=self.retrieval_metrics_callback,
+            prefetched_context=self._prefetched_context,
         )
 
         return cast(list[InferenceChunk], self._retrieved_chunks)
@@ -317,11 +337,20 @@ class SearchPipeline:
 
         flat_ranges: list[ChunkRange] = [r for ranges in merged_ranges for r in ranges]
 
+        prefetched_context = self._prefetched_context or PrefetchedChunkContext()
+
         for chunk_range in flat_ranges:
             # Don't need to fetch chunks within range for merging if chunk_above / below are 0.
             if above == below == 0:
                 inference_chunks.extend(chunk_range.chunks)
 
+            # Already fetched along with the retrieval
+            elif all(
+                (chunk.document_id, chunk.chunk_id) in prefetched_context.covered
+                for chunk in chunk_range.chunks
+            ):
+                continue
+
             else:
                 chunk_requests.append(
                     VespaChunkRequest(
@@ -332,19 +361,22 @@ class SearchPipeline:
                 )
 
         if chunk_requests:
-            inference_chunks.extend(
-                cleanup_chunks(
-                    self.document_index.id_based_retrieval(
-                        chunk_requests=chunk_requests,
-                        filters=IndexFilters(access_control_list=None),
-                        batch_retrieval=True,
-                    )
+            try:
+                fetched_chunks = self.document_index.id_based_retrieval(
+                    chunk_requests=chunk_requests,
+                    filters=IndexFilters(access_control_list=None),
+                    batch_retrieval=True,
                 )
-            )
+            except DocumentIndexPartialRetrievalError as e:
+                # sections of the failed requests are built from what is available
+                logger.warning(f"Fetching surrounding chunks partially failed: {e}")
+                fetched_chunks = e.retrieved_chunks
+            inference_chunks.extend(cleanup_chunks(fetched_chunks))
 
-        doc_chunk_ind_to_chunk = {
-            (chunk.document_id, chunk.chunk_id): chunk for chunk in inference_chunks
-        }
+        doc_chunk_ind_to_chunk = dict(prefetched_context.chunks)
+        doc_chunk_ind_to_chunk.update(
+            {(chunk.document_id, chunk.chunk_id): chunk for chunk in inference_chunks}
+        )
 
         # In case of failed parallel calls to Vespa, at least we should have the initial retrieved chunks
         doc_chunk_ind_to_chunk.update(
@@ -511,6 +543,63 @@ class SearchPipeline:
 
         return self._section_relevance
 
+    def stream_search_results(self) -> Iterator[SearchResultsUpdate]:
+        """Incremental version of `reranked_sections` and `section_relevance`. Yields the
+        retrieved sections as soon as retrieval is done, their final order once reranking is
+        done and then the relevance verdict of each evaluated section as soon as its LLM
+        evaluation completes. Afterwards the properties return the same results."""
+        retrieved_sections = self.retrieved_sections
+        if self.retrieved_sections_callback is not None:
+            self.retrieved_sections_callback(retrieved_sections)
+        yield RetrievedSectionsUpdate(sections=retrieved_sections)
+
+        section_indices = {
+            section.center_chunk.unique_id: ind
+            for ind, section in enumerate(retrieved_sections)
+        }
+        relevance_pieces: list[SectionRelevancePiece] = []
+        for update in stream_search_postprocessing(
+            search_query=self.search_query,
+            retrieved_sections=retrieved_sections,
+            llm=self.fast_llm,
+            rerank_metrics_callback=self.rerank_metrics_callback,
+        ):
+            if isinstance(update, SectionRelevancePiece):
+                relevance_pieces.append(update)
+                yield update
+                continue
+
+            self._reranked_sections = update
+            yield RerankedSectionsUpdate(
+                section_indices=[
+                    section_indices[section.center_chunk.unique_id]
+                    for section in update
+                ],
+                scores=[section.center_chunk.score for section in update],
+            )
+
+        if self.search_query.evaluation_type == LLMEvaluationType.AGENTIC:
+            # evaluated on the final sections, which need the reranked order
+            functions = [
+                FunctionCall(
+                    evaluate_inference_section,
+                    (section, self.search_query.query, self.llm),
+                )
+                for section in self.final_context_sections
+            ]
+            for _, piece in run_functions_in_parallel_as_completed(functions):
+                relevance_pieces.append(piece)
+                yield piece
+            self._section_relevance = relevance_pieces
+
+        elif (
+            self.search_query.evaluation_type == LLMEvaluationType.BASIC
+            and not DISABLE_LLM_DOC_RELEVANCE
+        ):
+            self._section_relevance = build_section_relevance(
+                self.reranked_sections, relevance_pieces
+            )
+
     @property
     def section_relevance_list(self) -> list[bool]:
         return section_relevance_list_impl(
@@ -1,4 +1,5 @@
 import base64
+import time
 from collections.abc import Callable
 from collections.abc import Iterator
 from typing import cast
@@ -7,10 +8,14 @@ import numpy
 from langchain_core.messages import BaseMessage
 from langchain_core.messages import HumanMessage
 from langchain_core.messages import SystemMessage
+from prometheus_client import Counter
+from prometheus_client import Histogram
 
 from onyx.chat.models import SectionRelevancePiece
 from onyx.configs.app_configs import BLURB_SIZE
 from onyx.configs.app_configs import IMAGE_ANALYSIS_SYSTEM_PROMPT
+from onyx.configs.app_configs import RERANK_CASCADE_MODEL_NAME
+from onyx.configs.app_configs import RERANK_CASCADE_NUM_CANDIDATES
 from onyx.configs.chat_configs import DISABLE_LLM_DOC_RELEVANCE
 from onyx.configs.constants import RETURN_SEPARATOR
 from onyx.configs.llm_configs import get_search_time_image_analysis_enabled
@@ -25,18 +30,26 @@ from onyx.context.search.models import MAX_METRICS_CONTENT
 from onyx.context.search.models import RerankingDetails
 from onyx.context.search.models import RerankMetricsContainer
 from onyx.context.search.models import SearchQuery
+from onyx.context.search.utils import normalize_query
 from onyx.db.engine import get_session_with_current_tenant
 from onyx.document_index.document_index_utils import (
-    translate_boost_count_to_multiplier,
+    translate_boost_counts_to_multipliers,
 )
 from onyx.file_store.file_store import get_default_file_store
 from onyx.llm.interfaces import LLM
 from onyx.llm.utils import message_to_string
+from onyx.natural_language_processing.rerank_score_cache import (
+    build_rerank_score_cache_key,
+)
+from onyx.natural_language_processing.rerank_score_cache import (
+    get_rerank_score_cache,
+)
 from onyx.natural_language_processing.search_nlp_models import RerankingModel
-from onyx.secondary_llm_flows.chunk_usefulness import llm_batch_eval_sections
+from onyx.secondary_llm_flows.chunk_usefulness import llm_eval_section
 from onyx.utils.logger import setup_logger
 from onyx.utils.threadpool_concurrency import FunctionCall
 from onyx.utils.threadpool_concurrency import run_functions_in_parallel
+from onyx.utils.threadpool_concurrency import run_functions_in_parallel_as_completed
 from onyx.utils.timing import log_function_time
 
 
@@ -151,6 +164,7 @@ def update_image_sections_with_query(
         for chunk in section.chunks:
             if chunk.unique_id in chunk_id_to_content:
                 chunk.content = chunk_id_to_content[chunk.unique_id]
+                chunk.content_token_counts = {}
                 updated_count += 1
 
     logger.info(
@@ -160,6 +174,21 @@ def update_image_sections_with_query(
 
 logger = setup_logger()
 
+RERANK_STAGE_CASCADE = "cascade"
+RERANK_STAGE_RERANK = "rerank"
+
+rerank_latency = Histogram(
+    "onyx_rerank_latency_seconds",
+    "Time spent waiting on a reranking model, cached scores excluded",
+    ["stage"],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+rerank_score_cache_lookups = Counter(
+    "onyx_rerank_score_cache_lookups_total",
+    "Rerank score cache lookups",
+    ["stage", "result"],
+)
+
 
 def _log_top_section_links(search_flow: str, sections: list[InferenceSection]) -> None:
     top_links = [
@@ -218,6 +247,88 @@ def cleanup_chunks(chunks: list[InferenceChunkUncleaned]) -> list[InferenceChunk
     return [chunk.to_inference_chunk() for chunk in chunks]
 
 
+def _predict_rerank_scores(
+    cross_encoder: RerankingModel,
+    query_str: str,
+    chunks: list[InferenceChunk],
+    passages: list[str],
+    stage: str,
+) -> tuple[list[float], int, float | None]:
+    """Scores the passages of the chunks, only the ones without a cached score are sent
+    to the model. Returns the scores, the number of cached scores and the time spent
+    waiting on the model (None if every score was cached)."""
+    # the cached scores are shared by queries which only differ in whitespace, so the
+    # model scores the normalized query (as for the query embeddings)
+    query_str = normalize_query(query_str)
+    score_cache = get_rerank_score_cache()
+    keys: list[str] = []
+    scores: list[float | None] = [None] * len(passages)
+    if score_cache is not None:
+        keys = [
+            build_rerank_score_cache_key(
+                model_name=cross_encoder.model_name,
+                provider_type=cross_encoder.provider_type,
+                api_url=cross_encoder.api_url,
+                query=query_str,
+                document_id=chunk.document_id,
+                chunk_id=chunk.chunk_id,
+                passage=passage,
+            )
+            for chunk, passage in zip(chunks, passages)
+        ]
+        scores = score_cache.get_many(keys)
+
+    missing_indices = [i for i, score in enumerate(scores) if score is None]
+    num_cached = len(passages) - len(missing_indices)
+    if score_cache is not None:
+        rerank_score_cache_lookups.labels(stage=stage, result="hit").inc(num_cached)
+        rerank_score_cache_lookups.labels(stage=stage, result="miss").inc(
+            len(missing_indices)
+        )
+
+    # leave erroring out on no passages to the model
+    if not missing_indices and passages:
+        return cast(list[float], scores), num_cached, None
+
+    start_time = time.monotonic()
+    predicted_scores = cross_encoder.predict(
+        query=query_str, passages=[passages[i] for i in missing_indices]
+    )
+    latency = time.monotonic() - start_time
+    rerank_latency.labels(stage=stage).observe(latency)
+
+    for i, score in zip(missing_indices, predicted_scores):
+        scores[i] = score
+    if score_cache is not None:
+        score_cache.put_many(
+            {keys[i]: score for i, score in zip(missing_indices, predicted_scores)}
+        )
+    return cast(list[float], scores), num_cached, latency
+
+
+def _rank_by_rerank_scores(
+    sim_scores: numpy.ndarray,
+    boosts: numpy.ndarray,
+    recency_biases: numpy.ndarray,
+    model_min: int = CROSS_ENCODER_RANGE_MIN,
+    model_max: int = CROSS_ENCODER_RANGE_MAX,
+) -> tuple[numpy.ndarray, numpy.ndarray]:
+    """Applies the boosts and the recency bias to the cross-encoder scores and normalizes
+    them to the range of the model. Returns the ranking (indices into the scores, best
+    first, ties keep their retrieval order) and the normalized scores in input order."""
+    min_score = sim_scores.min() if sim_scores.size else 0.0
+    boosted_sim_scores = (
+        (sim_scores - min_score)
+        * translate_boost_counts_to_multipliers(boosts)
+        * recency_biases
+    )
+    normalized_scores = (boosted_sim_scores + min_score - model_min) / (
+        model_max - model_min
+    )
+    ranking = numpy.argsort(-normalized_scores, kind="stable")
+    return ranking, normalized_scores
+
+
 @log_function_time(print_only=True)
 def semantic_reranking(
     query_str: str,
@@ -230,6 +341,9 @@ def semantic_reranking(
     """Reranks chunks based on cross-encoder models. Additionally provides the original indices
     of the chunks in their new sorted order.
 
+    If RERANK_CASCADE_MODEL_NAME is set, a cheap model first narrows the chunks down to the
+    candidates for the configured model. The chunks it prunes come last, without a score.
+
     Note: this updates the chunks in place, it updates the chunk scores which came from retrieval
     """
     assert (
@@ -249,43 +363,82 @@ def semantic_reranking(
         f"{chunk.semantic_identifier or chunk.title or ''}\n{chunk.content}"
         for chunk in chunks_to_rerank
     ]
-    sim_scores_floats = cross_encoder.predict(query=query_str, passages=passages)
-
-    # Old logic to handle multiple cross-encoders preserved but not used
-    sim_scores = [numpy.array(sim_scores_floats)]
 
-    raw_sim_scores = cast(numpy.ndarray, sum(sim_scores) / len(sim_scores))
-
-    cross_models_min = numpy.min(sim_scores)
-
-    shifted_sim_scores = sum(
-        [enc_n_scores - cross_models_min for enc_n_scores in sim_scores]
-    ) / len(sim_scores)
+    stage_latencies: dict[str, float] = {}
+    num_cached_scores: dict[str, int] = {}
+
+    # indices into chunks_to_rerank
+    candidate_indices = list(range(len(chunks_to_rerank)))
+    pruned_indices: list[int] = []
+    if (
+        RERANK_CASCADE_MODEL_NAME
+        and len(chunks_to_rerank) > RERANK_CASCADE_NUM_CANDIDATES
+    ):
+        cascade_model = RerankingModel(
+            model_name=RERANK_CASCADE_MODEL_NAME,
+            provider_type=None,
+            api_key=None,
+            api_url=None,
+        )
+        cascade_scores, num_cached, latency = _predict_rerank_scores(
+            cascade_model,
+            query_str,
+            chunks_to_rerank,
+            passages,
+            RERANK_STAGE_CASCADE,
+        )
+        num_cached_scores[RERANK_STAGE_CASCADE] = num_cached
+        if latency is not None:
+            stage_latencies[RERANK_STAGE_CASCADE] = latency
 
-    boosts = [
-        translate_boost_count_to_multiplier(chunk.boost) for chunk in chunks_to_rerank
-    ]
-    recency_multiplier = [chunk.recency_bias for chunk in chunks_to_rerank]
-    boosted_sim_scores = shifted_sim_scores * boosts * recency_multiplier
-    normalized_b_s_scores = (boosted_sim_scores + cross_models_min - model_min) / (
-        model_max - model_min
-    )
-    orig_indices = [i for i in range(len(normalized_b_s_scores))]
-    scored_results = list(
-        zip(normalized_b_s_scores, raw_sim_scores, chunks_to_rerank, orig_indices)
+        by_cascade_score = sorted(
+            candidate_indices, key=lambda i: cascade_scores[i], reverse=True
+        )
+        candidate_indices = sorted(by_cascade_score[:RERANK_CASCADE_NUM_CANDIDATES])
+        pruned_indices = by_cascade_score[RERANK_CASCADE_NUM_CANDIDATES:]
+
+    candidates = [chunks_to_rerank[i] for i in candidate_indices]
+    sim_scores_floats, num_cached, latency = _predict_rerank_scores(
+        cross_encoder,
+        query_str,
+        candidates,
+        [passages[i] for i in candidate_indices],
+        RERANK_STAGE_RERANK,
     )
-    scored_results.sort(key=lambda x: x[0], reverse=True)
-    ranked_sim_scores, ranked_raw_scores, ranked_chunks, ranked_indices = zip(
-        *scored_results
+    num_cached_scores[RERANK_STAGE_RERANK] = num_cached
+    if latency is not None:
+        stage_latencies[RERANK_STAGE_RERANK] = latency
+
+    raw_sim_scores = numpy.asarray(sim_scores_floats, dtype=numpy.float64)
+    ranking, normalized_b_s_scores = _rank_by_rerank_scores(
+        raw_sim_scores,
+        boosts=numpy.fromiter(
+            (chunk.boost for chunk in candidates),
+            dtype=numpy.float64,
+            count=len(candidates),
+        ),
+        recency_biases=numpy.fromiter(
+            (chunk.recency_bias for chunk in candidates),
+            dtype=numpy.float64,
+            count=len(candidates),
+        ),
+        model_min=model_min,
+        model_max=model_max,
     )
 
+    # only the chunk references are reordered, the scores stay in the arrays
+    ranked_order = ranking.tolist()
+    ranked_sim_scores = normalized_b_s_scores[ranking].tolist()
+    ranked_chunks = [candidates[i] for i in ranked_order]
+    ranked_indices = [candidate_indices[i] for i in ranked_order]
+
     logger.debug(
         f"Reranked (Boosted + Time Weighted) similarity scores: {ranked_sim_scores}"
     )
 
     # Assign new chunk scores based on reranking
-    for ind, chunk in enumerate(ranked_chunks):
-        chunk.score = ranked_sim_scores[ind]
+    for chunk, score in zip(ranked_chunks, ranked_sim_scores):
+        chunk.score = score
 
     if rerank_metrics_callback is not None:
         chunk_metrics = [
@@ -300,11 +453,21 @@ def semantic_reranking(
 
         rerank_metrics_callback(
             RerankMetricsContainer(
-                metrics=chunk_metrics, raw_similarity_scores=ranked_raw_scores  # type: ignore
+                metrics=chunk_metrics,
+                raw_similarity_scores=raw_sim_scores[ranking].tolist(),
+                stage_latencies=stage_latencies,
+                num_cached_scores=num_cached_scores,
+                num_pruned=len(pruned_indices),
             )
         )
 
-    return list(ranked_chunks), list(ranked_indices)
+    # the cascade scores are on another scale, the pruned chunks keep their cascade
+    # order after the reranked ones
+    pruned_chunks = [chunks_to_rerank[i] for i in pruned_indices]
+    for pruned_chunk in pruned_chunks:
+        pruned_chunk.score = None
+
+    return ranked_chunks + pruned_chunks, ranked_indices + pruned_indices
 
 
 def should_rerank(rerank_settings: RerankingDetails | None) -> bool:
@@ -356,78 +519,81 @@ def rerank_sections(
     return ordered_sections
 
 
-@log_function_time(print_only=True)
-def filter_sections(
-    query: SearchQuery,
-    sections_to_filter: list[InferenceSection],
-    llm: LLM,
-    # For cost saving, we may turn this on
-    use_chunk: bool = False,
-) -> list[InferenceSection]:
-    """Filters sections based on whether the LLM thought they were relevant to the query.
-    This applies on the section which has more context than the chunk. Hopefully this yields more accurate LLM evaluations.
-
-    Returns a list of the unique chunk IDs that were marked as relevant
-    """
-    # Log evaluation type to help with debugging
-    logger.info(f"filter_sections called with evaluation_type={query.evaluation_type}")
-
-    # Fast path: immediately return empty list for SKIP evaluation type (ordering-only mode)
-    if query.evaluation_type == LLMEvaluationType.SKIP:
-        return []
-
-    sections_to_filter = sections_to_filter[: query.max_llm_filter_sections]
-
-    contents = [
-        section.center_chunk.content if use_chunk else section.combined_content
-        for section in sections_to_filter
-    ]
-    metadata_list = [section.center_chunk.metadata for section in sections_to_filter]
-    titles = [
-        section.center_chunk.semantic_identifier for section in sections_to_filter
-    ]
+def _evaluate_section_relevance(
+    query: str, section: InferenceSection, llm: LLM
+) -> SectionRelevancePiece:
+    center_chunk = section.center_chunk
+    try:
+        relevant = llm_eval_section(
+            query=query,
+            section_content=section.combined_content,
+            llm=llm,
+            title=center_chunk.semantic_identifier,
+            metadata=center_chunk.metadata,
+        )
+    except Exception:
+        # In case of failure, don't throw out the section
+        logger.exception(
+            f"Failed to evaluate the relevance of {center_chunk.unique_id}"
+        )
+        relevant = True
 
-    llm_chunk_selection = llm_batch_eval_sections(
-        query=query.query,
-        section_contents=contents,
-        llm=llm,
-        titles=titles,
-        metadata_list=metadata_list,
+    return SectionRelevancePiece(
+        document_id=center_chunk.document_id,
+        chunk_id=center_chunk.chunk_id,
+        relevant=relevant,
+        content="",
     )
 
+
+def build_section_relevance(
+    sections: list[InferenceSection],
+    relevance_pieces: list[SectionRelevancePiece],
+) -> list[SectionRelevancePiece]:
+    """One piece per section, the sections which were not evaluated are not relevant"""
+    relevant_sections = {
+        (piece.document_id, piece.chunk_id)
+        for piece in relevance_pieces
+        if piece.relevant
+    }
     return [
-        section
-        for ind, section in enumerate(sections_to_filter)
-        if llm_chunk_selection[ind]
+        SectionRelevancePiece(
+            document_id=section.center_chunk.document_id,
+            chunk_id=section.center_chunk.chunk_id,
+            relevant=(section.center_chunk.document_id, section.center_chunk.chunk_id)
+            in relevant_sections,
+            content="",
+        )
+        for section in sections
     ]
 
 
-def search_postprocessing(
+def stream_search_postprocessing(
     search_query: SearchQuery,
     retrieved_sections: list[InferenceSection],
     llm: LLM,
     rerank_metrics_callback: Callable[[RerankMetricsContainer], None] | None = None,
-) -> Iterator[list[InferenceSection] | list[SectionRelevancePiece]]:
+) -> Iterator[list[InferenceSection] | SectionRelevancePiece]:
+    """Yields the sections in their final order as soon as reranking is done (right away
+    without reranking), then the LLM relevance verdict of each evaluated section as soon as
+    its evaluation completes. Reranking and the evaluations run in parallel, verdicts which
+    complete before the reranking are yielded right after the sections."""
     # Fast path for ordering-only: detect it by checking if evaluation_type is SKIP
     if search_query.evaluation_type == LLMEvaluationType.SKIP:
         logger.info(
             "Fast path: Detected ordering-only mode, bypassing all post-processing"
         )
-        # Immediately yield the sections without any processing and an empty relevance list
         yield retrieved_sections
-        yield cast(list[SectionRelevancePiece], [])
         return
 
-    post_processing_tasks: list[FunctionCall] = []
-
     if not retrieved_sections:
         # Avoids trying to rerank an empty list which throws an error
         yield cast(list[InferenceSection], [])
-        yield cast(list[SectionRelevancePiece], [])
         return
 
+    post_processing_tasks: list[FunctionCall] = []
+
     rerank_task_id = None
-    sections_yielded = False
     if should_rerank(search_query.rerank_settings):
         post_processing_tasks.append(
             FunctionCall(
@@ -451,69 +617,70 @@ def search_postprocessing(
             )
         _log_top_section_links(search_query.search_type.value, retrieved_sections)
         yield retrieved_sections
-        sections_yielded = True
 
-    llm_filter_task_id = None
     # Only add LLM filtering if not in SKIP mode and if LLM doc relevance is not disabled
     if not DISABLE_LLM_DOC_RELEVANCE and search_query.evaluation_type in [
         LLMEvaluationType.BASIC,
         LLMEvaluationType.UNSPECIFIED,
     ]:
-        logger.info("Adding LLM filtering task for document relevance evaluation")
-        post_processing_tasks.append(
+        logger.info("Adding LLM filtering tasks for document relevance evaluation")
+        post_processing_tasks.extend(
             FunctionCall(
-                filter_sections,
-                (
-                    search_query,
-                    retrieved_sections[: search_query.max_llm_filter_sections],
-                    llm,
-                ),
+                _evaluate_section_relevance, (search_query.query, section, llm)
             )
+            for section in retrieved_sections[: search_query.max_llm_filter_sections]
         )
-        llm_filter_task_id = post_processing_tasks[-1].result_id
     elif DISABLE_LLM_DOC_RELEVANCE:
         logger.info("Skipping LLM filtering task because LLM doc relevance is disabled")
 
-    post_processing_results = (
-        run_functions_in_parallel(post_processing_tasks)
-        if post_processing_tasks
-        else {}
-    )
-    reranked_sections = cast(
-        list[InferenceSection] | None,
-        post_processing_results.get(str(rerank_task_id)) if rerank_task_id else None,
+    # verdicts which complete before the reranking are held back until after it
+    early_relevance_pieces: list[SectionRelevancePiece] | None = (
+        [] if rerank_task_id else None
     )
-    if reranked_sections:
-        if sections_yielded:
-            logger.error(
-                "Trying to yield re-ranked sections, but sections were already yielded. This should never happen."
-            )
-        else:
-            _log_top_section_links(search_query.search_type.value, reranked_sections)
+    for result_id, result in run_functions_in_parallel_as_completed(
+        post_processing_tasks
+    ):
+        if result_id != rerank_task_id:
+            if early_relevance_pieces is not None:
+                early_relevance_pieces.append(result)
+            else:
+                yield result
+            continue
+
+        reranked_sections = cast(list[InferenceSection], result)
+        _log_top_section_links(search_query.search_type.value, reranked_sections)
+
+        # Add the image processing step here
+        if get_search_time_image_analysis_enabled():
+            update_image_sections_with_query(reranked_sections, search_query.query, llm)
 
-            # Add the image processing step here
-            if get_search_time_image_analysis_enabled():
-                update_image_sections_with_query(
-                    reranked_sections, search_query.query, llm
-                )
+        yield reranked_sections
+        yield from cast(list[SectionRelevancePiece], early_relevance_pieces)
+        early_relevance_pieces = None
 
-            yield reranked_sections
 
-    llm_selected_section_ids = (
-        [
-            section.center_chunk.unique_id
-            for section in post_processing_results.get(str(llm_filter_task_id), [])
-        ]
-        if llm_filter_task_id
-        else []
+def search_postprocessing(
+    search_query: SearchQuery,
+    retrieved_sections: list[InferenceSection],
+    llm: LLM,
+    rerank_metrics_callback: Callable[[RerankMetricsContainer], None] | None = None,
+) -> Iterator[list[InferenceSection] | list[SectionRelevancePiece]]:
+    """Yields the sections in their final order, then the relevance of all of them"""
+    postprocessing_stream = stream_search_postprocessing(
+        search_query=search_query,
+        retrieved_sections=retrieved_sections,
+        llm=llm,
+        rerank_metrics_callback=rerank_metrics_callback,
     )
+    final_sections = cast(list[InferenceSection], next(postprocessing_stream))
+    yield final_sections
 
-    yield [
-        SectionRelevancePiece(
-            document_id=section.center_chunk.document_id,
-            chunk_id=section.center_chunk.chunk_id,
-            relevant=section.center_chunk.unique_id in llm_selected_section_ids,
-            content="",
-        )
-        for section in (reranked_sections or retrieved_sections)
-    ]
+    # ordering-only mode has no relevance at all
+    if search_query.evaluation_type == LLMEvaluationType.SKIP:
+        yield cast(list[SectionRelevancePiece], [])
+        return
+
+    yield build_section_relevance(
+        final_sections,
+        cast(list[SectionRelevancePiece], list(postprocessing_stream)),
+    )
@@ -9,6 +9,7 @@ from onyx.configs.chat_configs import HYBRID_ALPHA
 from onyx.configs.chat_configs import HYBRID_ALPHA_KEYWORD
 from onyx.configs.chat_configs import NUM_POSTPROCESSED_RESULTS
 from onyx.configs.chat_configs import NUM_RETURNED_HITS
+from onyx.configs.chat_configs import RETRIEVAL_FUSION_METHOD
 from onyx.context.search.enums import LLMEvaluationType
 from onyx.context.search.enums import RecencyBiasSetting
 from onyx.context.search.enums import SearchType
@@ -228,6 +229,8 @@ def retrieval_preprocessing(
     if search_request.hybrid_alpha:
         hybrid_alpha = search_request.hybrid_alpha
 
+    fusion_method = search_request.fusion_method or RETRIEVAL_FUSION_METHOD
+
     # Search request overrides anything else as it's explicitly set by the request
     # If not explicitly specified, use the persona settings if they exist
     # Otherwise, use the global defaults
@@ -250,6 +253,7 @@ def retrieval_preprocessing(
         filters=final_filters,
         hybrid_alpha=hybrid_alpha,
         recency_bias_multiplier=recency_bias_multiplier,
+        fusion_method=fusion_method,
         num_hits=limit if limit is not None else NUM_RETURNED_HITS,
         offset=offset or 0,
         rerank_settings=rerank_settings,
@@ -0,0 +1,130 @@
+from collections.abc import Sequence
+from typing import TypeVar
+
+import numpy as np
+import numpy.typing as npt
+
+from onyx.configs.chat_configs import RRF_K
+from onyx.context.search.enums import RetrievalFusionMethod
+from onyx.context.search.models import InferenceChunk
+
+ChunkT = TypeVar("ChunkT", bound=InferenceChunk)
+
+
+def _fused_scores(
+    method: RetrievalFusionMethod,
+    scores: npt.NDArray[np.float64],
+    groups: npt.NDArray[np.intp],
+    num_groups: int,
+    set_sizes: npt.NDArray[np.intp],
+    weights: npt.NDArray[np.float64],
+    representatives: npt.NDArray[np.intp],
+    rrf_k: int,
+) -> npt.NDArray[np.float64]:
+    if method == RetrievalFusionMethod.MAX:
+        return scores[representatives]
+
+    set_starts = np.cumsum(set_sizes) - set_sizes
+    hit_weights = np.repeat(weights, set_sizes)
+
+    if method == RetrievalFusionMethod.RRF:
+        # the hits of each retrieval are ordered best first
+        ranks = np.arange(len(scores)) - np.repeat(set_starts, set_sizes) + 1
+        contributions = hit_weights / (rrf_k + ranks)
+    else:
+        non_empty = set_sizes > 0
+        starts = set_starts[non_empty]
+        sizes = set_sizes[non_empty]
+        set_mins = np.repeat(np.minimum.reduceat(scores, starts), sizes)
+        set_ranges = np.repeat(np.maximum.reduceat(scores, starts), sizes) - set_mins
+        normalized = np.divide(
+            scores - set_mins,
+            set_ranges,
+            out=np.ones_like(scores),
+            where=set_ranges > 0,
+        )
+        contributions = hit_weights * normalized
+
+    return np.bincount(groups, weights=contributions, minlength=num_groups).astype(
+        np.float64
+    )
+
+
+def fuse_retrieval_results(
+    chunk_sets: Sequence[Sequence[ChunkT]],
+    method: RetrievalFusionMethod = RetrievalFusionMethod.MAX,
+    weights: Sequence[float] | None = None,
+    top_k: int | None = None,
+    rrf_k: int = RRF_K,
+) -> list[ChunkT]:
+    """Combines the hits of several retrievals into one list of unique chunks, best first.
+
+    The chunks are only reduced to (chunk key, score) arrays, the fusion and the top k
+    selection are vectorized. Each chunk is represented by its highest scoring hit, for
+    the methods other than MAX by a copy of that hit with the fused score, the hits of
+    the passed retrievals are left untouched. Ties keep the order in which the chunks
+    are first seen.
+    """
+    if weights is not None and len(weights) != len(chunk_sets):
+        raise ValueError(
+            f"Got {len(weights)} weights for {len(chunk_sets)} retrieval results"
+        )
+
+    chunks = [chunk for chunk_set in chunk_sets for chunk in chunk_set]
+    if not chunks:
+        return []
+
+    # chunks are numbered in the order they are first seen
+    group_ids: dict[tuple[str, int], int] = {}
+    groups = np.fromiter(
+        (
+            group_ids.setdefault((chunk.document_id, chunk.chunk_id), len(group_ids))
+            for chunk in chunks
+        ),
+        dtype=np.intp,
+        count=len(chunks),
+    )
+    scores = np.fromiter(
+        (chunk.score or 0 for chunk in chunks), dtype=np.float64, count=len(chunks)
+    )
+    num_groups = len(group_ids)
+
+    # the first of the highest scoring hits of each chunk represents it
+    by_group_and_score = np.lexsort((np.arange(len(chunks)), -scores, groups))
+    sorted_groups = groups[by_group_and_score]
+    representatives = by_group_and_score[
+        np.concatenate(([True], sorted_groups[1:] != sorted_groups[:-1]))
+    ]
+
+    fused = _fused_scores(
+        method=method,
+        scores=scores,
+        groups=groups,
+        num_groups=num_groups,
+        set_sizes=np.fromiter(
+            (len(chunk_set) for chunk_set in chunk_sets),
+            dtype=np.intp,
+            count=len(chunk_sets),
+        ),
+        weights=(
+            np.asarray(weights, dtype=np.float64)
+            if weights is not None
+            else np.ones(len(chunk_sets))
+        ),
+        representatives=representatives,
+        rrf_k=rrf_k,
+    )
+
+    ranking = np.lexsort((np.arange(num_groups), -fused))
+    if top_k is not None:
+        ranking = ranking[:top_k]
+
+    fused_chunks = [
+        chunks[representative] for representative in representatives[ranking]
+    ]
+    if method == RetrievalFusionMethod.MAX:
+        return fused_chunks
+    return [
+        chunk.model_copy(update={"score": score})
+        for chunk, score in zip(fused_chunks, fused[ranking].tolist())
+    ]
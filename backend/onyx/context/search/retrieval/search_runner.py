@@ -1,10 +1,17 @@
 import string
+import threading
 from collections.abc import Callable
+from typing import Any
+from typing import cast
 
 import nltk  # type:ignore
+from prometheus_client import Counter
 from sqlalchemy.orm import Session
 
 from onyx.agents.agent_search.shared_graph_utils.models import QueryExpansionType
+from onyx.configs.chat_configs import INLINE_CONTEXT_EXPANSION
+from onyx.configs.model_configs import DOC_EMBEDDING_CONTEXT_SIZE
+from onyx.context.search.enums import RetrievalFusionMethod
 from onyx.context.search.enums import SearchType
 from onyx.context.search.models import ChunkMetric
 from onyx.context.search.models import IndexFilters
@@ -17,14 +24,31 @@ from onyx.context.search.models import SearchQuery
 from onyx.context.search.postprocessing.postprocessing import cleanup_chunks
 from onyx.context.search.preprocessing.preprocessing import HYBRID_ALPHA
 from onyx.context.search.preprocessing.preprocessing import HYBRID_ALPHA_KEYWORD
+from onyx.context.search.retrieval.fusion import fuse_retrieval_results
 from onyx.context.search.utils import inference_section_from_chunks
+from onyx.context.search.utils import normalize_query
+from onyx.db.models import SearchSettings
 from onyx.db.search_settings import get_current_search_settings
 from onyx.db.search_settings import get_multilingual_expansion
+from onyx.document_index.interfaces import ChunkContextWindow
+from onyx.document_index.interfaces import ContextFetchClaims
 from onyx.document_index.interfaces import DocumentIndex
+from onyx.document_index.interfaces import DocumentIndexPartialRetrievalError
+from onyx.document_index.interfaces import HybridRetrievalResult
 from onyx.document_index.interfaces import VespaChunkRequest
 from onyx.document_index.vespa.shared_utils.utils import (
     replace_invalid_doc_id_characters,
 )
+from onyx.natural_language_processing.embedding_cache import (
+    build_embedding_cache_key,
+)
+from onyx.natural_language_processing.embedding_cache import (
+    build_embedding_cache_namespace,
+)
+from onyx.natural_language_processing.embedding_cache import EmbeddingCache
+from onyx.natural_language_processing.embedding_cache import (
+    get_query_embedding_cache,
+)
 from onyx.natural_language_processing.search_nlp_models import EmbeddingModel
 from onyx.secondary_llm_flows.query_expansion import multilingual_query_expansion
 from onyx.utils.logger import setup_logger
@@ -41,21 +65,96 @@ from shared_configs.model_server_models import Embedding
 logger = setup_logger()
 
 
-def _dedupe_chunks(
-    chunks: list[InferenceChunkUncleaned],
+class PrefetchedChunkContext:
+    """Surrounding chunks of the retrieved chunks, fetched during the retrieval.
+
+    `covered` holds the chunks whose whole context window (`chunks_above` /
+    `chunks_below` of the search query) is in `chunks`, those need no further fetching.
+    Shared by the parallel retrievals of the (multilingual) query rephrases.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.chunks: dict[tuple[str, int], InferenceChunk] = {}
+        self.covered: set[tuple[str, int]] = set()
+
+    def add(self, chunks: list[InferenceChunk], covered: set[tuple[str, int]]) -> None:
+        with self._lock:
+            for chunk in chunks:
+                self.chunks.setdefault((chunk.document_id, chunk.chunk_id), chunk)
+            self.covered.update(covered)
+
+
+def _hybrid_retrieval(
+    document_index: DocumentIndex,
+    context_window: ChunkContextWindow | None,
+    context_claims: ContextFetchClaims | None,
+    retrieval_results: list[HybridRetrievalResult],
+    query: str,
+    query_embedding: Embedding,
+    final_keywords: list[str] | None,
+    filters: IndexFilters,
+    hybrid_alpha: float,
+    time_decay_multiplier: float,
+    num_to_retrieve: int,
+    ranking_profile_type: QueryExpansionType,
+    offset: int,
 ) -> list[InferenceChunkUncleaned]:
-    used_chunks: dict[tuple[str, int], InferenceChunkUncleaned] = {}
-    for chunk in chunks:
-        key = (chunk.document_id, chunk.chunk_id)
-        if key not in used_chunks:
-            used_chunks[key] = chunk
-        else:
-            stored_chunk_score = used_chunks[key].score or 0
-            this_chunk_score = chunk.score or 0
-            if stored_chunk_score < this_chunk_score:
-                used_chunks[key] = chunk
+    if context_window is None:
+        return document_index.hybrid_retrieval(
+            query,
+            query_embedding,
+            final_keywords,
+            filters,
+            hybrid_alpha,
+            time_decay_multiplier,
+            num_to_retrieve,
+            ranking_profile_type,
+            offset,
+        )
 
-    return list(used_chunks.values())
+    result = document_index.hybrid_retrieval_with_context(
+        query,
+        query_embedding,
+        final_keywords,
+        filters,
+        hybrid_alpha,
+        time_decay_multiplier,
+        num_to_retrieve,
+        ranking_profile_type,
+        offset,
+        context_window=context_window,
+        context_claims=context_claims,
+    )
+    retrieval_results.append(result)
+    return result.top_chunks
+
+
+def _collect_context(
+    retrieval_results: list[HybridRetrievalResult],
+) -> tuple[dict[tuple[str, int], InferenceChunkUncleaned], set[tuple[str, int]]]:
+    """Context chunks of all retrievals and the chunks whose context window they cover"""
+    context_chunks: dict[tuple[str, int], InferenceChunkUncleaned] = {}
+    covered: set[tuple[str, int]] = set()
+    for result in retrieval_results:
+        if result.context_chunks is None:
+            continue
+        for chunk in result.context_chunks:
+            context_chunks.setdefault((chunk.document_id, chunk.chunk_id), chunk)
+        context_hits = (
+            result.context_hits
+            if result.context_hits is not None
+            else result.top_chunks
+        )
+        for chunk in context_hits:
+            if chunk.large_chunk_reference_ids:
+                covered.update(
+                    (chunk.document_id, chunk_id)
+                    for chunk_id in chunk.large_chunk_reference_ids
+                )
+            else:
+                covered.add((chunk.document_id, chunk.chunk_id))
+    return context_chunks, covered
 
 
 def download_nltk_data() -> None:
@@ -93,31 +192,40 @@ def lemmatize_text(keywords: list[str]) -> list[str]:
 
 def combine_retrieval_results(
     chunk_sets: list[list[InferenceChunk]],
+    fusion_method: RetrievalFusionMethod = RetrievalFusionMethod.MAX,
 ) -> list[InferenceChunk]:
-    all_chunks = [chunk for chunk_set in chunk_sets for chunk in chunk_set]
+    return fuse_retrieval_results(chunk_sets, method=fusion_method)
 
-    unique_chunks: dict[tuple[str, int], InferenceChunk] = {}
-    for chunk in all_chunks:
-        key = (chunk.document_id, chunk.chunk_id)
-        if key not in unique_chunks:
-            unique_chunks[key] = chunk
-            continue
 
-        stored_chunk_score = unique_chunks[key].score or 0
-        this_chunk_score = chunk.score or 0
-        if stored_chunk_score < this_chunk_score:
-            unique_chunks[key] = chunk
-
-    sorted_chunks = sorted(
-        unique_chunks.values(), key=lambda x: x.score or 0, reverse=True
-    )
+query_embedding_cache_lookups = Counter(
+    "onyx_query_embedding_cache_lookups_total",
+    "Search query embedding cache lookups",
+    ["result"],
+)
 
-    return sorted_chunks
 
+def _build_query_embedding_cache_namespace(search_settings: SearchSettings) -> str:
+    # the search settings id is part of the namespace so that swapping to new search
+    # settings never serves embeddings from the old model, even if the
+    # model config happens to be identical
+    namespace = build_embedding_cache_namespace(
+        model_name=search_settings.model_name,
+        provider_type=search_settings.provider_type,
+        deployment_name=search_settings.deployment_name,
+        normalize=search_settings.normalize,
+        prefix=search_settings.query_prefix,
+        reduced_dimension=search_settings.reduced_dimension,
+        text_type=EmbedTextType.QUERY,
+        max_seq_length=DOC_EMBEDDING_CONTEXT_SIZE,
+    )
+    return f"{search_settings.id}:{namespace}"
 
-def get_query_embedding(query: str, db_session: Session) -> Embedding:
-    search_settings = get_current_search_settings(db_session)
 
+def _encode_queries(
+    queries: list[str],
+    search_settings: SearchSettings,
+    embedding_cache: EmbeddingCache | None,
+) -> list[Embedding]:
     model = EmbeddingModel.from_db_model(
         search_settings=search_settings,
         # The below are globally set, this flow always uses the indexing one
@@ -125,22 +233,98 @@ def get_query_embedding(query: str, db_session: Session) -> Embedding:
         server_port=MODEL_SERVER_PORT,
     )
 
-    query_embedding = model.encode([query], text_type=EmbedTextType.QUERY)[0]
-    return query_embedding
+    normalized_queries = [normalize_query(query) for query in queries]
+    if embedding_cache is None or not all(normalized_queries):
+        # leave erroring out on empty queries to the model
+        return model.encode(queries, text_type=EmbedTextType.QUERY)
+
+    namespace = _build_query_embedding_cache_namespace(search_settings)
+    keys = [build_embedding_cache_key(namespace, query) for query in normalized_queries]
+    embeddings = embedding_cache.get_many(keys)
+
+    key_to_missing_query: dict[str, str] = {
+        key: query
+        for key, query, embedding in zip(keys, normalized_queries, embeddings)
+        if embedding is None
+    }
+    num_hits = len(keys) - len(key_to_missing_query)
+    query_embedding_cache_lookups.labels(result="hit").inc(num_hits)
+    query_embedding_cache_lookups.labels(result="miss").inc(len(key_to_missing_query))
+
+    if key_to_missing_query:
+        new_embeddings = model.encode(
+            list(key_to_missing_query.values()), text_type=EmbedTextType.QUERY
+        )
+        key_to_new_embedding = dict(zip(key_to_missing_query, new_embeddings))
+        embedding_cache.put_many(key_to_new_embedding)
+        embeddings = [
+            embedding if embedding is not None else key_to_new_embedding[key]
+            for key, embedding in zip(keys, embeddings)
+        ]
+
+    logger.debug(
+        f"Query embedding cache: {num_hits} of {len(keys)} queries cached. "
+        f"Totals: {embedding_cache.stats}"
+    )
+    return cast(list[Embedding], embeddings)
+
+
+def get_query_embedding(query: str, db_session: Session) -> Embedding:
+    return get_query_embeddings([query], db_session)[0]
 
 
 def get_query_embeddings(queries: list[str], db_session: Session) -> list[Embedding]:
     search_settings = get_current_search_settings(db_session)
-
-    model = EmbeddingModel.from_db_model(
+    return _encode_queries(
+        queries=queries,
         search_settings=search_settings,
-        # The below are globally set, this flow always uses the indexing one
-        server_host=MODEL_SERVER_HOST,
-        server_port=MODEL_SERVER_PORT,
+        embedding_cache=get_query_embedding_cache(),
     )
 
-    query_embedding = model.encode(queries, text_type=EmbedTextType.QUERY)
-    return query_embedding
+
+def _semantic_expansions_to_embed(query: SearchQuery) -> list[str]:
+    if (
+        query.search_type != SearchType.SEMANTIC
+        or query.precomputed_semantic_expansion_embeddings is not None
+        or not query.expanded_queries
+        or not query.expanded_queries.keywords_expansions
+        or not query.expanded_queries.semantic_expansions
+    ):
+        return []
+    # only the first expansion is searched with, see `doc_index_retrieval`
+    return query.expanded_queries.semantic_expansions[:1]
+
+
+def plan_query_embeddings(
+    queries: list[SearchQuery], db_session: Session
+) -> list[SearchQuery]:
+    """Embeds every text the retrievals of the queries search with (the queries
+    themselves and their semantic expansions) in a single call to the model server.
+    Returns the queries with these embeddings precomputed."""
+    # rephrases share their expansions, each distinct text is embedded once
+    texts: dict[str, int] = {}
+    for query in queries:
+        if query.precomputed_query_embedding is None:
+            texts.setdefault(query.query, len(texts))
+        for expansion in _semantic_expansions_to_embed(query):
+            texts.setdefault(expansion, len(texts))
+
+    if not texts:
+        return queries
+
+    embeddings = get_query_embeddings(list(texts), db_session)
+    planned_queries: list[SearchQuery] = []
+    for query in queries:
+        update: dict[str, Any] = {}
+        if query.precomputed_query_embedding is None:
+            update["precomputed_query_embedding"] = embeddings[texts[query.query]]
+        semantic_expansions = _semantic_expansions_to_embed(query)
+        if semantic_expansions:
+            update["precomputed_semantic_expansion_embeddings"] = [
+                embeddings[texts[expansion]] for expansion in semantic_expansions
+            ]
+        planned_queries.append(query.model_copy(update=update) if update else query)
+    return planned_queries
 
 
 @log_function_time(print_only=True)
@@ -148,19 +332,20 @@ def doc_index_retrieval(
     query: SearchQuery,
     document_index: DocumentIndex,
     db_session: Session,
+    prefetched_context: PrefetchedChunkContext | None = None,
 ) -> list[InferenceChunk]:
     """
     This function performs the search to retrieve the chunks,
     extracts chunks from the large chunks, persists the scores
     from the large chunks to the referenced chunks,
     dedupes the chunks, and cleans the chunks.
+
+    If `prefetched_context` is given, the chunks surrounding the retrieved ones are
+    fetched along with them and added to it.
     """
-    query_embedding = query.precomputed_query_embedding or get_query_embedding(
-        query.query, db_session
-    )
+    query = plan_query_embeddings([query], db_session)[0]
+    query_embedding = cast(Embedding, query.precomputed_query_embedding)
 
-    keyword_embeddings_thread: TimeoutThread[list[Embedding]] | None = None
-    semantic_embeddings_thread: TimeoutThread[list[Embedding]] | None = None
     top_base_chunks_standard_ranking_thread: (
         TimeoutThread[list[InferenceChunkUncleaned]] | None
     ) = None
@@ -169,14 +354,30 @@ def doc_index_retrieval(
         None
     )
 
-    keyword_embeddings: list[Embedding] | None = None
-    semantic_embeddings: list[Embedding] | None = None
-
     top_semantic_chunks: list[InferenceChunkUncleaned] | None = None
 
+    # fetch the chunks referenced by large chunks (and the surrounding chunks) within
+    # each retrieval rather than in extra round trips afterwards
+    context_window: ChunkContextWindow | None = None
+    context_claims: ContextFetchClaims | None = None
+    if INLINE_CONTEXT_EXPANSION:
+        context_window = (
+            ChunkContextWindow(
+                chunks_above=query.chunks_above, chunks_below=query.chunks_below
+            )
+            if prefetched_context is not None
+            else ChunkContextWindow()
+        )
+        context_claims = ContextFetchClaims()
+    retrieval_results: list[HybridRetrievalResult] = []
+
     # original retrieveal method
     top_base_chunks_standard_ranking_thread = run_in_background(
-        document_index.hybrid_retrieval,
+        _hybrid_retrieval,
+        document_index,
+        context_window,
+        context_claims,
+        retrieval_results,
         query.query,
         query_embedding,
         query.processed_keywords,
@@ -193,33 +394,16 @@ def doc_index_retrieval(
         and query.expanded_queries.keywords_expansions
         and query.expanded_queries.semantic_expansions
     ):
-
-        keyword_embeddings_thread = run_in_background(
-            get_query_embeddings,
-            query.expanded_queries.keywords_expansions,
-            db_session,
-        )
-
-        if query.search_type == SearchType.SEMANTIC:
-            semantic_embeddings_thread = run_in_background(
-                get_query_embeddings,
-                query.expanded_queries.semantic_expansions,
-                db_session,
-            )
-
-        keyword_embeddings = wait_on_background(keyword_embeddings_thread)
-        if query.search_type == SearchType.SEMANTIC:
-            assert semantic_embeddings_thread is not None
-            semantic_embeddings = wait_on_background(semantic_embeddings_thread)
-
         # Use original query embedding for keyword retrieval embedding
-        keyword_embeddings = [query_embedding]
-
         # Note: we generally prepped earlier for multiple expansions, but for now we only use one.
         top_keyword_chunks_thread = run_in_background(
-            document_index.hybrid_retrieval,
+            _hybrid_retrieval,
+            document_index,
+            context_window,
+            context_claims,
+            retrieval_results,
             query.expanded_queries.keywords_expansions[0],
-            keyword_embeddings[0],
+            query_embedding,
             query.processed_keywords,
             query.filters,
             HYBRID_ALPHA_KEYWORD,
@@ -230,10 +414,15 @@ def doc_index_retrieval(
         )
 
         if query.search_type == SearchType.SEMANTIC:
+            semantic_embeddings = query.precomputed_semantic_expansion_embeddings
             assert semantic_embeddings is not None
 
             top_semantic_chunks_thread = run_in_background(
-                document_index.hybrid_retrieval,
+                _hybrid_retrieval,
+                document_index,
+                context_window,
+                context_claims,
+                retrieval_results,
                 query.expanded_queries.semantic_expansions[0],
                 semantic_embeddings[0],
                 query.processed_keywords,
@@ -255,15 +444,15 @@ def doc_index_retrieval(
             assert top_semantic_chunks_thread is not None
             top_semantic_chunks = wait_on_background(top_semantic_chunks_thread)
 
-        all_top_chunks = top_base_chunks_standard_ranking + top_keyword_chunks
+        chunk_sets = [top_base_chunks_standard_ranking, top_keyword_chunks]
 
         # use all three retrieval methods to retrieve top chunks
 
         if query.search_type == SearchType.SEMANTIC and top_semantic_chunks is not None:
 
-            all_top_chunks += top_semantic_chunks
+            chunk_sets.append(top_semantic_chunks)
 
-        top_chunks = _dedupe_chunks(all_top_chunks)
+        top_chunks = fuse_retrieval_results(chunk_sets, method=query.fusion_method)
 
     else:
 
@@ -271,22 +460,41 @@ def doc_index_retrieval(
             top_base_chunks_standard_ranking_thread
         )
 
-        top_chunks = _dedupe_chunks(top_base_chunks_standard_ranking)
+        top_chunks = fuse_retrieval_results([top_base_chunks_standard_ranking])
 
     logger.info(f"Overall number of top initial retrieval chunks: {len(top_chunks)}")
 
+    context_chunks, covered = _collect_context(retrieval_results)
+    if prefetched_context is not None:
+        # copies, cleaning modifies the chunks and the referenced ones are reused below
+        prefetched_context.add(
+            cleanup_chunks([chunk.model_copy() for chunk in context_chunks.values()]),
+            covered,
+        )
+
     retrieval_requests: list[VespaChunkRequest] = []
     normal_chunks: list[InferenceChunkUncleaned] = []
+    prefetched_referenced_chunks: dict[tuple[str, int], InferenceChunkUncleaned] = {}
     referenced_chunk_scores: dict[tuple[str, int], float] = {}
     for chunk in top_chunks:
         if chunk.large_chunk_reference_ids:
-            retrieval_requests.append(
-                VespaChunkRequest(
-                    document_id=replace_invalid_doc_id_characters(chunk.document_id),
-                    min_chunk_ind=chunk.large_chunk_reference_ids[0],
-                    max_chunk_ind=chunk.large_chunk_reference_ids[-1],
+            reference_keys = [
+                (chunk.document_id, chunk_id)
+                for chunk_id in chunk.large_chunk_reference_ids
+            ]
+            if all(key in context_chunks for key in reference_keys):
+                for key in reference_keys:
+                    prefetched_referenced_chunks[key] = context_chunks[key].model_copy()
+            else:
+                retrieval_requests.append(
+                    VespaChunkRequest(
+                        document_id=replace_invalid_doc_id_characters(
+                            chunk.document_id
+                        ),
+                        min_chunk_ind=chunk.large_chunk_reference_ids[0],
+                        max_chunk_ind=chunk.large_chunk_reference_ids[-1],
+                    )
                 )
-            )
             # for each referenced chunk, persist the
             # highest score to the referenced chunk
             for chunk_id in chunk.large_chunk_reference_ids:
@@ -298,15 +506,22 @@ def doc_index_retrieval(
             normal_chunks.append(chunk)
 
     # If there are no large chunks, just return the normal chunks
-    if not retrieval_requests:
+    if not retrieval_requests and not prefetched_referenced_chunks:
         return cleanup_chunks(normal_chunks)
 
     # Retrieve and return the referenced normal chunks from the large chunks
-    retrieved_inference_chunks = document_index.id_based_retrieval(
-        chunk_requests=retrieval_requests,
-        filters=query.filters,
-        batch_retrieval=True,
-    )
+    retrieved_inference_chunks = list(prefetched_referenced_chunks.values())
+    if retrieval_requests:
+        try:
+            retrieved_inference_chunks += document_index.id_based_retrieval(
+                chunk_requests=retrieval_requests,
+                filters=query.filters,
+                batch_retrieval=True,
+            )
+        except DocumentIndexPartialRetrievalError as e:
+            # the missing referenced chunks are logged below
+            logger.warning(f"Resolving large chunks partially failed: {e}")
+            retrieved_inference_chunks += e.retrieved_chunks
 
     # Apply the scores from the large chunks to the chunks referenced
     # by each large chunk
@@ -355,6 +570,7 @@ def retrieve_chunks(
     retrieval_metrics_callback: (
         Callable[[RetrievalMetricsContainer], None] | None
     ) = None,
+    prefetched_context: PrefetchedChunkContext | None = None,
 ) -> list[InferenceChunk]:
     """Returns a list of the best chunks from an initial keyword/semantic/ hybrid search."""
 
@@ -362,11 +578,14 @@ def retrieve_chunks(
     # Don't do query expansion on complex queries, rephrasings likely would not work well
     if not multilingual_expansion or "\n" in query.query or "\r" in query.query:
         top_chunks = doc_index_retrieval(
-            query=query, document_index=document_index, db_session=db_session
+            query=query,
+            document_index=document_index,
+            db_session=db_session,
+            prefetched_context=prefetched_context,
         )
     else:
         simplified_queries = set()
-        run_queries: list[tuple[Callable, tuple]] = []
+        rephrased_queries: list[SearchQuery] = []
 
         # Currently only uses query expansion on multilingual use cases
         query_rephrases = multilingual_query_expansion(
@@ -388,18 +607,28 @@ def retrieve_chunks(
                     # need to recompute for each rephrase
                     # note that `SearchQuery` is a frozen model, so we can't update
                     # it below
-                    "precomputed_query_embedding": None,
+                    "precomputed_query_embedding": (
+                        query.precomputed_query_embedding
+                        if rephrase == query.query
+                        else None
+                    ),
                 },
                 deep=True,
             )
-            run_queries.append(
-                (
-                    doc_index_retrieval,
-                    (q_copy, document_index, db_session),
-                )
+            rephrased_queries.append(q_copy)
+
+        # one embedding call for all rephrases instead of one per retrieval
+        run_queries: list[tuple[Callable, tuple]] = [
+            (
+                doc_index_retrieval,
+                (planned_query, document_index, db_session, prefetched_context),
             )
+            for planned_query in plan_query_embeddings(rephrased_queries, db_session)
+        ]
         parallel_search_results = run_functions_tuples_in_parallel(run_queries)
-        top_chunks = combine_retrieval_results(parallel_search_results)
+        top_chunks = combine_retrieval_results(
+            parallel_search_results, fusion_method=query.fusion_method
+        )
 
     if not top_chunks:
         logger.warning(
@@ -1,4 +1,5 @@
 import string
+import unicodedata
 from collections.abc import Sequence
 from typing import TypeVar
 
@@ -32,6 +33,12 @@ TSection = TypeVar(
 )
 
 
+def normalize_query(query: str) -> str:
+    """Queries which only differ in whitespace / unicode representation map to the
+    same embedding / rerank scores (and cache entries)."""
+    return " ".join(unicodedata.normalize("NFC", query).split())
+
+
 def dedupe_documents(items: list[T]) -> tuple[list[T], list[int]]:
     seen_ids = set()
     deduped_items = []
@@ -48,6 +48,7 @@ from onyx.db.models import User
 from onyx.db.models import UserFile
 from onyx.db.persona import get_best_persona_id_for_user
 from onyx.db.pg_file_store import delete_lobj_by_name
+from onyx.db.token_limit import record_chat_message_token_usage
 from onyx.file_store.models import FileDescriptor
 from onyx.file_store.models import InMemoryChatFile
 from onyx.llm.override_models import LLMOverride
@@ -645,12 +646,15 @@ def create_new_chat_message(
     refined_answer_improvement: bool | None = None,
     is_agentic: bool = False,
 ) -> ChatMessage:
+    # tokens to add to the token budget counters
+    new_token_count = token_count
     if reserved_message_id is not None:
         # Edit existing message
         existing_message = db_session.query(ChatMessage).get(reserved_message_id)
         if existing_message is None:
             raise ValueError(f"No message found with id {reserved_message_id}")
 
+        new_token_count -= existing_message.token_count or 0
         existing_message.chat_session_id = chat_session_id
         existing_message.parent_message = parent_message.id
         existing_message.message = message
@@ -697,6 +701,9 @@ def create_new_chat_message(
     db_session.flush()
 
     parent_message.latest_child_message = new_chat_message.id
+
+    # recorded when the message is committed, here or by the caller
+    record_chat_message_token_usage(chat_session_id, new_token_count, db_session)
     if commit:
         db_session.commit()
 
@@ -212,6 +212,30 @@ def get_documents_for_connector_credential_pair(
     return db_session.scalars(stmt).all()
 
 
+def get_sorted_document_ids_for_connector_credential_pair(
+    db_session: Session,
+    connector_id: int,
+    credential_id: int,
+    batch_size: int = 10_000,
+) -> Generator[str, None, None]:
+    """Streams the ids of every document for the cc-pair, sorted by code point
+    (the "C" collation) so that they can be merge-diffed against ids sorted in
+    Python. Only `batch_size` ids are held in memory at a time."""
+    stmt = (
+        select(DocumentByConnectorCredentialPair.id)
+        .where(
+            and_(
+                DocumentByConnectorCredentialPair.connector_id == connector_id,
+                DocumentByConnectorCredentialPair.credential_id == credential_id,
+            )
+        )
+        .order_by(DocumentByConnectorCredentialPair.id.collate("C"))
+        .execution_options(yield_per=batch_size)
+    )
+    for doc_id in db_session.scalars(stmt):
+        yield doc_id
+
+
 def get_documents_by_ids(
     db_session: Session,
     document_ids: list[str],
@@ -503,6 +527,29 @@ def update_docs_chunk_count__no_commit(
         doc.chunk_count = doc_id_to_chunk_count[doc.id]
 
 
+def update_docs_fingerprints__no_commit(
+    doc_id_to_fingerprints: dict[str, tuple[str, list[str]] | None],
+    db_session: Session,
+) -> None:
+    """Stores the (content fingerprint, chunk fingerprints) used by incremental chunking.
+    None clears them, so that the next indexing of the document rewrites every chunk."""
+    if not doc_id_to_fingerprints:
+        return
+
+    documents_to_update = (
+        db_session.query(DbDocument)
+        .filter(DbDocument.id.in_(list(doc_id_to_fingerprints.keys())))
+        .all()
+    )
+    for doc in documents_to_update:
+        fingerprints = doc_id_to_fingerprints[doc.id]
+        if fingerprints is None:
+            doc.content_fingerprint = None
+            doc.chunk_fingerprints = None
+        else:
+            doc.content_fingerprint, doc.chunk_fingerprints = fingerprints
+
+
 def mark_document_as_modified(
     document_id: str,
     db_session: Session,
@@ -528,6 +575,19 @@ def mark_document_as_synced(document_id: str, db_session: Session) -> None:
     db_session.commit()
 
 
+def mark_documents_as_synced(document_ids: list[str], db_session: Session) -> None:
+    if not document_ids:
+        return
+
+    stmt = (
+        update(DbDocument)
+        .where(DbDocument.id.in_(document_ids))
+        .values(last_synced=datetime.now(timezone.utc))
+    )
+    db_session.execute(stmt)
+    db_session.commit()
+
+
 def delete_document_by_connector_credential_pair__no_commit(
     db_session: Session,
     document_id: str,
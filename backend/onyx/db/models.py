@@ -554,6 +554,15 @@ class Document(Base):
     # Only null for documents indexed prior to this change
     chunk_count: Mapped[int | None] = mapped_column(Integer, nullable=True)
 
+    # Used by incremental chunking to tell which chunks in Vespa are still up to date.
+    # The content fingerprint covers the sections and the document level fields written
+    # into every chunk, the chunk fingerprints cover each chunk (and its position).
+    # Null if the document was last indexed without incremental chunking
+    content_fingerprint: Mapped[str | None] = mapped_column(String, nullable=True)
+    chunk_fingerprints: Mapped[list[str] | None] = mapped_column(
+        postgresql.ARRAY(String), nullable=True
+    )
+
     # last time any vespa relevant row metadata or the doc changed.
     # does not include last_synced
     last_modified: Mapped[datetime.datetime | None] = mapped_column(
@@ -19,6 +19,9 @@ from onyx.db.search_settings import get_secondary_search_settings
 from onyx.db.search_settings import update_search_settings_status
 from onyx.document_index.factory import get_default_document_index
 from onyx.key_value_store.factory import get_kv_store
+from onyx.natural_language_processing.embedding_cache import (
+    clear_query_embedding_cache,
+)
 from onyx.utils.logger import setup_logger
 
 
@@ -74,6 +77,9 @@ def _perform_index_swap(
         db_session=db_session,
     )
 
+    # query embeddings of the old model will never be used again
+    clear_query_embedding_cache()
+
     # remove the old index from the vector db
     document_index = get_default_document_index(secondary_search_settings, None)
 
@@ -1,12 +1,50 @@
 from collections.abc import Sequence
+from datetime import datetime
+from datetime import timezone
+from functools import lru_cache
+from uuid import UUID
 
+from redis.exceptions import RedisError
+from sqlalchemy import event
 from sqlalchemy import select
 from sqlalchemy.orm import Session
+from sqlalchemy.orm import SessionTransaction
 
+from onyx.configs.app_configs import TOKEN_BUDGET_COUNTERS_ENABLED
 from onyx.configs.constants import TokenRateLimitScope
+from onyx.db.engine import get_session_context_manager
+from onyx.db.models import ChatSession
 from onyx.db.models import TokenRateLimit
 from onyx.db.models import TokenRateLimit__UserGroup
+from onyx.db.models import User__UserGroup
+from onyx.redis.redis_token_budget import RedisTokenBudget
+from onyx.redis.redis_token_budget import TOKEN_BUDGET_SCOPE_GLOBAL
+from onyx.redis.redis_token_budget import user_group_token_budget_scope
+from onyx.redis.redis_token_budget import user_token_budget_scope
 from onyx.server.token_rate_limits.models import TokenRateLimitArgs
+from onyx.utils.logger import setup_logger
+from shared_configs.contextvars import get_current_tenant_id
+
+logger = setup_logger()
+
+# session.info key of the token usage to record once the session commits
+_PENDING_TOKEN_USAGE_KEY = "pending_token_usage"
+
+
+@lru_cache()
+def any_rate_limit_exists() -> bool:
+    """Checks if any rate limit exists in the database. Is cached, so that if no rate limits
+    are setup, we don't have any effect on average query latency."""
+    logger.debug("Checking for any rate limits...")
+    with get_session_context_manager() as db_session:
+        return (
+            db_session.scalar(
+                select(TokenRateLimit.id).where(
+                    TokenRateLimit.enabled == True  # noqa: E712
+                )
+            )
+            is not None
+        )
 
 
 def fetch_all_user_token_rate_limits(
@@ -109,3 +147,61 @@ def delete_token_rate_limit(
 
     db_session.delete(token_limit)
     db_session.commit()
+
+
+def _record_pending_token_usage(db_session: Session) -> None:
+    pending_usage: list[tuple[str, list[str], int, datetime]] = db_session.info.pop(
+        _PENDING_TOKEN_USAGE_KEY, []
+    )
+    for tenant_id, scopes, token_count, time_sent in pending_usage:
+        try:
+            RedisTokenBudget(tenant_id).record_usage(scopes, token_count, time_sent)
+        except RedisError:
+            logger.exception("Failed to record the token usage of a chat message")
+
+
+def _drop_pending_token_usage(
+    db_session: Session, previous_transaction: SessionTransaction
+) -> None:
+    # a rolled back savepoint does not roll back the messages of the outer transaction
+    if not previous_transaction.nested:
+        db_session.info.pop(_PENDING_TOKEN_USAGE_KEY, None)
+
+
+def record_chat_message_token_usage(
+    chat_session_id: UUID, token_count: int, db_session: Session
+) -> None:
+    """Adds the tokens of a chat message to the token budget counters of the tenant,
+    the user of the chat session and their user groups once `db_session` commits, and
+    not at all if it rolls back. The counters are only used to check the budgets, a
+    failure here never fails writing the message."""
+    if not TOKEN_BUDGET_COUNTERS_ENABLED or token_count <= 0:
+        return
+
+    # nothing would ever check the counters
+    if not any_rate_limit_exists():
+        return
+
+    chat_session = db_session.get(ChatSession, chat_session_id)
+    user_id: UUID | None = chat_session.user_id if chat_session else None
+
+    scopes = [TOKEN_BUDGET_SCOPE_GLOBAL]
+    if user_id is not None:
+        scopes.append(user_token_budget_scope(user_id))
+        user_group_ids = db_session.scalars(
+            select(User__UserGroup.user_group_id).where(
+                User__UserGroup.user_id == user_id
+            )
+        ).all()
+        scopes.extend(
+            user_group_token_budget_scope(user_group_id)
+            for user_group_id in user_group_ids
+        )
+
+    # the scopes are resolved now, no SQL can be emitted after the commit
+    db_session.info.setdefault(_PENDING_TOKEN_USAGE_KEY, []).append(
+        (get_current_tenant_id(), scopes, token_count, datetime.now(tz=timezone.utc))
+    )
+    if not event.contains(db_session, "after_commit", _record_pending_token_usage):
+        event.listen(db_session, "after_commit", _record_pending_token_usage)
+        event.listen(db_session, "after_soft_rollback", _drop_pending_token_usage)
@@ -2,6 +2,8 @@ import math
 import uuid
 from uuid import UUID
 
+import numpy as np
+import numpy.typing as npt
 from sqlalchemy.orm import Session
 
 from onyx.configs.app_configs import ENABLE_MULTIPASS_INDEXING
@@ -76,6 +78,14 @@ def translate_boost_count_to_multiplier(boost: int) -> float:
     return 2 / (1 + math.exp(-1 * boost / 3))
 
 
+def translate_boost_counts_to_multipliers(
+    boosts: npt.NDArray[np.float64],
+) -> npt.NDArray[np.float64]:
+    """Vectorized version of translate_boost_count_to_multiplier"""
+    sigmoid = 1 / (1 + np.exp(-1 * boosts / 3))
+    return np.where(boosts < 0, 0.5 + sigmoid, 2 * sigmoid)
+
+
 # Assembles a list of Vespa chunk IDs for a document
 # given the required context. This can be used to directly query
 # Vespa's Document API.
@@ -31,6 +31,7 @@ def get_default_document_index(
         secondary_large_chunks_enabled=secondary_large_chunks_enabled,
         multitenant=MULTI_TENANT,
         httpx_client=httpx_client,
+        embedding_precision=search_settings.embedding_precision,
     )
 
 
@@ -1,4 +1,5 @@
 import abc
+import threading
 from dataclasses import dataclass
 from datetime import datetime
 from typing import Any
@@ -19,6 +20,24 @@ class DocumentInsertionRecord:
     already_existed: bool
 
 
+class DocumentIndexPartialFailureError(Exception):
+    """Raised by `Indexable.index` if only some of the documents in the batch could
+    be written. Lets callers retry / report just the failed documents."""
+
+    def __init__(
+        self,
+        insertion_records: set[DocumentInsertionRecord],
+        failed_document_ids: dict[str, str],
+    ) -> None:
+        self.insertion_records = insertion_records
+        # document id -> error message
+        self.failed_document_ids = failed_document_ids
+        super().__init__(
+            f"Failed to index {len(failed_document_ids)} document(s): "
+            f"{list(failed_document_ids)[:5]}"
+        )
+
+
 @dataclass(frozen=True)
 class VespaChunkRequest:
     document_id: str
@@ -38,6 +57,67 @@ class VespaChunkRequest:
         return None
 
 
+class DocumentIndexPartialRetrievalError(Exception):
+    """Raised by `IdRetrievalCapable.id_based_retrieval` if only some of the chunk
+    requests could be fetched. Holds what was retrieved so that callers can continue
+    with it."""
+
+    def __init__(
+        self,
+        retrieved_chunks: list[InferenceChunkUncleaned],
+        failed_chunk_requests: list[VespaChunkRequest],
+    ) -> None:
+        self.retrieved_chunks = retrieved_chunks
+        self.failed_chunk_requests = failed_chunk_requests
+        super().__init__(
+            f"Failed to retrieve {len(failed_chunk_requests)} chunk request(s): "
+            f"{failed_chunk_requests[:5]}"
+        )
+
+
+@dataclass(frozen=True)
+class ChunkContextWindow:
+    """Chunks above / below each hit to fetch along with the hits of a search"""
+
+    chunks_above: int = 0
+    chunks_below: int = 0
+
+
+@dataclass
+class HybridRetrievalResult:
+    # the hits, same as returned by `hybrid_retrieval`
+    top_chunks: list[InferenceChunkUncleaned]
+    # every (non large) chunk within the context window of a hit, with the chunks
+    # referenced by large chunk hits (and their windows). None if they could not be
+    # fetched, callers then have to fetch them separately
+    context_chunks: list[InferenceChunkUncleaned] | None
+    # the hits whose context is in `context_chunks`, None if all of them. The context
+    # of the others was claimed by another retrieval, see `ContextFetchClaims`
+    context_hits: list[InferenceChunkUncleaned] | None = None
+
+
+class ContextFetchClaims:
+    """Shared by the parallel retrievals of a query, so that the context of a hit
+    returned by several of them is only fetched by the first one to claim it."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._claimed: set[tuple[str, int]] = set()
+
+    def claim(
+        self, hits: list[InferenceChunkUncleaned]
+    ) -> list[InferenceChunkUncleaned]:
+        """Claims the hits not claimed yet and returns them."""
+        with self._lock:
+            unclaimed = [
+                hit
+                for hit in hits
+                if (hit.document_id, hit.chunk_id) not in self._claimed
+            ]
+            self._claimed.update((hit.document_id, hit.chunk_id) for hit in unclaimed)
+        return unclaimed
+
+
 @dataclass
 class IndexBatchParams:
     """
@@ -104,6 +184,8 @@ class VespaDocumentFields:
     boost: float | None = None
     hidden: bool | None = None
     aggregated_chunk_boost_factor: float | None = None
+    # only set when re-indexing a document whose chunks were (partially) left in place
+    doc_updated_at: datetime | None = None
 
 
 @dataclass
@@ -227,6 +309,10 @@ class Indexable(abc.ABC):
             List of document ids which map to unique documents and are used for deduping chunks
             when updating, as well as if the document is newly indexed or already existed and
             just updated
+
+        Raises:
+            DocumentIndexPartialFailureError: if the implementation is able to tell which
+                documents failed and only some of them did
         """
         raise NotImplementedError
 
@@ -334,6 +420,9 @@ class IdRetrievalCapable(abc.ABC):
         Returns:
             list of chunks for the document id or the specific chunk by the specified chunk index
             and document id
+
+        Raises:
+            DocumentIndexPartialRetrievalError: if only some of the requests could be served
         """
         raise NotImplementedError
 
@@ -386,6 +475,45 @@ class HybridCapable(abc.ABC):
         """
         raise NotImplementedError
 
+    def hybrid_retrieval_with_context(
+        self,
+        query: str,
+        query_embedding: Embedding,
+        final_keywords: list[str] | None,
+        filters: IndexFilters,
+        hybrid_alpha: float,
+        time_decay_multiplier: float,
+        num_to_retrieve: int,
+        ranking_profile_type: QueryExpansionType,
+        offset: int = 0,
+        title_content_ratio: float | None = TITLE_CONTENT_RATIO,
+        context_window: ChunkContextWindow = ChunkContextWindow(),
+        context_claims: ContextFetchClaims | None = None,
+    ) -> HybridRetrievalResult:
+        """
+        Same as `hybrid_retrieval`, but also returns the chunks surrounding each hit (within
+        `context_window`) and the chunks referenced by large chunk hits. Saves the caller
+        the separate id based retrievals after the search. With `context_claims`, only
+        the context of the hits claimed by this retrieval is fetched.
+
+        Indices which can't do this return no context chunks, the default.
+        """
+        return HybridRetrievalResult(
+            top_chunks=self.hybrid_retrieval(
+                query=query,
+                query_embedding=query_embedding,
+                final_keywords=final_keywords,
+                filters=filters,
+                hybrid_alpha=hybrid_alpha,
+                time_decay_multiplier=time_decay_multiplier,
+                num_to_retrieve=num_to_retrieve,
+                ranking_profile_type=ranking_profile_type,
+                offset=offset,
+                title_content_ratio=title_content_ratio,
+            ),
+            context_chunks=None,
+        )
+
 
 class AdminCapable(abc.ABC):
     """
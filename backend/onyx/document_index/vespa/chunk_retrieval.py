@@ -1,3 +1,4 @@
+import asyncio
 import json
 import string
 from collections.abc import Callable
@@ -6,15 +7,20 @@ from datetime import datetime
 from datetime import timezone
 from typing import Any
 from typing import cast
+from typing import NoReturn
 
 import httpx
 from retry import retry
 
 from onyx.configs.app_configs import LOG_VESPA_TIMING_INFORMATION
+from onyx.configs.app_configs import VESPA_ID_RETRIEVAL_MAX_CONCURRENCY
 from onyx.context.search.models import IndexFilters
 from onyx.context.search.models import InferenceChunkUncleaned
+from onyx.document_index.interfaces import ChunkContextWindow
+from onyx.document_index.interfaces import DocumentIndexPartialRetrievalError
 from onyx.document_index.interfaces import VespaChunkRequest
-from onyx.document_index.vespa.shared_utils.utils import get_vespa_http_client
+from onyx.document_index.vespa.query_client import async_vespa_query_request
+from onyx.document_index.vespa.query_client import vespa_query_request
 from onyx.document_index.vespa.shared_utils.vespa_request_builders import (
     build_vespa_filters,
 )
@@ -28,6 +34,7 @@ from onyx.document_index.vespa_constants import CHUNK_CONTEXT
 from onyx.document_index.vespa_constants import CHUNK_ID
 from onyx.document_index.vespa_constants import CONTENT
 from onyx.document_index.vespa_constants import CONTENT_SUMMARY
+from onyx.document_index.vespa_constants import CONTENT_TOKEN_COUNTS
 from onyx.document_index.vespa_constants import DOC_SUMMARY
 from onyx.document_index.vespa_constants import DOC_UPDATED_AT
 from onyx.document_index.vespa_constants import DOCUMENT_ID
@@ -99,6 +106,12 @@ def _vespa_hit_to_inference_chunk(
 
     # parse fields that are stored as strings, but are really json / datetime
     metadata = json.loads(fields[METADATA]) if METADATA in fields else {}
+    # chunks indexed before the token counts were computed do not have them
+    content_token_counts = (
+        json.loads(fields[CONTENT_TOKEN_COUNTS])
+        if CONTENT_TOKEN_COUNTS in fields
+        else {}
+    )
     updated_at = (
         datetime.fromtimestamp(fields[DOC_UPDATED_AT], tz=timezone.utc)
         if DOC_UPDATED_AT in fields
@@ -148,6 +161,7 @@ def _vespa_hit_to_inference_chunk(
         metadata_suffix=fields.get(METADATA_SUFFIX),
         doc_summary=fields.get(DOC_SUMMARY, ""),
         chunk_context=fields.get(CHUNK_CONTEXT, ""),
+        content_token_counts=content_token_counts,
         match_highlights=match_highlights,
         updated_at=updated_at,
     )
@@ -202,9 +216,10 @@ def _get_chunks_via_visit_api(
     while True:
         try:
             filtered_params = {k: v for k, v in params.items() if v is not None}
-            with get_vespa_http_client() as http_client:
-                response = http_client.get(url, params=filtered_params)
-                response.raise_for_status()
+            response = vespa_query_request(
+                "GET", url, operation="visit", params=filtered_params
+            )
+            response.raise_for_status()
         except httpx.HTTPError as e:
             error_base = "Failed to query Vespa"
             logger.error(
@@ -257,6 +272,23 @@ def _get_chunks_via_visit_api(
 #     return [chunk["id"].split("::", 1)[-1] for chunk in document_chunks]
 
 
+def _visit_api_retrieval(
+    chunk_request: VespaChunkRequest,
+    index_name: str,
+    filters: IndexFilters,
+    get_large_chunks: bool,
+) -> list[InferenceChunkUncleaned]:
+    return [
+        _vespa_hit_to_inference_chunk(chunk, null_score=True)
+        for chunk in _get_chunks_via_visit_api(
+            chunk_request=chunk_request,
+            index_name=index_name,
+            filters=filters,
+            get_large_chunks=get_large_chunks,
+        )
+    ]
+
+
 def parallel_visit_api_retrieval(
     index_name: str,
     chunk_requests: list[VespaChunkRequest],
@@ -265,7 +297,7 @@ def parallel_visit_api_retrieval(
 ) -> list[InferenceChunkUncleaned]:
     functions_with_args: list[tuple[Callable, tuple]] = [
         (
-            _get_chunks_via_visit_api,
+            _visit_api_retrieval,
             (chunk_request, index_name, filters, get_large_chunks),
         )
         for chunk_request in chunk_requests
@@ -276,28 +308,27 @@ def parallel_visit_api_retrieval(
     )
 
     # Any failures to retrieve would give a None, drop the Nones and empty lists
-    vespa_chunk_sets = [res for res in parallel_results if res]
+    inference_chunks: list[InferenceChunkUncleaned] = []
+    for chunk_set in parallel_results:
+        if chunk_set:
+            inference_chunks.extend(chunk_set)
 
-    flattened_vespa_chunks = []
-    for chunk_set in vespa_chunk_sets:
-        flattened_vespa_chunks.extend(chunk_set)
+    return inference_chunks
 
-    inference_chunks = [
-        _vespa_hit_to_inference_chunk(chunk, null_score=True)
-        for chunk in flattened_vespa_chunks
-    ]
 
-    return inference_chunks
+# retry settings of `query_vespa`, also used by `async_query_vespa`
+_QUERY_TRIES = 3
+_QUERY_RETRY_DELAY = 1
+_QUERY_RETRY_BACKOFF = 2
 
 
-@retry(tries=3, delay=1, backoff=2)
-def query_vespa(
+def _build_query_params(
     query_params: Mapping[str, str | int | float],
-) -> list[InferenceChunkUncleaned]:
+) -> dict[str, Any]:
     if "query" in query_params and not cast(str, query_params["query"]).strip():
         raise ValueError("No/empty query received")
 
-    params = dict(
+    return dict(
         **query_params,
         **(
             {
@@ -308,26 +339,27 @@ def query_vespa(
         ),
     )
 
-    try:
-        with get_vespa_http_client() as http_client:
-            response = http_client.post(SEARCH_ENDPOINT, json=params)
-            response.raise_for_status()
-    except httpx.HTTPError as e:
-        error_base = "Failed to query Vespa"
-        logger.error(
-            f"{error_base}:\n"
-            f"Request URL: {e.request.url}\n"
-            f"Request Headers: {e.request.headers}\n"
-            f"Request Payload: {params}\n"
-            f"Exception: {str(e)}"
-            + (
-                f"\nResponse: {e.response.text}"
-                if isinstance(e, httpx.HTTPStatusError)
-                else ""
-            )
+
+def _raise_query_error(e: httpx.HTTPError, params: dict[str, Any]) -> NoReturn:
+    error_base = "Failed to query Vespa"
+    logger.error(
+        f"{error_base}:\n"
+        f"Request URL: {e.request.url}\n"
+        f"Request Headers: {e.request.headers}\n"
+        f"Request Payload: {params}\n"
+        f"Exception: {str(e)}"
+        + (
+            f"\nResponse: {e.response.text}"
+            if isinstance(e, httpx.HTTPStatusError)
+            else ""
         )
-        raise httpx.HTTPError(error_base) from e
+    )
+    raise httpx.HTTPError(error_base) from e
+
 
+def _parse_query_response(
+    response: httpx.Response, query_params: Mapping[str, str | int | float]
+) -> list[InferenceChunkUncleaned]:
     response_json: dict[str, Any] = response.json()
 
     if LOG_VESPA_TIMING_INFORMATION:
@@ -369,6 +401,57 @@ def query_vespa(
     return inference_chunks
 
 
+@retry(tries=_QUERY_TRIES, delay=_QUERY_RETRY_DELAY, backoff=_QUERY_RETRY_BACKOFF)
+def query_vespa(
+    query_params: Mapping[str, str | int | float],
+) -> list[InferenceChunkUncleaned]:
+    params = _build_query_params(query_params)
+
+    try:
+        response = vespa_query_request(
+            "POST", SEARCH_ENDPOINT, operation="search", json=params
+        )
+        response.raise_for_status()
+    except httpx.HTTPError as e:
+        _raise_query_error(e, params)
+
+    return _parse_query_response(response, query_params)
+
+
+async def _async_query_vespa_once(
+    params: dict[str, Any], query_params: Mapping[str, str | int | float]
+) -> list[InferenceChunkUncleaned]:
+    try:
+        response = await async_vespa_query_request(
+            "POST", SEARCH_ENDPOINT, operation="search", json=params
+        )
+        response.raise_for_status()
+    except httpx.HTTPError as e:
+        _raise_query_error(e, params)
+
+    return _parse_query_response(response, query_params)
+
+
+async def async_query_vespa(
+    query_params: Mapping[str, str | int | float],
+) -> list[InferenceChunkUncleaned]:
+    """Async equivalent of `query_vespa`, for use from async request handlers."""
+    params = _build_query_params(query_params)
+
+    retry_delays = [
+        _QUERY_RETRY_DELAY * _QUERY_RETRY_BACKOFF**retry
+        for retry in range(_QUERY_TRIES - 1)
+    ]
+    for delay in retry_delays:
+        try:
+            return await _async_query_vespa_once(params, query_params)
+        except httpx.HTTPError:
+            logger.warning(f"Vespa query failed, retrying in {delay}s")
+            await asyncio.sleep(delay)
+
+    return await _async_query_vespa_once(params, query_params)
+
+
 def _get_chunks_via_batch_search(
     index_name: str,
     chunk_requests: list[VespaChunkRequest],
@@ -403,19 +486,58 @@ def _get_chunks_via_batch_search(
     return inference_chunks
 
 
-def batch_search_api_retrieval(
-    index_name: str,
+def build_context_chunk_requests(
+    chunks: list[InferenceChunkUncleaned], context_window: ChunkContextWindow
+) -> list[VespaChunkRequest]:
+    """Chunk requests for everything within `context_window` of the given hits, and for
+    the chunks referenced by large chunk hits. Overlapping ranges of the same document
+    are merged so that each chunk is requested once."""
+    above = context_window.chunks_above
+    below = context_window.chunks_below
+
+    doc_ranges: dict[str, list[tuple[int, int]]] = {}
+    for chunk in chunks:
+        if chunk.large_chunk_reference_ids:
+            start = chunk.large_chunk_reference_ids[0]
+            end = chunk.large_chunk_reference_ids[-1]
+        elif above or below:
+            start = end = chunk.chunk_id
+        else:
+            # the hit itself is all that is needed
+            continue
+        doc_ranges.setdefault(chunk.document_id, []).append(
+            (max(0, start - above), end + below)
+        )
+
+    chunk_requests: list[VespaChunkRequest] = []
+    for document_id, ranges in doc_ranges.items():
+        ranges.sort()
+        merged = [ranges[0]]
+        for start, end in ranges[1:]:
+            if start <= merged[-1][1] + 1:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+            else:
+                merged.append((start, end))
+        chunk_requests.extend(
+            VespaChunkRequest(
+                document_id=document_id, min_chunk_ind=start, max_chunk_ind=end
+            )
+            for start, end in merged
+        )
+    return chunk_requests
+
+
+def _group_chunk_requests(
     chunk_requests: list[VespaChunkRequest],
-    filters: IndexFilters,
-    get_large_chunks: bool = False,
-) -> list[InferenceChunkUncleaned]:
-    retrieved_chunks: list[InferenceChunkUncleaned] = []
+) -> tuple[list[list[VespaChunkRequest]], list[VespaChunkRequest]]:
+    """Splits the capped requests into groups which each fit a single batched search.
+    The uncapped requests are returned separately, they go through the Visit API."""
+    capped_groups: list[list[VespaChunkRequest]] = []
     capped_requests: list[VespaChunkRequest] = []
     uncapped_requests: list[VespaChunkRequest] = []
     chunk_count = 0
     for req_ind, request in enumerate(chunk_requests, start=1):
         # All requests without a chunk range are uncapped
-        # Uncapped requests are retrieved using the Visit API
         range = request.range
         if range is None:
             uncapped_requests.append(request)
@@ -424,36 +546,92 @@ def batch_search_api_retrieval(
         if (
             chunk_count + range > MAX_ID_SEARCH_QUERY_SIZE
             or req_ind % MAX_OR_CONDITIONS == 0
-        ):
-            retrieved_chunks.extend(
-                _get_chunks_via_batch_search(
-                    index_name=index_name,
-                    chunk_requests=capped_requests,
-                    filters=filters,
-                    get_large_chunks=get_large_chunks,
-                )
-            )
+        ) and capped_requests:
+            capped_groups.append(capped_requests)
             capped_requests = []
             chunk_count = 0
         capped_requests.append(request)
         chunk_count += range
 
     if capped_requests:
-        retrieved_chunks.extend(
-            _get_chunks_via_batch_search(
-                index_name=index_name,
-                chunk_requests=capped_requests,
-                filters=filters,
-                get_large_chunks=get_large_chunks,
-            )
-        )
+        capped_groups.append(capped_requests)
+    return capped_groups, uncapped_requests
+
 
+def _capture_failure(
+    func: Callable[..., list[InferenceChunkUncleaned]], *args: Any
+) -> list[InferenceChunkUncleaned] | Exception:
+    try:
+        return func(*args)
+    except Exception as e:
+        return e
+
+
+def batch_search_api_retrieval(
+    index_name: str,
+    chunk_requests: list[VespaChunkRequest],
+    filters: IndexFilters,
+    get_large_chunks: bool = False,
+    max_concurrency: int = VESPA_ID_RETRIEVAL_MAX_CONCURRENCY,
+) -> list[InferenceChunkUncleaned]:
+    """Retrieves the requested chunks with as few batched searches as possible, and the
+    uncapped requests through the Visit API. The searches and visits run concurrently
+    (at most `max_concurrency` at a time), the results are in the order of the requests.
+
+    Visits are best effort, a failed one is only logged. If a batched search fails,
+    `DocumentIndexPartialRetrievalError` is raised once everything else has finished.
+    """
+    capped_groups, uncapped_requests = _group_chunk_requests(chunk_requests)
     if uncapped_requests:
         logger.debug(f"Retrieving {len(uncapped_requests)} uncapped requests")
-        retrieved_chunks.extend(
-            parallel_visit_api_retrieval(
-                index_name, uncapped_requests, filters, get_large_chunks
-            )
+
+    # the batched search consumes its list of requests, hand it a copy
+    retrievals: list[tuple[list[VespaChunkRequest], tuple[Callable, tuple]]] = [
+        (
+            group,
+            (
+                _get_chunks_via_batch_search,
+                (index_name, list(group), filters, get_large_chunks),
+            ),
+        )
+        for group in capped_groups
+    ] + [
+        (
+            [request],
+            (
+                _visit_api_retrieval,
+                (request, index_name, filters, get_large_chunks),
+            ),
+        )
+        for request in uncapped_requests
+    ]
+
+    results: list[list[InferenceChunkUncleaned] | Exception]
+    if len(retrievals) == 1:
+        func, args = retrievals[0][1]
+        results = [_capture_failure(func, *args)]
+    else:
+        results = run_functions_tuples_in_parallel(
+            [(_capture_failure, (func, *args)) for _, (func, args) in retrievals],
+            max_workers=max_concurrency,
         )
 
+    retrieved_chunks: list[InferenceChunkUncleaned] = []
+    failed_requests: list[VespaChunkRequest] = []
+    search_error: Exception | None = None
+    for (requests, (func, _)), result in zip(retrievals, results):
+        if not isinstance(result, Exception):
+            retrieved_chunks.extend(result)
+            continue
+
+        failed_requests.extend(requests)
+        if func is _get_chunks_via_batch_search:
+            search_error = search_error or result
+        logger.error(f"Failed to retrieve chunks for {requests}: {result}")
+
+    if search_error is not None:
+        raise DocumentIndexPartialRetrievalError(
+            retrieved_chunks=retrieved_chunks, failed_chunk_requests=failed_requests
+        ) from search_error
+
     return retrieved_chunks
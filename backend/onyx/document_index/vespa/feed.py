@@ -0,0 +1,324 @@
+"""Bulk feed path for Vespa.
+
+The default write path sends one blocking request per chunk from a thread pool,
+so throughput is capped by `NUM_THREADS` round trips at a time. Here operations
+are streamed over a small number of persistent HTTP/2 connections from a single
+event loop, with up to `max_inflight` requests in flight. This is the same approach
+Vespa's own feed client takes, since the /document/v1 API only accepts a single
+document per request.
+
+If Vespa pushes back (429 / 503 / 507), the number of in flight requests is halved
+and the operation is retried after a backoff. The window then grows back by one
+for every window's worth of successful operations (AIMD).
+
+The sync entrypoint runs the feeds on a process wide event loop (on its own thread)
+with a long lived client, so consecutive feeds reuse the connections instead of
+opening new ones each time.
+"""
+
+import asyncio
+import contextvars
+import json
+import os
+import random
+import threading
+import time
+from collections.abc import Callable
+from collections.abc import Iterable
+from dataclasses import dataclass
+from dataclasses import field
+from http import HTTPStatus
+from typing import Any
+
+import httpx
+
+from onyx.configs.app_configs import VESPA_FEED_MAX_CONNECTIONS
+from onyx.configs.app_configs import VESPA_FEED_MAX_INFLIGHT
+from onyx.configs.app_configs import VESPA_FEED_MAX_RETRIES
+from onyx.document_index.vespa.shared_utils.utils import get_vespa_async_http_client
+from onyx.utils.logger import setup_logger
+
+logger = setup_logger()
+
+THROTTLED_STATUS_CODES = {
+    HTTPStatus.TOO_MANY_REQUESTS,
+    HTTPStatus.SERVICE_UNAVAILABLE,
+    HTTPStatus.INSUFFICIENT_STORAGE,
+}
+
+_JSON_HEADERS = {"Content-Type": "application/json"}
+
+_MIN_RETRY_DELAY = 0.1
+_MAX_RETRY_DELAY = 10.0
+
+
+@dataclass
+class VespaFeedOperation:
+    method: str  # "POST" (put document), "PUT" (partial update) or "DELETE"
+    url: str
+    # the Onyx document this operation belongs to, failures are reported per document
+    document_id: str
+    body: dict[str, Any] | None = None
+
+
+@dataclass
+class VespaFeedResult:
+    num_operations: int = 0
+    num_throttled: int = 0
+    elapsed: float = 0.0
+    # document id -> error message of the first failed operation for that document
+    failed_document_ids: dict[str, str] = field(default_factory=dict)
+    # every document id which had at least one operation in the feed
+    document_ids: set[str] = field(default_factory=set)
+
+    @property
+    def succeeded_document_ids(self) -> set[str]:
+        return self.document_ids - self.failed_document_ids.keys()
+
+    def raise_for_failures(self, action: str) -> None:
+        if self.failed_document_ids:
+            raise VespaFeedError(action, self.failed_document_ids)
+
+
+class VespaFeedError(Exception):
+    def __init__(self, action: str, failed_document_ids: dict[str, str]) -> None:
+        self.failed_document_ids = failed_document_ids
+        examples = list(failed_document_ids.items())[:5]
+        super().__init__(
+            f"Failed to {action} {len(failed_document_ids)} document(s) in Vespa. "
+            f"Examples: {examples}"
+        )
+
+
+class AdaptiveInflightLimiter:
+    """Like a semaphore, but the number of permits shrinks when the server is
+    throttling us and slowly grows back (up to `max_inflight`) when it is not."""
+
+    def __init__(self, max_inflight: int) -> None:
+        self.max_inflight = max(max_inflight, 1)
+        self.limit = self.max_inflight
+        self._in_flight = 0
+        self._successes_since_change = 0
+        self._condition = asyncio.Condition()
+
+    async def acquire(self) -> None:
+        async with self._condition:
+            await self._condition.wait_for(lambda: self._in_flight < self.limit)
+            self._in_flight += 1
+
+    async def release(self) -> None:
+        async with self._condition:
+            self._in_flight -= 1
+            self._condition.notify_all()
+
+    def on_success(self) -> None:
+        self._successes_since_change += 1
+        if self._successes_since_change >= self.limit:
+            self._successes_since_change = 0
+            if self.limit < self.max_inflight:
+                self.limit += 1
+
+    def on_throttled(self) -> None:
+        self._successes_since_change = 0
+        self.limit = max(self.limit // 2, 1)
+
+
+def _retry_delay(attempt: int) -> float:
+    delay = min(_MIN_RETRY_DELAY * (2**attempt), _MAX_RETRY_DELAY)
+    # jitter so that throttled requests don't all come back at the same time
+    return delay * random.uniform(0.5, 1.0)
+
+
+async def _send_operation(
+    operation: VespaFeedOperation,
+    client: httpx.AsyncClient,
+    limiter: AdaptiveInflightLimiter,
+    result: VespaFeedResult,
+    max_retries: int,
+) -> None:
+    # serialize once, even if the operation ends up being retried
+    content = json.dumps(operation.body) if operation.body is not None else None
+
+    error_message = ""
+    for attempt in range(max_retries + 1):
+        if attempt > 0:
+            await asyncio.sleep(_retry_delay(attempt))
+
+        try:
+            response = await client.request(
+                operation.method,
+                operation.url,
+                content=content,
+                headers=_JSON_HEADERS if content is not None else None,
+            )
+        except httpx.TransportError as e:
+            error_message = f"{type(e).__name__}: {e}"
+            continue
+
+        if response.is_success:
+            limiter.on_success()
+            return
+
+        error_message = f"HTTP {response.status_code}: {response.text}"
+        if response.status_code in THROTTLED_STATUS_CODES:
+            result.num_throttled += 1
+            limiter.on_throttled()
+            if response.status_code == HTTPStatus.INSUFFICIENT_STORAGE:
+                logger.warning(
+                    "Vespa returned 507 Insufficient Storage, backing off. If this "
+                    "persists, allocate more memory or disk space to the "
+                    "Vespa/index container."
+                )
+            continue
+
+        if response.status_code < 500:
+            # the operation itself is bad, retrying won't help
+            break
+
+    logger.error(
+        f"Vespa feed operation failed: method={operation.method} "
+        f"url={operation.url} document_id={operation.document_id} "
+        f"error={error_message}"
+    )
+    result.failed_document_ids.setdefault(operation.document_id, error_message)
+
+
+async def afeed_vespa_operations(
+    operations: Iterable[VespaFeedOperation],
+    client: httpx.AsyncClient,
+    max_inflight: int = VESPA_FEED_MAX_INFLIGHT,
+    max_retries: int = VESPA_FEED_MAX_RETRIES,
+) -> VespaFeedResult:
+    """Sends all operations, returns once every operation has either succeeded or
+    exhausted its retries. `operations` is consumed lazily, so it can be a generator
+    and only ~`max_inflight` operations are materialized at a time.
+
+    NOTE: operations are sent concurrently, so there is no ordering between them.
+    If some operations must happen before others (e.g. deleting stale chunks before
+    writing new chunks with the same ids), use separate feeds."""
+    result = VespaFeedResult()
+    limiter = AdaptiveInflightLimiter(max_inflight)
+    tasks: set[asyncio.Task] = set()
+
+    async def _run(operation: VespaFeedOperation) -> None:
+        try:
+            await _send_operation(operation, client, limiter, result, max_retries)
+        except Exception as e:
+            logger.exception("Unexpected error in Vespa feed operation")
+            result.failed_document_ids.setdefault(operation.document_id, str(e))
+        finally:
+            await limiter.release()
+
+    start = time.monotonic()
+    for operation in operations:
+        result.num_operations += 1
+        result.document_ids.add(operation.document_id)
+
+        await limiter.acquire()
+        task = asyncio.create_task(_run(operation))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+
+    if tasks:
+        await asyncio.gather(*tasks)
+    result.elapsed = time.monotonic() - start
+
+    logger.debug(
+        f"Fed {result.num_operations} operations to Vespa in {result.elapsed:.2f}s: "
+        f"failed_documents={len(result.failed_document_ids)} "
+        f"throttled={result.num_throttled} final_inflight_limit={limiter.limit}"
+    )
+    return result
+
+
+class VespaFeedClientPool:
+    """Holds the process wide event loop which runs the sync feeds, and the feed
+    client bound to it. After a fork the child drops both and lazily creates its own,
+    the loop thread does not exist in the child."""
+
+    _loop: asyncio.AbstractEventLoop | None = None
+    _loop_thread: threading.Thread | None = None
+    _async_client: httpx.AsyncClient | None = None
+    _lock: threading.Lock = threading.Lock()
+
+    @classmethod
+    def get_loop(cls) -> asyncio.AbstractEventLoop:
+        with cls._lock:
+            if cls._loop is None or cls._loop_thread is None:
+                loop = asyncio.new_event_loop()
+                loop_thread = threading.Thread(
+                    target=loop.run_forever, name="vespa-feed-loop", daemon=True
+                )
+                loop_thread.start()
+                cls._loop = loop
+                cls._loop_thread = loop_thread
+            return cls._loop
+
+    @classmethod
+    def get_async(cls) -> httpx.AsyncClient:
+        """Must be called from the feed loop, the client is bound to it."""
+        if asyncio.get_running_loop() is not cls._loop:
+            raise RuntimeError("The Vespa feed client is only usable from its loop")
+
+        if cls._async_client is None or cls._async_client.is_closed:
+            cls._async_client = get_vespa_async_http_client(VESPA_FEED_MAX_CONNECTIONS)
+        return cls._async_client
+
+    @classmethod
+    def _reset_after_fork(cls) -> None:
+        # the lock may have been held by another thread at the time of the fork
+        cls._lock = threading.Lock()
+        cls._loop = None
+        cls._loop_thread = None
+        cls._async_client = None
+
+
+os.register_at_fork(after_in_child=VespaFeedClientPool._reset_after_fork)
+
+
+def feed_vespa_operations(
+    operations: Iterable[VespaFeedOperation],
+    max_inflight: int = VESPA_FEED_MAX_INFLIGHT,
+    max_retries: int = VESPA_FEED_MAX_RETRIES,
+    client_factory: Callable[[], httpx.AsyncClient] | None = None,
+) -> VespaFeedResult:
+    """Sync entrypoint, runs the feed on the process wide feed loop and blocks until
+    it is done. Can be called from any thread, also from one running an event loop
+    (which is blocked in the meantime). `client_factory` creates a client just for
+    this feed instead of using the shared one."""
+    loop = VespaFeedClientPool.get_loop()
+    try:
+        running_loop: asyncio.AbstractEventLoop | None = asyncio.get_running_loop()
+    except RuntimeError:
+        running_loop = None
+    if running_loop is loop:
+        # would wait on itself forever
+        raise RuntimeError(
+            "feed_vespa_operations can't be called from the feed loop, "
+            "await afeed_vespa_operations instead"
+        )
+
+    async def _feed() -> VespaFeedResult:
+        if client_factory is None:
+            return await afeed_vespa_operations(
+                operations,
+                VespaFeedClientPool.get_async(),
+                max_inflight=max_inflight,
+                max_retries=max_retries,
+            )
+
+        async with client_factory() as client:
+            return await afeed_vespa_operations(
+                operations,
+                client,
+                max_inflight=max_inflight,
+                max_retries=max_retries,
+            )
+
+    # run under the caller's context, e.g. so that the tenant id is still set
+    context = contextvars.copy_context()
+
+    async def _feed_in_caller_context() -> VespaFeedResult:
+        return await asyncio.create_task(_feed(), context=context)
+
+    return asyncio.run_coroutine_threadsafe(_feed_in_caller_context(), loop).result()
@@ -21,6 +21,8 @@ import requests  # type: ignore
 from retry import retry
 
 from onyx.agents.agent_search.shared_graph_utils.models import QueryExpansionType
+from onyx.configs.app_configs import ENABLE_VESPA_BULK_FEED
+from onyx.configs.app_configs import VESPA_HEX_TENSOR_CELL_TYPE
 from onyx.configs.chat_configs import DOC_TIME_DECAY
 from onyx.configs.chat_configs import NUM_RETURNED_HITS
 from onyx.configs.chat_configs import TITLE_CONTENT_RATIO
@@ -30,9 +32,13 @@ from onyx.context.search.models import IndexFilters
 from onyx.context.search.models import InferenceChunkUncleaned
 from onyx.db.enums import EmbeddingPrecision
 from onyx.document_index.document_index_utils import get_document_chunk_ids
+from onyx.document_index.interfaces import ChunkContextWindow
+from onyx.document_index.interfaces import ContextFetchClaims
 from onyx.document_index.interfaces import DocumentIndex
+from onyx.document_index.interfaces import DocumentIndexPartialFailureError
 from onyx.document_index.interfaces import DocumentInsertionRecord
 from onyx.document_index.interfaces import EnrichedDocumentIndexingInfo
+from onyx.document_index.interfaces import HybridRetrievalResult
 from onyx.document_index.interfaces import IndexBatchParams
 from onyx.document_index.interfaces import MinimalDocumentIndexingInfo
 from onyx.document_index.interfaces import UpdateRequest
@@ -40,17 +46,23 @@ from onyx.document_index.interfaces import VespaChunkRequest
 from onyx.document_index.interfaces import VespaDocumentFields
 from onyx.document_index.interfaces import VespaDocumentUserFields
 from onyx.document_index.vespa.chunk_retrieval import batch_search_api_retrieval
+from onyx.document_index.vespa.chunk_retrieval import build_context_chunk_requests
 from onyx.document_index.vespa.chunk_retrieval import (
     parallel_visit_api_retrieval,
 )
 from onyx.document_index.vespa.chunk_retrieval import query_vespa
 from onyx.document_index.vespa.deletion import delete_vespa_chunks
+from onyx.document_index.vespa.feed import feed_vespa_operations
+from onyx.document_index.vespa.feed import VespaFeedOperation
+from onyx.document_index.vespa.indexing_utils import _vespa_get_updated_at_attribute
 from onyx.document_index.vespa.indexing_utils import BaseHTTPXClientContext
 from onyx.document_index.vespa.indexing_utils import batch_index_vespa_chunks
+from onyx.document_index.vespa.indexing_utils import build_vespa_index_operations
 from onyx.document_index.vespa.indexing_utils import check_for_final_chunk_existence
 from onyx.document_index.vespa.indexing_utils import clean_chunk_id_copy
 from onyx.document_index.vespa.indexing_utils import GlobalHTTPXClientContext
 from onyx.document_index.vespa.indexing_utils import TemporaryHTTPXClientContext
+from onyx.document_index.vespa.shared_utils.utils import encode_hex_tensor
 from onyx.document_index.vespa.shared_utils.utils import get_vespa_http_client
 from onyx.document_index.vespa.shared_utils.utils import (
     replace_invalid_doc_id_characters,
@@ -62,6 +74,7 @@ from onyx.document_index.vespa_constants import ACCESS_CONTROL_LIST
 from onyx.document_index.vespa_constants import BATCH_SIZE
 from onyx.document_index.vespa_constants import BOOST
 from onyx.document_index.vespa_constants import CONTENT_SUMMARY
+from onyx.document_index.vespa_constants import DOC_UPDATED_AT
 from onyx.document_index.vespa_constants import DOCUMENT_ID_ENDPOINT
 from onyx.document_index.vespa_constants import DOCUMENT_SETS
 from onyx.document_index.vespa_constants import HIDDEN
@@ -138,10 +151,15 @@ class VespaIndex(DocumentIndex):
         secondary_large_chunks_enabled: bool | None,
         multitenant: bool = False,
         httpx_client: httpx.Client | None = None,
+        embedding_precision: EmbeddingPrecision | None = None,
     ) -> None:
         self.index_name = index_name
         self.secondary_index_name = secondary_index_name
 
+        # cell type of the embeddings of the (primary) index, if unknown the embeddings
+        # are always fed as JSON floats
+        self.embedding_precision = embedding_precision
+
         self.large_chunks_enabled = large_chunks_enabled
         self.secondary_large_chunks_enabled = secondary_large_chunks_enabled
 
@@ -181,6 +199,12 @@ class VespaIndex(DocumentIndex):
         deploy_url = f"{VESPA_APPLICATION_ENDPOINT}/tenant/default/prepareandactivate"
         logger.notice(f"Deploying Vespa application package to {deploy_url}")
 
+        # changing the type of a query input only touches the rank profiles, so switching
+        # the query tensor encoding (e.g. to bfloat16) needs no reindexing
+        query_embedding_cell_type = (
+            VESPA_HEX_TENSOR_CELL_TYPE or EmbeddingPrecision.FLOAT
+        )
+
         vespa_schema_path = os.path.join(
             os.getcwd(), "onyx", "document_index", "vespa", "app_config"
         )
@@ -238,6 +262,7 @@ class VespaIndex(DocumentIndex):
             schema_name=self.index_name,
             dim=primary_embedding_dim,
             embedding_precision=primary_embedding_precision.value,
+            query_embedding_cell_type=query_embedding_cell_type.value,
         )
 
         schema = add_ngrams_to_schema(schema) if needs_reindexing else schema
@@ -254,6 +279,7 @@ class VespaIndex(DocumentIndex):
                 schema_name=self.secondary_index_name,
                 dim=secondary_index_embedding_dim,
                 embedding_precision=secondary_index_embedding_precision.value,
+                query_embedding_cell_type=query_embedding_cell_type.value,
             )
 
             zip_dict[f"schemas/{schema_names[1]}.sd"] = upcoming_schema.encode("utf-8")
@@ -282,6 +308,10 @@ class VespaIndex(DocumentIndex):
         deploy_url = f"{VESPA_APPLICATION_ENDPOINT}/tenant/default/prepareandactivate"
         logger.info(f"Deploying Vespa application package to {deploy_url}")
 
+        query_embedding_cell_type = (
+            VESPA_HEX_TENSOR_CELL_TYPE or EmbeddingPrecision.FLOAT
+        )
+
         vespa_schema_path = os.path.join(
             os.getcwd(), "onyx", "document_index", "vespa", "app_config"
         )
@@ -350,6 +380,7 @@ class VespaIndex(DocumentIndex):
                 schema_name=index_name,
                 dim=embedding_dim,
                 embedding_precision=embedding_precision.value,
+                query_embedding_cell_type=query_embedding_cell_type.value,
             )
 
             schema = add_ngrams_to_schema(schema) if needs_reindexing else schema
@@ -365,6 +396,13 @@ class VespaIndex(DocumentIndex):
                 f"Failed to prepare Vespa Onyx Indexes. Response: {response.text}"
             )
 
+    @property
+    def _feed_hex_tensor_cell_type(self) -> EmbeddingPrecision | None:
+        # fed hex tensors are read with the cell type of the field, not the query's
+        if VESPA_HEX_TENSOR_CELL_TYPE is None:
+            return None
+        return self.embedding_precision
+
     def index(
         self,
         chunks: list[DocMetadataAwareIndexChunk],
@@ -420,41 +458,120 @@ class VespaIndex(DocumentIndex):
                 if cleaned_doc_info.chunk_end_index:
                     existing_docs.add(cleaned_doc_info.doc_id)
 
-            # Now, for each doc, we know exactly where to start and end our deletion
-            # So let's generate the chunk IDs for each chunk to delete
-            chunks_to_delete = get_document_chunk_ids(
-                enriched_document_info_list=enriched_doc_infos,
-                tenant_id=tenant_id,
-                large_chunks_enabled=large_chunks_enabled,
-            )
-
-            # Delete old Vespa documents
-            for doc_chunk_ids_batch in batch_generator(chunks_to_delete, BATCH_SIZE):
-                delete_vespa_chunks(
-                    doc_chunk_ids=doc_chunk_ids_batch,
-                    index_name=self.index_name,
-                    http_client=http_client,
-                    executor=executor,
+            if ENABLE_VESPA_BULK_FEED:
+                failed_document_ids = self._bulk_index(
+                    enriched_doc_infos=enriched_doc_infos,
+                    cleaned_chunks=cleaned_chunks,
+                    tenant_id=tenant_id,
+                    large_chunks_enabled=large_chunks_enabled,
+                    new_document_id_to_original_document_id=new_document_id_to_original_document_id,
                 )
-
-            for chunk_batch in batch_generator(cleaned_chunks, BATCH_SIZE):
-                batch_index_vespa_chunks(
-                    chunks=chunk_batch,
-                    index_name=self.index_name,
-                    http_client=http_client,
-                    multitenant=self.multitenant,
-                    executor=executor,
+            else:
+                # Now, for each doc, we know exactly where to start and end our deletion
+                # So let's generate the chunk IDs for each chunk to delete
+                chunks_to_delete = get_document_chunk_ids(
+                    enriched_document_info_list=enriched_doc_infos,
+                    tenant_id=tenant_id,
+                    large_chunks_enabled=large_chunks_enabled,
                 )
 
+                # Delete old Vespa documents
+                for doc_chunk_ids_batch in batch_generator(
+                    chunks_to_delete, BATCH_SIZE
+                ):
+                    delete_vespa_chunks(
+                        doc_chunk_ids=doc_chunk_ids_batch,
+                        index_name=self.index_name,
+                        http_client=http_client,
+                        executor=executor,
+                    )
+
+                for chunk_batch in batch_generator(cleaned_chunks, BATCH_SIZE):
+                    batch_index_vespa_chunks(
+                        chunks=chunk_batch,
+                        index_name=self.index_name,
+                        http_client=http_client,
+                        multitenant=self.multitenant,
+                        executor=executor,
+                        hex_tensor_cell_type=self._feed_hex_tensor_cell_type,
+                    )
+                failed_document_ids = {}
+
         all_cleaned_doc_ids = {chunk.source_document.id for chunk in cleaned_chunks}
 
-        return {
+        insertion_records = {
             DocumentInsertionRecord(
                 document_id=new_document_id_to_original_document_id[cleaned_doc_id],
                 already_existed=cleaned_doc_id in existing_docs,
             )
             for cleaned_doc_id in all_cleaned_doc_ids
         }
+        if failed_document_ids:
+            raise DocumentIndexPartialFailureError(
+                insertion_records={
+                    record
+                    for record in insertion_records
+                    if record.document_id not in failed_document_ids
+                },
+                failed_document_ids=failed_document_ids,
+            )
+
+        return insertion_records
+
+    def _bulk_index(
+        self,
+        enriched_doc_infos: list[EnrichedDocumentIndexingInfo],
+        cleaned_chunks: list[DocMetadataAwareIndexChunk],
+        tenant_id: str,
+        large_chunks_enabled: bool,
+        new_document_id_to_original_document_id: dict[str, str],
+    ) -> dict[str, str]:
+        """Bulk feed equivalent of the delete + write in `index`.
+        Returns the (original) ids of the documents which failed -> error message."""
+        document_url = DOCUMENT_ID_ENDPOINT.format(index_name=self.index_name)
+
+        # stale chunks must be gone before the new chunks are written, since a chunk
+        # of the new version can have the same id as a chunk of the old version
+        delete_result = feed_vespa_operations(
+            VespaFeedOperation(
+                method="DELETE",
+                url=f"{document_url}/{doc_chunk_id}",
+                document_id=new_document_id_to_original_document_id.get(
+                    doc_info.doc_id, doc_info.doc_id
+                ),
+            )
+            for doc_info in enriched_doc_infos
+            for doc_chunk_id in get_document_chunk_ids(
+                enriched_document_info_list=[doc_info],
+                tenant_id=tenant_id,
+                large_chunks_enabled=large_chunks_enabled,
+            )
+        )
+        failed_document_ids = dict(delete_result.failed_document_ids)
+
+        index_result = feed_vespa_operations(
+            build_vespa_index_operations(
+                chunks=(
+                    chunk
+                    for chunk in cleaned_chunks
+                    if new_document_id_to_original_document_id[chunk.source_document.id]
+                    not in failed_document_ids
+                ),
+                index_name=self.index_name,
+                multitenant=self.multitenant,
+                document_id_map=new_document_id_to_original_document_id,
+                hex_tensor_cell_type=self._feed_hex_tensor_cell_type,
+            )
+        )
+        failed_document_ids.update(index_result.failed_document_ids)
+
+        logger.debug(
+            f"Bulk fed {delete_result.num_operations} deletes in "
+            f"{delete_result.elapsed:.2f}s and {index_result.num_operations} chunks in "
+            f"{index_result.elapsed:.2f}s. Throttled "
+            f"{delete_result.num_throttled + index_result.num_throttled} times."
+        )
+        return failed_document_ids
 
     @classmethod
     def _apply_updates_batched(
@@ -577,8 +694,19 @@ class VespaIndex(DocumentIndex):
                         )
                     )
 
-        with self.httpx_client_context as httpx_client:
-            self._apply_updates_batched(processed_updates_requests, httpx_client)
+        if ENABLE_VESPA_BULK_FEED:
+            feed_vespa_operations(
+                VespaFeedOperation(
+                    method="PUT",
+                    url=update.url,
+                    document_id=update.document_id,
+                    body=update.update_request,
+                )
+                for update in processed_updates_requests
+            ).raise_for_failures("update")
+        else:
+            with self.httpx_client_context as httpx_client:
+                self._apply_updates_batched(processed_updates_requests, httpx_client)
         logger.debug(
             "Finished updating Vespa documents in %.2f seconds",
             time.monotonic() - update_start,
@@ -622,6 +750,11 @@ class VespaIndex(DocumentIndex):
             if fields.hidden is not None:
                 update_dict["fields"][HIDDEN] = {"assign": fields.hidden}
 
+            if fields.doc_updated_at is not None:
+                update_dict["fields"][DOC_UPDATED_AT] = {
+                    "assign": _vespa_get_updated_at_attribute(fields.doc_updated_at)
+                }
+
         if user_fields is not None:
             if user_fields.user_file_id is not None:
                 update_dict["fields"][USER_FILE] = {"assign": user_fields.user_file_id}
@@ -743,6 +876,19 @@ class VespaIndex(DocumentIndex):
                     large_chunks_enabled=large_chunks_enabled,
                 )
 
+                if ENABLE_VESPA_BULK_FEED:
+                    document_url = DOCUMENT_ID_ENDPOINT.format(index_name=index_name)
+                    feed_vespa_operations(
+                        VespaFeedOperation(
+                            method="DELETE",
+                            url=f"{document_url}/{doc_chunk_id}",
+                            document_id=doc_id,
+                        )
+                        for doc_chunk_id in chunks_to_delete
+                    ).raise_for_failures("delete")
+                    total_chunks_deleted += len(chunks_to_delete)
+                    continue
+
                 for doc_chunk_ids_batch in batch_generator(
                     chunks_to_delete, BATCH_SIZE
                 ):
@@ -802,6 +948,105 @@ class VespaIndex(DocumentIndex):
         offset: int = 0,
         title_content_ratio: float | None = TITLE_CONTENT_RATIO,
     ) -> list[InferenceChunkUncleaned]:
+        return query_vespa(
+            self._build_hybrid_query_params(
+                query=query,
+                query_embedding=query_embedding,
+                final_keywords=final_keywords,
+                filters=filters,
+                hybrid_alpha=hybrid_alpha,
+                time_decay_multiplier=time_decay_multiplier,
+                num_to_retrieve=num_to_retrieve,
+                ranking_profile_type=ranking_profile_type,
+                offset=offset,
+                title_content_ratio=title_content_ratio,
+            )
+        )
+
+    def hybrid_retrieval_with_context(
+        self,
+        query: str,
+        query_embedding: Embedding,
+        final_keywords: list[str] | None,
+        filters: IndexFilters,
+        hybrid_alpha: float,
+        time_decay_multiplier: float,
+        num_to_retrieve: int,
+        ranking_profile_type: QueryExpansionType,
+        offset: int = 0,
+        title_content_ratio: float | None = TITLE_CONTENT_RATIO,
+        context_window: ChunkContextWindow = ChunkContextWindow(),
+        context_claims: ContextFetchClaims | None = None,
+    ) -> HybridRetrievalResult:
+        # Vespa only returns documents matching the query, so the context can't come back
+        # in the search response itself. It is fetched right after, in one batched id
+        # based search, still inside the caller's (parallel) retrieval
+        top_chunks = self.hybrid_retrieval(
+            query=query,
+            query_embedding=query_embedding,
+            final_keywords=final_keywords,
+            filters=filters,
+            hybrid_alpha=hybrid_alpha,
+            time_decay_multiplier=time_decay_multiplier,
+            num_to_retrieve=num_to_retrieve,
+            ranking_profile_type=ranking_profile_type,
+            offset=offset,
+            title_content_ratio=title_content_ratio,
+        )
+
+        # hits also returned by another retrieval of the query are expanded only once
+        context_hits = (
+            context_claims.claim(top_chunks) if context_claims else top_chunks
+        )
+        chunk_requests = [
+            VespaChunkRequest(
+                document_id=replace_invalid_doc_id_characters(request.document_id),
+                min_chunk_ind=request.min_chunk_ind,
+                max_chunk_ind=request.max_chunk_ind,
+            )
+            for request in build_context_chunk_requests(context_hits, context_window)
+        ]
+        if not chunk_requests:
+            return HybridRetrievalResult(
+                top_chunks=top_chunks, context_chunks=[], context_hits=context_hits
+            )
+
+        try:
+            # the hits already passed the ACL, their context is always shown with them
+            context_chunks = batch_search_api_retrieval(
+                index_name=self.index_name,
+                chunk_requests=chunk_requests,
+                filters=IndexFilters(
+                    access_control_list=None, tenant_id=filters.tenant_id
+                ),
+                get_large_chunks=False,
+            )
+        except Exception:
+            logger.exception(
+                "Failed to fetch the context of the retrieved chunks, "
+                "it will be fetched separately"
+            )
+            return HybridRetrievalResult(top_chunks=top_chunks, context_chunks=None)
+
+        return HybridRetrievalResult(
+            top_chunks=top_chunks,
+            context_chunks=context_chunks,
+            context_hits=context_hits,
+        )
+
+    def _build_hybrid_query_params(
+        self,
+        query: str,
+        query_embedding: Embedding,
+        final_keywords: list[str] | None,
+        filters: IndexFilters,
+        hybrid_alpha: float,
+        time_decay_multiplier: float,
+        num_to_retrieve: int,
+        ranking_profile_type: QueryExpansionType,
+        offset: int,
+        title_content_ratio: float | None,
+    ) -> dict[str, str | int | float]:
         vespa_where_clauses = build_vespa_filters(filters)
         # Needs to be at least as much as the value set in Vespa schema config
         target_hits = max(10 * num_to_retrieve, 1000)
@@ -826,10 +1071,16 @@ class VespaIndex(DocumentIndex):
 
         logger.debug(f"Query YQL: {yql}")
 
+        query_embedding_cell_type = VESPA_HEX_TENSOR_CELL_TYPE
+
         params: dict[str, str | int | float] = {
             "yql": yql,
             "query": final_query,
-            "input.query(query_embedding)": str(query_embedding),
+            "input.query(query_embedding)": (
+                encode_hex_tensor(query_embedding, query_embedding_cell_type)
+                if query_embedding_cell_type
+                else str(query_embedding)
+            ),
             "input.query(decay_factor)": str(DOC_TIME_DECAY * time_decay_multiplier),
             "input.query(alpha)": hybrid_alpha,
             "input.query(title_content_ratio)": (
@@ -842,8 +1093,7 @@ class VespaIndex(DocumentIndex):
             "ranking.profile": ranking_profile,
             "timeout": VESPA_TIMEOUT,
         }
-
-        return query_vespa(params)
+        return params
 
     def admin_retrieval(
         self,
@@ -4,9 +4,12 @@ import uuid
 from abc import ABC
 from abc import abstractmethod
 from collections.abc import Callable
+from collections.abc import Iterable
+from collections.abc import Iterator
 from datetime import datetime
 from datetime import timezone
 from http import HTTPStatus
+from typing import Any
 
 import httpx
 from retry import retry
@@ -14,9 +17,12 @@ from retry import retry
 from onyx.connectors.cross_connector_utils.miscellaneous_utils import (
     get_experts_stores_representations,
 )
+from onyx.db.enums import EmbeddingPrecision
 from onyx.document_index.document_index_utils import get_uuid_from_chunk
 from onyx.document_index.document_index_utils import get_uuid_from_chunk_info_old
 from onyx.document_index.interfaces import MinimalDocumentIndexingInfo
+from onyx.document_index.vespa.feed import VespaFeedOperation
+from onyx.document_index.vespa.shared_utils.utils import encode_hex_tensor
 from onyx.document_index.vespa.shared_utils.utils import remove_invalid_unicode_chars
 from onyx.document_index.vespa.shared_utils.utils import (
     replace_invalid_doc_id_characters,
@@ -29,6 +35,7 @@ from onyx.document_index.vespa_constants import CHUNK_CONTEXT
 from onyx.document_index.vespa_constants import CHUNK_ID
 from onyx.document_index.vespa_constants import CONTENT
 from onyx.document_index.vespa_constants import CONTENT_SUMMARY
+from onyx.document_index.vespa_constants import CONTENT_TOKEN_COUNTS
 from onyx.document_index.vespa_constants import DOC_SUMMARY
 from onyx.document_index.vespa_constants import DOC_UPDATED_AT
 from onyx.document_index.vespa_constants import DOCUMENT_ID
@@ -126,22 +133,17 @@ def get_existing_documents_from_chunks(
     return document_ids
 
 
-@retry(tries=5, delay=1, backoff=2)
-def _index_vespa_chunk(
+def _build_vespa_chunk_fields(
     chunk: DocMetadataAwareIndexChunk,
-    index_name: str,
-    http_client: httpx.Client,
     multitenant: bool,
-) -> None:
-    json_header = {
-        "Content-Type": "application/json",
-    }
+    hex_tensor_cell_type: EmbeddingPrecision | None = None,
+) -> dict[str, Any]:
+    """`hex_tensor_cell_type` is the cell type of the embedding fields of the index, if
+    given the embeddings are sent in the (much smaller) hex form of that type"""
     document = chunk.source_document
 
     # No minichunk documents in vespa, minichunk vectors are stored in the chunk itself
 
-    vespa_chunk_id = str(get_uuid_from_chunk(chunk))
-
     embeddings = chunk.embeddings
 
     embeddings_name_vector_map = {"full_chunk": embeddings.full_embedding}
@@ -150,6 +152,20 @@ def _index_vespa_chunk(
         for ind, m_c_embed in enumerate(embeddings.mini_chunk_embeddings):
             embeddings_name_vector_map[f"mini_chunk_{ind}"] = m_c_embed
 
+    embeddings_field: dict[str, Any] = embeddings_name_vector_map
+    title_embedding_field: Any = chunk.title_embedding
+    if hex_tensor_cell_type is not None:
+        embeddings_field = {
+            "blocks": {
+                name: encode_hex_tensor(vector, hex_tensor_cell_type)
+                for name, vector in embeddings_name_vector_map.items()
+            }
+        }
+        if chunk.title_embedding is not None:
+            title_embedding_field = {
+                "values": encode_hex_tensor(chunk.title_embedding, hex_tensor_cell_type)
+            }
+
     title = document.get_title_for_document_index()
 
     metadata_json = document.metadata
@@ -184,6 +200,7 @@ def _index_vespa_chunk(
         # Note that it's not exactly the same as the actual content
         # which contains the title prefix and metadata suffix
         CONTENT_SUMMARY: remove_invalid_unicode_chars(chunk.content),
+        CONTENT_TOKEN_COUNTS: json.dumps(chunk.content_token_counts),
         SOURCE_TYPE: str(document.source.value),
         SOURCE_LINKS: json.dumps(chunk.source_links),
         SEMANTIC_IDENTIFIER: remove_invalid_unicode_chars(document.semantic_identifier),
@@ -195,8 +212,8 @@ def _index_vespa_chunk(
         METADATA_SUFFIX: remove_invalid_unicode_chars(chunk.metadata_suffix_keyword),
         CHUNK_CONTEXT: chunk.chunk_context,
         DOC_SUMMARY: chunk.doc_summary,
-        EMBEDDINGS: embeddings_name_vector_map,
-        TITLE_EMBEDDING: chunk.title_embedding,
+        EMBEDDINGS: embeddings_field,
+        TITLE_EMBEDDING: title_embedding_field,
         DOC_UPDATED_AT: _vespa_get_updated_at_attribute(document.doc_updated_at),
         PRIMARY_OWNERS: get_experts_stores_representations(document.primary_owners),
         SECONDARY_OWNERS: get_experts_stores_representations(document.secondary_owners),
@@ -216,6 +233,27 @@ def _index_vespa_chunk(
     if multitenant:
         if chunk.tenant_id:
             vespa_document_fields[TENANT_ID] = chunk.tenant_id
+
+    return vespa_document_fields
+
+
+@retry(tries=5, delay=1, backoff=2)
+def _index_vespa_chunk(
+    chunk: DocMetadataAwareIndexChunk,
+    index_name: str,
+    http_client: httpx.Client,
+    multitenant: bool,
+    hex_tensor_cell_type: EmbeddingPrecision | None = None,
+) -> None:
+    json_header = {
+        "Content-Type": "application/json",
+    }
+    document = chunk.source_document
+    vespa_chunk_id = str(get_uuid_from_chunk(chunk))
+    vespa_document_fields = _build_vespa_chunk_fields(
+        chunk, multitenant, hex_tensor_cell_type
+    )
+
     vespa_url = f"{DOCUMENT_ID_ENDPOINT.format(index_name=index_name)}/{vespa_chunk_id}"
     logger.debug(f'Indexing to URL "{vespa_url}"')
     res = http_client.post(
@@ -244,6 +282,7 @@ def batch_index_vespa_chunks(
     http_client: httpx.Client,
     multitenant: bool,
     executor: concurrent.futures.ThreadPoolExecutor | None = None,
+    hex_tensor_cell_type: EmbeddingPrecision | None = None,
 ) -> None:
     external_executor = True
 
@@ -254,7 +293,12 @@ def batch_index_vespa_chunks(
     try:
         chunk_index_future = {
             executor.submit(
-                _index_vespa_chunk, chunk, index_name, http_client, multitenant
+                _index_vespa_chunk,
+                chunk,
+                index_name,
+                http_client,
+                multitenant,
+                hex_tensor_cell_type,
             ): chunk
             for chunk in chunks
         }
@@ -267,6 +311,35 @@ def batch_index_vespa_chunks(
             executor.shutdown(wait=True)
 
 
+def build_vespa_index_operations(
+    chunks: Iterable[DocMetadataAwareIndexChunk],
+    index_name: str,
+    multitenant: bool,
+    document_id_map: dict[str, str] | None = None,
+    hex_tensor_cell_type: EmbeddingPrecision | None = None,
+) -> Iterator[VespaFeedOperation]:
+    """Lazily builds the bulk feed operations for the given chunks.
+
+    `document_id_map` maps the (cleaned) document ids of the chunks to the ids that
+    failures should be reported under."""
+    for chunk in chunks:
+        document_id = chunk.source_document.id
+        yield VespaFeedOperation(
+            method="POST",
+            url=f"{DOCUMENT_ID_ENDPOINT.format(index_name=index_name)}/{get_uuid_from_chunk(chunk)}",
+            document_id=(
+                document_id_map.get(document_id, document_id)
+                if document_id_map
+                else document_id
+            ),
+            body={
+                "fields": _build_vespa_chunk_fields(
+                    chunk, multitenant, hex_tensor_cell_type
+                )
+            },
+        )
+
+
 def clean_chunk_id_copy(
     chunk: DocMetadataAwareIndexChunk,
 ) -> DocMetadataAwareIndexChunk:
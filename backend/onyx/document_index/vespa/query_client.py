@@ -0,0 +1,177 @@
+"""Process wide, pooled HTTP clients for the Vespa query path (search / visit).
+
+`get_vespa_http_client()` creates a new client, and with it a new connection, for
+every request. Searches are latency sensitive and a single chat turn runs several of
+them in parallel, so paying for a TCP / TLS / HTTP2 handshake each time adds up. These
+clients are created once per process and keep their connections alive.
+
+Like `HttpxPool` (used by the celery workers) the clients are shared between threads.
+After a fork the child drops the clients inherited from the parent and lazily creates
+its own, the connections belong to the parent. The async client is bound to the event
+loop it was created on and is recreated if used from another one.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from typing import Any
+from typing import cast
+
+import httpx
+from prometheus_client import Counter
+from prometheus_client import Histogram
+
+from onyx.configs.app_configs import MANAGED_VESPA
+from onyx.configs.app_configs import VESPA_CLOUD_CERT_PATH
+from onyx.configs.app_configs import VESPA_CLOUD_KEY_PATH
+from onyx.configs.app_configs import VESPA_QUERY_KEEPALIVE_EXPIRY
+from onyx.configs.app_configs import VESPA_QUERY_MAX_CONNECTIONS
+from onyx.configs.app_configs import VESPA_QUERY_MAX_KEEPALIVE_CONNECTIONS
+from onyx.configs.app_configs import VESPA_REQUEST_TIMEOUT
+
+vespa_query_latency = Histogram(
+    "onyx_vespa_query_latency_seconds",
+    "Latency of search / visit requests against Vespa",
+    ["operation", "client"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 15),
+)
+vespa_query_connections = Counter(
+    "onyx_vespa_query_connections_total",
+    "Search / visit requests against Vespa by whether they had to open a connection",
+    ["connection"],
+)
+
+# emitted by httpcore whenever a request has to open a new connection
+_CONNECT_TRACE_EVENTS = (
+    "connection.connect_tcp.started",
+    "connection.connect_unix_socket.started",
+)
+
+
+def _client_kwargs() -> dict[str, Any]:
+    return dict(
+        cert=(
+            cast(tuple[str, str], (VESPA_CLOUD_CERT_PATH, VESPA_CLOUD_KEY_PATH))
+            if MANAGED_VESPA
+            else None
+        ),
+        verify=False if not MANAGED_VESPA else True,
+        timeout=VESPA_REQUEST_TIMEOUT,
+        http2=True,
+        limits=httpx.Limits(
+            max_connections=VESPA_QUERY_MAX_CONNECTIONS,
+            max_keepalive_connections=VESPA_QUERY_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=VESPA_QUERY_KEEPALIVE_EXPIRY,
+        ),
+    )
+
+
+class VespaQueryClientPool:
+    """Holds the process wide sync and async query clients."""
+
+    _client: httpx.Client | None = None
+    _async_client: httpx.AsyncClient | None = None
+    _async_client_loop: asyncio.AbstractEventLoop | None = None
+    _lock: threading.Lock = threading.Lock()
+
+    @classmethod
+    def get(cls) -> httpx.Client:
+        with cls._lock:
+            if cls._client is None or cls._client.is_closed:
+                cls._client = httpx.Client(**_client_kwargs())
+            return cls._client
+
+    @classmethod
+    def get_async(cls) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        with cls._lock:
+            if (
+                cls._async_client is None
+                or cls._async_client.is_closed
+                or cls._async_client_loop is not loop
+            ):
+                cls._async_client = httpx.AsyncClient(**_client_kwargs())
+                cls._async_client_loop = loop
+            return cls._async_client
+
+    @classmethod
+    def close(cls) -> None:
+        with cls._lock:
+            client = cls._client
+            cls._client = None
+        if client is not None:
+            client.close()
+
+    @classmethod
+    async def aclose(cls) -> None:
+        with cls._lock:
+            async_client = cls._async_client
+            async_client_loop = cls._async_client_loop
+            cls._async_client = None
+            cls._async_client_loop = None
+        # connections of a client from another (likely closed) loop can't be closed
+        if async_client is not None and async_client_loop is asyncio.get_running_loop():
+            await async_client.aclose()
+
+    @classmethod
+    def _reset_after_fork(cls) -> None:
+        # the lock may have been held by another thread at the time of the fork
+        cls._lock = threading.Lock()
+        cls._client = None
+        cls._async_client = None
+        cls._async_client_loop = None
+
+
+os.register_at_fork(after_in_child=VespaQueryClientPool._reset_after_fork)
+
+
+def _record_request(
+    operation: str, client: str, start_time: float, opened_connection: bool
+) -> None:
+    vespa_query_latency.labels(operation=operation, client=client).observe(
+        time.monotonic() - start_time
+    )
+    vespa_query_connections.labels(
+        connection="new" if opened_connection else "reused"
+    ).inc()
+
+
+def vespa_query_request(
+    method: str, url: str, operation: str, **kwargs: Any
+) -> httpx.Response:
+    """Sends a request through the pooled client. `operation` labels the metrics."""
+    opened_connection = False
+
+    def _trace(event_name: str, info: dict[str, Any]) -> None:
+        nonlocal opened_connection
+        if event_name in _CONNECT_TRACE_EVENTS:
+            opened_connection = True
+
+    start_time = time.monotonic()
+    try:
+        return VespaQueryClientPool.get().request(
+            method, url, extensions={"trace": _trace}, **kwargs
+        )
+    finally:
+        _record_request(operation, "sync", start_time, opened_connection)
+
+
+async def async_vespa_query_request(
+    method: str, url: str, operation: str, **kwargs: Any
+) -> httpx.Response:
+    """Async equivalent of `vespa_query_request`."""
+    opened_connection = False
+
+    async def _trace(event_name: str, info: dict[str, Any]) -> None:
+        nonlocal opened_connection
+        if event_name in _CONNECT_TRACE_EVENTS:
+            opened_connection = True
+
+    start_time = time.monotonic()
+    try:
+        return await VespaQueryClientPool.get_async().request(
+            method, url, extensions={"trace": _trace}, **kwargs
+        )
+    finally:
+        _record_request(operation, "async", start_time, opened_connection)
@@ -3,11 +3,13 @@ import time
 from typing import cast
 
 import httpx
+import numpy as np
 
 from onyx.configs.app_configs import MANAGED_VESPA
 from onyx.configs.app_configs import VESPA_CLOUD_CERT_PATH
 from onyx.configs.app_configs import VESPA_CLOUD_KEY_PATH
 from onyx.configs.app_configs import VESPA_REQUEST_TIMEOUT
+from onyx.db.enums import EmbeddingPrecision
 from onyx.document_index.vespa_constants import VESPA_APP_CONTAINER_URL
 from onyx.utils.logger import setup_logger
 
@@ -53,13 +55,30 @@ def replace_invalid_doc_id_characters(text: str) -> str:
     return text.replace("'", "_")
 
 
+_ILLEGAL_XML_CHARS_RE: re.Pattern = re.compile(
+    "[\x00-\x08\x0b\x0c\x0e-\x1f\ud800-\udfff\ufdd0-\ufdef\ufffe\uffff]"
+)
+
+
 def remove_invalid_unicode_chars(text: str) -> str:
     """Vespa does not take in unicode chars that aren't valid for XML.
     This removes them."""
-    _illegal_xml_chars_RE: re.Pattern = re.compile(
-        "[\x00-\x08\x0b\x0c\x0e-\x1f\ud800-\udfff\ufdd0-\ufdef\ufffe\uffff]"
-    )
-    return _illegal_xml_chars_RE.sub("", text)
+    return _ILLEGAL_XML_CHARS_RE.sub("", text)
+
+
+def encode_hex_tensor(values: list[float], cell_type: EmbeddingPrecision) -> str:
+    """Encodes the cells of a dense tensor in Vespa's hex form, big endian IEEE 754
+    floats. bfloat16 cells are the upper halves of the float32s, rounded to nearest even.
+
+    Vespa reads the hex string with the cell type of the field / query input it is given
+    for, so `cell_type` has to match that type."""
+    float32_values = np.asarray(values, dtype=np.float32)
+    if cell_type == EmbeddingPrecision.FLOAT:
+        return float32_values.astype(">f4").tobytes().hex().upper()
+
+    bits = float32_values.view(np.uint32).astype(np.uint64)
+    rounded = (bits + 0x7FFF + ((bits >> 16) & 1)) >> 16
+    return rounded.astype(">u2").tobytes().hex().upper()
 
 
 def get_vespa_http_client(no_timeout: bool = False, http2: bool = True) -> httpx.Client:
@@ -80,6 +99,26 @@ def get_vespa_http_client(no_timeout: bool = False, http2: bool = True) -> httpx
     )
 
 
+def get_vespa_async_http_client(max_connections: int) -> httpx.AsyncClient:
+    """Async equivalent of `get_vespa_http_client`, used for bulk feeding. Requests
+    are multiplexed over at most `max_connections` HTTP/2 connections."""
+
+    return httpx.AsyncClient(
+        cert=(
+            cast(tuple[str, str], (VESPA_CLOUD_CERT_PATH, VESPA_CLOUD_KEY_PATH))
+            if MANAGED_VESPA
+            else None
+        ),
+        verify=False if not MANAGED_VESPA else True,
+        timeout=VESPA_REQUEST_TIMEOUT,
+        http2=True,
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+        ),
+    )
+
+
 def wait_for_vespa_with_timeout(wait_interval: int = 5, wait_limit: int = 60) -> bool:
     """Waits for Vespa to become ready subject to a timeout.
     Returns True if Vespa is ready, False otherwise."""
@@ -61,6 +61,7 @@ METADATA_LIST = "metadata_list"
 METADATA_SUFFIX = "metadata_suffix"
 DOC_SUMMARY = "doc_summary"
 CHUNK_CONTEXT = "chunk_context"
+CONTENT_TOKEN_COUNTS = "content_token_counts"
 BOOST = "boost"
 AGGREGATED_CHUNK_BOOST_FACTOR = "aggregated_chunk_boost_factor"
 DOC_UPDATED_AT = "doc_updated_at"  # Indexed as seconds since epoch
@@ -98,6 +99,7 @@ YQL_BASE = (
     f"{METADATA_SUFFIX}, "
     f"{DOC_SUMMARY}, "
     f"{CHUNK_CONTEXT}, "
+    f"{CONTENT_TOKEN_COUNTS}, "
     f"{CONTENT_SUMMARY} "
     f"from {{index_name}} where "
 )
@@ -0,0 +1,153 @@
+"""Fingerprints used to re-index only the chunks of a document which actually changed.
+
+Chunk ids in the document index are deterministic (document id + position), so a
+chunk whose fingerprint (which includes its position) was stored the last time the
+document was indexed is already in the index exactly as it would be written now.
+Only those chunks' access / metadata fields need to be refreshed.
+
+Everything which is written into every chunk of a document (title, metadata, owners,
+the chunker / index settings) goes into the document fingerprint, which is folded into
+every chunk fingerprint. Changing any of it therefore rewrites the whole document.
+`doc_updated_at` is deliberately left out, it is refreshed through a partial update.
+"""
+
+import hashlib
+import json
+from collections.abc import Sequence
+
+from pydantic import BaseModel
+
+from onyx.connectors.models import IndexingDocument
+from onyx.connectors.models import Section
+from onyx.indexing.chunker import Chunker
+from onyx.indexing.models import DocAwareChunk
+
+# bump to invalidate all stored fingerprints, e.g. if the chunk fields written to the
+# document index change
+_FINGERPRINT_VERSION = "1"
+
+
+class DocumentChunkDiff(BaseModel):
+    """Result of comparing a document's freshly produced chunks with the fingerprints
+    stored from the last time it was indexed."""
+
+    document_id: str
+    content_fingerprint: str
+    # fingerprints of every chunk of the document, changed or not
+    chunk_fingerprints: list[str]
+    changed_chunks: list[DocAwareChunk]
+    unchanged_chunks: list[DocAwareChunk]
+    # if the sections were unchanged the document is not re-chunked at all, so the
+    # unchanged chunks are only known by count
+    rechunked: bool
+    num_unchanged_chunks: int
+
+
+def _hash(parts: Sequence[str | None]) -> str:
+    hasher = hashlib.sha256()
+    for part in parts:
+        # length prefixed so that moving text between parts changes the hash
+        encoded = (part if part is not None else "\0").encode("utf-8")
+        hasher.update(len(encoded).to_bytes(8, "little"))
+        hasher.update(encoded)
+    return hasher.hexdigest()
+
+
+def build_document_fingerprint(
+    document: IndexingDocument, chunker: Chunker, index_name: str
+) -> str:
+    owners = [
+        json.dumps(
+            [owner.model_dump(mode="json") for owner in owner_list or []],
+            sort_keys=True,
+        )
+        for owner_list in (document.primary_owners, document.secondary_owners)
+    ]
+    return _hash(
+        [
+            _FINGERPRINT_VERSION,
+            index_name,
+            str(chunker.chunk_token_limit),
+            str(chunker.include_metadata),
+            str(chunker.enable_multipass),
+            str(chunker.enable_large_chunks),
+            str(document.source.value),
+            document.semantic_identifier,
+            document.get_title_for_document_index(),
+            json.dumps(document.metadata, sort_keys=True),
+            *owners,
+        ]
+    )
+
+
+def build_section_fingerprint(section: Section) -> str:
+    return _hash([section.text, section.link, section.image_file_name])
+
+
+def build_content_fingerprint(
+    document_fingerprint: str, document: IndexingDocument
+) -> str:
+    """If this is unchanged, chunking the document would produce the exact same
+    chunks as last time."""
+    return _hash(
+        [
+            document_fingerprint,
+            *(
+                build_section_fingerprint(section)
+                for section in document.processed_sections
+            ),
+        ]
+    )
+
+
+def build_chunk_fingerprint(document_fingerprint: str, chunk: DocAwareChunk) -> str:
+    return _hash(
+        [
+            document_fingerprint,
+            str(chunk.chunk_id),
+            str(chunk.large_chunk_id),
+            json.dumps(chunk.large_chunk_reference_ids),
+            chunk.blurb,
+            chunk.content,
+            chunk.title_prefix,
+            chunk.metadata_suffix_semantic,
+            chunk.metadata_suffix_keyword,
+            json.dumps(chunk.mini_chunk_texts),
+            json.dumps(chunk.source_links, sort_keys=True),
+            chunk.image_file_name,
+            str(chunk.section_continuation),
+        ]
+    )
+
+
+def diff_document_chunks(
+    document_id: str,
+    content_fingerprint: str,
+    document_fingerprint: str,
+    chunks: list[DocAwareChunk],
+    stored_chunk_fingerprints: list[str] | None,
+) -> DocumentChunkDiff:
+    """Splits the chunks of a single (re-chunked) document into the ones which need
+    to be embedded and written and the ones already in the document index."""
+    stored = set(stored_chunk_fingerprints or [])
+
+    chunk_fingerprints: list[str] = []
+    changed_chunks: list[DocAwareChunk] = []
+    unchanged_chunks: list[DocAwareChunk] = []
+    for chunk in chunks:
+        fingerprint = build_chunk_fingerprint(document_fingerprint, chunk)
+        chunk_fingerprints.append(fingerprint)
+        if fingerprint in stored:
+            unchanged_chunks.append(chunk)
+        else:
+            changed_chunks.append(chunk)
+
+    return DocumentChunkDiff(
+        document_id=document_id,
+        content_fingerprint=content_fingerprint,
+        chunk_fingerprints=chunk_fingerprints,
+        changed_chunks=changed_chunks,
+        unchanged_chunks=unchanged_chunks,
+        rechunked=True,
+        num_unchanged_chunks=len(unchanged_chunks),
+    )
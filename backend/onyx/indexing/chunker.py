@@ -16,6 +16,8 @@ from onyx.connectors.models import IndexingDocument
 from onyx.connectors.models import Section
 from onyx.indexing.indexing_heartbeat import IndexingHeartbeatInterface
 from onyx.indexing.models import DocAwareChunk
+from onyx.indexing.text_splitter import SentenceTokenSplitter
+from onyx.indexing.text_splitter import TokenizedText
 from onyx.llm.utils import MAX_CONTEXT_TOKENS
 from onyx.natural_language_processing.utils import BaseTokenizer
 from onyx.utils.logger import setup_logger
@@ -135,9 +137,6 @@ class Chunker:
         mini_chunk_size: int = MINI_CHUNK_SIZE,
         callback: IndexingHeartbeatInterface | None = None,
     ) -> None:
-        # importing llama_index uses a lot of RAM, so we only import it when needed.
-        from llama_index.core.node_parser import SentenceSplitter
-
         self.include_metadata = include_metadata
         self.chunk_token_limit = chunk_token_limit
         self.enable_multipass = enable_multipass
@@ -156,21 +155,22 @@ class Chunker:
         self.max_context = 0
         self.prompt_tokens = 0
 
-        self.blurb_splitter = SentenceSplitter(
-            tokenizer=tokenizer.tokenize,
+        # every section is tokenized once, chunks / blurbs / mini chunks and all token
+        # counts are derived from the token offsets of that single pass
+        self.section_separator = TokenizedText.from_text(SECTION_SEPARATOR, tokenizer)
+
+        self.blurb_splitter = SentenceTokenSplitter(
             chunk_size=blurb_size,
             chunk_overlap=0,
         )
 
-        self.chunk_splitter = SentenceSplitter(
-            tokenizer=tokenizer.tokenize,
+        self.chunk_splitter = SentenceTokenSplitter(
             chunk_size=chunk_token_limit,
             chunk_overlap=chunk_overlap,
         )
 
         self.mini_chunk_splitter = (
-            SentenceSplitter(
-                tokenizer=tokenizer.tokenize,
+            SentenceTokenSplitter(
                 chunk_size=mini_chunk_size,
                 chunk_overlap=0,
             )
@@ -195,20 +195,20 @@ class Chunker:
             start = end
         return chunks
 
-    def _extract_blurb(self, text: str) -> str:
+    def _extract_blurb(self, text: TokenizedText) -> str:
         """
         Extract a short blurb from the text (first chunk of size `blurb_size`).
         """
-        texts = self.blurb_splitter.split_text(text)
+        texts = self.blurb_splitter.split_text(text, max_chunks=1)
         if not texts:
             return ""
         return texts[0]
 
-    def _get_mini_chunk_texts(self, chunk_text: str) -> list[str] | None:
+    def _get_mini_chunk_texts(self, chunk_text: TokenizedText) -> list[str] | None:
         """
         For "multipass" mode: additional sub-chunks (mini-chunks) for use in certain embeddings.
         """
-        if self.mini_chunk_splitter and chunk_text.strip():
+        if self.mini_chunk_splitter and chunk_text.text.strip():
             return self.mini_chunk_splitter.split_text(chunk_text)
         return None
 
@@ -217,7 +217,7 @@ class Chunker:
         self,
         document: IndexingDocument,
         chunks_list: list[DocAwareChunk],
-        text: str,
+        text: TokenizedText,
         links: dict[int, str],
         is_continuation: bool = False,
         title_prefix: str = "",
@@ -232,7 +232,7 @@ class Chunker:
             source_document=document,
             chunk_id=len(chunks_list),
             blurb=self._extract_blurb(text),
-            content=text,
+            content=text.text,
             source_links=links or {0: ""},
             image_file_name=image_file_name,
             section_continuation=is_continuation,
@@ -262,16 +262,18 @@ class Chunker:
         """
         chunks: list[DocAwareChunk] = []
         link_offsets: dict[int, str] = {}
-        chunk_text = ""
+        chunk_text = TokenizedText(text="", token_starts=[])
 
         for section_idx, section in enumerate(sections):
             # Get section text and other attributes
-            section_text = clean_text(str(section.text or ""))
+            section_text = TokenizedText.from_text(
+                clean_text(str(section.text or "")), self.tokenizer
+            )
             section_link_text = section.link or ""
             image_url = section.image_file_name
 
             # If there is no useful content, skip
-            if not section_text and (not document.title or section_idx > 0):
+            if not section_text.text and (not document.title or section_idx > 0):
                 logger.warning(
                     f"Skipping empty or irrelevant section in doc "
                     f"{document.semantic_identifier}, link={section_link_text}"
@@ -281,7 +283,7 @@ class Chunker:
             # CASE 1: If this section has an image, force a separate chunk
             if image_url:
                 # First, if we have any partially built text chunk, finalize it
-                if chunk_text.strip():
+                if chunk_text.text.strip():
                     self._create_chunk(
                         document,
                         chunks,
@@ -292,7 +294,7 @@ class Chunker:
                         metadata_suffix_semantic=metadata_suffix_semantic,
                         metadata_suffix_keyword=metadata_suffix_keyword,
                     )
-                    chunk_text = ""
+                    chunk_text = TokenizedText(text="", token_starts=[])
                     link_offsets = {}
 
                 # Create a chunk specifically for this image section
@@ -311,11 +313,11 @@ class Chunker:
                 continue
 
             # CASE 2: Normal text section
-            section_token_count = len(self.tokenizer.encode(section_text))
+            section_token_count = section_text.count_tokens()
 
             # If the section is large on its own, split it separately
             if section_token_count > content_token_limit:
-                if chunk_text.strip():
+                if chunk_text.text.strip():
                     self._create_chunk(
                         document,
                         chunks,
@@ -326,24 +328,24 @@ class Chunker:
                         metadata_suffix_semantic,
                         metadata_suffix_keyword,
                     )
-                    chunk_text = ""
+                    chunk_text = TokenizedText(text="", token_starts=[])
                     link_offsets = {}
 
-                split_texts = self.chunk_splitter.split_text(section_text)
+                split_texts = self.chunk_splitter.split(section_text)
                 for i, split_text in enumerate(split_texts):
                     # If even the split_text is bigger than strict limit, further split
                     if (
                         STRICT_CHUNK_TOKEN_LIMIT
-                        and len(self.tokenizer.encode(split_text)) > content_token_limit
+                        and split_text.count_tokens() > content_token_limit
                     ):
                         smaller_chunks = self._split_oversized_chunk(
-                            split_text, content_token_limit
+                            split_text.text, content_token_limit
                         )
                         for j, small_chunk in enumerate(smaller_chunks):
                             self._create_chunk(
                                 document,
                                 chunks,
-                                small_chunk,
+                                TokenizedText.from_text(small_chunk, self.tokenizer),
                                 {0: section_link_text},
                                 is_continuation=(j != 0),
                                 title_prefix=title_prefix,
@@ -364,16 +366,20 @@ class Chunker:
                 continue
 
             # If we can still fit this section into the current chunk, do so
-            current_token_count = len(self.tokenizer.encode(chunk_text))
-            current_offset = len(shared_precompare_cleanup(chunk_text))
+            current_token_count = chunk_text.count_tokens()
+            current_offset = len(shared_precompare_cleanup(chunk_text.text))
             next_section_tokens = (
-                len(self.tokenizer.encode(SECTION_SEPARATOR)) + section_token_count
+                self.section_separator.count_tokens() + section_token_count
             )
 
             if next_section_tokens + current_token_count <= content_token_limit:
-                if chunk_text:
-                    chunk_text += SECTION_SEPARATOR
-                chunk_text += section_text
+                chunk_text = (
+                    TokenizedText.join(
+                        self.section_separator, [chunk_text, section_text]
+                    )
+                    if chunk_text.text
+                    else section_text
+                )
                 link_offsets[current_offset] = section_link_text
             else:
                 # finalize the existing chunk
@@ -392,7 +398,7 @@ class Chunker:
                 chunk_text = section_text
 
         # finalize any leftover text chunk
-        if chunk_text.strip() or not chunks:
+        if chunk_text.text.strip() or not chunks:
             self._create_chunk(
                 document,
                 chunks,
@@ -413,7 +419,11 @@ class Chunker:
             logger.debug(f"Chunking {document.semantic_identifier}")
 
         # Title prep
-        title = self._extract_blurb(document.get_title_for_document_index() or "")
+        title = self._extract_blurb(
+            TokenizedText.from_text(
+                document.get_title_for_document_index() or "", self.tokenizer
+            )
+        )
         title_prefix = title + RETURN_SEPARATOR if title else ""
         title_tokens = len(self.tokenizer.encode(title_prefix))
 
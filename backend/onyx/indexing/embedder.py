@@ -2,7 +2,10 @@ import time
 from abc import ABC
 from abc import abstractmethod
 from collections import defaultdict
+from typing import cast
 
+from onyx.configs.app_configs import LARGE_CHUNK_RATIO
+from onyx.configs.model_configs import DOC_EMBEDDING_CONTEXT_SIZE
 from onyx.connectors.models import ConnectorFailure
 from onyx.connectors.models import DocumentFailure
 from onyx.db.models import SearchSettings
@@ -10,6 +13,14 @@ from onyx.indexing.indexing_heartbeat import IndexingHeartbeatInterface
 from onyx.indexing.models import ChunkEmbedding
 from onyx.indexing.models import DocAwareChunk
 from onyx.indexing.models import IndexChunk
+from onyx.natural_language_processing.embedding_cache import (
+    build_embedding_cache_key,
+)
+from onyx.natural_language_processing.embedding_cache import (
+    build_embedding_cache_namespace,
+)
+from onyx.natural_language_processing.embedding_cache import EmbeddingCache
+from onyx.natural_language_processing.embedding_cache import get_embedding_cache
 from onyx.natural_language_processing.search_nlp_models import EmbeddingModel
 from onyx.utils.logger import setup_logger
 from onyx.utils.timing import log_function_time
@@ -50,6 +61,7 @@ class IndexingEmbedder(ABC):
         self.api_url = api_url
         self.api_version = api_version
         self.deployment_name = deployment_name
+        self.reduced_dimension = reduced_dimension
 
         self.embedding_model = EmbeddingModel(
             model_name=model_name,
@@ -93,6 +105,7 @@ class DefaultIndexingEmbedder(IndexingEmbedder):
         deployment_name: str | None = None,
         reduced_dimension: int | None = None,
         callback: IndexingHeartbeatInterface | None = None,
+        embedding_cache: EmbeddingCache | None = None,
     ):
         super().__init__(
             model_name,
@@ -107,6 +120,59 @@ class DefaultIndexingEmbedder(IndexingEmbedder):
             reduced_dimension,
             callback,
         )
+        self.embedding_cache = embedding_cache
+
+    def _encode_passages_with_cache(
+        self,
+        embedding_cache: EmbeddingCache,
+        texts: list[str],
+        large_chunks_present: bool = False,
+        tenant_id: str | None = None,
+        request_id: str | None = None,
+    ) -> list[Embedding]:
+        """Embeds the texts, only sending the ones not found in the embedding cache
+        to the model server."""
+        namespace = build_embedding_cache_namespace(
+            model_name=self.model_name,
+            provider_type=self.provider_type,
+            deployment_name=self.deployment_name,
+            normalize=self.normalize,
+            prefix=self.passage_prefix,
+            reduced_dimension=self.reduced_dimension,
+            text_type=EmbedTextType.PASSAGE,
+            # determines how the texts are trimmed before embedding
+            max_seq_length=DOC_EMBEDDING_CONTEXT_SIZE
+            * (LARGE_CHUNK_RATIO if large_chunks_present else 1),
+        )
+        keys = [build_embedding_cache_key(namespace, text) for text in texts]
+        embeddings = embedding_cache.get_many(keys)
+
+        # identical texts (e.g. repeated boilerplate) only need to be embedded once
+        key_to_missing_text: dict[str, str] = {
+            key: text
+            for key, text, embedding in zip(keys, texts, embeddings)
+            if embedding is None
+        }
+        if key_to_missing_text:
+            new_embeddings = self.embedding_model.encode(
+                texts=list(key_to_missing_text.values()),
+                text_type=EmbedTextType.PASSAGE,
+                large_chunks_present=large_chunks_present,
+                tenant_id=tenant_id,
+                request_id=request_id,
+            )
+            key_to_new_embedding = dict(zip(key_to_missing_text, new_embeddings))
+            embedding_cache.put_many(key_to_new_embedding)
+            embeddings = [
+                embedding if embedding is not None else key_to_new_embedding[key]
+                for key, embedding in zip(keys, embeddings)
+            ]
+
+        logger.debug(
+            f"Embedding cache: {len(texts) - len(key_to_missing_text)} of {len(texts)} "
+            f"texts cached. Totals: {embedding_cache.stats}"
+        )
+        return cast(list[Embedding], embeddings)
 
     @log_function_time()
     def embed_chunks(
@@ -143,12 +209,22 @@ class DefaultIndexingEmbedder(IndexingEmbedder):
                     raise RuntimeError("Large chunk contains mini chunks")
                 flat_chunk_texts.extend(chunk.mini_chunk_texts)
 
-        embeddings = self.embedding_model.encode(
-            texts=flat_chunk_texts,
-            text_type=EmbedTextType.PASSAGE,
-            large_chunks_present=large_chunks_present,
-            tenant_id=tenant_id,
-            request_id=request_id,
+        embeddings = (
+            self._encode_passages_with_cache(
+                self.embedding_cache,
+                texts=flat_chunk_texts,
+                large_chunks_present=large_chunks_present,
+                tenant_id=tenant_id,
+                request_id=request_id,
+            )
+            if self.embedding_cache is not None
+            else self.embedding_model.encode(
+                texts=flat_chunk_texts,
+                text_type=EmbedTextType.PASSAGE,
+                large_chunks_present=large_chunks_present,
+                tenant_id=tenant_id,
+                request_id=request_id,
+            )
         )
 
         chunk_titles = {
@@ -163,11 +239,20 @@ class DefaultIndexingEmbedder(IndexingEmbedder):
         # Cache the Title embeddings to only have to do it once
         title_embed_dict: dict[str, Embedding] = {}
         if chunk_titles_list:
-            title_embeddings = self.embedding_model.encode(
-                chunk_titles_list,
-                text_type=EmbedTextType.PASSAGE,
-                tenant_id=tenant_id,
-                request_id=request_id,
+            title_embeddings = (
+                self._encode_passages_with_cache(
+                    self.embedding_cache,
+                    chunk_titles_list,
+                    tenant_id=tenant_id,
+                    request_id=request_id,
+                )
+                if self.embedding_cache is not None
+                else self.embedding_model.encode(
+                    chunk_titles_list,
+                    text_type=EmbedTextType.PASSAGE,
+                    tenant_id=tenant_id,
+                    request_id=request_id,
+                )
             )
             title_embed_dict.update(
                 {
@@ -237,6 +322,7 @@ class DefaultIndexingEmbedder(IndexingEmbedder):
             deployment_name=search_settings.deployment_name,
             reduced_dimension=search_settings.reduced_dimension,
             callback=callback,
+            embedding_cache=get_embedding_cache(),
         )
 
 
@@ -12,10 +12,12 @@ from onyx.access.models import DocumentAccess
 from onyx.configs.app_configs import DEFAULT_CONTEXTUAL_RAG_LLM_NAME
 from onyx.configs.app_configs import DEFAULT_CONTEXTUAL_RAG_LLM_PROVIDER
 from onyx.configs.app_configs import ENABLE_CONTEXTUAL_RAG
+from onyx.configs.app_configs import INCREMENTAL_CHUNKING_ENABLED
 from onyx.configs.app_configs import MAX_DOCUMENT_CHARS
 from onyx.configs.app_configs import MAX_TOKENS_FOR_FULL_INCLUSION
 from onyx.configs.app_configs import USE_CHUNK_SUMMARY
 from onyx.configs.app_configs import USE_DOCUMENT_SUMMARY
+from onyx.configs.app_configs import VESPA_SYNC_BATCH_CONCURRENCY
 from onyx.configs.constants import DEFAULT_BOOST
 from onyx.configs.llm_configs import get_image_extraction_and_analysis_enabled
 from onyx.configs.model_configs import USE_INFORMATION_CONTENT_CLASSIFICATION
@@ -36,6 +38,7 @@ from onyx.db.document import get_documents_by_ids
 from onyx.db.document import mark_document_as_indexed_for_cc_pair__no_commit
 from onyx.db.document import prepare_to_modify_documents
 from onyx.db.document import update_docs_chunk_count__no_commit
+from onyx.db.document import update_docs_fingerprints__no_commit
 from onyx.db.document import update_docs_last_modified__no_commit
 from onyx.db.document import update_docs_updated_at__no_commit
 from onyx.db.document import upsert_document_by_connector_credential_pair
@@ -56,10 +59,17 @@ from onyx.document_index.document_index_utils import (
     get_multipass_config,
 )
 from onyx.document_index.interfaces import DocumentIndex
+from onyx.document_index.interfaces import DocumentInsertionRecord
 from onyx.document_index.interfaces import DocumentMetadata
 from onyx.document_index.interfaces import IndexBatchParams
+from onyx.document_index.interfaces import VespaDocumentFields
+from onyx.document_index.interfaces import VespaDocumentUserFields
 from onyx.file_processing.image_summarization import summarize_image_with_error_handling
 from onyx.file_store.utils import store_user_file_plaintext
+from onyx.indexing.chunk_fingerprints import build_content_fingerprint
+from onyx.indexing.chunk_fingerprints import build_document_fingerprint
+from onyx.indexing.chunk_fingerprints import diff_document_chunks
+from onyx.indexing.chunk_fingerprints import DocumentChunkDiff
 from onyx.indexing.chunker import Chunker
 from onyx.indexing.embedder import embed_chunks_with_failure_handling
 from onyx.indexing.embedder import IndexingEmbedder
@@ -275,6 +285,7 @@ def index_doc_batch_with_handler(
     ignore_time_skip: bool = False,
     enable_contextual_rag: bool = False,
     llm: LLM | None = None,
+    content_tokenizers: list[BaseTokenizer] | None = None,
 ) -> IndexingPipelineResult:
     try:
         index_pipeline_result = index_doc_batch(
@@ -289,34 +300,42 @@ def index_doc_batch_with_handler(
             tenant_id=tenant_id,
             enable_contextual_rag=enable_contextual_rag,
             llm=llm,
+            content_tokenizers=content_tokenizers,
         )
     except Exception as e:
         # don't log the batch directly, it's too much text
         document_ids = [doc.id for doc in document_batch]
         logger.exception(f"Failed to index document batch: {document_ids}")
 
-        index_pipeline_result = IndexingPipelineResult(
-            new_docs=0,
-            total_docs=len(document_batch),
-            total_chunks=0,
-            failures=[
-                ConnectorFailure(
-                    failed_document=DocumentFailure(
-                        document_id=document.id,
-                        document_link=(
-                            document.sections[0].link if document.sections else None
-                        ),
-                    ),
-                    failure_message=str(e),
-                    exception=e,
-                )
-                for document in document_batch
-            ],
-        )
+        index_pipeline_result = build_failed_batch_result(document_batch, e)
 
     return index_pipeline_result
 
 
+def build_failed_batch_result(
+    document_batch: list[Document], e: Exception
+) -> IndexingPipelineResult:
+    """Marks every document in the batch as failed with the given exception."""
+    return IndexingPipelineResult(
+        new_docs=0,
+        total_docs=len(document_batch),
+        total_chunks=0,
+        failures=[
+            ConnectorFailure(
+                failed_document=DocumentFailure(
+                    document_id=document.id,
+                    document_link=(
+                        document.sections[0].link if document.sections else None
+                    ),
+                ),
+                failure_message=str(e),
+                exception=e,
+            )
+            for document in document_batch
+        ],
+    )
+
+
 def index_doc_batch_prepare(
     documents: list[Document],
     index_attempt_metadata: IndexAttemptMetadata,
@@ -695,37 +714,155 @@ def add_contextual_summaries(
     return chunks
 
 
-@log_function_time(debug_only=True)
-def index_doc_batch(
+class ChunkedDocBatch(BaseModel):
+    """Output of the chunking stage of the indexing pipeline."""
+
+    filtered_documents: list[Document]
+    # None if there is nothing to embed / write (e.g. every doc was up to date)
+    ctx: DocumentBatchPrepareContext | None
+    # with incremental chunking, only the chunks which changed since the last indexing
+    chunks: list[DocAwareChunk] = []
+    # None if incremental chunking was not used for this batch
+    chunk_diffs: dict[str, DocumentChunkDiff] | None = None
+
+
+class EmbeddedDocBatch(BaseModel):
+    """Output of the embedding stage of the indexing pipeline."""
+
+    chunked_batch: ChunkedDocBatch
+    chunks_with_embeddings: list[IndexChunk] = []
+    embedding_failures: list[ConnectorFailure] = []
+    chunk_content_scores: list[float] = []
+
+
+def _chunk_documents_incrementally(
+    ctx: DocumentBatchPrepareContext,
+    chunker: Chunker,
+    index_name: str,
+) -> tuple[list[DocAwareChunk], dict[str, DocumentChunkDiff]]:
+    """Chunks the documents and drops the chunks which are already in the document
+    index, based on the fingerprints stored from the last time each was indexed.
+    Documents whose sections did not change at all are not re-chunked."""
+    chunk_diffs: dict[str, DocumentChunkDiff] = {}
+    documents_to_chunk: list[IndexingDocument] = []
+    document_fingerprints: dict[str, str] = {}
+    content_fingerprints: dict[str, str] = {}
+    stored_fingerprints: dict[str, list[str] | None] = {}
+    for document in ctx.indexable_docs:
+        document_fingerprint = build_document_fingerprint(document, chunker, index_name)
+        content_fingerprint = build_content_fingerprint(document_fingerprint, document)
+
+        # the stored fingerprints are only trusted if they describe every chunk
+        # the document has in the document index
+        db_doc = ctx.id_to_db_doc_map.get(document.id)
+        stored_chunk_fingerprints = (
+            db_doc.chunk_fingerprints
+            if db_doc is not None
+            and db_doc.chunk_fingerprints is not None
+            and db_doc.chunk_count == len(db_doc.chunk_fingerprints)
+            else None
+        )
+        if (
+            db_doc is not None
+            and stored_chunk_fingerprints is not None
+            and db_doc.content_fingerprint == content_fingerprint
+        ):
+            chunk_diffs[document.id] = DocumentChunkDiff(
+                document_id=document.id,
+                content_fingerprint=content_fingerprint,
+                chunk_fingerprints=stored_chunk_fingerprints,
+                changed_chunks=[],
+                unchanged_chunks=[],
+                rechunked=False,
+                num_unchanged_chunks=len(stored_chunk_fingerprints),
+            )
+            continue
+
+        documents_to_chunk.append(document)
+        document_fingerprints[document.id] = document_fingerprint
+        content_fingerprints[document.id] = content_fingerprint
+        stored_fingerprints[document.id] = stored_chunk_fingerprints
+
+    doc_id_to_chunks: dict[str, list[DocAwareChunk]] = defaultdict(list)
+    for chunk in chunker.chunk(documents_to_chunk):
+        doc_id_to_chunks[chunk.source_document.id].append(chunk)
+
+    for document in documents_to_chunk:
+        chunk_diffs[document.id] = diff_document_chunks(
+            document_id=document.id,
+            content_fingerprint=content_fingerprints[document.id],
+            document_fingerprint=document_fingerprints[document.id],
+            chunks=doc_id_to_chunks[document.id],
+            stored_chunk_fingerprints=stored_fingerprints[document.id],
+        )
+
+    changed_chunks = [
+        chunk
+        for document in ctx.indexable_docs
+        for chunk in chunk_diffs[document.id].changed_chunks
+    ]
+    logger.debug(
+        f"Incremental chunking: {len(changed_chunks)} changed chunks, "
+        f"{sum(diff.num_unchanged_chunks for diff in chunk_diffs.values())} "
+        "unchanged chunks"
+    )
+    return changed_chunks, chunk_diffs
+
+
+def _get_content_tokenizers() -> list[BaseTokenizer]:
+    """The tokenizers of the default LLM and fast LLM (one per tokenizer family) the
+    token counts of the chunks are computed for, so that sections built from the
+    chunks do not need to be tokenized again when they are pruned to fit a prompt."""
+    try:
+        llm, fast_llm = get_default_llms()
+    except Exception as e:
+        logger.warning(f"Not counting chunk tokens, no default LLM: {e}")
+        return []
+
+    tokenizers: dict[str, BaseTokenizer] = {}
+    for llm_config in (llm.config, fast_llm.config):
+        tokenizer = get_tokenizer(
+            model_name=llm_config.model_name,
+            provider_type=llm_config.model_provider,
+        )
+        if tokenizer.family is not None:
+            tokenizers.setdefault(tokenizer.family, tokenizer)
+    return list(tokenizers.values())
+
+
+def _add_content_token_counts(
+    chunks: list[DocAwareChunk], tokenizers: list[BaseTokenizer]
+) -> None:
+    for tokenizer in tokenizers:
+        tokenizer_family = tokenizer.family
+        if tokenizer_family is None:
+            continue
+
+        for chunk in chunks:
+            chunk.content_token_counts[tokenizer_family] = len(
+                tokenizer.encode(chunk.content)
+            )
+
+
+def index_doc_batch_chunk(
     *,
     document_batch: list[Document],
     chunker: Chunker,
-    embedder: IndexingEmbedder,
-    information_content_classification_model: InformationContentClassificationModel,
-    document_index: DocumentIndex,
     index_attempt_metadata: IndexAttemptMetadata,
     db_session: Session,
-    tenant_id: str,
     enable_contextual_rag: bool = False,
     llm: LLM | None = None,
     ignore_time_skip: bool = False,
     filter_fnc: Callable[[list[Document]], list[Document]] = filter_documents,
-) -> IndexingPipelineResult:
-    """Takes different pieces of the indexing pipeline and applies it to a batch of documents
-    Note that the documents should already be batched at this point so that it does not inflate the
-    memory requirements
-
-    Returns a tuple where the first element is the number of new docs and the
-    second element is the number of chunks."""
-
-    no_access = DocumentAccess.build(
-        user_emails=[],
-        user_groups=[],
-        external_user_emails=[],
-        external_user_group_ids=[],
-        is_public=False,
-    )
-
+    document_index_name: str | None = None,
+    content_tokenizers: list[BaseTokenizer] | None = None,
+) -> ChunkedDocBatch:
+    """First stage of the indexing pipeline. Filters the batch, upserts the documents
+    into Postgres and splits them into chunks (optionally with contextual RAG summaries).
+
+    If incremental chunking is enabled and `document_index_name` is given, only the
+    chunks which changed since the documents were last indexed are returned.
+    """
     filtered_documents = filter_fnc(document_batch)
 
     ctx = index_doc_batch_prepare(
@@ -735,22 +872,7 @@ def index_doc_batch(
         db_session=db_session,
     )
     if not ctx:
-        # even though we didn't actually index anything, we should still
-        # mark them as "completed" for the CC Pair in order to make the
-        # counts match
-        mark_document_as_indexed_for_cc_pair__no_commit(
-            connector_id=index_attempt_metadata.connector_id,
-            credential_id=index_attempt_metadata.credential_id,
-            document_ids=[doc.id for doc in filtered_documents],
-            db_session=db_session,
-        )
-        db_session.commit()
-        return IndexingPipelineResult(
-            new_docs=0,
-            total_docs=len(filtered_documents),
-            total_chunks=0,
-            failures=[],
-        )
+        return ChunkedDocBatch(filtered_documents=filtered_documents, ctx=None)
 
     # Convert documents to IndexingDocument objects with processed section
     # logger.debug("Processing image sections")
@@ -768,8 +890,20 @@ def index_doc_batch(
     logger.debug("Starting chunking")
     # NOTE: no special handling for failures here, since the chunker is not
     # a common source of failure for the indexing pipeline
-    chunks: list[DocAwareChunk] = chunker.chunk(ctx.indexable_docs)
-    llm_tokenizer: BaseTokenizer | None = None
+    # Contextual RAG summaries depend on the whole document, and re-indexing from the
+    # beginning should not trust what is (supposedly) already in the document index
+    chunk_diffs: dict[str, DocumentChunkDiff] | None = None
+    if (
+        INCREMENTAL_CHUNKING_ENABLED
+        and document_index_name is not None
+        and not enable_contextual_rag
+        and not ignore_time_skip
+    ):
+        chunks, chunk_diffs = _chunk_documents_incrementally(
+            ctx=ctx, chunker=chunker, index_name=document_index_name
+        )
+    else:
+        chunks = chunker.chunk(ctx.indexable_docs)
 
     # contextual RAG
     if enable_contextual_rag:
@@ -788,15 +922,38 @@ def index_doc_batch(
             chunk_token_limit=chunker.chunk_token_limit * 2,
         )
 
+    _add_content_token_counts(chunks, content_tokenizers or [])
+
+    return ChunkedDocBatch(
+        filtered_documents=filtered_documents,
+        ctx=ctx,
+        chunks=chunks,
+        chunk_diffs=chunk_diffs,
+    )
+
+
+def index_doc_batch_embed(
+    *,
+    chunked_batch: ChunkedDocBatch,
+    embedder: IndexingEmbedder,
+    information_content_classification_model: InformationContentClassificationModel,
+    tenant_id: str,
+    request_id: str | None,
+) -> EmbeddedDocBatch:
+    """Second stage of the indexing pipeline. Embeds the chunks and computes the
+    information content boost for each of them. Does not touch Postgres."""
+    if not chunked_batch.ctx:
+        return EmbeddedDocBatch(chunked_batch=chunked_batch)
+
     logger.debug("Starting embedding")
     chunks_with_embeddings, embedding_failures = (
         embed_chunks_with_failure_handling(
-            chunks=chunks,
+            chunks=chunked_batch.chunks,
             embedder=embedder,
             tenant_id=tenant_id,
-            request_id=index_attempt_metadata.request_id,
+            request_id=request_id,
         )
-        if chunks
+        if chunked_batch.chunks
         else ([], [])
     )
 
@@ -808,6 +965,96 @@ def index_doc_batch(
         else [1.0] * len(chunks_with_embeddings)
     )
 
+    return EmbeddedDocBatch(
+        chunked_batch=chunked_batch,
+        chunks_with_embeddings=chunks_with_embeddings,
+        embedding_failures=embedding_failures,
+        chunk_content_scores=chunk_content_scores,
+    )
+
+
+def _update_unchanged_chunks(
+    document_index: DocumentIndex,
+    document_id: str,
+    chunk_count: int,
+    tenant_id: str,
+    fields: VespaDocumentFields,
+    user_fields: VespaDocumentUserFields,
+) -> ConnectorFailure | None:
+    """Refreshes the access / metadata fields of a document whose chunks were (at least
+    partially) left in place by incremental chunking. Chunks rewritten in this batch
+    are updated too, which is a no-op for them."""
+    try:
+        document_index.update_single(
+            document_id,
+            chunk_count=chunk_count,
+            tenant_id=tenant_id,
+            fields=fields,
+            user_fields=user_fields,
+        )
+    except Exception as e:
+        logger.exception(
+            f"Failed to update unchanged chunks for '{document_id}' in vector db"
+        )
+        return ConnectorFailure(
+            failed_document=DocumentFailure(document_id=document_id),
+            failure_message=str(e),
+            exception=e,
+        )
+    return None
+
+
+def index_doc_batch_write(
+    *,
+    embedded_batch: EmbeddedDocBatch,
+    document_index: DocumentIndex,
+    index_attempt_metadata: IndexAttemptMetadata,
+    db_session: Session,
+    tenant_id: str,
+    large_chunks_enabled: bool,
+) -> IndexingPipelineResult:
+    """Final stage of the indexing pipeline. Writes the embedded chunks into the
+    document index and records the outcome in Postgres. Once this returns, the batch
+    is durable."""
+    no_access = DocumentAccess.build(
+        user_emails=[],
+        user_groups=[],
+        external_user_emails=[],
+        external_user_group_ids=[],
+        is_public=False,
+    )
+
+    filtered_documents = embedded_batch.chunked_batch.filtered_documents
+    ctx = embedded_batch.chunked_batch.ctx
+    if not ctx:
+        # even though we didn't actually index anything, we should still
+        # mark them as "completed" for the CC Pair in order to make the
+        # counts match
+        mark_document_as_indexed_for_cc_pair__no_commit(
+            connector_id=index_attempt_metadata.connector_id,
+            credential_id=index_attempt_metadata.credential_id,
+            document_ids=[doc.id for doc in filtered_documents],
+            db_session=db_session,
+        )
+        db_session.commit()
+        return IndexingPipelineResult(
+            new_docs=0,
+            total_docs=len(filtered_documents),
+            total_chunks=0,
+            failures=[],
+        )
+
+    chunks_with_embeddings = embedded_batch.chunks_with_embeddings
+    embedding_failures = embedded_batch.embedding_failures
+    chunk_content_scores = embedded_batch.chunk_content_scores
+    chunk_diffs = embedded_batch.chunked_batch.chunk_diffs
+
+    embedding_failed_doc_ids = {
+        failure.failed_document.document_id
+        for failure in embedding_failures
+        if failure.failed_document
+    }
+
     updatable_ids = [doc.id for doc in ctx.updatable_docs]
     updatable_chunk_data = [
         UpdatableChunkData(
@@ -859,11 +1106,19 @@ def index_doc_batch(
             )
             for document_id in updatable_ids
         }
+        # chunks left in place by incremental chunking still belong to the document,
+        # otherwise they would be deleted as stale
+        if chunk_diffs is not None:
+            for document_id, chunk_diff in chunk_diffs.items():
+                if document_id not in embedding_failed_doc_ids:
+                    doc_id_to_new_chunk_cnt[
+                        document_id
+                    ] += chunk_diff.num_unchanged_chunks
 
         try:
             llm, _ = get_default_llms()
 
-            llm_tokenizer = get_tokenizer(
+            llm_tokenizer: BaseTokenizer | None = get_tokenizer(
                 model_name=llm.config.model_name,
                 provider_type=llm.config.model_provider,
             )
@@ -883,11 +1138,23 @@ def index_doc_batch(
                 user_file_id = doc_id_to_user_file_id[document_id]
                 if not user_file_id:
                     continue
-                document_chunks = [
+                doc_chunk_diff = chunk_diffs.get(document_id) if chunk_diffs else None
+                if doc_chunk_diff is not None and not doc_chunk_diff.rechunked:
+                    # the content did not change, so neither did the token count
+                    continue
+                document_chunks: list[DocAwareChunk] = [
                     chunk
                     for chunk in chunks_with_embeddings
                     if chunk.source_document.id == document_id
                 ]
+                if doc_chunk_diff is not None and doc_chunk_diff.unchanged_chunks:
+                    document_chunks = sorted(
+                        document_chunks + doc_chunk_diff.unchanged_chunks,
+                        key=lambda chunk: (
+                            chunk.large_chunk_id is not None,
+                            chunk.chunk_id,
+                        ),
+                    )
                 if document_chunks:
                     combined_content = " ".join(
                         [chunk.content for chunk in document_chunks]
@@ -948,10 +1215,79 @@ def index_doc_batch(
                 doc_id_to_previous_chunk_cnt=doc_id_to_previous_chunk_cnt,
                 doc_id_to_new_chunk_cnt=doc_id_to_new_chunk_cnt,
                 tenant_id=tenant_id,
-                large_chunks_enabled=chunker.enable_large_chunks,
+                large_chunks_enabled=large_chunks_enabled,
             ),
         )
 
+        if chunk_diffs is not None:
+            written_doc_ids = {
+                chunk.source_document.id for chunk in access_aware_chunks
+            }
+            vector_db_failed_doc_ids = {
+                failure.failed_document.document_id
+                for failure in vector_db_write_failures
+                if failure.failed_document
+            }
+            # documents whose chunks were all left in place are not written at all
+            insertion_records.extend(
+                DocumentInsertionRecord(document_id=document_id, already_existed=True)
+                for document_id in updatable_ids
+                if document_id not in written_doc_ids
+                and document_id not in embedding_failed_doc_ids
+                and document_id not in vector_db_failed_doc_ids
+            )
+
+            id_to_updatable_doc = {doc.id: doc for doc in ctx.updatable_docs}
+            update_functions: list[tuple[Callable, tuple]] = []
+            for document_id, chunk_diff in chunk_diffs.items():
+                if (
+                    not chunk_diff.num_unchanged_chunks
+                    or document_id in embedding_failed_doc_ids
+                    or document_id in vector_db_failed_doc_ids
+                ):
+                    continue
+
+                user_file_id = doc_id_to_user_file_id.get(document_id)
+                user_folder_id = doc_id_to_user_folder_id.get(document_id)
+                fields = VespaDocumentFields(
+                    access=doc_id_to_access_info.get(document_id, no_access),
+                    document_sets=set(doc_id_to_document_set.get(document_id, [])),
+                    boost=(
+                        ctx.id_to_db_doc_map[document_id].boost
+                        if document_id in ctx.id_to_db_doc_map
+                        else DEFAULT_BOOST
+                    ),
+                    doc_updated_at=id_to_updatable_doc[document_id].doc_updated_at,
+                )
+                user_fields = VespaDocumentUserFields(
+                    user_file_id=(
+                        str(user_file_id) if user_file_id is not None else None
+                    ),
+                    user_folder_id=(
+                        str(user_folder_id) if user_folder_id is not None else None
+                    ),
+                )
+                update_functions.append(
+                    (
+                        _update_unchanged_chunks,
+                        (
+                            document_index,
+                            document_id,
+                            doc_id_to_new_chunk_cnt[document_id],
+                            tenant_id,
+                            fields,
+                            user_fields,
+                        ),
+                    )
+                )
+
+            update_failures = run_functions_tuples_in_parallel(
+                update_functions, max_workers=VESPA_SYNC_BATCH_CONCURRENCY
+            )
+            vector_db_write_failures.extend(
+                failure for failure in update_failures if failure is not None
+            )
+
         all_returned_doc_ids = (
             {record.document_id for record in insertion_records}
             .union(
@@ -1001,6 +1337,30 @@ def index_doc_batch(
             db_session=db_session,
         )
 
+        # failed documents (and all documents indexed without incremental chunking)
+        # get their fingerprints cleared, so that they are fully rewritten next time
+        failed_doc_ids = {
+            failure.failed_document.document_id
+            for failure in vector_db_write_failures + embedding_failures
+            if failure.failed_document
+        }
+        update_docs_fingerprints__no_commit(
+            doc_id_to_fingerprints={
+                document_id: (
+                    (
+                        chunk_diffs[document_id].content_fingerprint,
+                        chunk_diffs[document_id].chunk_fingerprints,
+                    )
+                    if chunk_diffs is not None
+                    and document_id in chunk_diffs
+                    and document_id not in failed_doc_ids
+                    else None
+                )
+                for document_id in updatable_ids
+            },
+            db_session=db_session,
+        )
+
         update_user_file_token_count__no_commit(
             user_file_id_to_token_count=user_file_id_to_token_count,
             db_session=db_session,
@@ -1045,18 +1405,76 @@ def index_doc_batch(
     return result
 
 
-def build_indexing_pipeline(
+@log_function_time(debug_only=True)
+def index_doc_batch(
     *,
+    document_batch: list[Document],
+    chunker: Chunker,
     embedder: IndexingEmbedder,
     information_content_classification_model: InformationContentClassificationModel,
     document_index: DocumentIndex,
+    index_attempt_metadata: IndexAttemptMetadata,
     db_session: Session,
     tenant_id: str,
-    chunker: Chunker | None = None,
+    enable_contextual_rag: bool = False,
+    llm: LLM | None = None,
     ignore_time_skip: bool = False,
+    filter_fnc: Callable[[list[Document]], list[Document]] = filter_documents,
+    content_tokenizers: list[BaseTokenizer] | None = None,
+) -> IndexingPipelineResult:
+    """Takes different pieces of the indexing pipeline and applies it to a batch of documents
+    Note that the documents should already be batched at this point so that it does not inflate the
+    memory requirements
+
+    Runs the chunk, embed and write stages back to back. See `PipelinedIndexer` for
+    a version which overlaps the stages of consecutive batches."""
+    chunked_batch = index_doc_batch_chunk(
+        document_batch=document_batch,
+        chunker=chunker,
+        index_attempt_metadata=index_attempt_metadata,
+        db_session=db_session,
+        enable_contextual_rag=enable_contextual_rag,
+        llm=llm,
+        ignore_time_skip=ignore_time_skip,
+        filter_fnc=filter_fnc,
+        document_index_name=document_index.index_name,
+        content_tokenizers=content_tokenizers,
+    )
+    embedded_batch = index_doc_batch_embed(
+        chunked_batch=chunked_batch,
+        embedder=embedder,
+        information_content_classification_model=information_content_classification_model,
+        tenant_id=tenant_id,
+        request_id=index_attempt_metadata.request_id,
+    )
+    return index_doc_batch_write(
+        embedded_batch=embedded_batch,
+        document_index=document_index,
+        index_attempt_metadata=index_attempt_metadata,
+        db_session=db_session,
+        tenant_id=tenant_id,
+        large_chunks_enabled=chunker.enable_large_chunks,
+    )
+
+
+class IndexingPipelineComponents(BaseModel):
+    chunker: Chunker
+    enable_contextual_rag: bool
+    llm: LLM | None
+    content_tokenizers: list[BaseTokenizer]
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+
+def get_indexing_pipeline_components(
+    *,
+    embedder: IndexingEmbedder,
+    db_session: Session,
+    chunker: Chunker | None = None,
     callback: IndexingHeartbeatInterface | None = None,
-) -> IndexingPipelineProtocol:
-    """Builds a pipeline which takes in a list (batch) of docs and indexes them."""
+) -> IndexingPipelineComponents:
+    """Resolves the chunker / contextual RAG settings for the search settings
+    currently being indexed into, and the tokenizers the chunk token counts are
+    computed for. Done once per indexing attempt, not per batch."""
     all_search_settings = get_active_search_settings(db_session)
     if (
         all_search_settings.secondary
@@ -1088,15 +1506,43 @@ def build_indexing_pipeline(
         callback=callback,
     )
 
+    return IndexingPipelineComponents(
+        chunker=chunker,
+        enable_contextual_rag=enable_contextual_rag,
+        llm=llm,
+        content_tokenizers=_get_content_tokenizers(),
+    )
+
+
+def build_indexing_pipeline(
+    *,
+    embedder: IndexingEmbedder,
+    information_content_classification_model: InformationContentClassificationModel,
+    document_index: DocumentIndex,
+    db_session: Session,
+    tenant_id: str,
+    chunker: Chunker | None = None,
+    ignore_time_skip: bool = False,
+    callback: IndexingHeartbeatInterface | None = None,
+) -> IndexingPipelineProtocol:
+    """Builds a pipeline which takes in a list (batch) of docs and indexes them."""
+    components = get_indexing_pipeline_components(
+        embedder=embedder,
+        db_session=db_session,
+        chunker=chunker,
+        callback=callback,
+    )
+
     return partial(
         index_doc_batch_with_handler,
-        chunker=chunker,
+        chunker=components.chunker,
         embedder=embedder,
         information_content_classification_model=information_content_classification_model,
         document_index=document_index,
         ignore_time_skip=ignore_time_skip,
         db_session=db_session,
         tenant_id=tenant_id,
-        enable_contextual_rag=enable_contextual_rag,
-        llm=llm,
+        enable_contextual_rag=components.enable_contextual_rag,
+        llm=components.llm,
+        content_tokenizers=components.content_tokenizers,
     )
@@ -32,6 +32,9 @@ class BaseChunk(BaseModel):
     image_file_name: str | None
     # True if this Chunk's start is not at the start of a Section
     section_continuation: bool
+    # Number of tokens of the content per tokenizer family (see `BaseTokenizer.family`),
+    # computed at indexing time for the tokenizers of the default LLMs
+    content_token_counts: dict[str, int] = Field(default_factory=dict)
 
 
 class DocAwareChunk(BaseChunk):
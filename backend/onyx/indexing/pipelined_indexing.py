@@ -0,0 +1,319 @@
+"""Pipelined version of the indexing pipeline.
+
+`index_doc_batch` runs the chunk, embed and write stages for a batch back to back,
+so while a batch is being embedded the connector, Postgres and Vespa all sit idle.
+`PipelinedIndexer` runs each stage on its own thread, connected by bounded queues,
+so that batch N+1 can be fetched and chunked while batch N is embedding and
+batch N-1 is being written to the document index.
+
+Ordering / durability guarantees:
+- every stage processes batches in submission order (one thread per stage), so
+  batches become durable in the same order as they were produced by the connector
+- results are handed back to the caller in submission order
+- `drain` blocks until every submitted batch is durable (or failed). Callers MUST
+  drain before advancing a connector checkpoint.
+"""
+
+import contextvars
+import queue
+import threading
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import Any
+
+from sqlalchemy.orm import Session
+
+from onyx.configs.app_configs import INDEXING_PIPELINE_CHUNK_QUEUE_DEPTH
+from onyx.configs.app_configs import INDEXING_PIPELINE_EMBED_QUEUE_DEPTH
+from onyx.configs.app_configs import INDEXING_PIPELINE_WRITE_QUEUE_DEPTH
+from onyx.connectors.models import Document
+from onyx.connectors.models import IndexAttemptMetadata
+from onyx.db.engine import get_session_with_current_tenant
+from onyx.document_index.interfaces import DocumentIndex
+from onyx.indexing.chunker import Chunker
+from onyx.indexing.embedder import IndexingEmbedder
+from onyx.indexing.indexing_heartbeat import IndexingHeartbeatInterface
+from onyx.indexing.indexing_pipeline import build_failed_batch_result
+from onyx.indexing.indexing_pipeline import ChunkedDocBatch
+from onyx.indexing.indexing_pipeline import EmbeddedDocBatch
+from onyx.indexing.indexing_pipeline import get_indexing_pipeline_components
+from onyx.indexing.indexing_pipeline import index_doc_batch_chunk
+from onyx.indexing.indexing_pipeline import index_doc_batch_embed
+from onyx.indexing.indexing_pipeline import index_doc_batch_write
+from onyx.indexing.indexing_pipeline import IndexingPipelineResult
+from onyx.natural_language_processing.search_nlp_models import (
+    InformationContentClassificationModel,
+)
+from onyx.utils.logger import setup_logger
+
+logger = setup_logger()
+
+# a stage takes the output of the previous stage (the raw document batch for the
+# first stage) + the metadata for the batch and returns its own output. The last
+# stage must return an `IndexingPipelineResult`.
+PipelineStage = Callable[[Any, IndexAttemptMetadata], Any]
+
+_STOP_SENTINEL = object()
+
+
+class PipelineCancelledError(Exception):
+    pass
+
+
+@dataclass
+class _InFlightBatch:
+    document_batch: list[Document]
+    index_attempt_metadata: IndexAttemptMetadata
+    # output of the last completed stage
+    value: Any
+    # set as soon as the batch is finished (possibly early, if a stage failed)
+    result: IndexingPipelineResult | None = None
+
+
+class PipelinedIndexer:
+    def __init__(
+        self,
+        stages: list[tuple[str, PipelineStage]],
+        queue_depths: list[int],
+    ) -> None:
+        """
+        Args:
+            stages: (name, stage function) pairs, in execution order
+            queue_depths: the max number of batches waiting in front of each stage.
+                When the queue in front of the first stage is full, `submit` blocks,
+                which applies backpressure all the way back to the connector.
+        """
+        if not stages:
+            raise ValueError("At least one stage is required")
+        if len(queue_depths) != len(stages):
+            raise ValueError("Must specify exactly one queue depth per stage")
+
+        self._stage_queues: list[queue.Queue] = [
+            queue.Queue(maxsize=max(depth, 1)) for depth in queue_depths
+        ]
+        # results are drained by the caller, so no need to bound this queue.
+        # Backpressure comes from the stage queues.
+        self._result_queue: queue.Queue = queue.Queue()
+        self._cancelled = threading.Event()
+        self._num_in_flight = 0
+        self._closed = False
+
+        self._threads: list[threading.Thread] = []
+        for ind, (name, stage) in enumerate(stages):
+            out_queue = (
+                self._stage_queues[ind + 1]
+                if ind + 1 < len(stages)
+                else self._result_queue
+            )
+            # copy the context so that things like the tenant id are available
+            # when acquiring db sessions within the stage
+            context = contextvars.copy_context()
+            thread = threading.Thread(
+                target=context.run,
+                args=(
+                    self._run_stage,
+                    name,
+                    stage,
+                    self._stage_queues[ind],
+                    out_queue,
+                    ind == len(stages) - 1,
+                ),
+                name=f"PipelinedIndexer-{name}",
+                daemon=True,
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    @property
+    def num_in_flight(self) -> int:
+        return self._num_in_flight
+
+    def _run_stage(
+        self,
+        name: str,
+        stage: PipelineStage,
+        in_queue: queue.Queue,
+        out_queue: queue.Queue,
+        is_last_stage: bool,
+    ) -> None:
+        while True:
+            item = in_queue.get()
+            if item is _STOP_SENTINEL:
+                out_queue.put(_STOP_SENTINEL)
+                return
+
+            batch: _InFlightBatch = item
+            if batch.result is None:
+                try:
+                    if self._cancelled.is_set():
+                        raise PipelineCancelledError(
+                            f"Indexing pipeline cancelled before stage '{name}'"
+                        )
+                    batch.value = stage(batch.value, batch.index_attempt_metadata)
+                    if is_last_stage:
+                        batch.result = batch.value
+                except Exception as e:
+                    if not isinstance(e, PipelineCancelledError):
+                        document_ids = [doc.id for doc in batch.document_batch]
+                        logger.exception(
+                            f"Failed to index document batch in stage '{name}': "
+                            f"{document_ids}"
+                        )
+                    batch.result = build_failed_batch_result(batch.document_batch, e)
+                    batch.value = None
+
+            out_queue.put(batch)
+
+    def _pop_result(
+        self, block: bool
+    ) -> tuple[list[Document], IndexingPipelineResult] | None:
+        try:
+            batch: _InFlightBatch = self._result_queue.get(block=block)
+        except queue.Empty:
+            return None
+
+        self._num_in_flight -= 1
+        if batch.result is None:
+            raise RuntimeError("Batch left the pipeline without a result")
+        return batch.document_batch, batch.result
+
+    def submit(
+        self,
+        document_batch: list[Document],
+        index_attempt_metadata: IndexAttemptMetadata,
+    ) -> list[tuple[list[Document], IndexingPipelineResult]]:
+        """Queues a batch for indexing. Blocks if the pipeline is full.
+
+        NOTE: the metadata is copied, so the caller can keep mutating its own
+        instance between batches.
+
+        Returns the batches which have finished since the last call, in order."""
+        if self._closed:
+            raise RuntimeError("Cannot submit to a closed PipelinedIndexer")
+
+        self._stage_queues[0].put(
+            _InFlightBatch(
+                document_batch=document_batch,
+                index_attempt_metadata=index_attempt_metadata.model_copy(),
+                value=document_batch,
+            )
+        )
+        self._num_in_flight += 1
+
+        completed: list[tuple[list[Document], IndexingPipelineResult]] = []
+        while (result := self._pop_result(block=False)) is not None:
+            completed.append(result)
+        return completed
+
+    def drain(self) -> list[tuple[list[Document], IndexingPipelineResult]]:
+        """Blocks until every submitted batch has finished. Returns the batches
+        which have finished since the last call, in order."""
+        completed: list[tuple[list[Document], IndexingPipelineResult]] = []
+        while self._num_in_flight > 0:
+            result = self._pop_result(block=True)
+            if result is not None:
+                completed.append(result)
+        return completed
+
+    def close(self, cancel: bool = False) -> None:
+        """Stops the stage threads. If `cancel` is set, batches which have not
+        started a stage yet are failed instead of being processed."""
+        if self._closed:
+            return
+        self._closed = True
+
+        if cancel:
+            self._cancelled.set()
+
+        self._stage_queues[0].put(_STOP_SENTINEL)
+        for thread in self._threads:
+            thread.join()
+
+    def __enter__(self) -> "PipelinedIndexer":
+        return self
+
+    def __exit__(self, exc_type: Any, exc_value: Any, traceback: Any) -> None:
+        self.close(cancel=exc_type is not None)
+
+
+def build_pipelined_indexing_pipeline(
+    *,
+    embedder: IndexingEmbedder,
+    information_content_classification_model: InformationContentClassificationModel,
+    document_index: DocumentIndex,
+    db_session: Session,
+    tenant_id: str,
+    chunker: Chunker | None = None,
+    ignore_time_skip: bool = False,
+    callback: IndexingHeartbeatInterface | None = None,
+    queue_depths: list[int] | None = None,
+) -> PipelinedIndexer:
+    """Pipelined equivalent of `build_indexing_pipeline`. The caller is responsible
+    for closing the returned `PipelinedIndexer`.
+
+    NOTE: `db_session` is only used to resolve the pipeline components. Each stage
+    thread uses its own sessions, since sessions cannot be shared across threads."""
+    components = get_indexing_pipeline_components(
+        embedder=embedder,
+        db_session=db_session,
+        chunker=chunker,
+        callback=callback,
+    )
+
+    def _chunk_stage(
+        document_batch: list[Document], index_attempt_metadata: IndexAttemptMetadata
+    ) -> ChunkedDocBatch:
+        with get_session_with_current_tenant() as stage_db_session:
+            chunked_batch = index_doc_batch_chunk(
+                document_batch=document_batch,
+                chunker=components.chunker,
+                index_attempt_metadata=index_attempt_metadata,
+                db_session=stage_db_session,
+                enable_contextual_rag=components.enable_contextual_rag,
+                llm=components.llm,
+                ignore_time_skip=ignore_time_skip,
+                document_index_name=document_index.index_name,
+                content_tokenizers=components.content_tokenizers,
+            )
+            # the write stage locks these rows from a different session, so
+            # nothing can be left uncommitted here
+            stage_db_session.commit()
+        return chunked_batch
+
+    def _embed_stage(
+        chunked_batch: ChunkedDocBatch, index_attempt_metadata: IndexAttemptMetadata
+    ) -> EmbeddedDocBatch:
+        return index_doc_batch_embed(
+            chunked_batch=chunked_batch,
+            embedder=embedder,
+            information_content_classification_model=information_content_classification_model,
+            tenant_id=tenant_id,
+            request_id=index_attempt_metadata.request_id,
+        )
+
+    def _write_stage(
+        embedded_batch: EmbeddedDocBatch, index_attempt_metadata: IndexAttemptMetadata
+    ) -> IndexingPipelineResult:
+        with get_session_with_current_tenant() as stage_db_session:
+            return index_doc_batch_write(
+                embedded_batch=embedded_batch,
+                document_index=document_index,
+                index_attempt_metadata=index_attempt_metadata,
+                db_session=stage_db_session,
+                tenant_id=tenant_id,
+                large_chunks_enabled=components.chunker.enable_large_chunks,
+            )
+
+    return PipelinedIndexer(
+        stages=[
+            ("chunk", _chunk_stage),
+            ("embed", _embed_stage),
+            ("write", _write_stage),
+        ],
+        queue_depths=queue_depths
+        or [
+            INDEXING_PIPELINE_CHUNK_QUEUE_DEPTH,
+            INDEXING_PIPELINE_EMBED_QUEUE_DEPTH,
+            INDEXING_PIPELINE_WRITE_QUEUE_DEPTH,
+        ],
+    )
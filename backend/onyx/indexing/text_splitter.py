@@ -0,0 +1,276 @@
+"""Sentence aware text splitting on top of a single tokenization of the text.
+
+Replaces llama_index's `SentenceSplitter`, which measures every candidate split (and
+every sub-split of those) by tokenizing it again, and which the chunker ran once more
+on every chunk for the blurb and the mini chunks. Here a text is tokenized once, keeping
+the character offset each token starts at, and the token count of any span of the text
+is two bisects into those offsets. Chunks, blurbs and mini chunks are all sliced out of
+the same offsets.
+
+The splitting rules are the ones of `SentenceSplitter`, so chunk boundaries stay
+(nearly) the same. A text which is too long is split, in order of preference:
+1. by paragraph separator
+2. into sentences (untrained punkt, same as llama_index)
+3. by the phrase regex
+4. by the word separator
+5. into characters
+and the splits are then greedily merged up to the chunk size.
+
+Differences to `SentenceSplitter`:
+- a token spanning a split boundary is counted in the split it starts in, rather than
+  re-tokenizing each split on its own. Counts can differ by a token here and there.
+- chunks are contiguous spans of the text, so whitespace dropped by the sentence
+  tokenizer in between two merged splits is kept.
+
+The splits carry no `is_sentence` flag: `SentenceSplitter._merge` only checks it in a
+branch where the split already fits (or starts a new chunk), so it never changes the
+merge result.
+"""
+
+import re
+from bisect import bisect_left
+from collections.abc import Iterable
+from collections.abc import Iterator
+from dataclasses import dataclass
+from itertools import chain
+from itertools import islice
+from typing import TYPE_CHECKING
+
+from onyx.natural_language_processing.utils import BaseTokenizer
+
+if TYPE_CHECKING:
+    from nltk.tokenize.punkt import PunktSentenceTokenizer  # type: ignore
+
+DEFAULT_PARAGRAPH_SEPARATOR = "\n\n\n"
+DEFAULT_WORD_SEPARATOR = " "
+# same as llama_index's CHUNKING_REGEX, every character is part of exactly one match
+_PHRASE_PATTERN = re.compile("[^,.;。？！]+[,.;。？！]?|[,.;。？！]")
+
+_punkt_tokenizer: "PunktSentenceTokenizer | None" = None
+
+
+def _get_punkt_tokenizer() -> "PunktSentenceTokenizer":
+    global _punkt_tokenizer
+    if _punkt_tokenizer is None:
+        from nltk.tokenize.punkt import PunktSentenceTokenizer  # type: ignore
+
+        _punkt_tokenizer = PunktSentenceTokenizer()
+    return _punkt_tokenizer
+
+
+@dataclass(frozen=True)
+class TokenizedText:
+    text: str
+    # character offset of the start of each token, in ascending order
+    token_starts: list[int]
+
+    @classmethod
+    def from_text(cls, text: str, tokenizer: BaseTokenizer) -> "TokenizedText":
+        return cls(
+            text=text, token_starts=tokenizer.token_offsets(text) if text else []
+        )
+
+    @classmethod
+    def join(
+        cls, separator: "TokenizedText", texts: list["TokenizedText"]
+    ) -> "TokenizedText":
+        """Equivalent of `separator.text.join(...)`, without re-tokenizing."""
+        parts: list[str] = []
+        token_starts: list[int] = []
+        offset = 0
+        for ind, tokenized in enumerate(texts):
+            if ind > 0:
+                parts.append(separator.text)
+                token_starts.extend(start + offset for start in separator.token_starts)
+                offset += len(separator.text)
+            parts.append(tokenized.text)
+            token_starts.extend(start + offset for start in tokenized.token_starts)
+            offset += len(tokenized.text)
+        return cls(text="".join(parts), token_starts=token_starts)
+
+    def count_tokens(self, start: int = 0, end: int | None = None) -> int:
+        if end is None:
+            end = len(self.text)
+        return bisect_left(self.token_starts, end) - bisect_left(
+            self.token_starts, start
+        )
+
+    def slice(self, start: int, end: int) -> "TokenizedText":
+        first = bisect_left(self.token_starts, start)
+        last = bisect_left(self.token_starts, end)
+        return TokenizedText(
+            text=self.text[start:end],
+            token_starts=[
+                token_start - start for token_start in self.token_starts[first:last]
+            ],
+        )
+
+
+@dataclass
+class _Split:
+    start: int
+    end: int
+    num_tokens: int
+
+
+def _split_keep_separator(
+    text: str, start: int, end: int, separator: str
+) -> list[tuple[int, int]]:
+    """Spans of `text[start:end].split(separator)`, with the separator kept at the
+    start of every split but the first."""
+    cut_points = [start]
+    position = text.find(separator, start, end)
+    while position != -1:
+        if position != start:
+            cut_points.append(position)
+        position = text.find(separator, position + len(separator), end)
+    cut_points.append(end)
+    return [
+        (cut_start, cut_end)
+        for cut_start, cut_end in zip(cut_points, cut_points[1:])
+        if cut_end > cut_start
+    ]
+
+
+def _split_sentences(text: str, start: int, end: int) -> Iterator[tuple[int, int]]:
+    # punkt yields lazily, which lets the blurb stop tokenizing after the first chunk
+    sentence_starts = (
+        start + span_start
+        for span_start, _ in _get_punkt_tokenizer().span_tokenize(text[start:end])
+    )
+    previous_start = next(sentence_starts, None)
+    if previous_start is None:
+        return
+    for sentence_start in sentence_starts:
+        yield previous_start, sentence_start
+        previous_start = sentence_start
+    yield previous_start, end
+
+
+def _split_phrases(text: str, start: int, end: int) -> list[tuple[int, int]]:
+    return [
+        (start + match.start(), start + match.end())
+        for match in _PHRASE_PATTERN.finditer(text[start:end])
+    ]
+
+
+def _split_chars(text: str, start: int, end: int) -> list[tuple[int, int]]:
+    return [(position, position + 1) for position in range(start, end)]
+
+
+class SentenceTokenSplitter:
+    """Splits text into chunks of at most `chunk_size` tokens, preferring to keep
+    paragraphs, sentences and phrases whole."""
+
+    def __init__(
+        self,
+        chunk_size: int,
+        chunk_overlap: int = 0,
+        paragraph_separator: str = DEFAULT_PARAGRAPH_SEPARATOR,
+        word_separator: str = DEFAULT_WORD_SEPARATOR,
+    ) -> None:
+        if chunk_overlap > chunk_size:
+            raise ValueError(
+                f"Got a larger chunk overlap ({chunk_overlap}) than chunk size "
+                f"({chunk_size}), should be smaller."
+            )
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.paragraph_separator = paragraph_separator
+        self.word_separator = word_separator
+
+    def _get_splits_by_fns(
+        self, text: str, start: int, end: int
+    ) -> Iterable[tuple[int, int]]:
+        paragraphs = _split_keep_separator(text, start, end, self.paragraph_separator)
+        if len(paragraphs) > 1:
+            return paragraphs
+
+        sentences = _split_sentences(text, start, end)
+        first_sentences = list(islice(sentences, 2))
+        if len(first_sentences) > 1:
+            return chain(first_sentences, sentences)
+
+        # the first of these giving more than one split wins
+        spans = _split_phrases(text, start, end)
+        if len(spans) <= 1:
+            spans = _split_keep_separator(text, start, end, self.word_separator)
+        if len(spans) <= 1:
+            spans = _split_chars(text, start, end)
+        return spans
+
+    def _split(
+        self, tokenized: TokenizedText, start: int, end: int
+    ) -> Iterator[_Split]:
+        num_tokens = tokenized.count_tokens(start, end)
+        # a single character can not be split any further
+        if num_tokens <= self.chunk_size or end - start <= 1:
+            yield _Split(start, end, num_tokens)
+            return
+
+        for span_start, span_end in self._get_splits_by_fns(tokenized.text, start, end):
+            num_tokens = tokenized.count_tokens(span_start, span_end)
+            if num_tokens <= self.chunk_size:
+                yield _Split(span_start, span_end, num_tokens)
+            else:
+                yield from self._split(tokenized, span_start, span_end)
+
+    def _merge(self, splits: Iterable[_Split]) -> Iterator[tuple[int, int]]:
+        current: list[_Split] = []
+        current_num_tokens = 0
+
+        for split in splits:
+            if current and current_num_tokens + split.num_tokens > self.chunk_size:
+                yield current[0].start, current[-1].end
+
+                # carry the tail of the closed chunk over as the overlap
+                overlap: list[_Split] = []
+                current_num_tokens = 0
+                for previous in reversed(current):
+                    if current_num_tokens + previous.num_tokens > self.chunk_overlap:
+                        break
+                    current_num_tokens += previous.num_tokens
+                    overlap.insert(0, previous)
+                current = overlap
+
+            current.append(split)
+            current_num_tokens += split.num_tokens
+
+        if current:
+            yield current[0].start, current[-1].end
+
+    def split_spans(
+        self, tokenized: TokenizedText, max_chunks: int | None = None
+    ) -> list[tuple[int, int]]:
+        """(start, end) character spans of the chunks, with leading / trailing
+        whitespace excluded. Whitespace only chunks are dropped.
+
+        With `max_chunks` only the start of the text needed for that many chunks is
+        split (e.g. for the blurb), the result is the same as slicing the full result.
+        """
+        text = tokenized.text
+        spans: list[tuple[int, int]] = []
+        for start, end in self._merge(self._split(tokenized, 0, len(text))):
+            if max_chunks is not None and len(spans) >= max_chunks:
+                break
+            chunk = text[start:end]
+            stripped_start = start + len(chunk) - len(chunk.lstrip())
+            stripped_end = end - (len(chunk) - len(chunk.rstrip()))
+            if stripped_end > stripped_start:
+                spans.append((stripped_start, stripped_end))
+        return spans
+
+    def split(
+        self, tokenized: TokenizedText, max_chunks: int | None = None
+    ) -> list[TokenizedText]:
+        if not tokenized.text:
+            return [tokenized]
+        return [
+            tokenized.slice(start, end)
+            for start, end in self.split_spans(tokenized, max_chunks)
+        ]
+
+    def split_text(
+        self, tokenized: TokenizedText, max_chunks: int | None = None
+    ) -> list[str]:
+        return [split.text for split in self.split(tokenized, max_chunks)]
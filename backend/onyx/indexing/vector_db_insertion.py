@@ -7,6 +7,7 @@ import httpx
 from onyx.connectors.models import ConnectorFailure
 from onyx.connectors.models import DocumentFailure
 from onyx.document_index.interfaces import DocumentIndex
+from onyx.document_index.interfaces import DocumentIndexPartialFailureError
 from onyx.document_index.interfaces import DocumentInsertionRecord
 from onyx.document_index.interfaces import IndexBatchParams
 from onyx.indexing.models import DocMetadataAwareIndexChunk
@@ -32,12 +33,17 @@ def write_chunks_to_vector_db_with_backoff(
     index_batch_params: IndexBatchParams,
 ) -> tuple[list[DocumentInsertionRecord], list[ConnectorFailure]]:
     """Tries to insert all chunks in one large batch. If that batch fails for any reason,
-    goes document by document to isolate the failure(s).
+    goes document by document to isolate the failure(s). If the document index reports
+    exactly which documents failed, only those are retried.
 
     IMPORTANT: must pass in whole documents at a time not individual chunks, since the
     vector DB interface assumes that all chunks for a single document are present.
     """
 
+    insertion_records: list[DocumentInsertionRecord] = []
+    # None means every document in the batch needs to be retried
+    doc_ids_to_retry: set[str] | None = None
+
     # first try to write the chunks to the vector db
     try:
         return (
@@ -49,6 +55,15 @@ def write_chunks_to_vector_db_with_backoff(
             ),
             [],
         )
+    except DocumentIndexPartialFailureError as e:
+        logger.warning(
+            f"Failed to write {len(e.failed_document_ids)} document(s) in the chunk "
+            "batch to vector db. Retrying those individually."
+        )
+        insertion_records.extend(e.insertion_records)
+        doc_ids_to_retry = set(e.failed_document_ids)
+
+        time.sleep(2)
     except Exception as e:
         logger.exception(
             "Failed to write chunk batch to vector db. Trying individual docs."
@@ -63,9 +78,9 @@ def write_chunks_to_vector_db_with_backoff(
     # try writing each doc one by one
     chunks_for_docs: dict[str, list[DocMetadataAwareIndexChunk]] = defaultdict(list)
     for chunk in chunks:
-        chunks_for_docs[chunk.source_document.id].append(chunk)
+        if doc_ids_to_retry is None or chunk.source_document.id in doc_ids_to_retry:
+            chunks_for_docs[chunk.source_document.id].append(chunk)
 
-    insertion_records: list[DocumentInsertionRecord] = []
     failures: list[ConnectorFailure] = []
     for doc_id, chunks_for_doc in chunks_for_docs.items():
         try:
@@ -1,10 +1,12 @@
 import json
 import os
 import traceback
+from collections.abc import AsyncIterator
 from collections.abc import Iterator
 from collections.abc import Sequence
 from typing import Any
 from typing import cast
+from typing import NoReturn
 
 import litellm  # type: ignore
 from httpx import RemoteProtocolError
@@ -223,6 +225,20 @@ def _convert_delta_to_message_chunk(
     raise ValueError(f"Unknown role: {role}")
 
 
+def _convert_stream_part_to_message_chunk(
+    part: litellm.ModelResponse, curr_msg: BaseMessage | None
+) -> BaseMessageChunk | None:
+    if not part["choices"]:
+        return None
+
+    choice = part["choices"][0]
+    return _convert_delta_to_message_chunk(
+        choice["delta"],
+        curr_msg,
+        stop_reason=choice["finish_reason"],
+    )
+
+
 def _prompt_to_dict(
     prompt: LanguageModelInput,
 ) -> Sequence[str | list[str] | dict[str, Any] | tuple[str, str]]:
@@ -363,6 +379,85 @@ class DefaultMultiLLM(LLM):
                 category=_LLM_PROMPT_LONG_TERM_LOG_CATEGORY,
             )
 
+    def _completion_kwargs(
+        self,
+        processed_prompt: Sequence[str | list[str] | dict[str, Any] | tuple[str, str]],
+        tools: list[dict] | None,
+        tool_choice: ToolChoiceOptions | None,
+        stream: bool,
+        structured_response_format: dict | None,
+        timeout_override: int | None,
+        max_tokens: int | None,
+    ) -> dict[str, Any]:
+        final_model_kwargs = {**self._model_kwargs}
+        if (
+            VERTEX_CREDENTIALS_KWARG not in final_model_kwargs
+            and self.config.credentials_file
+        ):
+            final_model_kwargs[VERTEX_CREDENTIALS_KWARG] = self.config.credentials_file
+
+        return dict(
+            mock_response=MOCK_LLM_RESPONSE,
+            # model choice
+            # model="openai/gpt-4",
+            model=f"{self.config.model_provider}/{self.config.deployment_name or self.config.model_name}",
+            # NOTE: have to pass in None instead of empty string for these
+            # otherwise litellm can have some issues with bedrock
+            api_key=self._api_key or None,
+            base_url=self._api_base or None,
+            api_version=self._api_version or None,
+            custom_llm_provider=self._custom_llm_provider or None,
+            # actual input
+            messages=processed_prompt,
+            tools=tools,
+            tool_choice=tool_choice if tools else None,
+            max_tokens=max_tokens,
+            # streaming choice
+            stream=stream,
+            # model params
+            temperature=self._temperature,
+            timeout=timeout_override or self._timeout,
+            # For now, we don't support parallel tool calls
+            # NOTE: we can't pass this in if tools are not specified
+            # or else OpenAI throws an error
+            **(
+                {"parallel_tool_calls": False}
+                if tools
+                and self.config.model_name
+                not in [
+                    "o3-mini",
+                    "o3-preview",
+                    "o1",
+                    "o1-preview",
+                    "o1-mini",
+                    "o1-mini-2024-09-12",
+                    "o3-mini-2025-01-31",
+                ]
+                else {}
+            ),  # TODO: remove once LITELLM has patched
+            **(
+                {"response_format": structured_response_format}
+                if structured_response_format
+                else {}
+            ),
+            **final_model_kwargs,
+        )
+
+    def _raise_completion_error(
+        self,
+        processed_prompt: Sequence[str | list[str] | dict[str, Any] | tuple[str, str]],
+        e: Exception,
+    ) -> NoReturn:
+        self._record_error(processed_prompt, e)
+        # for break pointing
+        if isinstance(e, litellm.Timeout):
+            raise LLMTimeoutError(e)
+
+        elif isinstance(e, litellm.RateLimitError):
+            raise LLMRateLimitError(e)
+
+        raise e
+
     def _completion(
         self,
         prompt: LanguageModelInput,
@@ -378,70 +473,48 @@ class DefaultMultiLLM(LLM):
         processed_prompt = _prompt_to_dict(prompt)
         self._record_call(processed_prompt)
 
-        final_model_kwargs = {**self._model_kwargs}
-        if (
-            VERTEX_CREDENTIALS_KWARG not in final_model_kwargs
-            and self.config.credentials_file
-        ):
-            final_model_kwargs[VERTEX_CREDENTIALS_KWARG] = self.config.credentials_file
-
         try:
             return litellm.completion(
-                mock_response=MOCK_LLM_RESPONSE,
-                # model choice
-                # model="openai/gpt-4",
-                model=f"{self.config.model_provider}/{self.config.deployment_name or self.config.model_name}",
-                # NOTE: have to pass in None instead of empty string for these
-                # otherwise litellm can have some issues with bedrock
-                api_key=self._api_key or None,
-                base_url=self._api_base or None,
-                api_version=self._api_version or None,
-                custom_llm_provider=self._custom_llm_provider or None,
-                # actual input
-                messages=processed_prompt,
-                tools=tools,
-                tool_choice=tool_choice if tools else None,
-                max_tokens=max_tokens,
-                # streaming choice
-                stream=stream,
-                # model params
-                temperature=self._temperature,
-                timeout=timeout_override or self._timeout,
-                # For now, we don't support parallel tool calls
-                # NOTE: we can't pass this in if tools are not specified
-                # or else OpenAI throws an error
-                **(
-                    {"parallel_tool_calls": False}
-                    if tools
-                    and self.config.model_name
-                    not in [
-                        "o3-mini",
-                        "o3-preview",
-                        "o1",
-                        "o1-preview",
-                        "o1-mini",
-                        "o1-mini-2024-09-12",
-                        "o3-mini-2025-01-31",
-                    ]
-                    else {}
-                ),  # TODO: remove once LITELLM has patched
-                **(
-                    {"response_format": structured_response_format}
-                    if structured_response_format
-                    else {}
-                ),
-                **final_model_kwargs,
+                **self._completion_kwargs(
+                    processed_prompt,
+                    tools,
+                    tool_choice,
+                    stream,
+                    structured_response_format,
+                    timeout_override,
+                    max_tokens,
+                )
             )
         except Exception as e:
-            self._record_error(processed_prompt, e)
-            # for break pointing
-            if isinstance(e, litellm.Timeout):
-                raise LLMTimeoutError(e)
+            self._raise_completion_error(processed_prompt, e)
 
-            elif isinstance(e, litellm.RateLimitError):
-                raise LLMRateLimitError(e)
+    async def _acompletion(
+        self,
+        prompt: LanguageModelInput,
+        tools: list[dict] | None,
+        tool_choice: ToolChoiceOptions | None,
+        stream: bool,
+        structured_response_format: dict | None = None,
+        timeout_override: int | None = None,
+        max_tokens: int | None = None,
+    ) -> litellm.ModelResponse | litellm.CustomStreamWrapper:
+        processed_prompt = _prompt_to_dict(prompt)
+        self._record_call(processed_prompt)
 
-            raise e
+        try:
+            return await litellm.acompletion(
+                **self._completion_kwargs(
+                    processed_prompt,
+                    tools,
+                    tool_choice,
+                    stream,
+                    structured_response_format,
+                    timeout_override,
+                    max_tokens,
+                )
+            )
+        except Exception as e:
+            self._raise_completion_error(processed_prompt, e)
 
     @property
     def config(self) -> LLMConfig:
@@ -487,6 +560,37 @@ class DefaultMultiLLM(LLM):
                 max_tokens=max_tokens,
             ),
         )
+        return self._process_response(prompt, response)
+
+    async def _ainvoke_implementation(
+        self,
+        prompt: LanguageModelInput,
+        tools: list[dict] | None = None,
+        tool_choice: ToolChoiceOptions | None = None,
+        structured_response_format: dict | None = None,
+        timeout_override: int | None = None,
+        max_tokens: int | None = None,
+    ) -> BaseMessage:
+        if LOG_DANSWER_MODEL_INTERACTIONS:
+            self.log_model_configs()
+
+        response = cast(
+            litellm.ModelResponse,
+            await self._acompletion(
+                prompt=prompt,
+                tools=tools,
+                tool_choice=tool_choice,
+                stream=False,
+                structured_response_format=structured_response_format,
+                timeout_override=timeout_override,
+                max_tokens=max_tokens,
+            ),
+        )
+        return self._process_response(prompt, response)
+
+    def _process_response(
+        self, prompt: LanguageModelInput, response: litellm.ModelResponse
+    ) -> BaseMessage:
         choice = response.choices[0]
         if hasattr(choice, "message"):
             output = _convert_litellm_message_to_langchain_message(choice.message)
@@ -534,15 +638,65 @@ class DefaultMultiLLM(LLM):
         )
         try:
             for part in response:
-                if not part["choices"]:
+                message_chunk = _convert_stream_part_to_message_chunk(part, output)
+                if message_chunk is None:
                     continue
 
-                choice = part["choices"][0]
-                message_chunk = _convert_delta_to_message_chunk(
-                    choice["delta"],
-                    output,
-                    stop_reason=choice["finish_reason"],
-                )
+                if output is None:
+                    output = message_chunk
+                else:
+                    output += message_chunk
+
+                yield message_chunk
+
+        except RemoteProtocolError:
+            raise RuntimeError(
+                "The AI model failed partway through generation, please try again."
+            )
+
+        self._finish_stream(prompt, output)
+
+    async def _astream_implementation(
+        self,
+        prompt: LanguageModelInput,
+        tools: list[dict] | None = None,
+        tool_choice: ToolChoiceOptions | None = None,
+        structured_response_format: dict | None = None,
+        timeout_override: int | None = None,
+        max_tokens: int | None = None,
+    ) -> AsyncIterator[BaseMessage]:
+        if LOG_DANSWER_MODEL_INTERACTIONS:
+            self.log_model_configs()
+
+        if DISABLE_LITELLM_STREAMING:
+            yield await self.ainvoke(
+                prompt,
+                tools,
+                tool_choice,
+                structured_response_format,
+                timeout_override,
+                max_tokens,
+            )
+            return
+
+        output = None
+        response = cast(
+            litellm.CustomStreamWrapper,
+            await self._acompletion(
+                prompt=prompt,
+                tools=tools,
+                tool_choice=tool_choice,
+                stream=True,
+                structured_response_format=structured_response_format,
+                timeout_override=timeout_override,
+                max_tokens=max_tokens,
+            ),
+        )
+        try:
+            async for part in response:
+                message_chunk = _convert_stream_part_to_message_chunk(part, output)
+                if message_chunk is None:
+                    continue
 
                 if output is None:
                     output = message_chunk
@@ -556,6 +710,11 @@ class DefaultMultiLLM(LLM):
                 "The AI model failed partway through generation, please try again."
             )
 
+        self._finish_stream(prompt, output)
+
+    def _finish_stream(
+        self, prompt: LanguageModelInput, output: BaseMessage | None
+    ) -> None:
         if output:
             self._record_result(prompt, output)
 
@@ -1,4 +1,6 @@
 import abc
+import asyncio
+from collections.abc import AsyncIterator
 from collections.abc import Iterator
 from typing import Literal
 
@@ -160,3 +162,96 @@ class LLM(abc.ABC):
         max_tokens: int | None = None,
     ) -> Iterator[BaseMessage]:
         raise NotImplementedError
+
+    async def ainvoke(
+        self,
+        prompt: LanguageModelInput,
+        tools: list[dict] | None = None,
+        tool_choice: ToolChoiceOptions | None = None,
+        structured_response_format: dict | None = None,
+        timeout_override: int | None = None,
+        max_tokens: int | None = None,
+    ) -> BaseMessage:
+        self._precall(prompt)
+        return await self._ainvoke_implementation(
+            prompt,
+            tools,
+            tool_choice,
+            structured_response_format,
+            timeout_override,
+            max_tokens,
+        )
+
+    async def _ainvoke_implementation(
+        self,
+        prompt: LanguageModelInput,
+        tools: list[dict] | None = None,
+        tool_choice: ToolChoiceOptions | None = None,
+        structured_response_format: dict | None = None,
+        timeout_override: int | None = None,
+        max_tokens: int | None = None,
+    ) -> BaseMessage:
+        """Runs the blocking implementation in a worker thread, implementations with
+        an async client should override this"""
+        return await asyncio.to_thread(
+            self._invoke_implementation,
+            prompt,
+            tools,
+            tool_choice,
+            structured_response_format,
+            timeout_override,
+            max_tokens,
+        )
+
+    async def astream(
+        self,
+        prompt: LanguageModelInput,
+        tools: list[dict] | None = None,
+        tool_choice: ToolChoiceOptions | None = None,
+        structured_response_format: dict | None = None,
+        timeout_override: int | None = None,
+        max_tokens: int | None = None,
+    ) -> AsyncIterator[BaseMessage]:
+        self._precall(prompt)
+        messages = self._astream_implementation(
+            prompt,
+            tools,
+            tool_choice,
+            structured_response_format,
+            timeout_override,
+            max_tokens,
+        )
+
+        tokens = []
+        async for message in messages:
+            if LOG_INDIVIDUAL_MODEL_TOKENS:
+                tokens.append(message.content)
+            yield message
+
+        if LOG_INDIVIDUAL_MODEL_TOKENS and tokens:
+            logger.debug(f"Model Tokens: {tokens}")
+
+    async def _astream_implementation(
+        self,
+        prompt: LanguageModelInput,
+        tools: list[dict] | None = None,
+        tool_choice: ToolChoiceOptions | None = None,
+        structured_response_format: dict | None = None,
+        timeout_override: int | None = None,
+        max_tokens: int | None = None,
+    ) -> AsyncIterator[BaseMessage]:
+        """Iterates the blocking implementation in a worker thread, implementations
+        with an async client should override this"""
+        messages = self._stream_implementation(
+            prompt,
+            tools,
+            tool_choice,
+            structured_response_format,
+            timeout_override,
+            max_tokens,
+        )
+        while True:
+            message = await asyncio.to_thread(next, messages, None)
+            if message is None:
+                break
+            yield message
@@ -0,0 +1,132 @@
+"""Capabilities of the models litellm knows about (context window, vision support),
+indexed once per process from `litellm.model_cost`.
+
+Configured model names often do not match a litellm key exactly, e.g. they carry an
+extra provider prefix from a model proxy or an ollama style `:tag` suffix. The key a
+(provider, model name) pair resolves to is computed once and cached, so the lookups
+done on every chat turn / persona listing are dict hits.
+"""
+
+import threading
+from collections.abc import Mapping
+from dataclasses import dataclass
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Any
+from typing import cast
+
+import litellm  # type: ignore
+
+from onyx.utils.logger import setup_logger
+
+logger = setup_logger()
+
+
+@dataclass(frozen=True)
+class ModelCapabilities:
+    max_input_tokens: int | None
+    max_tokens: int | None
+    max_output_tokens: int | None
+    supports_vision: bool
+
+
+def _int_or_none(value: Any) -> int | None:
+    # some entries (e.g. `sample_spec`) hold descriptions instead of numbers
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return None
+    return int(value)
+
+
+def build_model_capability_index() -> Mapping[str, ModelCapabilities]:
+    return MappingProxyType(
+        {
+            model_key: ModelCapabilities(
+                max_input_tokens=_int_or_none(model_obj.get("max_input_tokens")),
+                max_tokens=_int_or_none(model_obj.get("max_tokens")),
+                max_output_tokens=_int_or_none(model_obj.get("max_output_tokens")),
+                supports_vision=model_obj.get("supports_vision") is True,
+            )
+            for model_key, model_obj in cast(dict, litellm.model_cost).items()
+            if isinstance(model_obj, dict)
+        }
+    )
+
+
+class _ModelCapabilityIndex:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        # the index and its generation, which is part of the resolution cache key so
+        # that lookups racing with a refresh do not cache entries of the old index
+        self._state: tuple[Mapping[str, ModelCapabilities], int] | None = None
+
+    def get(self) -> tuple[Mapping[str, ModelCapabilities], int]:
+        state = self._state
+        if state is None:
+            with self._lock:
+                if self._state is None:
+                    self._state = (build_model_capability_index(), 0)
+                state = self._state
+        return state
+
+    def refresh(self) -> None:
+        with self._lock:
+            generation = self._state[1] + 1 if self._state else 0
+            self._state = (build_model_capability_index(), generation)
+
+
+_MODEL_CAPABILITY_INDEX = _ModelCapabilityIndex()
+
+
+def _strip_extra_provider_from_model_name(model_name: str) -> str:
+    return model_name.split("/")[1] if "/" in model_name else model_name
+
+
+def _strip_colon_from_model_name(model_name: str) -> str:
+    return ":".join(model_name.split(":")[:-1]) if ":" in model_name else model_name
+
+
+def _candidate_model_keys(provider: str, model_name: str) -> list[str]:
+    stripped_model_name = _strip_extra_provider_from_model_name(model_name)
+
+    model_names = [
+        model_name,
+        # Remove leading extra provider. Usually for cases where user has a
+        # customer model proxy which appends another prefix
+        stripped_model_name,
+        # remove :XXXX from the end, if present. Needed for ollama.
+        _strip_colon_from_model_name(model_name),
+        _strip_colon_from_model_name(stripped_model_name),
+    ]
+    filtered_model_names = [name for name in model_names if name]
+
+    # First try all model names with provider prefix, then without
+    return [f"{provider}/{name}" for name in filtered_model_names] + (
+        filtered_model_names
+    )
+
+
+@lru_cache(maxsize=4096)
+def _resolve_model_capabilities(
+    generation: int, provider: str, model_name: str
+) -> ModelCapabilities | None:
+    index, _ = _MODEL_CAPABILITY_INDEX.get()
+    for model_key in _candidate_model_keys(provider, model_name):
+        capabilities = index.get(model_key)
+        if capabilities is not None:
+            return capabilities
+
+    logger.warning(f"No litellm entry found for {provider}/{model_name}")
+    return None
+
+
+def get_model_capabilities(
+    model_name: str, model_provider: str
+) -> ModelCapabilities | None:
+    _, generation = _MODEL_CAPABILITY_INDEX.get()
+    return _resolve_model_capabilities(generation, model_provider, model_name)
+
+
+def refresh_model_capability_index() -> None:
+    """Rebuilds the index, e.g. after models were registered with litellm"""
+    _MODEL_CAPABILITY_INDEX.refresh()
+    _resolve_model_capabilities.cache_clear()
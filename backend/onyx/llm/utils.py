@@ -1,9 +1,7 @@
-import copy
 import io
 import json
 from collections.abc import Callable
 from collections.abc import Iterator
-from functools import lru_cache
 from typing import Any
 from typing import cast
 from typing import TYPE_CHECKING
@@ -44,6 +42,7 @@ from onyx.file_processing.extract_file_text import read_pdf_file
 from onyx.file_store.models import ChatFileType
 from onyx.file_store.models import InMemoryChatFile
 from onyx.llm.interfaces import LLM
+from onyx.llm.model_capabilities import get_model_capabilities
 from onyx.prompts.chat_prompts import CONTEXTUAL_RAG_TOKEN_ESTIMATE
 from onyx.prompts.chat_prompts import DOCUMENT_SUMMARY_TOKEN_ESTIMATE
 from onyx.prompts.constants import CODE_BLOCK_PAT
@@ -331,28 +330,29 @@ _IMG_TOKENS = 85
 
 
 def check_message_tokens(
-    message: BaseMessage, encode_fn: Callable[[str], list] | None = None
+    message: BaseMessage, count_fn: Callable[[str], int] | None = None
 ) -> int:
+    """`count_fn` returns the number of tokens of a text, defaults to
+    `check_number_of_tokens`."""
+    count_tokens = count_fn or check_number_of_tokens
     if isinstance(message.content, str):
-        return check_number_of_tokens(message.content, encode_fn)
+        return count_tokens(message.content)
 
     total_tokens = 0
     for part in message.content:
         if isinstance(part, str):
-            total_tokens += check_number_of_tokens(part, encode_fn)
+            total_tokens += count_tokens(part)
             continue
 
         if part["type"] == "text":
-            total_tokens += check_number_of_tokens(part["text"], encode_fn)
+            total_tokens += count_tokens(part["text"])
         elif part["type"] == "image_url":
             total_tokens += _IMG_TOKENS
 
     if isinstance(message, AIMessage) and message.tool_calls:
         for tool_call in message.tool_calls:
-            total_tokens += check_number_of_tokens(
-                json.dumps(tool_call["args"]), encode_fn
-            )
-            total_tokens += check_number_of_tokens(tool_call["name"], encode_fn)
+            total_tokens += count_tokens(json.dumps(tool_call["args"]))
+            total_tokens += count_tokens(tool_call["name"])
 
     return total_tokens
 
@@ -385,71 +385,6 @@ def test_llm(llm: LLM) -> str | None:
     return error_msg
 
 
-@lru_cache(maxsize=1)  # the copy.deepcopy is expensive, so we cache the result
-def get_model_map() -> dict:
-    starting_map = copy.deepcopy(cast(dict, litellm.model_cost))
-
-    # NOTE: we could add additional models here in the future,
-    # but for now there is no point. Ollama allows the user to
-    # to specify their desired max context window, and it's
-    # unlikely to be standard across users even for the same model
-    # (it heavily depends on their hardware). For now, we'll just
-    # rely on GEN_AI_MODEL_FALLBACK_MAX_TOKENS to cover this.
-    # for model_name in [
-    #     "llama3.2",
-    #     "llama3.2:1b",
-    #     "llama3.2:3b",
-    #     "llama3.2:11b",
-    #     "llama3.2:90b",
-    # ]:
-    #     starting_map[f"ollama/{model_name}"] = {
-    #         "max_tokens": 128000,
-    #         "max_input_tokens": 128000,
-    #         "max_output_tokens": 128000,
-    #     }
-
-    return starting_map
-
-
-def _strip_extra_provider_from_model_name(model_name: str) -> str:
-    return model_name.split("/")[1] if "/" in model_name else model_name
-
-
-def _strip_colon_from_model_name(model_name: str) -> str:
-    return ":".join(model_name.split(":")[:-1]) if ":" in model_name else model_name
-
-
-def _find_model_obj(model_map: dict, provider: str, model_name: str) -> dict | None:
-    stripped_model_name = _strip_extra_provider_from_model_name(model_name)
-
-    model_names = [
-        model_name,
-        _strip_extra_provider_from_model_name(model_name),
-        # Remove leading extra provider. Usually for cases where user has a
-        # customer model proxy which appends another prefix
-        # remove :XXXX from the end, if present. Needed for ollama.
-        _strip_colon_from_model_name(model_name),
-        _strip_colon_from_model_name(stripped_model_name),
-    ]
-
-    # Filter out None values and deduplicate model names
-    filtered_model_names = [name for name in model_names if name]
-
-    # First try all model names with provider prefix
-    for model_name in filtered_model_names:
-        model_obj = model_map.get(f"{provider}/{model_name}")
-        if model_obj:
-            return model_obj
-
-    # Then try all model names without provider prefix
-    for model_name in filtered_model_names:
-        model_obj = model_map.get(model_name)
-        if model_obj:
-            return model_obj
-
-    return None
-
-
 def get_llm_contextual_cost(
     llm: LLM,
 ) -> float:
@@ -526,7 +461,6 @@ def get_llm_contextual_cost(
 
 
 def get_llm_max_tokens(
-    model_map: dict,
     model_name: str,
     model_provider: str,
 ) -> int:
@@ -536,65 +470,43 @@ def get_llm_max_tokens(
         logger.info(f"Using override GEN_AI_MAX_TOKENS: {GEN_AI_MAX_TOKENS}")
         return GEN_AI_MAX_TOKENS
 
-    try:
-        model_obj = _find_model_obj(
-            model_map,
-            model_provider,
-            model_name,
-        )
-        if not model_obj:
-            raise RuntimeError(
-                f"No litellm entry found for {model_provider}/{model_name}"
-            )
+    capabilities = get_model_capabilities(model_name, model_provider)
+    if capabilities is None:
+        return GEN_AI_MODEL_FALLBACK_MAX_TOKENS
 
-        if "max_input_tokens" in model_obj:
-            max_tokens = model_obj["max_input_tokens"]
-            return max_tokens
+    if capabilities.max_input_tokens is not None:
+        return capabilities.max_input_tokens
 
-        if "max_tokens" in model_obj:
-            max_tokens = model_obj["max_tokens"]
-            return max_tokens
+    if capabilities.max_tokens is not None:
+        return capabilities.max_tokens
 
-        logger.error(f"No max tokens found for LLM: {model_name}")
-        raise RuntimeError("No max tokens found for LLM")
-    except Exception:
-        logger.exception(
-            f"Failed to get max tokens for LLM with name {model_name}. Defaulting to {GEN_AI_MODEL_FALLBACK_MAX_TOKENS}."
-        )
-        return GEN_AI_MODEL_FALLBACK_MAX_TOKENS
+    logger.error(
+        f"No max tokens found for LLM: {model_name}. "
+        f"Defaulting to {GEN_AI_MODEL_FALLBACK_MAX_TOKENS}."
+    )
+    return GEN_AI_MODEL_FALLBACK_MAX_TOKENS
 
 
 def get_llm_max_output_tokens(
-    model_map: dict,
     model_name: str,
     model_provider: str,
 ) -> int:
     """Best effort attempt to get the max output tokens for the LLM"""
-    try:
-        model_obj = model_map.get(f"{model_provider}/{model_name}")
-        if not model_obj:
-            model_obj = model_map[model_name]
-        else:
-            pass
-
-        if "max_output_tokens" in model_obj:
-            max_output_tokens = model_obj["max_output_tokens"]
-            return max_output_tokens
+    capabilities = get_model_capabilities(model_name, model_provider)
+    if capabilities is not None:
+        if capabilities.max_output_tokens is not None:
+            return capabilities.max_output_tokens
 
         # Fallback to a fraction of max_tokens if max_output_tokens is not specified
-        if "max_tokens" in model_obj:
-            max_output_tokens = int(model_obj["max_tokens"] * 0.1)
-            return max_output_tokens
+        if capabilities.max_tokens is not None:
+            return int(capabilities.max_tokens * 0.1)
 
-        logger.error(f"No max output tokens found for LLM: {model_name}")
-        raise RuntimeError("No max output tokens found for LLM")
-    except Exception:
-        default_output_tokens = int(GEN_AI_MODEL_FALLBACK_MAX_TOKENS)
-        logger.exception(
-            f"Failed to get max output tokens for LLM with name {model_name}. "
-            f"Defaulting to {default_output_tokens} (fallback max tokens)."
-        )
-        return default_output_tokens
+    default_output_tokens = int(GEN_AI_MODEL_FALLBACK_MAX_TOKENS)
+    logger.error(
+        f"No max output tokens found for LLM: {model_name}. "
+        f"Defaulting to {default_output_tokens} (fallback max tokens)."
+    )
+    return default_output_tokens
 
 
 def get_max_input_tokens(
@@ -607,14 +519,11 @@ def get_max_input_tokens(
     # and there is no other interface to get what we want. This should be okay though, since the
     # `model_cost` dict is a named public interface:
     # https://litellm.vercel.app/docs/completion/token_usage#7-model_cost
-    # model_map is  litellm.model_cost
-    litellm_model_map = get_model_map()
-
+    # The capability index is built from litellm.model_cost
     input_toks = (
         get_llm_max_tokens(
             model_name=model_name,
             model_provider=model_provider,
-            model_map=litellm_model_map,
         )
         - output_tokens
     )
@@ -644,23 +553,8 @@ def get_max_input_tokens_from_llm_provider(
 
 
 def model_supports_image_input(model_name: str, model_provider: str) -> bool:
-    model_map = get_model_map()
-    try:
-        model_obj = _find_model_obj(
-            model_map,
-            model_provider,
-            model_name,
-        )
-        if not model_obj:
-            raise RuntimeError(
-                f"No litellm entry found for {model_provider}/{model_name}"
-            )
-        return model_obj.get("supports_vision", False)
-    except Exception:
-        logger.exception(
-            f"Failed to get model object for {model_provider}/{model_name}"
-        )
-        return False
+    capabilities = get_model_capabilities(model_name, model_provider)
+    return capabilities.supports_vision if capabilities else False
 
 
 def model_is_reasoning_model(model_name: str) -> bool:
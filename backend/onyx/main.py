@@ -48,6 +48,7 @@ from onyx.configs.constants import POSTGRES_WEB_APP_NAME
 from onyx.db.engine import get_session_context_manager
 from onyx.db.engine import SqlEngine
 from onyx.db.engine import warm_up_connections
+from onyx.document_index.vespa.query_client import VespaQueryClientPool
 from onyx.server.api_key.api import router as api_key_router
 from onyx.server.auth_check import check_router_auth
 from onyx.server.documents.cc_pair import router as cc_pair_router
@@ -248,6 +249,9 @@ async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
 
     SqlEngine.reset_engine()
 
+    VespaQueryClientPool.close()
+    await VespaQueryClientPool.aclose()
+
     if AUTH_RATE_LIMITING_ENABLED:
         await close_auth_limiter()
 
@@ -0,0 +1,384 @@
+"""Content-hash keyed embedding caches, used for indexing and for search queries.
+
+An embedding is a pure function of the model configuration and the exact text, so
+re-indexing a document whose chunks have not changed (e.g. a Confluence page where a
+single paragraph was edited) does not need to go back to the embedding provider for
+the unchanged chunks.
+
+Keys are built from a "namespace" which captures everything about the model config
+that can change the resulting vector (model, provider, normalization, prefix,
+reduced dimension, text type, max sequence length) + a hash of the exact text.
+"""
+
+import hashlib
+import threading
+import time
+from abc import ABC
+from abc import abstractmethod
+from array import array
+from collections import OrderedDict
+from typing import cast
+
+from redis import Redis
+from redis.exceptions import RedisError
+
+from onyx.configs.app_configs import EMBEDDING_CACHE_BACKEND
+from onyx.configs.app_configs import EMBEDDING_CACHE_MAX_ENTRIES
+from onyx.configs.app_configs import EMBEDDING_CACHE_MEMORY_MAX_ENTRIES
+from onyx.configs.app_configs import EMBEDDING_CACHE_TTL_SECONDS
+from onyx.configs.app_configs import QUERY_EMBEDDING_CACHE_ENABLED
+from onyx.configs.app_configs import QUERY_EMBEDDING_CACHE_LOCAL_MAX_ENTRIES
+from onyx.configs.app_configs import QUERY_EMBEDDING_CACHE_LOCAL_TTL_SECONDS
+from onyx.configs.app_configs import QUERY_EMBEDDING_CACHE_MAX_ENTRIES
+from onyx.configs.app_configs import QUERY_EMBEDDING_CACHE_TTL_SECONDS
+from onyx.redis.redis_pool import get_raw_redis_client
+from onyx.utils.logger import setup_logger
+from shared_configs.contextvars import get_current_tenant_id
+from shared_configs.enums import EmbeddingProvider
+from shared_configs.enums import EmbedTextType
+from shared_configs.model_server_models import Embedding
+
+logger = setup_logger()
+
+EMBEDDING_CACHE_BACKEND_MEMORY = "memory"
+EMBEDDING_CACHE_BACKEND_REDIS = "redis"
+
+
+def build_embedding_cache_namespace(
+    *,
+    model_name: str | None,
+    provider_type: EmbeddingProvider | None,
+    deployment_name: str | None,
+    normalize: bool,
+    prefix: str | None,
+    reduced_dimension: int | None,
+    text_type: EmbedTextType,
+    max_seq_length: int,
+) -> str:
+    """Identifies everything about an embedding request (besides the text itself)
+    which can change the resulting vector."""
+    namespace_parts = [
+        str(provider_type.value if provider_type else None),
+        str(model_name),
+        str(deployment_name),
+        str(normalize),
+        str(prefix),
+        str(reduced_dimension),
+        text_type.value,
+        str(max_seq_length),
+    ]
+    return hashlib.sha256("\x1f".join(namespace_parts).encode()).hexdigest()[:16]
+
+
+def build_embedding_cache_key(namespace: str, text: str) -> str:
+    return f"{namespace}:{hashlib.sha256(text.encode()).hexdigest()}"
+
+
+def serialize_embedding(embedding: Embedding) -> bytes:
+    # embeddings are float32 on the model server side anyways
+    return array("f", embedding).tobytes()
+
+
+def deserialize_embedding(data: bytes) -> Embedding:
+    return array("f", data).tolist()
+
+
+class EmbeddingCacheStats:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def record(self, hits: int, misses: int) -> None:
+        with self._lock:
+            self.hits += hits
+            self.misses += misses
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def __str__(self) -> str:
+        return f"hits={self.hits} misses={self.misses} hit_rate={self.hit_rate:.2%}"
+
+
+class EmbeddingCache(ABC):
+    def __init__(self) -> None:
+        self.stats = EmbeddingCacheStats()
+
+    @abstractmethod
+    def _get_many(self, keys: list[str]) -> list[Embedding | None]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def put_many(self, entries: dict[str, Embedding]) -> None:
+        raise NotImplementedError
+
+    def get_many(self, keys: list[str]) -> list[Embedding | None]:
+        """Returns the cached embedding for each key (None on a miss), in order."""
+        if not keys:
+            return []
+
+        embeddings = self._get_many(keys)
+        hits = sum(1 for embedding in embeddings if embedding is not None)
+        self.stats.record(hits=hits, misses=len(keys) - hits)
+        return embeddings
+
+
+class InMemoryEmbeddingCache(EmbeddingCache):
+    """Process local LRU cache with an optional TTL."""
+
+    def __init__(self, max_entries: int, ttl_seconds: float | None = None) -> None:
+        super().__init__()
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        # key -> (insert time, embedding)
+        self._entries: OrderedDict[str, tuple[float, Embedding]] = OrderedDict()
+
+    def _get_many(self, keys: list[str]) -> list[Embedding | None]:
+        now = time.monotonic()
+        embeddings: list[Embedding | None] = []
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is None:
+                    embeddings.append(None)
+                    continue
+
+                inserted_at, embedding = entry
+                if (
+                    self.ttl_seconds is not None
+                    and now - inserted_at > self.ttl_seconds
+                ):
+                    del self._entries[key]
+                    embeddings.append(None)
+                    continue
+
+                self._entries.move_to_end(key)
+                embeddings.append(embedding)
+        return embeddings
+
+    def put_many(self, entries: dict[str, Embedding]) -> None:
+        now = time.monotonic()
+        with self._lock:
+            for key, embedding in entries.items():
+                self._entries[key] = (now, embedding)
+                self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class RedisEmbeddingCache(EmbeddingCache):
+    """Persistent cache shared by all indexing workers. Evicts the least recently
+    used entries once more than `max_entries` are stored for the tenant.
+
+    Failures to talk to Redis are treated as cache misses, the cache should never be
+    the reason indexing fails."""
+
+    KEY_PREFIX = "embedding_cache"
+
+    def __init__(
+        self,
+        tenant_id: str,
+        max_entries: int,
+        ttl_seconds: int | None = None,
+        redis_client: Redis | None = None,
+        key_prefix: str = KEY_PREFIX,
+    ) -> None:
+        super().__init__()
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        # keys are prefixed manually since pipelines bypass the tenant prefixing
+        self.redis_client = redis_client or get_raw_redis_client()
+        self.key_prefix = f"{tenant_id}:{key_prefix}"
+        # sorted set of cache keys, scored by last access time
+        self.lru_key = f"{self.key_prefix}:lru"
+
+    def _entry_key(self, key: str) -> str:
+        return f"{self.key_prefix}:entry:{key}"
+
+    def _get_many(self, keys: list[str]) -> list[Embedding | None]:
+        try:
+            raw_values = cast(
+                list[bytes | None],
+                self.redis_client.mget([self._entry_key(key) for key in keys]),
+            )
+
+            hit_keys = [key for key, value in zip(keys, raw_values) if value]
+            if hit_keys:
+                now = time.time()
+                self.redis_client.zadd(self.lru_key, {key: now for key in hit_keys})
+        except RedisError:
+            logger.exception("Failed to read from the embedding cache")
+            return [None] * len(keys)
+
+        return [deserialize_embedding(value) if value else None for value in raw_values]
+
+    def put_many(self, entries: dict[str, Embedding]) -> None:
+        if not entries:
+            return
+
+        try:
+            now = time.time()
+            pipe = self.redis_client.pipeline(transaction=False)
+            for key, embedding in entries.items():
+                pipe.set(
+                    self._entry_key(key),
+                    serialize_embedding(embedding),
+                    ex=self.ttl_seconds,
+                )
+            pipe.zadd(self.lru_key, {key: now for key in entries})
+            pipe.zcard(self.lru_key)
+            num_entries = pipe.execute()[-1]
+
+            num_to_evict = num_entries - self.max_entries
+            if num_to_evict > 0:
+                evicted = cast(
+                    list[tuple[bytes, float]],
+                    self.redis_client.zpopmin(self.lru_key, num_to_evict),
+                )
+                if evicted:
+                    self.redis_client.delete(
+                        *[self._entry_key(key.decode()) for key, _ in evicted]
+                    )
+        except RedisError:
+            logger.exception("Failed to write to the embedding cache")
+
+    def clear(self) -> None:
+        """Removes every entry of this cache. Entries are deleted in batches so that a
+        large cache does not block Redis."""
+        try:
+            while True:
+                evicted = cast(
+                    list[tuple[bytes, float]],
+                    self.redis_client.zpopmin(self.lru_key, 1000),
+                )
+                if not evicted:
+                    break
+                self.redis_client.delete(
+                    *[self._entry_key(key.decode()) for key, _ in evicted]
+                )
+        except RedisError:
+            logger.exception("Failed to clear the embedding cache")
+
+
+class TieredEmbeddingCache(EmbeddingCache):
+    """A small process local cache in front of a shared one. Hits in the shared cache
+    are copied into the local cache, writes go to both."""
+
+    def __init__(self, local: EmbeddingCache, shared: EmbeddingCache) -> None:
+        super().__init__()
+        self.local = local
+        self.shared = shared
+
+    def _get_many(self, keys: list[str]) -> list[Embedding | None]:
+        embeddings = self.local.get_many(keys)
+
+        missing_indices = [
+            i for i, embedding in enumerate(embeddings) if embedding is None
+        ]
+        if not missing_indices:
+            return embeddings
+
+        shared_embeddings = self.shared.get_many([keys[i] for i in missing_indices])
+        shared_hits: dict[str, Embedding] = {}
+        for i, embedding in zip(missing_indices, shared_embeddings):
+            if embedding is not None:
+                embeddings[i] = embedding
+                shared_hits[keys[i]] = embedding
+
+        if shared_hits:
+            self.local.put_many(shared_hits)
+        return embeddings
+
+    def put_many(self, entries: dict[str, Embedding]) -> None:
+        self.local.put_many(entries)
+        self.shared.put_many(entries)
+
+
+_memory_caches: dict[str, InMemoryEmbeddingCache] = {}
+_memory_caches_lock = threading.Lock()
+
+
+def get_embedding_cache(tenant_id: str | None = None) -> EmbeddingCache | None:
+    """Returns the configured embedding cache, or None if caching is disabled."""
+    tenant_id = tenant_id or get_current_tenant_id()
+
+    if EMBEDDING_CACHE_BACKEND == EMBEDDING_CACHE_BACKEND_REDIS:
+        return RedisEmbeddingCache(
+            tenant_id=tenant_id,
+            max_entries=EMBEDDING_CACHE_MAX_ENTRIES,
+            ttl_seconds=EMBEDDING_CACHE_TTL_SECONDS or None,
+        )
+
+    if EMBEDDING_CACHE_BACKEND == EMBEDDING_CACHE_BACKEND_MEMORY:
+        with _memory_caches_lock:
+            if tenant_id not in _memory_caches:
+                _memory_caches[tenant_id] = InMemoryEmbeddingCache(
+                    max_entries=EMBEDDING_CACHE_MEMORY_MAX_ENTRIES,
+                    ttl_seconds=EMBEDDING_CACHE_TTL_SECONDS or None,
+                )
+            return _memory_caches[tenant_id]
+
+    if EMBEDDING_CACHE_BACKEND:
+        logger.warning(f"Unknown embedding cache backend: {EMBEDDING_CACHE_BACKEND}")
+    return None
+
+
+QUERY_EMBEDDING_CACHE_KEY_PREFIX = "query_embedding_cache"
+
+_query_memory_caches: dict[str, InMemoryEmbeddingCache] = {}
+
+
+def _get_local_query_embedding_cache(tenant_id: str) -> InMemoryEmbeddingCache:
+    with _memory_caches_lock:
+        if tenant_id not in _query_memory_caches:
+            _query_memory_caches[tenant_id] = InMemoryEmbeddingCache(
+                max_entries=QUERY_EMBEDDING_CACHE_LOCAL_MAX_ENTRIES,
+                ttl_seconds=QUERY_EMBEDDING_CACHE_LOCAL_TTL_SECONDS or None,
+            )
+        return _query_memory_caches[tenant_id]
+
+
+def get_query_embedding_cache(tenant_id: str | None = None) -> EmbeddingCache | None:
+    """Returns the cache used for search query embeddings, or None if disabled.
+    Queries are short and repeat a lot (Slack bots, suggested questions, agent
+    sub-questions), so a process local cache sits in front of the Redis one which is
+    shared by all api server workers."""
+    if not QUERY_EMBEDDING_CACHE_ENABLED:
+        return None
+
+    tenant_id = tenant_id or get_current_tenant_id()
+    return TieredEmbeddingCache(
+        local=_get_local_query_embedding_cache(tenant_id),
+        shared=RedisEmbeddingCache(
+            tenant_id=tenant_id,
+            max_entries=QUERY_EMBEDDING_CACHE_MAX_ENTRIES,
+            ttl_seconds=QUERY_EMBEDDING_CACHE_TTL_SECONDS or None,
+            key_prefix=QUERY_EMBEDDING_CACHE_KEY_PREFIX,
+        ),
+    )
+
+
+def clear_query_embedding_cache(tenant_id: str | None = None) -> None:
+    """Drops all cached query embeddings of the tenant. The cache keys include the
+    search settings, so this is not needed for correctness after a model swap, it
+    just frees up the space used by the old model's embeddings right away. Other
+    processes' local caches age out through their TTL."""
+    tenant_id = tenant_id or get_current_tenant_id()
+    _get_local_query_embedding_cache(tenant_id).clear()
+    RedisEmbeddingCache(
+        tenant_id=tenant_id,
+        max_entries=QUERY_EMBEDDING_CACHE_MAX_ENTRIES,
+        key_prefix=QUERY_EMBEDDING_CACHE_KEY_PREFIX,
+    ).clear()
@@ -0,0 +1,117 @@
+"""Cache of cross-encoder scores for (query, chunk) pairs.
+
+A rerank score is a pure function of the reranking model and the exact query / passage
+pair. Agent search reranks overlapping chunks for many near duplicate sub-queries and
+refined answers rerank the same pairs again, so only the pairs which were not scored
+recently need to go to the reranking model.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from onyx.configs.app_configs import RERANK_SCORE_CACHE_ENABLED
+from onyx.configs.app_configs import RERANK_SCORE_CACHE_MAX_ENTRIES
+from onyx.configs.app_configs import RERANK_SCORE_CACHE_TTL_SECONDS
+from onyx.context.search.utils import normalize_query
+from shared_configs.enums import RerankerProvider
+
+
+def build_rerank_score_cache_key(
+    *,
+    model_name: str,
+    provider_type: RerankerProvider | None,
+    api_url: str | None,
+    query: str,
+    document_id: str,
+    chunk_id: int,
+    passage: str,
+) -> str:
+    """The passage (title + content of the chunk) is part of the key, an updated chunk
+    does not get the score of its previous content."""
+    model_part = "\x1f".join(
+        [str(provider_type.value if provider_type else None), model_name, str(api_url)]
+    )
+    pair_part = "\x1f".join(
+        [
+            normalize_query(query),
+            document_id,
+            str(chunk_id),
+            hashlib.sha256(passage.encode()).hexdigest(),
+        ]
+    )
+    return hashlib.sha256(f"{model_part}\x1e{pair_part}".encode()).hexdigest()
+
+
+class RerankScoreCache:
+    """Process local LRU cache with an optional TTL."""
+
+    def __init__(self, max_entries: int, ttl_seconds: float | None = None) -> None:
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        # key -> (insert time, score)
+        self._entries: OrderedDict[str, tuple[float, float]] = OrderedDict()
+
+    def get_many(self, keys: list[str]) -> list[float | None]:
+        """Returns the cached score for each key (None on a miss), in order."""
+        now = time.monotonic()
+        scores: list[float | None] = []
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is None:
+                    scores.append(None)
+                    continue
+
+                inserted_at, score = entry
+                if (
+                    self.ttl_seconds is not None
+                    and now - inserted_at > self.ttl_seconds
+                ):
+                    del self._entries[key]
+                    scores.append(None)
+                    continue
+
+                self._entries.move_to_end(key)
+                scores.append(score)
+        return scores
+
+    def put_many(self, entries: dict[str, float]) -> None:
+        now = time.monotonic()
+        with self._lock:
+            for key, score in entries.items():
+                self._entries[key] = (now, score)
+                self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+_rerank_score_cache: RerankScoreCache | None = None
+_rerank_score_cache_lock = threading.Lock()
+
+
+def get_rerank_score_cache() -> RerankScoreCache | None:
+    """Returns the process wide rerank score cache, or None if disabled. Scores do not
+    depend on the tenant, a hit needs the exact same query and chunk content."""
+    global _rerank_score_cache
+
+    if not RERANK_SCORE_CACHE_ENABLED:
+        return None
+
+    with _rerank_score_cache_lock:
+        if _rerank_score_cache is None:
+            _rerank_score_cache = RerankScoreCache(
+                max_entries=RERANK_SCORE_CACHE_MAX_ENTRIES,
+                ttl_seconds=RERANK_SCORE_CACHE_TTL_SECONDS or None,
+            )
+        return _rerank_score_cache
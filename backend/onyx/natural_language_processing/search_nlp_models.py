@@ -30,6 +30,9 @@ from onyx.natural_language_processing.exceptions import (
 from onyx.natural_language_processing.utils import get_tokenizer
 from onyx.natural_language_processing.utils import tokenizer_trim_content
 from onyx.utils.logger import setup_logger
+from shared_configs.configs import EMBEDDING_BATCH_MAX_TOKENS
+from shared_configs.configs import EMBEDDING_LENGTH_BUCKETED_MAX_BATCH_SIZE
+from shared_configs.configs import EMBEDDING_LENGTH_BUCKETING_ENABLED
 from shared_configs.configs import INDEXING_MODEL_SERVER_HOST
 from shared_configs.configs import INDEXING_MODEL_SERVER_PORT
 from shared_configs.configs import MODEL_SERVER_HOST
@@ -48,6 +51,7 @@ from shared_configs.model_server_models import IntentRequest
 from shared_configs.model_server_models import IntentResponse
 from shared_configs.model_server_models import RerankRequest
 from shared_configs.model_server_models import RerankResponse
+from shared_configs.utils import batch_indices_by_token_budget
 from shared_configs.utils import batch_list
 
 logger = setup_logger()
@@ -173,6 +177,25 @@ class EmbeddingModel:
         except requests.RequestException as e:
             raise HTTPError(f"Request failed: {str(e)}") from e
 
+    def _get_batch_indices(
+        self, texts: list[str], batch_size: int, max_seq_length: int
+    ) -> list[list[int]]:
+        """Local models pad each batch to its longest text, so when enabled, texts of
+        similar token length are batched together under a token budget. API based
+        models are billed / rate limited per token regardless, so they keep fixed
+        size batches."""
+        if not EMBEDDING_LENGTH_BUCKETING_ENABLED or self.provider_type:
+            return batch_list(list(range(len(texts))), batch_size)
+
+        lengths = [
+            min(len(self.tokenizer.encode(text)), max_seq_length) for text in texts
+        ]
+        return batch_indices_by_token_budget(
+            lengths,
+            max_batch_tokens=EMBEDDING_BATCH_MAX_TOKENS or batch_size * max_seq_length,
+            max_batch_size=max(batch_size, EMBEDDING_LENGTH_BUCKETED_MAX_BATCH_SIZE),
+        )
+
     def _batch_encode_texts(
         self,
         texts: list[str],
@@ -183,7 +206,8 @@ class EmbeddingModel:
         tenant_id: str | None = None,
         request_id: str | None = None,
     ) -> list[Embedding]:
-        text_batches = batch_list(texts, batch_size)
+        index_batches = self._get_batch_indices(texts, batch_size, max_seq_length)
+        text_batches = [[texts[idx] for idx in batch] for batch in index_batches]
 
         logger.debug(
             f"Encoding {len(texts)} texts in {len(text_batches)} batches for local model"
@@ -281,7 +305,13 @@ class EmbeddingModel:
                 if self.callback:
                     self.callback.progress("_batch_encode_texts", 1)
 
-        return embeddings
+        # batches may not be in the original order of the texts (length bucketing)
+        ordered_embeddings: list[Embedding] = [[] for _ in texts]
+        for idx, embedding in zip(
+            (idx for batch in index_batches for idx in batch), embeddings
+        ):
+            ordered_embeddings[idx] = embedding
+        return ordered_embeddings
 
     def encode(
         self,
@@ -0,0 +1,89 @@
+"""Cache of the number of tokens in a text, per tokenizer family.
+
+The same texts are counted over and over: the system / user prompts whenever a prompt
+is built, the chat history on every turn, and the sections when they are pruned to fit
+the context window, once more for every sub-question of agent search. A token count is
+a pure function of the tokenizer vocabulary and the text, so it is only computed once.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+
+from onyx.configs.app_configs import TOKEN_COUNT_CACHE_ENABLED
+from onyx.configs.app_configs import TOKEN_COUNT_CACHE_MAX_ENTRIES
+from onyx.natural_language_processing.utils import BaseTokenizer
+
+
+def build_token_count_cache_key(tokenizer_family: str, text: str) -> bytes:
+    """Only a digest of the text is kept, cached sections / prompts can be long."""
+    hasher = hashlib.blake2b(digest_size=16)
+    hasher.update(tokenizer_family.encode())
+    hasher.update(b"\x1e")
+    hasher.update(text.encode(errors="surrogatepass"))
+    return hasher.digest()
+
+
+class TokenCountCache:
+    """Process local LRU cache."""
+
+    def __init__(self, max_entries: int) -> None:
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[bytes, int] = OrderedDict()
+
+    def get(self, key: bytes) -> int | None:
+        with self._lock:
+            token_count = self._entries.get(key)
+            if token_count is not None:
+                self._entries.move_to_end(key)
+            return token_count
+
+    def put(self, key: bytes, token_count: int) -> None:
+        with self._lock:
+            self._entries[key] = token_count
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+_token_count_cache: TokenCountCache | None = None
+_token_count_cache_lock = threading.Lock()
+
+
+def get_token_count_cache() -> TokenCountCache | None:
+    """Returns the process wide token count cache, or None if disabled."""
+    global _token_count_cache
+
+    if not TOKEN_COUNT_CACHE_ENABLED:
+        return None
+
+    with _token_count_cache_lock:
+        if _token_count_cache is None:
+            _token_count_cache = TokenCountCache(
+                max_entries=TOKEN_COUNT_CACHE_MAX_ENTRIES
+            )
+        return _token_count_cache
+
+
+def count_tokens(text: str, tokenizer: BaseTokenizer) -> int:
+    """Same as `len(tokenizer.encode(text))`, cached if the tokenizer has a family."""
+    tokenizer_family = tokenizer.family
+    cache = get_token_count_cache() if tokenizer_family is not None else None
+    if cache is None or tokenizer_family is None:
+        return len(tokenizer.encode(text))
+
+    key = build_token_count_cache_key(tokenizer_family, text)
+    token_count = cache.get(key)
+    if token_count is None:
+        token_count = len(tokenizer.encode(text))
+        cache.put(key, token_count)
+    return token_count
@@ -23,6 +23,12 @@ os.environ["TRANSFORMERS_NO_ADVISORY_WARNINGS"] = "1"
 
 
 class BaseTokenizer(ABC):
+    @property
+    def family(self) -> str | None:
+        """Identifies the vocabulary, tokenizers of the same family encode a string
+        into the same tokens. Token counts are only cached for known families."""
+        return None
+
     @abstractmethod
     def encode(self, string: str) -> list[int]:
         pass
@@ -35,6 +41,13 @@ class BaseTokenizer(ABC):
     def decode(self, tokens: list[int]) -> str:
         pass
 
+    def token_offsets(self, string: str) -> list[int]:
+        """Character offset in `string` at which each token of `encode(string)` starts.
+        Tokenizers which can't map tokens back onto the string spread the tokens evenly
+        over it, which keeps token counts of long spans close to exact."""
+        num_tokens = len(self.encode(string))
+        return [(ind * len(string)) // num_tokens for ind in range(num_tokens)]
+
 
 class TiktokenTokenizer(BaseTokenizer):
     _instances: dict[str, "TiktokenTokenizer"] = {}
@@ -50,6 +63,11 @@ class TiktokenTokenizer(BaseTokenizer):
 
             self.encoder = tiktoken.encoding_for_model(model_name)
 
+    @property
+    def family(self) -> str | None:
+        # e.g. all models using o200k_base share their token counts
+        return f"tiktoken:{self.encoder.name}"
+
     def encode(self, string: str) -> list[int]:
         # this ignores special tokens that the model is trained on, see encode_ordinary for details
         return self.encoder.encode_ordinary(string)
@@ -68,11 +86,26 @@ class TiktokenTokenizer(BaseTokenizer):
     def decode(self, tokens: list[int]) -> str:
         return self.encoder.decode(tokens)
 
+    def token_offsets(self, string: str) -> list[int]:
+        try:
+            decoded, offsets = self.encoder.decode_with_offsets(self.encode(string))
+        except Exception:
+            return super().token_offsets(string)
+        # e.g. lone surrogates don't survive the round trip
+        if decoded != string:
+            return super().token_offsets(string)
+        return offsets
+
 
 class HuggingFaceTokenizer(BaseTokenizer):
     def __init__(self, model_name: str):
+        self.model_name = model_name
         self.encoder: Tokenizer = Tokenizer.from_pretrained(model_name)
 
+    @property
+    def family(self) -> str | None:
+        return f"huggingface:{self.model_name}"
+
     def _safer_encode(self, string: str) -> Encoding:
         """
         Encode a string using the HuggingFaceTokenizer, but if it fails,
@@ -96,6 +129,21 @@ class HuggingFaceTokenizer(BaseTokenizer):
     def decode(self, tokens: list[int]) -> str:
         return self.encoder.decode(tokens)
 
+    def token_offsets(self, string: str) -> list[int]:
+        try:
+            encoding = self.encoder.encode(string, add_special_tokens=False)
+        except Exception:
+            # the ascii fallback of _safer_encode has offsets into a different string
+            return super().token_offsets(string)
+
+        offsets: list[int] = []
+        last_start = 0
+        for start, _ in encoding.offsets:
+            # tokens inserted by the tokenizer (e.g. a leading "▁") may point back
+            last_start = max(last_start, start)
+            offsets.append(last_start)
+        return offsets
+
 
 _TOKENIZER_CACHE: dict[tuple[EmbeddingProvider | None, str | None], BaseTokenizer] = {}
 
@@ -207,5 +255,6 @@ def tokenizer_trim_chunks(
         if len(new_content) != len(chunk.content):
             new_chunk = copy(chunk)
             new_chunk.content = new_content
+            new_chunk.content_token_counts = {}
             new_chunks[ind] = new_chunk
     return new_chunks
@@ -1,4 +1,5 @@
 import time
+from collections.abc import Iterator
 from typing import cast
 from uuid import uuid4
 
@@ -9,6 +10,7 @@ from redis.lock import Lock as RedisLock
 from sqlalchemy.orm import Session
 
 from onyx.configs.app_configs import DB_YIELD_PER_DEFAULT
+from onyx.configs.app_configs import VESPA_SYNC_BATCH_SIZE
 from onyx.configs.constants import CELERY_VESPA_SYNC_BEAT_LOCK_TIMEOUT
 from onyx.configs.constants import OnyxCeleryPriority
 from onyx.configs.constants import OnyxCeleryQueues
@@ -19,6 +21,7 @@ from onyx.db.document import (
     construct_document_id_select_for_connector_credential_pair_by_needs_sync,
 )
 from onyx.redis.redis_object_helper import RedisObjectHelper
+from onyx.utils.batching import batch_generator
 
 
 class RedisConnectorCredentialPair(RedisObjectHelper):
@@ -63,7 +66,8 @@ class RedisConnectorCredentialPair(RedisObjectHelper):
         tenant_id: str,
     ) -> tuple[int, int] | None:
         """We can limit the number of tasks generated here, which is useful to prevent
-        one tenant from overwhelming the sync queue.
+        one tenant from overwhelming the sync queue. Each task syncs a batch of up to
+        VESPA_SYNC_BATCH_SIZE documents.
 
         This works because the dirty state of a document is in the DB, so more docs
         get picked up after the limited set of tasks is complete.
@@ -86,21 +90,27 @@ class RedisConnectorCredentialPair(RedisObjectHelper):
 
         num_docs = 0
 
-        for doc_id in db_session.scalars(stmt).yield_per(DB_YIELD_PER_DEFAULT):
-            doc_id = cast(str, doc_id)
-            current_time = time.monotonic()
-            if current_time - last_lock_time >= (
-                CELERY_VESPA_SYNC_BEAT_LOCK_TIMEOUT / 4
-            ):
-                lock.reacquire()
-                last_lock_time = current_time
+        def _doc_ids_to_sync() -> Iterator[str]:
+            nonlocal last_lock_time, num_docs
 
-            num_docs += 1
+            for doc_id in db_session.scalars(stmt).yield_per(DB_YIELD_PER_DEFAULT):
+                doc_id = cast(str, doc_id)
+                current_time = time.monotonic()
+                if current_time - last_lock_time >= (
+                    CELERY_VESPA_SYNC_BEAT_LOCK_TIMEOUT / 4
+                ):
+                    lock.reacquire()
+                    last_lock_time = current_time
 
-            # check if we should skip the document (typically because it's already syncing)
-            if doc_id in self.skip_docs:
-                continue
+                num_docs += 1
 
+                # check if we should skip the document (typically because it's already syncing)
+                if doc_id in self.skip_docs:
+                    continue
+
+                yield doc_id
+
+        for doc_ids in batch_generator(_doc_ids_to_sync(), VESPA_SYNC_BATCH_SIZE):
             # celery's default task id format is "dd32ded3-00aa-4884-8b21-42f8332e7fac"
             # the key for the result is "celery-task-meta-dd32ded3-00aa-4884-8b21-42f8332e7fac"
             # we prefix the task id so it's easier to keep track of who created the task
@@ -115,8 +125,8 @@ class RedisConnectorCredentialPair(RedisObjectHelper):
 
             # Priority on sync's triggered by new indexing should be medium
             celery_app.send_task(
-                OnyxCeleryTask.VESPA_METADATA_SYNC_TASK,
-                kwargs=dict(document_id=doc_id, tenant_id=tenant_id),
+                OnyxCeleryTask.VESPA_METADATA_SYNC_BATCH_TASK,
+                kwargs=dict(document_ids=doc_ids, tenant_id=tenant_id),
                 queue=OnyxCeleryQueues.VESPA_METADATA_SYNC,
                 task_id=custom_task_id,
                 priority=OnyxCeleryPriority.MEDIUM,
@@ -124,7 +134,7 @@ class RedisConnectorCredentialPair(RedisObjectHelper):
             )
 
             num_tasks_sent += 1
-            self.skip_docs.add(doc_id)
+            self.skip_docs.update(doc_ids)
 
             if num_tasks_sent >= max_tasks:
                 break
@@ -1,4 +1,5 @@
 import time
+from collections.abc import Iterable
 from datetime import datetime
 from typing import cast
 from uuid import uuid4
@@ -158,14 +159,16 @@ class RedisConnectorPrune:
 
     def generate_tasks(
         self,
-        documents_to_prune: set[str],
+        documents_to_prune: Iterable[str],
         celery_app: Celery,
         db_session: Session,
         lock: RedisLock | None,
     ) -> int | None:
         last_lock_time = time.monotonic()
 
-        async_results = []
+        # only the number of tasks is returned, the task results are not kept so that
+        # memory does not grow with the number of documents
+        num_tasks_sent = 0
         cc_pair = get_connector_credential_pair_from_id(
             db_session=db_session,
             cc_pair_id=int(self.id),
@@ -191,7 +194,7 @@ class RedisConnectorPrune:
             self.redis.sadd(self.taskset_key, custom_task_id)
 
             # Priority on sync's triggered by new indexing should be medium
-            result = celery_app.send_task(
+            celery_app.send_task(
                 OnyxCeleryTask.DOCUMENT_BY_CC_PAIR_CLEANUP_TASK,
                 kwargs=dict(
                     document_id=doc_id,
@@ -205,9 +208,9 @@ class RedisConnectorPrune:
                 ignore_result=True,
             )
 
-            async_results.append(result)
+            num_tasks_sent += 1
 
-        return len(async_results)
+        return num_tasks_sent
 
     def reset(self) -> None:
         self.redis.srem(OnyxRedisConstants.ACTIVE_FENCES, self.fence_key)
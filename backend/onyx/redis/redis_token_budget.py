@@ -0,0 +1,212 @@
+"""Per-minute token usage counters used to enforce the token rate limits.
+
+Each scope (the whole tenant, a user, a user group) has a Redis hash of
+`epoch minute -> tokens`, which is incremented when a chat message is written. The
+usage over each rate limit window is summed up inside Redis by a Lua script, so the
+check before every chat message does not need to aggregate the chat history in
+Postgres.
+
+A counter only exists once it was reconstructed from Postgres by a check (cold start,
+expired counter, or a rate limit with a longer period than the counter covers). Usage
+is not recorded for counters which do not exist, the reconstruction includes it.
+
+A reconstruction first claims the counter (an empty counter with a rebuild token),
+then reads Postgres and adds the usage on top of what was recorded in the meantime.
+So no usage recorded while Postgres is read is lost, at worst a message committed
+right around the claim is counted twice. If another check claimed the counter in the
+meantime, only the latest reconstruction is applied.
+"""
+
+import math
+from collections.abc import Sequence
+from datetime import datetime
+from typing import cast
+from uuid import UUID
+from uuid import uuid4
+
+from redis import Redis
+
+from onyx.redis.redis_pool import get_raw_redis_client
+
+TOKEN_BUDGET_SCOPE_GLOBAL = "global"
+
+# Besides the buckets, a counter has a "since" field (the first second from which its
+# buckets are complete) and while it is being reconstructed a "rebuild" field (the
+# token of the reconstruction in progress)
+_REBUILD_FIELD = "rebuild"
+
+# KEYS: counters of the scopes, ARGV[1]: epoch minute, ARGV[2]: number of tokens
+_RECORD_USAGE_SCRIPT = """
+for i = 1, #KEYS do
+    if redis.call("EXISTS", KEYS[i]) == 1 then
+        redis.call("HINCRBY", KEYS[i], ARGV[1], ARGV[2])
+    end
+end
+"""
+
+# KEYS[1]: counter of the scope, ARGV[1]: TTL of the counter in seconds,
+# ARGV[2..]: start of each window in epoch seconds, the first one is the earliest.
+# Returns the tokens used in each window, or nil if the counter does not cover the
+# earliest window. Buckets before the earliest window are dropped.
+_WINDOWED_USAGE_SCRIPT = """
+local since = redis.call("HGET", KEYS[1], "since")
+local earliest = tonumber(ARGV[2])
+if not since or tonumber(since) > earliest then
+    return false
+end
+
+local sums = {}
+for i = 2, #ARGV do
+    sums[i - 1] = 0
+end
+
+local stale = {}
+local fields = redis.call("HGETALL", KEYS[1])
+for j = 1, #fields, 2 do
+    if fields[j] ~= "since" and fields[j] ~= "rebuild" then
+        local bucket_start = tonumber(fields[j]) * 60
+        if bucket_start < earliest then
+            stale[#stale + 1] = fields[j]
+        else
+            local tokens = tonumber(fields[j + 1])
+            for i = 2, #ARGV do
+                if bucket_start >= tonumber(ARGV[i]) then
+                    sums[i - 1] = sums[i - 1] + tokens
+                end
+            end
+        end
+    end
+end
+
+for j = 1, #stale, 1000 do
+    redis.call("HDEL", KEYS[1], unpack(stale, j, math.min(j + 999, #stale)))
+end
+if #stale > 0 then
+    redis.call("HSET", KEYS[1], "since", ARGV[2])
+end
+redis.call("EXPIRE", KEYS[1], ARGV[1])
+return sums
+"""
+
+# KEYS[1]: counter of the scope, ARGV[1]: rebuild token, ARGV[2]: TTL of the counter in
+# seconds, ARGV[3]: since, ARGV[4..]: alternating epoch minute and number of tokens.
+# Returns 0 without touching the counter if it was claimed by another reconstruction.
+_RECONSTRUCT_SCRIPT = """
+if redis.call("HGET", KEYS[1], "rebuild") ~= ARGV[1] then
+    return 0
+end
+
+for i = 4, #ARGV, 2 do
+    redis.call("HINCRBY", KEYS[1], ARGV[i], ARGV[i + 1])
+end
+redis.call("HSET", KEYS[1], "since", ARGV[3])
+redis.call("HDEL", KEYS[1], "rebuild")
+redis.call("EXPIRE", KEYS[1], ARGV[2])
+return 1
+"""
+
+
+def user_token_budget_scope(user_id: UUID) -> str:
+    return f"user:{user_id}"
+
+
+def user_group_token_budget_scope(user_group_id: int) -> str:
+    return f"user_group:{user_group_id}"
+
+
+def _epoch_minute(time: datetime) -> int:
+    return int(time.timestamp()) // 60
+
+
+class RedisTokenBudget:
+    KEY_PREFIX = "token_budget"
+
+    def __init__(self, tenant_id: str, redis_client: Redis | None = None) -> None:
+        # keys are prefixed manually since scripts bypass the tenant prefixing
+        self.redis_client = redis_client or get_raw_redis_client()
+        self.key_prefix = f"{tenant_id}:{self.KEY_PREFIX}"
+
+    def _counter_key(self, scope: str) -> str:
+        return f"{self.key_prefix}:{scope}"
+
+    def record_usage(
+        self, scopes: list[str], token_count: int, time_sent: datetime
+    ) -> None:
+        """Adds the tokens to the counters of the scopes which exist."""
+        if not scopes or token_count <= 0:
+            return
+
+        self.redis_client.eval(
+            _RECORD_USAGE_SCRIPT,
+            len(scopes),
+            *[self._counter_key(scope) for scope in scopes],
+            str(_epoch_minute(time_sent)),
+            str(token_count),
+        )
+
+    def get_windowed_usage(
+        self, scope: str, window_starts: list[datetime], ttl_seconds: int
+    ) -> list[int] | None:
+        """Returns the tokens used since each of the window starts, or None if the
+        counter needs to be reconstructed first."""
+        earliest_first = sorted(
+            range(len(window_starts)), key=lambda i: window_starts[i]
+        )
+        result = cast(
+            list[int] | None,
+            self.redis_client.eval(
+                _WINDOWED_USAGE_SCRIPT,
+                1,
+                self._counter_key(scope),
+                str(ttl_seconds),
+                # buckets count if they start at or after the window start
+                *[str(math.ceil(window_starts[i].timestamp())) for i in earliest_first],
+            ),
+        )
+        if result is None:
+            return None
+
+        usage = [0] * len(window_starts)
+        for i, tokens in zip(earliest_first, result):
+            usage[i] = int(tokens)
+        return usage
+
+    def begin_reconstruct(self, scope: str, ttl_seconds: int) -> str:
+        """Replaces the counter with an empty one which usage is recorded into, but
+        which is not used for checks until `reconstruct` completes it. Must be called
+        before the usage is read from Postgres, returns the rebuild token."""
+        rebuild_token = uuid4().hex
+
+        counter_key = self._counter_key(scope)
+        pipe = self.redis_client.pipeline(transaction=True)
+        pipe.delete(counter_key)
+        pipe.hset(counter_key, _REBUILD_FIELD, rebuild_token)
+        pipe.expire(counter_key, ttl_seconds)
+        pipe.execute()
+        return rebuild_token
+
+    def reconstruct(
+        self,
+        scope: str,
+        usage: Sequence[tuple[datetime, int]],
+        since: datetime,
+        ttl_seconds: int,
+        rebuild_token: str,
+    ) -> bool:
+        """Adds the per-minute usage since `since` to the counter claimed by
+        `begin_reconstruct`. Returns False if another reconstruction claimed it."""
+        buckets: dict[str, int] = {}
+        for minute, token_count in usage:
+            bucket = str(_epoch_minute(minute))
+            buckets[bucket] = buckets.get(bucket, 0) + int(token_count or 0)
+
+        applied = self.redis_client.eval(
+            _RECONSTRUCT_SCRIPT,
+            1,
+            self._counter_key(scope),
+            rebuild_token,
+            str(ttl_seconds),
+            str(int(since.timestamp())),
+            *[str(part) for bucket in buckets.items() for part in bucket],
+        )
+        return bool(applied)
@@ -0,0 +1,112 @@
+"""Cache of the time / source filters the LLM extracted from a query.
+
+The same queries are searched over and over (the same question asked by several users,
+agent search sub-questions, retries), asking the LLM for their filters again only adds
+latency. Entries expire after FILTER_EXTRACTION_CACHE_TTL_SECONDS as relative cutoffs
+("in the last week") move with the current time.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Generic
+from typing import TypeVar
+
+from onyx.configs.chat_configs import FILTER_EXTRACTION_CACHE_MAX_ENTRIES
+from onyx.configs.chat_configs import FILTER_EXTRACTION_CACHE_TTL_SECONDS
+from onyx.configs.constants import DocumentSource
+from onyx.context.search.utils import normalize_query
+
+T = TypeVar("T")
+
+
+def build_filter_extraction_cache_key(
+    model_name: str, query: str, *extra_parts: str
+) -> str:
+    """Queries are case folded as well, casing does not change the filters."""
+    return "\x1f".join([model_name, *extra_parts, normalize_query(query).casefold()])
+
+
+class FilterExtractionCache(Generic[T]):
+    """Process local LRU cache with a TTL. Values are returned in a 1-tuple so that
+    `None` (no filter) can be cached as well."""
+
+    def __init__(self, max_entries: int, ttl_seconds: float) -> None:
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        # key -> (insert time, value)
+        self._entries: OrderedDict[str, tuple[float, T]] = OrderedDict()
+
+    def get(self, key: str) -> tuple[T] | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            inserted_at, value = entry
+            if time.monotonic() - inserted_at > self.ttl_seconds:
+                del self._entries[key]
+                return None
+
+            self._entries.move_to_end(key)
+            return (value,)
+
+    def put(self, key: str, value: T) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+_time_filter_cache: FilterExtractionCache[tuple[datetime | None, bool]] | None = None
+_source_filter_cache: FilterExtractionCache[list[DocumentSource] | None] | None = None
+_filter_cache_lock = threading.Lock()
+
+
+def get_time_filter_cache() -> (
+    FilterExtractionCache[tuple[datetime | None, bool]] | None
+):
+    """Returns the process wide cache of time filters, or None if disabled."""
+    global _time_filter_cache
+
+    if FILTER_EXTRACTION_CACHE_MAX_ENTRIES <= 0:
+        return None
+
+    with _filter_cache_lock:
+        if _time_filter_cache is None:
+            _time_filter_cache = FilterExtractionCache(
+                max_entries=FILTER_EXTRACTION_CACHE_MAX_ENTRIES,
+                ttl_seconds=FILTER_EXTRACTION_CACHE_TTL_SECONDS,
+            )
+        return _time_filter_cache
+
+
+def get_source_filter_cache() -> (
+    FilterExtractionCache[list[DocumentSource] | None] | None
+):
+    """Returns the process wide cache of source filters, or None if disabled. The
+    valid sources are part of the key, so entries are not shared across tenants with
+    different connectors."""
+    global _source_filter_cache
+
+    if FILTER_EXTRACTION_CACHE_MAX_ENTRIES <= 0:
+        return None
+
+    with _filter_cache_lock:
+        if _source_filter_cache is None:
+            _source_filter_cache = FilterExtractionCache(
+                max_entries=FILTER_EXTRACTION_CACHE_MAX_ENTRIES,
+                ttl_seconds=FILTER_EXTRACTION_CACHE_TTL_SECONDS,
+            )
+        return _source_filter_cache
@@ -1,9 +1,11 @@
 import json
 import random
+import re
 
 from sqlalchemy.orm import Session
 
 from onyx.configs.chat_configs import ENABLE_CONNECTOR_CLASSIFIER
+from onyx.configs.chat_configs import ENABLE_RULE_BASED_FILTER_EXTRACTION
 from onyx.configs.constants import DocumentSource
 from onyx.db.connector import fetch_unique_document_sources
 from onyx.db.engine import get_sqlalchemy_engine
@@ -17,11 +19,73 @@ from onyx.prompts.constants import SOURCES_KEY
 from onyx.prompts.filter_extration import FILE_SOURCE_WARNING
 from onyx.prompts.filter_extration import SOURCE_FILTER_PROMPT
 from onyx.prompts.filter_extration import WEB_SOURCE_WARNING
+from onyx.secondary_llm_flows.filter_extraction_cache import (
+    build_filter_extraction_cache_key,
+)
+from onyx.secondary_llm_flows.filter_extraction_cache import get_source_filter_cache
 from onyx.utils.logger import setup_logger
 from onyx.utils.text_processing import extract_embedded_json
 
 logger = setup_logger()
 
+# Generic words users scope a search with instead of the name of the source, which the
+# LLM maps to a source (e.g. "repository" -> GitHub)
+_SOURCE_ALIASES: dict[DocumentSource, list[str]] = {
+    DocumentSource.WEB: ["website", "site", "web page", "webpage"],
+    DocumentSource.FILE: ["upload", "uploaded"],
+    DocumentSource.GOOGLE_DRIVE: ["drive", "gdrive", "google doc", "google sheet"],
+    DocumentSource.GMAIL: ["email", "e-mail", "mail", "inbox"],
+    DocumentSource.SLACK: ["channel", "thread"],
+    DocumentSource.DISCORD: ["channel", "thread"],
+    DocumentSource.TEAMS: ["channel"],
+    DocumentSource.GITHUB: ["repo", "repository", "pull request"],
+    DocumentSource.GITLAB: ["repo", "repository", "merge request"],
+    DocumentSource.JIRA: ["ticket", "issue"],
+    DocumentSource.LINEAR: ["ticket", "issue"],
+    DocumentSource.ZENDESK: ["ticket"],
+    DocumentSource.FRESHDESK: ["ticket"],
+    DocumentSource.CONFLUENCE: ["wiki"],
+    DocumentSource.MEDIAWIKI: ["wiki"],
+}
+
+
+def _plural_pattern(word: str) -> str:
+    if word.endswith("y"):
+        return rf"{re.escape(word[:-1])}(?:y|ies)"
+    return rf"{re.escape(word)}s?"
+
+
+def _source_mention_pattern(source: DocumentSource) -> re.Pattern[str]:
+    # "google_drive" also matches "Google Drive" and "googledrive", plurals as well
+    names = []
+    for name in [source.value.replace("_", " "), *_SOURCE_ALIASES.get(source, [])]:
+        *leading_words, last_word = name.split()
+        names.append(
+            r"[\s_-]?".join(
+                [re.escape(word) for word in leading_words]
+                + [_plural_pattern(last_word)]
+            )
+        )
+    return re.compile(rf"\b(?:{'|'.join(names)})\b")
+
+
+_SOURCE_MENTION_PATTERNS = {
+    source: _source_mention_pattern(source) for source in DocumentSource
+}
+
+
+def mentioned_document_sources(
+    query: str, valid_sources: list[DocumentSource]
+) -> list[DocumentSource]:
+    """The valid sources the query names or refers to with a generic word (e.g.
+    "repository"). A source filter is only ever extracted for these."""
+    lowered_query = query.lower()
+    return [
+        source
+        for source in valid_sources
+        if _SOURCE_MENTION_PATTERNS[source].search(lowered_query)
+    ]
+
 
 def strings_to_document_sources(source_strs: list[str]) -> list[DocumentSource]:
     sources = []
@@ -50,13 +114,9 @@ def _sample_documents_using_custom_connector_classifier(
     query: str,
     valid_sources: list[DocumentSource],
 ) -> list[DocumentSource] | None:
-    query_joined = "".join(ch for ch in query.lower() if ch.isalnum())
-    available_connectors = list(
-        filter(
-            lambda conn: conn.lower() in query_joined,
-            [item.value for item in valid_sources],
-        )
-    )
+    available_connectors = [
+        source.value for source in mentioned_document_sources(query, valid_sources)
+    ]
 
     if not available_connectors:
         return None
@@ -69,7 +129,10 @@ def _sample_documents_using_custom_connector_classifier(
 def extract_source_filter(
     query: str, llm: LLM, db_session: Session
 ) -> list[DocumentSource] | None:
-    """Returns a list of valid sources for search or None if no specific sources were detected"""
+    """Returns a list of valid sources for search or None if no specific sources were detected
+
+    Queries which do not mention any of the valid sources do not go to the LLM, its
+    answers for the others are cached per normalized query."""
 
     valid_sources = fetch_unique_document_sources(db_session)
     if not valid_sources:
@@ -78,6 +141,22 @@ def extract_source_filter(
     if ENABLE_CONNECTOR_CLASSIFIER:
         return _sample_documents_using_custom_connector_classifier(query, valid_sources)
 
+    if ENABLE_RULE_BASED_FILTER_EXTRACTION and not mentioned_document_sources(
+        query, valid_sources
+    ):
+        return None
+
+    cache = get_source_filter_cache()
+    cache_key = build_filter_extraction_cache_key(
+        llm.config.model_name,
+        query,
+        ",".join(sorted(source.value for source in valid_sources)),
+    )
+    if cache is not None:
+        cached_filter = cache.get(cache_key)
+        if cached_filter is not None:
+            return cached_filter[0]
+
     def _get_source_filter_messages(
         query: str,
         valid_sources: list[DocumentSource],
@@ -182,7 +261,10 @@ def extract_source_filter(
     model_output = message_to_string(llm.invoke(filled_llm_prompt))
     logger.debug(model_output)
 
-    return _extract_source_filters_from_llm_out(model_output)
+    source_filter = _extract_source_filters_from_llm_out(model_output)
+    if cache is not None:
+        cache.put(cache_key, source_filter)
+    return source_filter
 
 
 if __name__ == "__main__":
@@ -1,19 +1,105 @@
 import json
+import re
 from datetime import datetime
 from datetime import timedelta
 from datetime import timezone
 
 from dateutil.parser import parse
 
+from onyx.configs.chat_configs import ENABLE_RULE_BASED_FILTER_EXTRACTION
 from onyx.llm.interfaces import LLM
 from onyx.llm.utils import dict_based_prompt_to_langchain_prompt
 from onyx.llm.utils import message_to_string
 from onyx.prompts.filter_extration import TIME_FILTER_PROMPT
 from onyx.prompts.prompt_utils import get_current_llm_day_time
+from onyx.secondary_llm_flows.filter_extraction_cache import (
+    build_filter_extraction_cache_key,
+)
+from onyx.secondary_llm_flows.filter_extraction_cache import get_time_filter_cache
 from onyx.utils.logger import setup_logger
 
 logger = setup_logger()
 
+_MONTH_NAMES = [
+    "january",
+    "february",
+    "march",
+    "april",
+    "may",
+    "june",
+    "july",
+    "august",
+    "september",
+    "october",
+    "november",
+    "december",
+]
+_MONTHS = {
+    **{name: num for num, name in enumerate(_MONTH_NAMES, start=1)},
+    **{name[:3]: num for num, name in enumerate(_MONTH_NAMES, start=1)},
+    "sept": 9,
+}
+# abbreviations are too often names ("Jan") to be trusted as a date
+_MONTH_PATTERN = "|".join(_MONTH_NAMES + ["sept"])
+_NUMBER_WORDS = {
+    "a": 1,
+    "an": 1,
+    "one": 1,
+    "two": 2,
+    "three": 3,
+    "four": 4,
+    "five": 5,
+    "six": 6,
+    "seven": 7,
+    "eight": 8,
+    "nine": 9,
+    "ten": 10,
+    "eleven": 11,
+    "twelve": 12,
+}
+_NUMBER_PATTERN = r"\d+|" + "|".join(_NUMBER_WORDS)
+_UNIT_PATTERN = "day|week|month|quarter|year"
+_YEAR_PATTERN = r"(?:19|20)\d{2}"
+
+# "last week", "past 3 months", "previous two quarters"
+_RELATIVE_RE = re.compile(
+    rf"\b(?:last|past|previous|prior)\s+(?:({_NUMBER_PATTERN})\s+)?({_UNIT_PATTERN})s?\b"
+)
+# "2 weeks ago"
+_AGO_RE = re.compile(rf"\b({_NUMBER_PATTERN})\s+({_UNIT_PATTERN})s?\s+ago\b")
+# "this month"
+_THIS_PERIOD_RE = re.compile(rf"\bthis\s+({_UNIT_PATTERN})\b")
+_DAY_RE = re.compile(r"\b(today|yesterday)\b")
+# "since March", "in February of 2022", "since sept 5, 2023". Not "from", people are
+# named after months too
+_MONTH_DATE_RE = re.compile(
+    rf"\b(?:since|in|during)\s+({_MONTH_PATTERN})\.?"
+    rf"(?:\s+(\d{{1,2}})(?:st|nd|rd|th)?)?(?:,?\s+(?:of\s+)?({_YEAR_PATTERN}))?\b"
+)
+# "in 2023", "since 2021"
+_YEAR_RE = re.compile(rf"\b(?:since|from|in|during)\s+({_YEAR_PATTERN})\b")
+# "since 03/01/2023", "after 2023-03-01"
+_NUMERIC_DATE_RE = re.compile(
+    r"\b(?:since|after|from|on)\s+(\d{1,2}[/-]\d{1,2}[/-]\d{4}|\d{4}-\d{2}-\d{2})\b"
+)
+_FAVOR_RECENT_RE = re.compile(
+    r"\b(?:latest|newest|most\s+recent(?:ly)?|recent(?:ly)?|up[- ]to[- ]date)\b"
+)
+# Anything time related the rules above did not understand, e.g. "before the launch"
+# or "Q3", the LLM decides for those queries
+_TIME_HINT_RE = re.compile(
+    r"\b(?:ago|before|after|since|until|till|when|during|dated?|dates|days?|daily|"
+    r"weeks?|weekly|weekends?|months?|monthly|quarters?|quarterly|q[1-4]|h[12]|fy\d*|"
+    r"ytd|years?|yearly|annual(?:ly)?|today|tonight|yesterday|tomorrow|now|"
+    r"current(?:ly)?|old|older|oldest|earlier|earliest|later|last|past|previous|"
+    r"prior|next|upcoming|time|period|season|spring|summer|autumn|winter|morning|"
+    r"afternoon|evening|night|mondays?|tuesdays?|wednesdays?|thursdays?|fridays?|"
+    r"saturdays?|sundays?|"
+    # "may" is too often not the month
+    + "|".join(month for month in _MONTHS if month != "may")
+    + rf")\b|\b{_YEAR_PATTERN}\b|\b\d{{1,2}}[/-]\d{{1,2}}\b"
+)
+
 
 def best_match_time(time_str: str) -> datetime | None:
     preferred_formats = ["%m/%d/%Y", "%m-%d-%Y"]
@@ -40,10 +126,160 @@ def best_match_time(time_str: str) -> datetime | None:
         return None
 
 
+def _time_unit_delta(unit: str, multiplier: float) -> timedelta | None:
+    if "day" in unit:
+        return timedelta(days=multiplier)
+    if "week" in unit:
+        return timedelta(weeks=multiplier)
+    if "month" in unit:
+        # Have to just use the average here, too complicated to calculate exact day
+        # based on current day etc.
+        return timedelta(days=multiplier * 30.437)
+    if "quarter" in unit:
+        return timedelta(days=multiplier * 91.25)
+    if "year" in unit:
+        return timedelta(days=multiplier * 365)
+    return None
+
+
+def _time_ago(unit: str, number: str | None, now: datetime) -> datetime | None:
+    """None if the unit is unknown or the date is out of range ("past 5000 years")"""
+    try:
+        time_diff = _time_unit_delta(unit, _parse_number(number))
+        return now - time_diff if time_diff is not None else None
+    except (OverflowError, ValueError):
+        return None
+
+
+def _parse_number(number: str | None) -> int:
+    if number is None:
+        return 1
+    return int(number) if number.isdigit() else _NUMBER_WORDS[number]
+
+
+def _start_of_period(unit: str, now: datetime) -> datetime:
+    start_of_day = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    if unit == "day":
+        return start_of_day
+    if unit == "week":
+        return start_of_day - timedelta(days=start_of_day.weekday())
+    if unit == "month":
+        return start_of_day.replace(day=1)
+    if unit == "quarter":
+        return start_of_day.replace(month=(now.month - 1) // 3 * 3 + 1, day=1)
+    return start_of_day.replace(month=1, day=1)
+
+
+def _month_date(
+    month: int, day: int | None, year: int | None, now: datetime
+) -> datetime | None:
+    """Without a year, the month refers to its latest occurrence"""
+    try:
+        date = datetime(year or now.year, month, day or 1, tzinfo=timezone.utc)
+    except ValueError:
+        return None
+    if year is None and date > now:
+        date = date.replace(year=date.year - 1)
+    return date
+
+
+def _hard_cutoffs(
+    query: str, now: datetime
+) -> tuple[list[datetime | None], list[tuple[int, int]]]:
+    """All hard cutoffs in the (lowercased) query and the spans they were found at.
+    A cutoff is None if the expression matched but is not a valid date."""
+    cutoffs: list[datetime | None] = []
+    spans: list[tuple[int, int]] = []
+
+    def _overlaps(span: tuple[int, int]) -> bool:
+        return any(span[0] < end and start < span[1] for start, end in spans)
+
+    for match in _RELATIVE_RE.finditer(query):
+        cutoffs.append(_time_ago(match[2], match[1], now))
+        spans.append(match.span())
+    for match in _AGO_RE.finditer(query):
+        if not _overlaps(match.span()):
+            cutoffs.append(_time_ago(match[2], match[1], now))
+            spans.append(match.span())
+    for match in _THIS_PERIOD_RE.finditer(query):
+        cutoffs.append(_start_of_period(match[1], now))
+        spans.append(match.span())
+    for match in _DAY_RE.finditer(query):
+        start_of_day = _start_of_period("day", now)
+        cutoffs.append(
+            start_of_day if match[1] == "today" else start_of_day - timedelta(days=1)
+        )
+        spans.append(match.span())
+    for match in _MONTH_DATE_RE.finditer(query):
+        cutoffs.append(
+            _month_date(
+                month=_MONTHS[match[1]],
+                day=int(match[2]) if match[2] else None,
+                year=int(match[3]) if match[3] else None,
+                now=now,
+            )
+        )
+        spans.append(match.span())
+    # before the years, "since 2023-03-01" starts with a year as well
+    for match in _NUMERIC_DATE_RE.finditer(query):
+        cutoffs.append(best_match_time(match[1]))
+        spans.append(match.span())
+    for match in _YEAR_RE.finditer(query):
+        if not _overlaps(match.span()):
+            cutoffs.append(datetime(int(match[1]), 1, 1, tzinfo=timezone.utc))
+            spans.append(match.span())
+
+    return cutoffs, spans
+
+
+def extract_time_filter_by_rules(
+    query: str, now: datetime | None = None
+) -> tuple[datetime | None, bool] | None:
+    """Same output as `extract_time_filter` for queries the rules are sure about: a
+    single hard cutoff ("last 2 weeks", "since March", "in 2023"), a recency bias
+    ("latest") or nothing time related at all. Returns None otherwise."""
+    now = now or datetime.now(timezone.utc)
+    lowered_query = query.lower()
+
+    cutoffs, spans = _hard_cutoffs(lowered_query, now)
+    residual_query = lowered_query
+    for start, end in spans:
+        residual_query = (
+            residual_query[:start] + " " * (end - start) + residual_query[end:]
+        )
+    residual_query, num_favor_recent = _FAVOR_RECENT_RE.subn(" ", residual_query)
+
+    if _TIME_HINT_RE.search(residual_query) or len(cutoffs) > 1:
+        return None
+
+    if cutoffs:
+        # invalid date, e.g. "since feb 30"
+        if cutoffs[0] is None:
+            return None
+        # same as the LLM flow, a hard cutoff overrides the recency bias
+        return cutoffs[0], False
+
+    return None, num_favor_recent > 0
+
+
 def extract_time_filter(query: str, llm: LLM) -> tuple[datetime | None, bool]:
     """Returns a datetime if a hard time filter should be applied for the given query
     Additionally returns a bool, True if more recently updated Documents should be
-    heavily favored"""
+    heavily favored
+
+    The LLM is only asked if the rules are unsure about the query, its answers are
+    cached per normalized query."""
+    if ENABLE_RULE_BASED_FILTER_EXTRACTION:
+        rule_based_filter = extract_time_filter_by_rules(query)
+        if rule_based_filter is not None:
+            return rule_based_filter
+
+    cache = get_time_filter_cache()
+    cache_key = build_filter_extraction_cache_key(llm.config.model_name, query)
+    if cache is not None:
+        cached_filter = cache.get(cache_key)
+        if cached_filter is not None:
+            return cached_filter[0]
 
     def _get_time_filter_messages(query: str) -> list[dict[str, str]]:
         messages = [
@@ -121,19 +357,7 @@ def extract_time_filter(query: str, llm: LLM) -> tuple[datetime | None, bool]:
                     pass
 
             if "filter_value" in model_json:
-                filter_value = model_json["filter_value"]
-                if "day" in filter_value:
-                    time_diff = timedelta(days=multiplier)
-                elif "week" in filter_value:
-                    time_diff = timedelta(weeks=multiplier)
-                elif "month" in filter_value:
-                    # Have to just use the average here, too complicated to calculate exact day
-                    # based on current day etc.
-                    time_diff = timedelta(days=multiplier * 30.437)
-                elif "quarter" in filter_value:
-                    time_diff = timedelta(days=multiplier * 91.25)
-                elif "year" in filter_value:
-                    time_diff = timedelta(days=multiplier * 365)
+                time_diff = _time_unit_delta(model_json["filter_value"], multiplier)
 
             if time_diff is not None:
                 current = datetime.now(timezone.utc)
@@ -151,7 +375,10 @@ def extract_time_filter(query: str, llm: LLM) -> tuple[datetime | None, bool]:
     model_output = message_to_string(llm.invoke(filled_llm_prompt))
     logger.debug(model_output)
 
-    return _extract_time_filter_from_llm_out(model_output)
+    time_filter = _extract_time_filter_from_llm_out(model_output)
+    if cache is not None:
+        cache.put(cache_key, time_filter)
+    return time_filter
 
 
 if __name__ == "__main__":
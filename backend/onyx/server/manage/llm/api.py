@@ -24,6 +24,7 @@ from onyx.llm.factory import get_llm
 from onyx.llm.factory import get_max_input_tokens_from_llm_provider
 from onyx.llm.llm_provider_options import fetch_available_well_known_llms
 from onyx.llm.llm_provider_options import WellKnownLLMProviderDescriptor
+from onyx.llm.model_capabilities import refresh_model_capability_index
 from onyx.llm.utils import get_llm_contextual_cost
 from onyx.llm.utils import litellm_exception_to_error_msg
 from onyx.llm.utils import model_supports_image_input
@@ -238,7 +239,7 @@ def put_llm_provider(
         llm_provider_upsert_request.api_key = existing_provider.api_key
 
     try:
-        return upsert_llm_provider(
+        llm_provider = upsert_llm_provider(
             llm_provider_upsert_request=llm_provider_upsert_request,
             db_session=db_session,
         )
@@ -246,6 +247,10 @@ def put_llm_provider(
         logger.exception("Failed to upsert LLM Provider")
         raise HTTPException(status_code=400, detail=str(e))
 
+    # drop the cached lookups of the models the provider no longer serves
+    refresh_model_capability_index()
+    return llm_provider
+
 
 @admin_router.delete("/provider/{provider_id}")
 def delete_llm_provider(
@@ -254,6 +259,7 @@ def delete_llm_provider(
     db_session: Session = Depends(get_session),
 ) -> None:
     remove_llm_provider(db_session, provider_id)
+    refresh_model_capability_index()
 
 
 @admin_router.post("/provider/{provider_id}/default")
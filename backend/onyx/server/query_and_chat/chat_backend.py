@@ -1,12 +1,10 @@
-import asyncio
 import datetime
 import io
 import json
 import os
 import time
 import uuid
-from collections.abc import Callable
-from collections.abc import Generator
+from collections.abc import AsyncGenerator
 from datetime import timedelta
 from uuid import UUID
 
@@ -25,7 +23,8 @@ from onyx.auth.users import current_chat_accessible_user
 from onyx.auth.users import current_user
 from onyx.chat.chat_utils import create_chat_chain
 from onyx.chat.chat_utils import extract_headers
-from onyx.chat.process_message import stream_chat_message
+from onyx.chat.process_message import astream_chat_message
+from onyx.chat.process_message import reserve_chat_stream_slot
 from onyx.chat.prompt_builder.citations_prompt import (
     compute_max_document_tokens_for_persona,
 )
@@ -367,36 +366,12 @@ def delete_chat_session_by_id(
         raise HTTPException(status_code=400, detail=str(e))
 
 
-async def is_connected(request: Request) -> Callable[[], bool]:
-    main_loop = asyncio.get_event_loop()
-
-    def is_connected_sync() -> bool:
-        future = asyncio.run_coroutine_threadsafe(request.is_disconnected(), main_loop)
-        try:
-            is_connected = not future.result(timeout=0.05)
-            return is_connected
-        except asyncio.TimeoutError:
-            logger.warning(
-                "Asyncio timed out (potentially missed request to stop streaming)"
-            )
-            return True
-        except Exception as e:
-            error_msg = str(e)
-            logger.critical(
-                f"An unexpected error occured with the disconnect check coroutine: {error_msg}"
-            )
-            return True
-
-    return is_connected_sync
-
-
 @router.post("/send-message")
 def handle_new_chat_message(
     chat_message_req: CreateChatMessageRequest,
     request: Request,
     user: User | None = Depends(current_chat_accessible_user),
     _rate_limit_check: None = Depends(check_token_rate_limits),
-    is_connected_func: Callable[[], bool] = Depends(is_connected),
 ) -> StreamingResponse:
     """
     This endpoint is both used for all the following purposes:
@@ -412,8 +387,6 @@ def handle_new_chat_message(
         request (Request): The current HTTP request context.
         user (User | None): The current user, obtained via dependency injection.
         _ (None): Rate limit check is run if user/group/global rate limits are enabled.
-        is_connected_func (Callable[[], bool]): Function to check client disconnection,
-            used to stop the streaming response if the client disconnects.
 
     Returns:
         StreamingResponse: Streams the response to the new chat message.
@@ -437,18 +410,30 @@ def handle_new_chat_message(
             db_session=db_session,
         )
 
-    def stream_generator() -> Generator[str, None, None]:
+    # Rejected rather than queued when every chat stream thread is taken, each thread
+    # stays busy until the LLM finished answering
+    slot = reserve_chat_stream_slot()
+    if slot is None:
+        raise HTTPException(
+            status_code=503,
+            detail="Too many chat messages are being answered, please try again shortly",
+            headers={"Retry-After": "5"},
+        )
+
+    # Streamed on the event loop. If the client disconnects, the response stops
+    # iterating the generator, which stops the chat pipeline.
+    async def stream_generator() -> AsyncGenerator[str, None]:
         try:
-            for packet in stream_chat_message(
+            async for packet in astream_chat_message(
                 new_msg_req=chat_message_req,
                 user=user,
+                slot=slot,
                 litellm_additional_headers=extract_headers(
                     request.headers, LITELLM_PASS_THROUGH_HEADERS
                 ),
                 custom_tool_additional_headers=get_custom_tool_additional_request_headers(
                     request.headers
                 ),
-                is_connected=is_connected_func,
             ):
                 yield packet
 
@@ -459,7 +444,9 @@ def handle_new_chat_message(
         finally:
             logger.debug("Stream generator finished")
 
-    return StreamingResponse(stream_generator(), media_type="text/event-stream")
+    response_stream = stream_generator()
+    slot.release_when_dropped(response_stream)
+    return StreamingResponse(response_stream, media_type="text/event-stream")
 
 
 @router.put("/set-message-as-latest")
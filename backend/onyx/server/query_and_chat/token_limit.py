@@ -1,25 +1,31 @@
+from collections.abc import Callable
 from collections.abc import Sequence
 from datetime import datetime
 from datetime import timedelta
 from datetime import timezone
-from functools import lru_cache
 
 from dateutil import tz
 from fastapi import Depends
 from fastapi import HTTPException
+from redis.exceptions import RedisError
 from sqlalchemy import func
 from sqlalchemy import select
 from sqlalchemy.orm import Session
 
 from onyx.auth.users import current_chat_accessible_user
+from onyx.configs.app_configs import TOKEN_BUDGET_COUNTERS_ENABLED
 from onyx.db.engine import get_session_context_manager
 from onyx.db.models import ChatMessage
 from onyx.db.models import ChatSession
 from onyx.db.models import TokenRateLimit
 from onyx.db.models import User
+from onyx.db.token_limit import any_rate_limit_exists
 from onyx.db.token_limit import fetch_all_global_token_rate_limits
+from onyx.redis.redis_token_budget import RedisTokenBudget
+from onyx.redis.redis_token_budget import TOKEN_BUDGET_SCOPE_GLOBAL
 from onyx.utils.logger import setup_logger
 from onyx.utils.variable_functionality import fetch_versioned_implementation
+from shared_configs.contextvars import get_current_tenant_id
 
 
 logger = setup_logger()
@@ -57,15 +63,15 @@ def _user_is_rate_limited_by_global() -> None:
             db_session=db_session, enabled_only=True, ordered=False
         )
 
-        if global_rate_limits:
-            global_cutoff_time = _get_cutoff_time(global_rate_limits)
-            global_usage = _fetch_global_usage(global_cutoff_time, db_session)
-
-            if _is_rate_limited(global_rate_limits, global_usage):
-                raise HTTPException(
-                    status_code=429,
-                    detail="Token budget exceeded for organization. Try again later.",
-                )
+        if global_rate_limits and _is_over_token_budget(
+            TOKEN_BUDGET_SCOPE_GLOBAL,
+            global_rate_limits,
+            lambda cutoff_time: _fetch_global_usage(cutoff_time, db_session),
+        ):
+            raise HTTPException(
+                status_code=429,
+                detail="Token budget exceeded for organization. Try again later.",
+            )
 
 
 def _fetch_global_usage(
@@ -119,17 +125,43 @@ def _is_rate_limited(
     return False
 
 
-@lru_cache()
-def any_rate_limit_exists() -> bool:
-    """Checks if any rate limit exists in the database. Is cached, so that if no rate limits
-    are setup, we don't have any effect on average query latency."""
-    logger.debug("Checking for any rate limits...")
-    with get_session_context_manager() as db_session:
-        return (
-            db_session.scalar(
-                select(TokenRateLimit.id).where(
-                    TokenRateLimit.enabled == True  # noqa: E712
-                )
+def _is_over_token_budget(
+    scope: str,
+    rate_limits: Sequence[TokenRateLimit],
+    fetch_usage: Callable[[datetime], Sequence[tuple[datetime, int]]],
+) -> bool:
+    """
+    If at least one rate limit of the scope is exceeded, return True. The usage comes
+    from the token budget counter of the scope, `fetch_usage` (the per-minute usage
+    since a cutoff time from Postgres) is only called to reconstruct the counter.
+    """
+    if not TOKEN_BUDGET_COUNTERS_ENABLED:
+        return _is_rate_limited(rate_limits, fetch_usage(_get_cutoff_time(rate_limits)))
+
+    now = datetime.now(tz=timezone.utc)
+    window_starts = [
+        now - timedelta(hours=rate_limit.period_hours) for rate_limit in rate_limits
+    ]
+    # an idle counter is reconstructed on the next check
+    ttl_seconds = max(rate_limit.period_hours for rate_limit in rate_limits) * 60 * 60
+
+    token_budget = RedisTokenBudget(get_current_tenant_id())
+    try:
+        tokens_used = token_budget.get_windowed_usage(scope, window_starts, ttl_seconds)
+        if tokens_used is None:
+            cutoff_time = min(window_starts)
+            # claimed before reading Postgres, so usage recorded meanwhile is kept
+            rebuild_token = token_budget.begin_reconstruct(scope, ttl_seconds)
+            usage = fetch_usage(cutoff_time)
+            token_budget.reconstruct(
+                scope, usage, cutoff_time, ttl_seconds, rebuild_token
             )
-            is not None
-        )
+            return _is_rate_limited(rate_limits, usage)
+    except RedisError:
+        logger.exception(f"Failed to read the token budget counter of {scope}")
+        return _is_rate_limited(rate_limits, fetch_usage(min(window_starts)))
+
+    return any(
+        scope_tokens_used >= rate_limit.token_budget * TOKEN_BUDGET_UNIT
+        for rate_limit, scope_tokens_used in zip(rate_limits, tokens_used)
+    )
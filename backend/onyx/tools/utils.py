@@ -6,6 +6,7 @@ from onyx.configs.app_configs import AZURE_DALLE_API_KEY
 from onyx.db.connector import check_connectors_exist
 from onyx.db.document import check_docs_exist
 from onyx.db.models import LLMProvider
+from onyx.natural_language_processing.token_count_cache import count_tokens
 from onyx.natural_language_processing.utils import BaseTokenizer
 from onyx.tools.tool import Tool
 
@@ -24,7 +25,7 @@ def explicit_tool_calling_supported(model_provider: str, model_name: str) -> boo
 
 
 def compute_tool_tokens(tool: Tool, llm_tokenizer: BaseTokenizer) -> int:
-    return len(llm_tokenizer.encode(json.dumps(tool.tool_definition())))
+    return count_tokens(json.dumps(tool.tool_definition()), llm_tokenizer)
 
 
 def compute_all_tool_tokens(tools: list[Tool], llm_tokenizer: BaseTokenizer) -> int:
@@ -0,0 +1,141 @@
+"""Bounded memory sorting / diffing of large collections of string ids.
+
+Used by pruning, where both the ids in the source and the ids in our index can number
+in the millions for a single cc-pair. Instead of holding both sides in Python sets,
+the source ids are sorted into runs which are spilled to disk, and the two sorted
+streams are merge-diffed.
+
+NOTE: ordering is Python's default `str` ordering (by code point). Sorted streams
+coming from Postgres must use the "C" collation to match.
+"""
+
+import heapq
+import json
+import tempfile
+from collections.abc import Iterable
+from collections.abc import Iterator
+from typing import Any
+from typing import IO
+
+
+def _encode_line(doc_id: str) -> str:
+    # ids are arbitrary strings, so the (rare) ones which could break the one id per
+    # line format are json encoded. Json encoded lines always start with a quote.
+    if "\n" in doc_id or doc_id.startswith('"'):
+        return f"{json.dumps(doc_id)}\n"
+    return f"{doc_id}\n"
+
+
+def _decode_line(line: str) -> str:
+    if line.startswith('"'):
+        return json.loads(line)
+    return line[:-1]
+
+
+class ExternalIdSorter:
+    """Collects ids and yields them back sorted and deduplicated. At most
+    `run_size` ids are kept in memory, the rest live in temporary sorted run files
+    which are removed on `close`."""
+
+    def __init__(self, run_size: int) -> None:
+        if run_size <= 0:
+            raise ValueError("run_size must be positive")
+
+        self.run_size = run_size
+        self._buffer: set[str] = set()
+        self._run_files: list[IO[str]] = []
+        self._closed = False
+
+    @property
+    def num_runs(self) -> int:
+        return len(self._run_files)
+
+    def add(self, doc_id: str) -> None:
+        self._buffer.add(doc_id)
+        if len(self._buffer) >= self.run_size:
+            self._spill()
+
+    def add_many(self, doc_ids: Iterable[str]) -> None:
+        for doc_id in doc_ids:
+            self.add(doc_id)
+
+    def _spill(self) -> None:
+        if not self._buffer:
+            return
+
+        run_file = tempfile.TemporaryFile(mode="w+", encoding="utf-8", newline="\n")
+        run_file.writelines(_encode_line(doc_id) for doc_id in sorted(self._buffer))
+        run_file.seek(0)
+
+        self._run_files.append(run_file)
+        self._buffer = set()
+
+    def iter_sorted(self) -> Iterator[str]:
+        """Yields every id added so far exactly once, in sorted order.
+        Should only be called once, after all ids have been added."""
+        if self._closed:
+            raise RuntimeError("ExternalIdSorter is closed")
+
+        if not self._run_files:
+            # everything fit in memory, no need to touch the disk
+            yield from sorted(self._buffer)
+            return
+
+        self._spill()
+        runs = [map(_decode_line, run_file) for run_file in self._run_files]
+        yield from dedupe_sorted(heapq.merge(*runs))
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+
+        for run_file in self._run_files:
+            run_file.close()
+        self._run_files = []
+        self._buffer = set()
+
+    def __enter__(self) -> "ExternalIdSorter":
+        return self
+
+    def __exit__(self, exc_type: Any, exc_value: Any, traceback: Any) -> None:
+        self.close()
+
+
+def dedupe_sorted(sorted_ids: Iterable[str]) -> Iterator[str]:
+    previous: str | None = None
+    for doc_id in sorted_ids:
+        if doc_id != previous:
+            yield doc_id
+            previous = doc_id
+
+
+def _check_sorted(sorted_ids: Iterable[str], name: str) -> Iterator[str]:
+    previous: str | None = None
+    for doc_id in sorted_ids:
+        if previous is not None and doc_id < previous:
+            raise ValueError(
+                f"'{name}' ids are not sorted: '{doc_id}' came after '{previous}'"
+            )
+        yield doc_id
+        previous = doc_id
+
+
+def sorted_difference(
+    left_sorted: Iterable[str], right_sorted: Iterable[str]
+) -> Iterator[str]:
+    """Lazily yields the ids in `left_sorted` which are not in `right_sorted`.
+
+    Both inputs must be sorted in ascending order (duplicates are fine). A ValueError
+    is raised as soon as either input is found to be out of order, since the result
+    would silently be wrong otherwise."""
+    left = _check_sorted(left_sorted, "left")
+    right = _check_sorted(right_sorted, "right")
+
+    right_id = next(right, None)
+    for left_id in left:
+        while right_id is not None and right_id < left_id:
+            right_id = next(right, None)
+
+        if right_id is None or right_id != left_id:
+            yield left_id
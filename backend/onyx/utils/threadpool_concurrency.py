@@ -1,13 +1,16 @@
+import asyncio
 import collections.abc
 import contextvars
 import copy
 import threading
 import uuid
+from collections.abc import AsyncGenerator
 from collections.abc import Callable
 from collections.abc import Iterator
 from collections.abc import MutableMapping
 from collections.abc import Sequence
 from concurrent.futures import as_completed
+from concurrent.futures import Executor
 from concurrent.futures import FIRST_COMPLETED
 from concurrent.futures import Future
 from concurrent.futures import ThreadPoolExecutor
@@ -252,10 +255,20 @@ def run_functions_in_parallel(
     Executes a list of FunctionCalls in parallel and stores the results in a dictionary where the keys
     are the result_id of the FunctionCall and the values are the results of the call.
     """
-    results: dict[str, Any] = {}
+    return dict(run_functions_in_parallel_as_completed(function_calls, allow_failures))
 
+
+def run_functions_in_parallel_as_completed(
+    function_calls: list[FunctionCall],
+    allow_failures: bool = False,
+) -> Iterator[tuple[str, Any]]:
+    """
+    Executes a list of FunctionCalls in parallel and yields the result_id and the result of each call
+    as soon as it completes. Like parallel_yield, stopping the iteration early does not cancel the
+    calls which are already running, closing the iterator waits for them.
+    """
     if len(function_calls) == 0:
-        return results
+        return
 
     with ThreadPoolExecutor(max_workers=len(function_calls)) as executor:
         future_to_id = {
@@ -268,15 +281,14 @@ def run_functions_in_parallel(
         for future in as_completed(future_to_id):
             result_id = future_to_id[future]
             try:
-                results[result_id] = future.result()
+                result = future.result()
             except Exception as e:
                 logger.exception(f"Function with ID {result_id} failed due to {e}")
-                results[result_id] = None
-
                 if not allow_failures:
                     raise
+                result = None
 
-    return results
+            yield result_id, result
 
 
 class TimeoutThread(threading.Thread, Generic[R]):
@@ -384,3 +396,52 @@ def parallel_yield(gens: list[Iterator[R]], max_workers: int = 10) -> Iterator[R
                     )
                     next_ind += 1
                 del future_to_index[future]
+
+
+async def iterate_in_executor(
+    iterator_func: Callable[[threading.Event], Iterator[R]],
+    executor: Executor,
+) -> AsyncGenerator[R, None]:
+    """
+    Runs a blocking iterator in the executor and yields its items on the event loop,
+    so that the caller does not hold a thread of the event loop's thread pool while
+    waiting for them. `iterator_func` is called in the executor with an event that is
+    set once the caller stops iterating (e.g. the client disconnected), the iterator
+    should wrap up at its next check of the event. It is still run to completion so
+    that it can clean up, the remaining items are dropped.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue[tuple[bool, Any]] = asyncio.Queue()
+    stopped = threading.Event()
+
+    def _put(done: bool, item: Any) -> None:
+        if stopped.is_set():
+            return
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, (done, item))
+        except RuntimeError:
+            # the event loop was closed
+            stopped.set()
+
+    def _produce() -> None:
+        try:
+            for item in iterator_func(stopped):
+                _put(False, item)
+        except BaseException as e:
+            _put(True, e)
+            return
+        _put(True, None)
+
+    # run with the context of the caller, e.g. the tenant id
+    context = contextvars.copy_context()
+    loop.run_in_executor(executor, context.run, _produce)
+    try:
+        while True:
+            done, item = await queue.get()
+            if done:
+                if item is not None:
+                    raise item
+                return
+            yield cast(R, item)
+    finally:
+        stopped.set()
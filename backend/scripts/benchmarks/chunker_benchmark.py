@@ -0,0 +1,153 @@
+"""Compares the tokenizer-native `SentenceTokenSplitter` with llama_index's
+`SentenceSplitter` which the chunker used before.
+
+For every generated section both produce the chunks, and the blurb and mini chunks of
+every chunk, the way the chunker does. Reports the time taken and how many of the
+chunks / blurbs / mini chunks come out identical.
+
+Basic Usage:
+
+python -m scripts.benchmarks.chunker_benchmark --num-sections 200
+"""
+
+import argparse
+import random
+import time
+
+from llama_index.core.node_parser import SentenceSplitter
+
+from onyx.configs.app_configs import BLURB_SIZE
+from onyx.configs.app_configs import MINI_CHUNK_SIZE
+from onyx.configs.model_configs import DOC_EMBEDDING_CONTEXT_SIZE
+from onyx.indexing.text_splitter import SentenceTokenSplitter
+from onyx.indexing.text_splitter import TokenizedText
+from onyx.natural_language_processing.utils import BaseTokenizer
+from onyx.natural_language_processing.utils import get_tokenizer
+
+_WORDS = (
+    "the quick brown fox jumps over a lazy dog while the index, the vector store "
+    "and the keyword search; all answer queries. Retrieval works! Does it scale?"
+).split()
+
+
+def _build_sections(num_sections: int, seed: int) -> list[str]:
+    rng = random.Random(seed)
+
+    def _paragraph(num_sentences: int) -> str:
+        sentences = []
+        for _ in range(num_sentences):
+            sentence = " ".join(rng.choice(_WORDS) for _ in range(rng.randint(3, 30)))
+            sentences.append(sentence.capitalize() + rng.choice([".", "!", "?", ""]))
+        return " ".join(sentences)
+
+    sections = []
+    for _ in range(num_sections):
+        kind = rng.random()
+        if kind < 0.3:
+            sections.append(_paragraph(rng.randint(50, 400)))
+        elif kind < 0.4:
+            sections.append(
+                "\n\n\n".join(_paragraph(rng.randint(5, 40)) for _ in range(4))
+            )
+        elif kind < 0.45:
+            sections.append("x" * rng.randint(10, 5000))
+        else:
+            sections.append(_paragraph(rng.randint(1, 15)))
+    return sections
+
+
+def _run_llama_index(
+    sections: list[str], tokenizer: BaseTokenizer
+) -> list[tuple[str, str, list[str]]]:
+    chunk_splitter = SentenceSplitter(
+        tokenizer=tokenizer.tokenize,
+        chunk_size=DOC_EMBEDDING_CONTEXT_SIZE,
+        chunk_overlap=0,
+    )
+    blurb_splitter = SentenceSplitter(
+        tokenizer=tokenizer.tokenize, chunk_size=BLURB_SIZE, chunk_overlap=0
+    )
+    mini_chunk_splitter = SentenceSplitter(
+        tokenizer=tokenizer.tokenize, chunk_size=MINI_CHUNK_SIZE, chunk_overlap=0
+    )
+
+    results = []
+    for section in sections:
+        for chunk in chunk_splitter.split_text(section):
+            blurbs = blurb_splitter.split_text(chunk)
+            results.append(
+                (
+                    chunk,
+                    blurbs[0] if blurbs else "",
+                    mini_chunk_splitter.split_text(chunk),
+                )
+            )
+    return results
+
+
+def _run_native(
+    sections: list[str], tokenizer: BaseTokenizer
+) -> list[tuple[str, str, list[str]]]:
+    chunk_splitter = SentenceTokenSplitter(chunk_size=DOC_EMBEDDING_CONTEXT_SIZE)
+    blurb_splitter = SentenceTokenSplitter(chunk_size=BLURB_SIZE)
+    mini_chunk_splitter = SentenceTokenSplitter(chunk_size=MINI_CHUNK_SIZE)
+
+    results = []
+    for section in sections:
+        tokenized_section = TokenizedText.from_text(section, tokenizer)
+        for chunk in chunk_splitter.split(tokenized_section):
+            blurbs = blurb_splitter.split_text(chunk, max_chunks=1)
+            results.append(
+                (
+                    chunk.text,
+                    blurbs[0] if blurbs else "",
+                    mini_chunk_splitter.split_text(chunk),
+                )
+            )
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--num-sections", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    tokenizer = get_tokenizer(model_name=None, provider_type=None)
+    sections = _build_sections(args.num_sections, args.seed)
+    num_tokens = sum(len(tokenizer.encode(section)) for section in sections)
+    print(f"{len(sections)} sections, {num_tokens} tokens")
+
+    timings = {}
+    outputs = {}
+    for name, run in (("llama_index", _run_llama_index), ("native", _run_native)):
+        start = time.monotonic()
+        outputs[name] = run(sections, tokenizer)
+        timings[name] = time.monotonic() - start
+        print(
+            f"{name:>12}: {timings[name]:.2f}s, {len(outputs[name])} chunks, "
+            f"{num_tokens / timings[name]:.0f} tokens/s"
+        )
+    print(f"speedup: {timings['llama_index'] / timings['native']:.1f}x")
+
+    old_chunks = {chunk: (blurb, mini) for chunk, blurb, mini in outputs["llama_index"]}
+    same_chunks = [chunk for chunk, _, _ in outputs["native"] if chunk in old_chunks]
+    same_blurbs = sum(
+        1
+        for chunk, blurb, _ in outputs["native"]
+        if chunk in old_chunks and old_chunks[chunk][0] == blurb
+    )
+    same_mini_chunks = sum(
+        1
+        for chunk, _, mini in outputs["native"]
+        if chunk in old_chunks and old_chunks[chunk][1] == mini
+    )
+    print(
+        f"identical chunks: {len(same_chunks)}/{len(outputs['llama_index'])}, "
+        f"of those identical blurbs: {same_blurbs}, "
+        f"identical mini chunks: {same_mini_chunks}"
+    )
+
+
+if __name__ == "__main__":
+    main()
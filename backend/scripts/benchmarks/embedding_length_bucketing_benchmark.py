@@ -0,0 +1,109 @@
+"""Compares embedding throughput of fixed size batches in arrival order (how texts
+are sent to the model server today) with batches bucketed by token length under a
+token budget (EMBEDDING_LENGTH_BUCKETING_ENABLED).
+
+Runs a local SentenceTransformer on CPU over a mix of texts resembling what indexing
+produces: full chunks, mini-chunks (multipass) and short titles / blurbs.
+
+Basic Usage:
+
+python -m scripts.benchmarks.embedding_length_bucketing_benchmark --num-texts 512
+"""
+
+import argparse
+import random
+import time
+
+from sentence_transformers import SentenceTransformer  # type: ignore
+
+from shared_configs.utils import batch_indices_by_token_budget
+from shared_configs.utils import batch_list
+
+# (fraction of texts, min words, max words)
+_LENGTH_DISTRIBUTION = [
+    (0.4, 250, 450),  # full chunks, many hit the max sequence length
+    (0.4, 60, 120),  # mini-chunks
+    (0.2, 3, 20),  # titles / blurbs
+]
+
+
+def _build_texts(num_texts: int) -> list[str]:
+    rng = random.Random(0)
+    vocabulary = (
+        "the onyx connector indexes documents from confluence jira slack and "
+        "google drive so that answers can cite the relevant sources quickly"
+    ).split()
+
+    texts = []
+    for _ in range(num_texts):
+        roll = rng.random()
+        for fraction, min_words, max_words in _LENGTH_DISTRIBUTION:
+            if roll < fraction:
+                break
+            roll -= fraction
+        num_words = rng.randint(min_words, max_words)
+        texts.append(" ".join(rng.choice(vocabulary) for _ in range(num_words)))
+
+    # arrival order is random, as chunks of different types are interleaved
+    rng.shuffle(texts)
+    return texts
+
+
+def _padding_fraction(lengths: list[int], index_batches: list[list[int]]) -> float:
+    padded = sum(len(batch) * max(lengths[i] for i in batch) for batch in index_batches)
+    return 1 - sum(lengths) / padded
+
+
+def _run(
+    model: SentenceTransformer, texts: list[str], index_batches: list[list[int]]
+) -> float:
+    start = time.monotonic()
+    for batch in index_batches:
+        model.encode([texts[i] for i in batch], batch_size=len(batch))
+    return time.monotonic() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--model", default="nomic-ai/nomic-embed-text-v1")
+    parser.add_argument("--num-texts", type=int, default=512)
+    parser.add_argument("--max-seq-length", type=int, default=512)
+    # BATCH_SIZE_ENCODE_CHUNKS
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--max-batch-size", type=int, default=128)
+    args = parser.parse_args()
+
+    model = SentenceTransformer(args.model, trust_remote_code=True, device="cpu")
+    model.max_seq_length = args.max_seq_length
+
+    texts = _build_texts(args.num_texts)
+    lengths = [
+        len(ids)
+        for ids in model.tokenizer(
+            texts, truncation=True, max_length=args.max_seq_length
+        )["input_ids"]
+    ]
+
+    modes = {
+        "fixed": batch_list(list(range(len(texts))), args.batch_size),
+        "bucketed": batch_indices_by_token_budget(
+            lengths,
+            max_batch_tokens=args.batch_size * args.max_seq_length,
+            max_batch_size=args.max_batch_size,
+        ),
+    }
+
+    # warm up
+    model.encode(texts[: args.batch_size])
+
+    for mode, index_batches in modes.items():
+        elapsed = _run(model, texts, index_batches)
+        print(
+            f"{mode:>8}: {len(texts) / elapsed:7.1f} texts/s "
+            f"batches={len(index_batches):>4} "
+            f"padding={_padding_fraction(lengths, index_batches):.0%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Measures the rule based time / source filter extraction on a set of sample search
+queries: how long the rules take per query and for how many of the queries they are
+sure enough that the LLM (one round trip each, before retrieval can start) is skipped.
+
+The sample queries are a mix of typical workplace searches, pass a file with one query
+per line to measure on real queries instead. No LLM is called.
+
+Basic Usage:
+
+python -m scripts.benchmarks.filter_extraction_benchmark --queries-file queries.txt
+"""
+
+import argparse
+import time
+
+from onyx.configs.constants import DocumentSource
+from onyx.secondary_llm_flows.source_filter import mentioned_document_sources
+from onyx.secondary_llm_flows.time_filter import extract_time_filter_by_rules
+
+_SAMPLE_QUERIES = [
+    "How do I reset my VPN password?",
+    "What is our parental leave policy?",
+    "Who owns the billing service?",
+    "How do I request access to the production database?",
+    "What's the latest on project Corgies?",
+    "What documents in Confluence cover engineer onboarding",
+    "Which customer asked about security features in February of 2022?",
+    "incidents from the last two weeks",
+    "What did we decide about the pricing page since March?",
+    "What changed in the deploy process this month?",
+    "Slack discussion about the outage yesterday",
+    "What happened before the launch?",
+    "Q3 planning doc",
+    "expense report guidelines",
+    "how to set up the local dev environment",
+    "GitHub issues about flaky tests",
+    "design review notes for the search redesign",
+    "What are the SLAs for enterprise customers?",
+    "recent changes to the on-call rotation",
+    "Where is the brand style guide?",
+]
+
+_VALID_SOURCES = [
+    DocumentSource.SLACK,
+    DocumentSource.CONFLUENCE,
+    DocumentSource.GOOGLE_DRIVE,
+    DocumentSource.GITHUB,
+    DocumentSource.JIRA,
+    DocumentSource.WEB,
+]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--queries-file", default=None)
+    parser.add_argument("--iterations", type=int, default=100)
+    args = parser.parse_args()
+
+    if args.queries_file:
+        with open(args.queries_file) as queries_file:
+            queries = [line.strip() for line in queries_file if line.strip()]
+    else:
+        queries = _SAMPLE_QUERIES
+
+    start = time.perf_counter()
+    for _ in range(args.iterations):
+        for query in queries:
+            extract_time_filter_by_rules(query)
+    time_rules_time = (time.perf_counter() - start) / (args.iterations * len(queries))
+
+    start = time.perf_counter()
+    for _ in range(args.iterations):
+        for query in queries:
+            mentioned_document_sources(query, _VALID_SOURCES)
+    source_rules_time = (time.perf_counter() - start) / (args.iterations * len(queries))
+
+    time_llm_queries = [
+        query for query in queries if extract_time_filter_by_rules(query) is None
+    ]
+    source_llm_queries = [
+        query for query in queries if mentioned_document_sources(query, _VALID_SOURCES)
+    ]
+    no_llm_queries = set(queries) - set(time_llm_queries) - set(source_llm_queries)
+
+    print(f"{len(queries)} queries, valid sources: {[s.value for s in _VALID_SOURCES]}")
+    print(
+        f"  time rules:   {time_rules_time * 1e6:6.1f}us per query, "
+        f"LLM needed for {len(time_llm_queries)}/{len(queries)}"
+    )
+    print(
+        f"  source rules: {source_rules_time * 1e6:6.1f}us per query, "
+        f"LLM needed for {len(source_llm_queries)}/{len(queries)}"
+    )
+    print(f"  no LLM call at all: {len(no_llm_queries)}/{len(queries)}")
+    for query in time_llm_queries:
+        print(f"    time filter LLM: {query}")
+    for query in source_llm_queries:
+        print(f"    source filter LLM: {query}")
+
+
+if __name__ == "__main__":
+    main()
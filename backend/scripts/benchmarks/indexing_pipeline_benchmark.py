@@ -0,0 +1,203 @@
+"""Compares the sequential indexing pipeline with the `PipelinedIndexer`.
+
+Documents come from the mock connector (served by a local stub server), embedding
+goes to a stub model server and writes go to a stub Vespa. The stubs just sleep for
+a configurable amount of time per batch, so the numbers show how much of the
+fetch / embed / write latency the pipeline is able to hide.
+
+Basic Usage:
+
+python -m scripts.benchmarks.indexing_pipeline_benchmark --num-batches 50
+"""
+
+import argparse
+import json
+import threading
+import time
+from datetime import datetime
+from datetime import timezone
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+from typing import Any
+
+from onyx.configs.constants import DocumentSource
+from onyx.connectors.connector_runner import ConnectorRunner
+from onyx.connectors.interfaces import CheckpointOutput
+from onyx.connectors.interfaces import SecondsSinceUnixEpoch
+from onyx.connectors.mock_connector.connector import MockConnector
+from onyx.connectors.mock_connector.connector import MockConnectorCheckpoint
+from onyx.connectors.models import Document
+from onyx.connectors.models import IndexAttemptMetadata
+from onyx.connectors.models import TextSection
+from onyx.indexing.indexing_pipeline import IndexingPipelineResult
+from onyx.indexing.pipelined_indexing import PipelinedIndexer
+
+
+def _build_connector_yields(num_batches: int, batch_size: int) -> list[dict]:
+    documents = [
+        Document(
+            id=f"doc_{i}",
+            sections=[TextSection(text="lorem ipsum dolor sit amet " * 200)],
+            source=DocumentSource.MOCK_CONNECTOR,
+            semantic_identifier=f"doc_{i}",
+            metadata={},
+        ).model_dump(mode="json")
+        for i in range(num_batches * batch_size)
+    ]
+    return [
+        {
+            "documents": documents,
+            "checkpoint": MockConnectorCheckpoint(has_more=False).model_dump(
+                mode="json"
+            ),
+            "failures": [],
+        }
+    ]
+
+
+def _start_stub_connector_server(connector_yields: list[dict]) -> ThreadingHTTPServer:
+    payload = json.dumps(connector_yields).encode()
+
+    class _Handler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_POST(self) -> None:
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            self.send_response(200)
+            self.end_headers()
+
+        def log_message(self, format: str, *args: Any) -> None:
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class _SlowMockConnector(MockConnector):
+    """Simulates the network time of a real connector."""
+
+    def __init__(self, host: str, port: int, fetch_latency_per_doc: float) -> None:
+        super().__init__(host, port)
+        self.fetch_latency_per_doc = fetch_latency_per_doc
+
+    def load_from_checkpoint(
+        self,
+        start: SecondsSinceUnixEpoch,
+        end: SecondsSinceUnixEpoch,
+        checkpoint: MockConnectorCheckpoint,
+    ) -> CheckpointOutput[MockConnectorCheckpoint]:
+        generator = super().load_from_checkpoint(start, end, checkpoint)
+        while True:
+            try:
+                item = next(generator)
+            except StopIteration as e:
+                return e.value
+            time.sleep(self.fetch_latency_per_doc)
+            yield item
+
+
+def _build_stages(
+    chunk_latency: float, embed_latency: float, write_latency: float
+) -> list[tuple[str, Any]]:
+    def _chunk(
+        document_batch: list[Document], _: IndexAttemptMetadata
+    ) -> tuple[int, int]:
+        time.sleep(chunk_latency)
+        num_chunks = sum(
+            len(doc.get_text_content()) // 2000 + 1 for doc in document_batch
+        )
+        return len(document_batch), num_chunks
+
+    def _stub_model_server(
+        counts: tuple[int, int], _: IndexAttemptMetadata
+    ) -> tuple[int, int]:
+        time.sleep(embed_latency)
+        return counts
+
+    def _stub_vespa(
+        counts: tuple[int, int], _: IndexAttemptMetadata
+    ) -> IndexingPipelineResult:
+        time.sleep(write_latency)
+        return IndexingPipelineResult(
+            new_docs=counts[0],
+            total_docs=counts[0],
+            total_chunks=counts[1],
+            failures=[],
+        )
+
+    return [("chunk", _chunk), ("embed", _stub_model_server), ("write", _stub_vespa)]
+
+
+def _run(args: argparse.Namespace, port: int, pipelined: bool) -> tuple[float, int]:
+    connector = _SlowMockConnector("127.0.0.1", port, args.fetch_latency_per_doc)
+    connector.load_credentials({})
+    runner: ConnectorRunner[MockConnectorCheckpoint] = ConnectorRunner(
+        connector,
+        batch_size=args.batch_size,
+        time_range=(
+            datetime.fromtimestamp(0, timezone.utc),
+            datetime.now(timezone.utc),
+        ),
+    )
+    stages = _build_stages(args.chunk_latency, args.embed_latency, args.write_latency)
+    metadata = IndexAttemptMetadata(connector_id=0, credential_id=0)
+
+    total_docs = 0
+    start = time.monotonic()
+    if pipelined:
+        with PipelinedIndexer(
+            stages=stages, queue_depths=[args.queue_depth] * len(stages)
+        ) as indexer:
+            for document_batch, _, _ in runner.run(connector.build_dummy_checkpoint()):
+                if document_batch is None:
+                    continue
+                for _, result in indexer.submit(document_batch, metadata):
+                    total_docs += result.total_docs
+            for _, result in indexer.drain():
+                total_docs += result.total_docs
+    else:
+        for document_batch, _, _ in runner.run(connector.build_dummy_checkpoint()):
+            if document_batch is None:
+                continue
+            value: Any = document_batch
+            for _, stage in stages:
+                value = stage(value, metadata)
+            total_docs += value.total_docs
+
+    return time.monotonic() - start, total_docs
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--num-batches", type=int, default=50)
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--queue-depth", type=int, default=1)
+    parser.add_argument("--fetch-latency-per-doc", type=float, default=0.002)
+    parser.add_argument("--chunk-latency", type=float, default=0.02)
+    parser.add_argument("--embed-latency", type=float, default=0.08)
+    parser.add_argument("--write-latency", type=float, default=0.05)
+    args = parser.parse_args()
+
+    server = _start_stub_connector_server(
+        _build_connector_yields(args.num_batches, args.batch_size)
+    )
+    port = server.server_address[1]
+    try:
+        for pipelined in (False, True):
+            elapsed, total_docs = _run(args, port, pipelined)
+            mode = "pipelined" if pipelined else "sequential"
+            print(
+                f"{mode:>10}: {total_docs} docs in {elapsed:.2f}s "
+                f"({total_docs / elapsed:.1f} docs/s)"
+            )
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
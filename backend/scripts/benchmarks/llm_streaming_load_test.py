@@ -0,0 +1,168 @@
+"""Load test of concurrent LLM streams against a local fake OpenAI-compatible server,
+comparing `LLM.stream` on a bounded thread pool (how the sync chat endpoint was served,
+Starlette runs sync generators on a pool of 40 threads by default) with `LLM.astream`
+on the event loop.
+
+The fake server streams `--num-tokens` chunks per completion with `--token-delay`
+seconds between them, so each stream is mostly spent waiting on the "model". It runs
+in a separate process so that it does not compete with the client for the GIL. Nothing
+leaves the machine, no API key is needed.
+
+Basic Usage:
+
+python -m scripts.benchmarks.llm_streaming_load_test --concurrency 100 1000 2000
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import socket
+import statistics
+import time
+from collections.abc import AsyncIterator
+from concurrent.futures import ThreadPoolExecutor
+
+import uvicorn
+from fastapi import FastAPI
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+
+from onyx.llm.chat_llm import DefaultMultiLLM
+
+
+def _fake_openai_app(num_tokens: int, token_delay: float) -> FastAPI:
+    app = FastAPI()
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request) -> StreamingResponse:
+        body = await request.json()
+
+        async def _chunks() -> AsyncIterator[str]:
+            for i in range(num_tokens):
+                await asyncio.sleep(token_delay)
+                chunk = {
+                    "id": "chatcmpl-load-test",
+                    "object": "chat.completion.chunk",
+                    "created": int(time.time()),
+                    "model": body["model"],
+                    "choices": [
+                        {
+                            "index": 0,
+                            "delta": {"role": "assistant", "content": f"token{i} "},
+                            "finish_reason": None if i < num_tokens - 1 else "stop",
+                        }
+                    ],
+                }
+                yield f"data: {json.dumps(chunk)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(_chunks(), media_type="text/event-stream")
+
+    return app
+
+
+def _serve(port: int, num_tokens: int, token_delay: float) -> None:
+    uvicorn.run(
+        _fake_openai_app(num_tokens, token_delay),
+        host="127.0.0.1",
+        port=port,
+        log_level="warning",
+        backlog=4096,
+    )
+
+
+def _start_server(num_tokens: int, token_delay: float) -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+
+    multiprocessing.Process(
+        target=_serve, args=(port, num_tokens, token_delay), daemon=True
+    ).start()
+    while True:
+        try:
+            socket.create_connection(("127.0.0.1", port)).close()
+            return port
+        except ConnectionRefusedError:
+            time.sleep(0.05)
+
+
+def _report(
+    name: str, total_time: float, first_token_times: list[float], num_streams: int
+) -> None:
+    first_token_times.sort()
+    print(
+        f"  {name:>7}: {total_time:6.2f}s total, "
+        f"{num_streams / total_time:7.1f} streams/s, "
+        f"first token p50 {statistics.median(first_token_times):6.2f}s "
+        f"p95 {first_token_times[int(len(first_token_times) * 0.95) - 1]:6.2f}s"
+    )
+
+
+def _run_threaded(llm: DefaultMultiLLM, concurrency: int, num_threads: int) -> None:
+    first_token_times: list[float] = []
+    start = time.perf_counter()
+
+    def _consume() -> None:
+        first_token_time = None
+        for _ in llm.stream("Hi"):
+            if first_token_time is None:
+                first_token_time = time.perf_counter() - start
+        first_token_times.append(first_token_time or 0.0)
+
+    with ThreadPoolExecutor(max_workers=num_threads) as executor:
+        for future in [executor.submit(_consume) for _ in range(concurrency)]:
+            future.result()
+    _report("stream", time.perf_counter() - start, first_token_times, concurrency)
+
+
+async def _run_async(llm: DefaultMultiLLM, concurrency: int) -> None:
+    first_token_times: list[float] = []
+    start = time.perf_counter()
+
+    async def _consume() -> None:
+        first_token_time = None
+        async for _ in llm.astream("Hi"):
+            if first_token_time is None:
+                first_token_time = time.perf_counter() - start
+        first_token_times.append(first_token_time or 0.0)
+
+    await asyncio.gather(*[_consume() for _ in range(concurrency)])
+    _report("astream", time.perf_counter() - start, first_token_times, concurrency)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[100, 1000, 2000])
+    parser.add_argument(
+        "--threads",
+        type=int,
+        default=40,
+        help="size of the thread pool for the sync streams",
+    )
+    parser.add_argument("--num-tokens", type=int, default=50)
+    parser.add_argument("--token-delay", type=float, default=0.02)
+    args = parser.parse_args()
+
+    port = _start_server(args.num_tokens, args.token_delay)
+    llm = DefaultMultiLLM(
+        api_key="load-test",
+        model_provider="openai",
+        model_name="gpt-4o",
+        api_base=f"http://127.0.0.1:{port}/v1",
+        max_input_tokens=128_000,
+    )
+    print(
+        f"fake server on port {port}, {args.num_tokens} tokens per stream, "
+        f"{args.num_tokens * args.token_delay:.1f}s per stream"
+    )
+
+    for concurrency in args.concurrency:
+        print(f"concurrency={concurrency}")
+        _run_threaded(llm, concurrency, args.threads)
+        asyncio.run(_run_async(llm, concurrency))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Compares running every embed request as its own forward pass with coalescing
+concurrent requests through the model server's MicroBatcher.
+
+The "model" is simulated with a fixed per call overhead plus a per item cost, which
+is roughly how a SentenceTransformer forward pass behaves for small batches. The
+simulated model only runs one forward pass at a time, like a model saturating the
+CPU / GPU would.
+
+Basic Usage:
+
+python -m scripts.benchmarks.micro_batching_benchmark --concurrency 1 8 32
+"""
+
+import argparse
+import asyncio
+import statistics
+import threading
+import time
+
+from model_server.micro_batching import MicroBatcher
+
+
+class _SimulatedModel:
+    def __init__(self, call_overhead: float, per_item_cost: float) -> None:
+        self.call_overhead = call_overhead
+        self.per_item_cost = per_item_cost
+        self._lock = threading.Lock()
+
+    def encode(self, texts: list[str]) -> list[list[float]]:
+        with self._lock:
+            time.sleep(self.call_overhead + self.per_item_cost * len(texts))
+        return [[0.0] for _ in texts]
+
+
+def _percentile(latencies: list[float], percentile: float) -> float:
+    return statistics.quantiles(latencies, n=100)[int(percentile) - 1]
+
+
+async def _run(
+    model: _SimulatedModel,
+    batcher: MicroBatcher[str, list[float]] | None,
+    concurrency: int,
+    num_requests: int,
+    texts_per_request: int,
+) -> tuple[float, list[float]]:
+    latencies: list[float] = []
+    semaphore = asyncio.Semaphore(concurrency)
+    texts = ["what is the vacation policy?"] * texts_per_request
+
+    async def _request() -> None:
+        async with semaphore:
+            start = time.monotonic()
+            if batcher:
+                await batcher.submit(texts)
+            else:
+                await asyncio.get_running_loop().run_in_executor(
+                    None, model.encode, texts
+                )
+            latencies.append(time.monotonic() - start)
+
+    start = time.monotonic()
+    await asyncio.gather(*[_request() for _ in range(num_requests)])
+    return time.monotonic() - start, latencies
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--num-requests", type=int, default=500)
+    parser.add_argument("--texts-per-request", type=int, default=1)
+    parser.add_argument("--call-overhead-ms", type=float, default=8)
+    parser.add_argument("--per-item-cost-ms", type=float, default=0.5)
+    parser.add_argument("--max-batch-size", type=int, default=128)
+    parser.add_argument("--max-wait-ms", type=float, default=5)
+    args = parser.parse_args()
+
+    model = _SimulatedModel(args.call_overhead_ms / 1000, args.per_item_cost_ms / 1000)
+    batcher: MicroBatcher[str, list[float]] = MicroBatcher(
+        run_batch=model.encode,
+        max_batch_size=args.max_batch_size,
+        max_wait_seconds=args.max_wait_ms / 1000,
+        kind="benchmark",
+    )
+
+    for concurrency in args.concurrency:
+        for mode, mode_batcher in (("per request", None), ("micro batch", batcher)):
+            elapsed, latencies = asyncio.run(
+                _run(
+                    model,
+                    mode_batcher,
+                    concurrency,
+                    args.num_requests,
+                    args.texts_per_request,
+                )
+            )
+            print(
+                f"concurrency={concurrency:>3} {mode:>11}: "
+                f"{args.num_requests / elapsed:8.1f} req/s "
+                f"p50={_percentile(latencies, 50) * 1000:7.1f}ms "
+                f"p99={_percentile(latencies, 99) * 1000:7.1f}ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Compares model capability lookups (e.g. `model_supports_image_input`) with the
+previous lookup against a deep copy of `litellm.model_cost` (candidate names with the
+provider / ollama tag stripped, tried one by one on every call) and with the
+precomputed capability index.
+
+Startup is the one-off deep copy vs building the index. Unknown models only time the
+lookup, the previous path also logged a traceback for them on every call.
+
+Basic Usage:
+
+python -m scripts.benchmarks.model_capability_benchmark --iterations 100000
+"""
+
+import argparse
+import copy
+import time
+from collections.abc import Callable
+from typing import cast
+
+import litellm  # type: ignore
+
+from onyx.llm.model_capabilities import build_model_capability_index
+from onyx.llm.model_capabilities import get_model_capabilities
+
+_MODELS = {
+    "exact": ("openai", "gpt-4o"),
+    "proxy prefix": ("openai", "my-proxy/gpt-4o"),
+    "ollama tag": ("ollama", "llama3.2:3b"),
+    "unknown": ("openai", "not-a-real-model"),
+}
+
+
+def _find_model_obj(model_map: dict, provider: str, model_name: str) -> dict | None:
+    stripped_model_name = model_name.split("/")[1] if "/" in model_name else model_name
+
+    def _strip_colon(name: str) -> str:
+        return ":".join(name.split(":")[:-1]) if ":" in name else name
+
+    model_names = [
+        model_name,
+        stripped_model_name,
+        _strip_colon(model_name),
+        _strip_colon(stripped_model_name),
+    ]
+    filtered_model_names = [name for name in model_names if name]
+    for name in filtered_model_names:
+        model_obj = model_map.get(f"{provider}/{name}")
+        if model_obj:
+            return model_obj
+    for name in filtered_model_names:
+        model_obj = model_map.get(name)
+        if model_obj:
+            return model_obj
+    return None
+
+
+def _time(lookup: Callable[[], object], iterations: int) -> float:
+    """Mean time (s) of a lookup"""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        lookup()
+    return (time.perf_counter() - start) / iterations
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=100_000)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    model_map = copy.deepcopy(cast(dict, litellm.model_cost))
+    deepcopy_time = time.perf_counter() - start
+    start = time.perf_counter()
+    build_model_capability_index()
+    index_time = time.perf_counter() - start
+    print(
+        f"startup ({len(model_map)} models): deepcopy {deepcopy_time * 1e3:.1f}ms, "
+        f"index {index_time * 1e3:.1f}ms"
+    )
+
+    for label, (provider, model_name) in _MODELS.items():
+        model_obj = _find_model_obj(model_map, provider, model_name)
+        capabilities = get_model_capabilities(model_name, provider)
+        assert bool(model_obj and model_obj.get("supports_vision")) == bool(
+            capabilities and capabilities.supports_vision
+        )
+
+        map_time = _time(
+            lambda: _find_model_obj(model_map, provider, model_name), args.iterations
+        )
+        index_lookup_time = _time(
+            lambda: get_model_capabilities(model_name, provider), args.iterations
+        )
+        print(
+            f"  {label:>12}: model map {map_time * 1e9:7.0f}ns, "
+            f"index {index_lookup_time * 1e9:7.0f}ns "
+            f"({map_time / index_lookup_time:.1f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""Times the pruning of retrieved sections to the context window (`_apply_pruning`,
+which counts the tokens of every section) for 50 and 200 sections of 3 chunks each:
+
+- uncached: the token count cache is disabled and the chunks have no token counts,
+  every section is tokenized (what every prompt / sub-question paid before)
+- cached: the same sections are pruned again, e.g. for the next sub-question of agent
+  search or the next turn of the chat, the counts come from the token count cache
+- precomputed: first time the sections are seen (empty cache), but the chunks carry
+  the token counts computed at indexing time, only the document wrappers are counted
+
+The token limit is high enough that all sections are counted.
+
+Basic Usage:
+
+python -m scripts.benchmarks.prune_sections_benchmark --num-sections 50 200
+"""
+
+import argparse
+import random
+import statistics
+import time
+from collections.abc import Callable
+from unittest.mock import patch
+
+from onyx.chat.prune_and_merge import _apply_pruning
+from onyx.configs.constants import DocumentSource
+from onyx.context.search.models import InferenceChunk
+from onyx.context.search.models import InferenceSection
+from onyx.context.search.utils import inference_section_from_chunks
+from onyx.llm.interfaces import LLMConfig
+from onyx.natural_language_processing.token_count_cache import get_token_count_cache
+from onyx.natural_language_processing.utils import get_tokenizer
+
+_WORDS = (
+    "the index stores every chunk of a document with its embedding and the "
+    "permissions of the source so that search only returns what a user can see "
+    "connectors pull documents from tools like wikis tickets and chat on a schedule"
+).split()
+
+_CHUNKS_PER_SECTION = 3
+
+
+def _build_sections(
+    num_sections: int, words_per_chunk: int, llm_config: LLMConfig
+) -> tuple[list[InferenceSection], list[InferenceSection]]:
+    """The sections without and with the token counts of their chunks"""
+    tokenizer = get_tokenizer(
+        model_name=llm_config.model_name, provider_type=llm_config.model_provider
+    )
+    assert tokenizer.family is not None
+
+    rng = random.Random(0)
+    sections: list[InferenceSection] = []
+    counted_sections: list[InferenceSection] = []
+    for section_num in range(num_sections):
+        chunks = [
+            InferenceChunk(
+                chunk_id=chunk_id,
+                document_id=f"doc_{section_num}",
+                semantic_identifier=f"Document {section_num}",
+                title=f"Document {section_num}",
+                blurb="",
+                content=" ".join(rng.choices(_WORDS, k=words_per_chunk)),
+                source_links={0: f"https://example.com/{section_num}"},
+                section_continuation=chunk_id > 0,
+                source_type=DocumentSource.WEB,
+                boost=0,
+                recency_bias=1.0,
+                score=1.0,
+                hidden=False,
+                metadata={"tag": "benchmark"},
+                match_highlights=[],
+                updated_at=None,
+                image_file_name=None,
+                doc_summary="",
+                chunk_context="",
+            )
+            for chunk_id in range(_CHUNKS_PER_SECTION)
+        ]
+        counted_chunks = [
+            chunk.model_copy(
+                update={
+                    "content_token_counts": {
+                        tokenizer.family: len(tokenizer.encode(chunk.content))
+                    }
+                }
+            )
+            for chunk in chunks
+        ]
+        for section_chunks, target in [
+            (chunks, sections),
+            (counted_chunks, counted_sections),
+        ]:
+            section = inference_section_from_chunks(
+                center_chunk=section_chunks[0], chunks=section_chunks
+            )
+            assert section is not None
+            target.append(section)
+    return sections, counted_sections
+
+
+def _time(
+    prune: Callable[[], object], iterations: int, before: Callable[[], object]
+) -> float:
+    """Median time (s) of a pruning, `before` runs untimed before each one"""
+    timings = []
+    for _ in range(iterations):
+        before()
+        start = time.perf_counter()
+        prune()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--num-sections", type=int, nargs="+", default=[50, 200])
+    parser.add_argument("--words-per-chunk", type=int, default=300)
+    parser.add_argument("--model-provider", default="openai")
+    parser.add_argument("--model-name", default="gpt-4o")
+    parser.add_argument("--using-tool-message", action="store_true")
+    parser.add_argument("--iterations", type=int, default=10)
+    args = parser.parse_args()
+
+    llm_config = LLMConfig(
+        model_provider=args.model_provider,
+        model_name=args.model_name,
+        temperature=0.0,
+        max_input_tokens=10_000_000,
+    )
+    cache = get_token_count_cache()
+    assert cache is not None, "the token count cache is disabled"
+    tokenizer = get_tokenizer(
+        model_name=args.model_name, provider_type=args.model_provider
+    )
+    print(f"tokenizer: {tokenizer.family}")
+
+    for num_sections in args.num_sections:
+        sections, counted_sections = _build_sections(
+            num_sections, args.words_per_chunk, llm_config
+        )
+
+        def _prune(prune_sections: list[InferenceSection]) -> Callable[[], object]:
+            return lambda: _apply_pruning(
+                sections=prune_sections,
+                section_relevance_list=None,
+                token_limit=10_000_000,
+                is_manually_selected_docs=False,
+                use_sections=True,
+                using_tool_message=args.using_tool_message,
+                llm_config=llm_config,
+            )
+
+        with patch(
+            "onyx.natural_language_processing.token_count_cache.get_token_count_cache",
+            return_value=None,
+        ):
+            uncached_time = _time(_prune(sections), args.iterations, lambda: None)
+
+        cache.clear()
+        _prune(sections)()
+        cached_time = _time(_prune(sections), args.iterations, lambda: None)
+
+        precomputed_time = _time(_prune(counted_sections), args.iterations, cache.clear)
+
+        print(f"{num_sections} sections:")
+        for name, prune_time in [
+            ("uncached", uncached_time),
+            ("cached", cached_time),
+            ("precomputed", precomputed_time),
+        ]:
+            print(
+                f"  {name:>11}: {prune_time * 1e3:8.2f}ms "
+                f"({uncached_time / prune_time:5.1f}x)"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""Compares memory / time of the in-memory set diff pruning used to do with the
+external sort + merge diff.
+
+Each mode runs in its own process so that peak RSS is measured independently.
+The "indexed" ids are streamed from a generator, standing in for the `yield_per`
+query against Postgres.
+
+Basic Usage:
+
+python -m scripts.benchmarks.pruning_diff_benchmark --num-ids 1000000 10000000
+"""
+
+import argparse
+import multiprocessing
+import random
+import resource
+import time
+from collections.abc import Iterator
+
+from onyx.utils.external_sort import ExternalIdSorter
+from onyx.utils.external_sort import sorted_difference
+
+# ~typical length of a document id (most are urls)
+_ID_TEMPLATE = "https://example.atlassian.net/wiki/spaces/ENG/pages/{:012d}"
+
+
+def _source_id_batches(
+    num_ids: int, removed_fraction: float, batch_size: int = 1000
+) -> Iterator[list[str]]:
+    """Source ids in a random order (as connectors return them), with a fraction of
+    the indexed ids missing."""
+    rng = random.Random(0)
+    order = list(range(num_ids))
+    rng.shuffle(order)
+    batch: list[str] = []
+    for i in order:
+        if rng.random() < removed_fraction:
+            continue
+        batch.append(_ID_TEMPLATE.format(i))
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _indexed_ids(num_ids: int) -> Iterator[str]:
+    # zero padded, so numeric order == string order
+    for i in range(num_ids):
+        yield _ID_TEMPLATE.format(i)
+
+
+def _max_rss_mb() -> float:
+    # ru_maxrss is in KB on linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _run_set_diff(num_ids: int, removed_fraction: float) -> int:
+    all_connector_doc_ids: set[str] = set()
+    for batch in _source_id_batches(num_ids, removed_fraction):
+        all_connector_doc_ids.update(batch)
+    all_indexed_document_ids = set(_indexed_ids(num_ids))
+    return len(list(all_indexed_document_ids - all_connector_doc_ids))
+
+
+def _run_merge_diff(num_ids: int, removed_fraction: float, run_size: int) -> int:
+    with ExternalIdSorter(run_size=run_size) as sorter:
+        for batch in _source_id_batches(num_ids, removed_fraction):
+            sorter.add_many(batch)
+        return sum(
+            1 for _ in sorted_difference(_indexed_ids(num_ids), sorter.iter_sorted())
+        )
+
+
+def _worker(
+    mode: str,
+    num_ids: int,
+    removed_fraction: float,
+    run_size: int,
+    results: multiprocessing.Queue,
+) -> None:
+    baseline_rss = _max_rss_mb()
+    start = time.monotonic()
+    if mode == "set":
+        num_removed = _run_set_diff(num_ids, removed_fraction)
+    else:
+        num_removed = _run_merge_diff(num_ids, removed_fraction, run_size)
+    results.put((time.monotonic() - start, _max_rss_mb() - baseline_rss, num_removed))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--num-ids", type=int, nargs="+", default=[1_000_000])
+    parser.add_argument("--removed-fraction", type=float, default=0.01)
+    parser.add_argument("--run-size", type=int, default=100_000)
+    args = parser.parse_args()
+
+    for num_ids in args.num_ids:
+        for mode in ("set", "merge"):
+            results: multiprocessing.Queue = multiprocessing.Queue()
+            process = multiprocessing.Process(
+                target=_worker,
+                args=(mode, num_ids, args.removed_fraction, args.run_size, results),
+            )
+            process.start()
+            elapsed, rss_mb, num_removed = results.get()
+            process.join()
+            print(
+                f"{num_ids:>10} ids {mode:>5}: {elapsed:7.2f}s "
+                f"peak_rss_increase={rss_mb:8.1f}MB removed={num_removed}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""Compares the time it takes to turn cross-encoder scores into the reranked chunks with
+the previous list based scoring (zip the boosts, recency and scores with the chunks,
+then sort the tuples) and with the NumPy stage of `semantic_reranking`.
+
+Only the post-processing is timed, the scores are generated up front in place of the
+reranking model.
+
+Basic Usage:
+
+python -m scripts.benchmarks.rerank_postprocessing_benchmark --num-rerank 50 200 1000
+"""
+
+import argparse
+import random
+import time
+from collections.abc import Callable
+from typing import cast
+
+import numpy
+
+from onyx.configs.constants import DocumentSource
+from onyx.context.search.models import InferenceChunk
+from onyx.context.search.postprocessing.postprocessing import _rank_by_rerank_scores
+from onyx.document_index.document_index_utils import (
+    translate_boost_count_to_multiplier,
+)
+
+
+def _chunk(i: int, rng: random.Random) -> InferenceChunk:
+    return InferenceChunk(
+        chunk_id=i % 8,
+        document_id=f"doc{i // 8}",
+        semantic_identifier=f"doc{i // 8}",
+        title=None,
+        blurb="",
+        content="",
+        source_links=None,
+        section_continuation=False,
+        source_type=DocumentSource.WEB,
+        boost=rng.randint(-5, 5),
+        recency_bias=rng.uniform(0.5, 1.0),
+        score=None,
+        hidden=False,
+        metadata={},
+        match_highlights=[],
+        updated_at=None,
+        image_file_name=None,
+        doc_summary="",
+        chunk_context="",
+    )
+
+
+def _list_scoring(
+    scores: list[float], candidates: list[InferenceChunk], assign_scores: bool = True
+) -> tuple[list[InferenceChunk], list[int]]:
+    sim_scores = [numpy.array(scores)]
+    raw_sim_scores = cast(numpy.ndarray, sum(sim_scores) / len(sim_scores))
+    cross_models_min = numpy.min(sim_scores)
+    shifted_sim_scores = sum(
+        [enc_n_scores - cross_models_min for enc_n_scores in sim_scores]
+    ) / len(sim_scores)
+    boosts = [translate_boost_count_to_multiplier(chunk.boost) for chunk in candidates]
+    recency_multiplier = [chunk.recency_bias for chunk in candidates]
+    boosted_sim_scores = shifted_sim_scores * boosts * recency_multiplier
+    normalized_b_s_scores = (boosted_sim_scores + cross_models_min - 0) / (1 - 0)
+    scored_results = list(
+        zip(
+            normalized_b_s_scores,
+            raw_sim_scores,
+            candidates,
+            list(range(len(candidates))),
+        )
+    )
+    scored_results.sort(key=lambda x: x[0], reverse=True)
+    ranked_sim_scores, _, ranked_chunks, ranked_indices = zip(*scored_results)
+    if assign_scores:
+        for ind, chunk in enumerate(ranked_chunks):
+            chunk.score = ranked_sim_scores[ind]
+    return list(ranked_chunks), list(ranked_indices)
+
+
+def _array_scoring(
+    scores: list[float], candidates: list[InferenceChunk], assign_scores: bool = True
+) -> tuple[list[InferenceChunk], list[int]]:
+    ranking, normalized_scores = _rank_by_rerank_scores(
+        numpy.asarray(scores, dtype=numpy.float64),
+        boosts=numpy.fromiter(
+            (chunk.boost for chunk in candidates),
+            dtype=numpy.float64,
+            count=len(candidates),
+        ),
+        recency_biases=numpy.fromiter(
+            (chunk.recency_bias for chunk in candidates),
+            dtype=numpy.float64,
+            count=len(candidates),
+        ),
+    )
+    ranked_indices = ranking.tolist()
+    ranked_chunks = [candidates[i] for i in ranked_indices]
+    if assign_scores:
+        for chunk, score in zip(ranked_chunks, normalized_scores[ranking].tolist()):
+            chunk.score = score
+    return ranked_chunks, ranked_indices
+
+
+def _time(
+    rank: Callable[[list[float], list[InferenceChunk], bool], object],
+    scores: list[float],
+    candidates: list[InferenceChunk],
+    iterations: int,
+    assign_scores: bool,
+) -> float:
+    """Mean time (s) of a ranking"""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        rank(scores, candidates, assign_scores)
+    return (time.perf_counter() - start) / iterations
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--num-rerank", type=int, nargs="+", default=[50, 200, 1000])
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    for num_rerank in args.num_rerank:
+        candidates = [_chunk(i, rng) for i in range(num_rerank)]
+        scores = [rng.random() for _ in candidates]
+
+        _, list_indices = _list_scoring(scores, candidates)
+        _, array_indices = _array_scoring(scores, candidates)
+        assert list_indices == array_indices
+
+        print(f"num_rerank={num_rerank}")
+        # writing the scores back to the chunks costs the same for both
+        for assign_scores in (True, False):
+            list_time = _time(
+                _list_scoring, scores, candidates, args.iterations, assign_scores
+            )
+            array_time = _time(
+                _array_scoring, scores, candidates, args.iterations, assign_scores
+            )
+            label = "with score assignment" if assign_scores else "scoring only"
+            print(
+                f"  {label:>21}: list {list_time * 1e6:8.1f}us, "
+                f"numpy {array_time * 1e6:8.1f}us ({list_time / array_time:.1f}x)"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""Compares the time it takes to combine the results of several retrievals with the
+previous dict based dedupe (keep the max score, then sort) and with
+`fuse_retrieval_results` for each of its fusion methods.
+
+The retrievals overlap partially, like the base / expansion / rephrase retrievals of
+a search do.
+
+Basic Usage:
+
+python -m scripts.benchmarks.retrieval_fusion_benchmark --retrievals 10 --hits 1000
+"""
+
+import argparse
+import random
+import time
+from collections.abc import Callable
+
+from onyx.configs.constants import DocumentSource
+from onyx.context.search.enums import RetrievalFusionMethod
+from onyx.context.search.models import InferenceChunkUncleaned
+from onyx.context.search.retrieval.fusion import fuse_retrieval_results
+
+
+def _chunk(document_id: str, chunk_id: int, score: float) -> InferenceChunkUncleaned:
+    return InferenceChunkUncleaned(
+        chunk_id=chunk_id,
+        document_id=document_id,
+        semantic_identifier=document_id,
+        title=None,
+        blurb="",
+        content="",
+        source_links=None,
+        section_continuation=False,
+        source_type=DocumentSource.WEB,
+        boost=0,
+        recency_bias=1.0,
+        score=score,
+        hidden=False,
+        metadata={},
+        match_highlights=[],
+        updated_at=None,
+        image_file_name=None,
+        doc_summary="",
+        chunk_context="",
+        metadata_suffix=None,
+        large_chunk_reference_ids=[],
+    )
+
+
+def _retrievals(
+    num_retrievals: int, num_hits: int, overlap: float, rng: random.Random
+) -> list[list[InferenceChunkUncleaned]]:
+    # the shared chunks are hit by every retrieval
+    shared = [(f"doc{i // 8}", i % 8) for i in range(int(num_hits * overlap))]
+    retrievals = []
+    for retrieval in range(num_retrievals):
+        keys = shared + [
+            (f"retrieval{retrieval}_doc{i // 8}", i % 8)
+            for i in range(num_hits - len(shared))
+        ]
+        scores = sorted((rng.random() for _ in keys), reverse=True)
+        rng.shuffle(keys)
+        retrievals.append(
+            [
+                _chunk(document_id, chunk_id, score)
+                for (document_id, chunk_id), score in zip(keys, scores)
+            ]
+        )
+    return retrievals
+
+
+def _dict_dedupe(
+    chunk_sets: list[list[InferenceChunkUncleaned]],
+) -> list[InferenceChunkUncleaned]:
+    unique_chunks: dict[tuple[str, int], InferenceChunkUncleaned] = {}
+    for chunk in (chunk for chunk_set in chunk_sets for chunk in chunk_set):
+        key = (chunk.document_id, chunk.chunk_id)
+        if key not in unique_chunks or (unique_chunks[key].score or 0) < (
+            chunk.score or 0
+        ):
+            unique_chunks[key] = chunk
+    return sorted(unique_chunks.values(), key=lambda x: x.score or 0, reverse=True)
+
+
+def _time(
+    combine: Callable[[], list],
+    chunk_sets: list[list[InferenceChunkUncleaned]],
+    iterations: int,
+) -> float:
+    """Mean time (s) of a combination"""
+    # fusion overwrites the scores of the hits
+    scores = [[chunk.score for chunk in chunk_set] for chunk_set in chunk_sets]
+    total = 0.0
+    for _ in range(iterations):
+        for chunk_set, set_scores in zip(chunk_sets, scores):
+            for chunk, score in zip(chunk_set, set_scores):
+                chunk.score = score
+        start = time.perf_counter()
+        combine()
+        total += time.perf_counter() - start
+    return total / iterations
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--retrievals", type=int, default=10)
+    parser.add_argument("--hits", type=int, default=1000)
+    parser.add_argument(
+        "--overlap",
+        type=float,
+        default=0.5,
+        help="share of the hits in every retrieval",
+    )
+    parser.add_argument("--top-k", type=int, default=None)
+    parser.add_argument("--iterations", type=int, default=50)
+    args = parser.parse_args()
+
+    chunk_sets = _retrievals(args.retrievals, args.hits, args.overlap, random.Random(0))
+    print(
+        f"{args.retrievals} retrievals x {args.hits} hits, "
+        f"{len(_dict_dedupe(chunk_sets))} unique chunks"
+    )
+
+    dict_time = _time(lambda: _dict_dedupe(chunk_sets), chunk_sets, args.iterations)
+    print(f"  {'dict max':>14}: {dict_time * 1e3:7.2f}ms")
+    for method in RetrievalFusionMethod:
+        fusion_time = _time(
+            lambda: fuse_retrieval_results(chunk_sets, method=method, top_k=args.top_k),
+            chunk_sets,
+            args.iterations,
+        )
+        print(f"  {'fused ' + method.value:>14}: {fusion_time * 1e3:7.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
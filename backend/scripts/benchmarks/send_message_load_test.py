@@ -0,0 +1,182 @@
+"""Load test of concurrent chat messages against a running api server, through
+`/chat/send-message` itself (auth, rate limits, chat session / message writes, search
+and the LLM) rather than only the LLM stream.
+
+Every message gets a chat session of its own, the sessions are created before the
+clock starts. Reports how many messages were answered and how many were rejected with
+a 503 because every chat stream thread of the api server was taken
+(CHAT_STREAM_MAX_THREADS), with the time to the first packet / first answer token of
+the answered ones.
+
+To measure the api server rather than the LLM provider, point its default LLM provider
+at a fake OpenAI compatible server (e.g. the one of `llm_streaming_load_test`).
+
+Basic Usage:
+
+python -m scripts.benchmarks.send_message_load_test --api-key <key> --concurrency 10 50 100
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from dataclasses import dataclass
+from dataclasses import field
+from typing import Any
+
+import httpx
+
+
+@dataclass
+class _Results:
+    first_packet_times: list[float] = field(default_factory=list)
+    first_token_times: list[float] = field(default_factory=list)
+    num_answered: int = 0
+    num_rejected: int = 0
+    errors: list[str] = field(default_factory=list)
+
+
+def _percentile(values: list[float], percentile: float) -> float:
+    values = sorted(values)
+    return values[max(int(len(values) * percentile) - 1, 0)]
+
+
+def _report(concurrency: int, total_time: float, results: _Results) -> None:
+    print(
+        f"  {results.num_answered}/{concurrency} answered, "
+        f"{results.num_rejected} rejected (503), {len(results.errors)} errors, "
+        f"{total_time:.2f}s total"
+    )
+    for name, times in [
+        ("first packet", results.first_packet_times),
+        ("first token", results.first_token_times),
+    ]:
+        if times:
+            print(
+                f"  {name:>12}: p50 {statistics.median(times):6.2f}s "
+                f"p95 {_percentile(times, 0.95):6.2f}s max {max(times):6.2f}s"
+            )
+    for error in results.errors[:5]:
+        print(f"  error: {error}")
+
+
+async def _create_chat_session(client: httpx.AsyncClient, persona_id: int) -> str:
+    response = await client.post(
+        "/chat/create-chat-session", json={"persona_id": persona_id}
+    )
+    response.raise_for_status()
+    return response.json()["chat_session_id"]
+
+
+async def _send_message(
+    client: httpx.AsyncClient,
+    chat_session_id: str,
+    message: str,
+    start: float,
+    results: _Results,
+) -> None:
+    request: dict[str, Any] = {
+        "chat_session_id": chat_session_id,
+        "parent_message_id": None,
+        "message": message,
+        "file_descriptors": [],
+        "prompt_id": None,
+        "search_doc_ids": None,
+        "retrieval_options": {"run_search": "auto", "real_time": True},
+    }
+    first_packet_time = None
+    first_token_time = None
+    try:
+        async with client.stream(
+            "POST", "/chat/send-message", json=request
+        ) as response:
+            if response.status_code == 503:
+                results.num_rejected += 1
+                return
+            if response.status_code != 200:
+                await response.aread()
+                results.errors.append(f"{response.status_code}: {response.text}")
+                return
+
+            async for line in response.aiter_lines():
+                if not line:
+                    continue
+                if first_packet_time is None:
+                    first_packet_time = time.perf_counter() - start
+                packet = json.loads(line)
+                if "error" in packet:
+                    results.errors.append(packet["error"])
+                    return
+                if first_token_time is None and packet.get("answer_piece"):
+                    first_token_time = time.perf_counter() - start
+    except httpx.HTTPError as e:
+        results.errors.append(repr(e))
+        return
+
+    results.num_answered += 1
+    if first_packet_time is not None:
+        results.first_packet_times.append(first_packet_time)
+    if first_token_time is not None:
+        results.first_token_times.append(first_token_time)
+
+
+async def _run(
+    api_server_url: str,
+    api_key: str | None,
+    persona_id: int,
+    message: str,
+    concurrency: int,
+    timeout: float,
+) -> None:
+    async with httpx.AsyncClient(
+        base_url=api_server_url,
+        headers={"Authorization": f"Bearer {api_key}"} if api_key else None,
+        timeout=timeout,
+        limits=httpx.Limits(max_connections=None),
+    ) as client:
+        chat_session_ids = [
+            await _create_chat_session(client, persona_id) for _ in range(concurrency)
+        ]
+
+        results = _Results()
+        start = time.perf_counter()
+        await asyncio.gather(
+            *[
+                _send_message(client, chat_session_id, message, start, results)
+                for chat_session_id in chat_session_ids
+            ]
+        )
+        _report(concurrency, time.perf_counter() - start, results)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--api-server-url", default="http://127.0.0.1:8080")
+    parser.add_argument(
+        "--api-key", default=None, help="not needed if auth is disabled"
+    )
+    parser.add_argument("--persona-id", type=int, default=0)
+    parser.add_argument("--message", default="What is our parental leave policy?")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[10, 50, 100])
+    parser.add_argument(
+        "--timeout", type=float, default=300, help="seconds per message"
+    )
+    args = parser.parse_args()
+
+    for concurrency in args.concurrency:
+        print(f"concurrency={concurrency}")
+        asyncio.run(
+            _run(
+                api_server_url=args.api_server_url,
+                api_key=args.api_key,
+                persona_id=args.persona_id,
+                message=args.message,
+                concurrency=concurrency,
+                timeout=args.timeout,
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""Compares the cost of a token rate limit check with the previous Postgres aggregate
+(per-minute GROUP BY over the chat messages joined to their chat sessions) and with
+the Redis token budget counters.
+
+The chat history is generated in temporary tables (dropped at the end) with the
+shape and indexes of chat_message / chat_session, spread over `--days` days. The
+counter holds the same usage for the longest rate limit window.
+
+Needs the Postgres and Redis of the configured environment.
+
+Basic Usage:
+
+python -m scripts.benchmarks.token_budget_benchmark --num-messages 1000000 --days 90
+"""
+
+import argparse
+import statistics
+import time
+import uuid
+from collections.abc import Callable
+from datetime import datetime
+from datetime import timedelta
+from datetime import timezone
+
+from sqlalchemy import text
+
+from onyx.db.engine import get_sqlalchemy_engine
+from onyx.db.engine import SqlEngine
+from onyx.redis.redis_token_budget import RedisTokenBudget
+
+_CREATE_TABLES = """
+CREATE TEMPORARY TABLE bench_chat_session (id uuid PRIMARY KEY, user_id uuid);
+CREATE TEMPORARY TABLE bench_chat_message (
+    id serial PRIMARY KEY,
+    chat_session_id uuid NOT NULL,
+    time_sent timestamptz NOT NULL,
+    token_count int NOT NULL
+);
+INSERT INTO bench_chat_session
+    SELECT
+        md5(i::text)::uuid,
+        ('00000000-0000-0000-0000-' || lpad((i % :num_users)::text, 12, '0'))::uuid
+    FROM generate_series(0, :num_sessions - 1) AS i;
+INSERT INTO bench_chat_message (chat_session_id, time_sent, token_count)
+    SELECT
+        md5((i % :num_sessions)::text)::uuid,
+        now() - random() * make_interval(days => :days),
+        (random() * 2000)::int
+    FROM generate_series(1, :num_messages) AS i;
+CREATE INDEX ON bench_chat_message (time_sent);
+CREATE INDEX ON bench_chat_message (chat_session_id);
+CREATE INDEX ON bench_chat_session (user_id);
+ANALYZE bench_chat_session;
+ANALYZE bench_chat_message;
+"""
+
+_GLOBAL_USAGE = """
+SELECT date_trunc('minute', m.time_sent), sum(m.token_count)
+FROM bench_chat_message m JOIN bench_chat_session s ON m.chat_session_id = s.id
+WHERE m.time_sent >= :cutoff_time
+GROUP BY date_trunc('minute', m.time_sent)
+"""
+
+_USER_USAGE = """
+SELECT date_trunc('minute', m.time_sent), sum(m.token_count)
+FROM bench_chat_message m JOIN bench_chat_session s ON m.chat_session_id = s.id
+WHERE s.user_id = :user_id AND m.time_sent >= :cutoff_time
+GROUP BY date_trunc('minute', m.time_sent)
+"""
+
+
+def _time(check: Callable[[], object], iterations: int) -> tuple[float, float]:
+    """Median and p95 time (s) of a check"""
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        check()
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return statistics.median(timings), timings[int(len(timings) * 0.95) - 1]
+
+
+def _report(name: str, timings: tuple[float, float]) -> None:
+    print(f"  {name:>28}: p50 {timings[0] * 1e3:8.2f}ms, p95 {timings[1] * 1e3:8.2f}ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--num-messages", type=int, default=1_000_000)
+    parser.add_argument("--num-users", type=int, default=1_000)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument(
+        "--period-hours",
+        type=int,
+        nargs="+",
+        default=[1, 24],
+        help="periods of the rate limits checked",
+    )
+    parser.add_argument("--iterations", type=int, default=50)
+    args = parser.parse_args()
+
+    SqlEngine.init_engine(pool_size=2, max_overflow=0)
+    token_budget = RedisTokenBudget(tenant_id=f"benchmark_{uuid.uuid4().hex}")
+    user_id = uuid.UUID(int=0)
+    ttl_seconds = max(args.period_hours) * 60 * 60
+
+    with get_sqlalchemy_engine().connect() as connection:
+        start = time.perf_counter()
+        for statement in _CREATE_TABLES.split(";"):
+            if statement.strip():
+                connection.execute(
+                    text(statement),
+                    {
+                        "num_users": args.num_users,
+                        "num_sessions": args.num_users * 10,
+                        "num_messages": args.num_messages,
+                        "days": args.days,
+                    },
+                )
+        print(
+            f"{args.num_messages} messages of {args.num_users} users over "
+            f"{args.days} days, generated in {time.perf_counter() - start:.1f}s"
+        )
+
+        def _window_starts() -> list[datetime]:
+            now = datetime.now(tz=timezone.utc)
+            return [now - timedelta(hours=hours) for hours in args.period_hours]
+
+        for scope, query, params in [
+            ("global", _GLOBAL_USAGE, {}),
+            (f"user:{user_id}", _USER_USAGE, {"user_id": user_id}),
+        ]:
+
+            def _fetch_usage() -> list[tuple[datetime, int]]:
+                rows = connection.execute(
+                    text(query), {"cutoff_time": min(_window_starts()), **params}
+                ).all()
+                return [(row[0], row[1]) for row in rows]
+
+            usage = _fetch_usage()
+            token_budget.reconstruct(
+                scope, usage, min(_window_starts()), ttl_seconds=ttl_seconds
+            )
+            print(f"{scope} scope, {len(usage)} minute buckets in the longest window")
+            _report("postgres aggregate", _time(_fetch_usage, args.iterations))
+            _report(
+                "redis counter",
+                _time(
+                    lambda: token_budget.get_windowed_usage(
+                        scope, _window_starts(), ttl_seconds
+                    ),
+                    args.iterations,
+                ),
+            )
+            _report(
+                "record usage (per message)",
+                _time(
+                    lambda: token_budget.record_usage(
+                        [scope], 100, datetime.now(tz=timezone.utc)
+                    ),
+                    args.iterations,
+                ),
+            )
+            token_budget.redis_client.delete(token_budget._counter_key(scope))
+
+
+if __name__ == "__main__":
+    main()
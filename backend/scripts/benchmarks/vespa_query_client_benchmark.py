@@ -0,0 +1,141 @@
+"""Compares a new Vespa client per search (the old query path) with the pooled query
+client against a local stub Vespa server.
+
+The stub answers every search with the same handful of hits after a configurable
+latency. Searches are issued from several threads at once, like the parallel
+keyword / semantic / rephrase retrievals of a chat turn.
+
+Basic Usage:
+
+python -m scripts.benchmarks.vespa_query_client_benchmark --num-searches 500 --concurrency 4
+"""
+
+import argparse
+import json
+import statistics
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+from typing import Any
+
+from onyx.document_index.vespa.query_client import vespa_query_request
+from onyx.document_index.vespa.query_client import VespaQueryClientPool
+from onyx.document_index.vespa.shared_utils.utils import get_vespa_http_client
+
+
+def _search_response(num_hits: int) -> bytes:
+    hits = [
+        {
+            "id": f"id:default:danswer_chunk::doc_{i}__{i}",
+            "relevance": 1.0 / (i + 1),
+            "fields": {
+                "document_id": f"doc_{i}",
+                "chunk_id": 0,
+                "content": "lorem ipsum dolor sit amet " * 40,
+                "semantic_identifier": f"Document {i}",
+                "section_continuation": False,
+                "source_type": "web",
+                "source_links": '{"0": "https://example.com"}',
+                "metadata": "{}",
+            },
+        }
+        for i in range(num_hits)
+    ]
+    return json.dumps({"root": {"children": hits}}).encode()
+
+
+def _start_stub_vespa_server(latency: float, num_hits: int) -> ThreadingHTTPServer:
+    body = _search_response(num_hits)
+
+    class _Handler(BaseHTTPRequestHandler):
+        # keep-alive, so that connections can actually be reused
+        protocol_version = "HTTP/1.1"
+        # headers and body are written separately, don't let Nagle delay the body
+        disable_nagle_algorithm = True
+
+        def do_POST(self) -> None:
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            time.sleep(latency)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format: str, *args: Any) -> None:
+            pass
+
+    class _Server(ThreadingHTTPServer):
+        request_queue_size = 1024
+        daemon_threads = True
+
+    server = _Server(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def _new_client_per_search(url: str) -> None:
+    # what `query_vespa` did before the pooled client
+    with get_vespa_http_client() as http_client:
+        response = http_client.post(url, json={"yql": "select * from sources *"})
+        response.raise_for_status()
+        response.json()
+
+
+def _pooled_search(url: str) -> None:
+    # what `query_vespa` does now
+    response = vespa_query_request(
+        "POST", url, operation="search", json={"yql": "select * from sources *"}
+    )
+    response.raise_for_status()
+    response.json()
+
+
+def _run(
+    search: Callable[[str], None], url: str, num_searches: int, concurrency: int
+) -> list[float]:
+    def _timed_search(_: int) -> float:
+        start = time.monotonic()
+        search(url)
+        return time.monotonic() - start
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        return list(executor.map(_timed_search, range(num_searches)))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--num-searches", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument(
+        "--latency", type=float, default=0.002, help="stub latency per search (s)"
+    )
+    parser.add_argument("--num-hits", type=int, default=10)
+    args = parser.parse_args()
+
+    server = _start_stub_vespa_server(args.latency, args.num_hits)
+    url = f"http://127.0.0.1:{server.server_address[1]}/search/"
+
+    for name, search in (
+        ("new client per search", _new_client_per_search),
+        ("pooled client", _pooled_search),
+    ):
+        # warm up (imports, first connection)
+        _run(search, url, args.concurrency, args.concurrency)
+        latencies = _run(search, url, args.num_searches, args.concurrency)
+        quantiles = statistics.quantiles(latencies, n=100)
+        print(
+            f"{name:>22}: p50={quantiles[49] * 1000:.2f}ms "
+            f"p95={quantiles[94] * 1000:.2f}ms "
+            f"p99={quantiles[98] * 1000:.2f}ms"
+        )
+
+    VespaQueryClientPool.close()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""Compares the size and the serialization time of Vespa requests carrying embeddings as
+JSON lists of floats (the default) with the hex tensor form (VESPA_HEX_TENSOR_CELL_TYPE).
+
+Measures the search request body with the query embedding, and the feed body of a
+chunk with its full chunk, mini chunk and title embeddings, like they are sent to Vespa.
+
+Basic Usage:
+
+python -m scripts.benchmarks.vespa_tensor_encoding_benchmark --dims 768 1536
+"""
+
+import argparse
+import json
+import random
+import time
+from collections.abc import Callable
+from typing import Any
+
+from onyx.db.enums import EmbeddingPrecision
+from onyx.document_index.vespa.shared_utils.utils import encode_hex_tensor
+
+
+def _embedding(dim: int, rng: random.Random) -> list[float]:
+    return [rng.gauss(0, 0.05) for _ in range(dim)]
+
+
+def _query_body(
+    embedding: list[float], cell_type: EmbeddingPrecision | None
+) -> dict[str, Any]:
+    return {
+        "yql": "select * from sources * where true",
+        "query": "what is the quarterly revenue",
+        "input.query(query_embedding)": (
+            encode_hex_tensor(embedding, cell_type) if cell_type else str(embedding)
+        ),
+        "hits": 50,
+    }
+
+
+def _feed_body(
+    embeddings: dict[str, list[float]],
+    title_embedding: list[float],
+    cell_type: EmbeddingPrecision | None,
+) -> dict[str, Any]:
+    if cell_type is None:
+        return {
+            "fields": {"embeddings": embeddings, "title_embedding": title_embedding}
+        }
+    return {
+        "fields": {
+            "embeddings": {
+                "blocks": {
+                    name: encode_hex_tensor(vector, cell_type)
+                    for name, vector in embeddings.items()
+                }
+            },
+            "title_embedding": {
+                "values": encode_hex_tensor(title_embedding, cell_type)
+            },
+        }
+    }
+
+
+def _time(build: Callable[[], dict[str, Any]], iterations: int) -> tuple[float, int]:
+    """Mean time (s) to build and serialize the body, and the size of the body"""
+    size = len(json.dumps(build()).encode())
+    start = time.perf_counter()
+    for _ in range(iterations):
+        json.dumps(build()).encode()
+    return (time.perf_counter() - start) / iterations, size
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dims", type=int, nargs="+", default=[768, 1024, 1536])
+    parser.add_argument("--mini-chunks", type=int, default=4)
+    parser.add_argument("--iterations", type=int, default=500)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    encodings: list[tuple[str, EmbeddingPrecision | None]] = [
+        ("json floats", None),
+        ("hex float", EmbeddingPrecision.FLOAT),
+        ("hex bfloat16", EmbeddingPrecision.BFLOAT16),
+    ]
+
+    for dim in args.dims:
+        query_embedding = _embedding(dim, rng)
+        chunk_embeddings = {"full_chunk": _embedding(dim, rng)} | {
+            f"mini_chunk_{i}": _embedding(dim, rng) for i in range(args.mini_chunks)
+        }
+        title_embedding = _embedding(dim, rng)
+
+        print(f"dim={dim}")
+        for name, cell_type in encodings:
+            query_time, query_size = _time(
+                lambda: _query_body(query_embedding, cell_type), args.iterations
+            )
+            feed_time, feed_size = _time(
+                lambda: _feed_body(chunk_embeddings, title_embedding, cell_type),
+                args.iterations,
+            )
+            print(
+                f"  {name:>13}: query {query_size / 1024:6.1f}KiB "
+                f"{query_time * 1e6:7.0f}us | feed {feed_size / 1024:6.1f}KiB "
+                f"{feed_time * 1e6:7.0f}us"
+            )
+
+
+if __name__ == "__main__":
+    main()
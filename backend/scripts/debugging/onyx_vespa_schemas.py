@@ -4,6 +4,7 @@ import argparse
 
 import jinja2
 
+from onyx.configs.app_configs import VESPA_HEX_TENSOR_CELL_TYPE
 from onyx.db.enums import EmbeddingPrecision
 from onyx.utils.logger import setup_logger
 from shared_configs.configs import SUPPORTED_EMBEDDING_MODELS
@@ -13,12 +14,15 @@ logger = setup_logger()
 
 def write_schema(index_name: str, dim: int, template: jinja2.Template) -> None:
     index_filename = index_name + ".sd"
+    # same query tensor encoding as the schemas deployed by VespaIndex
+    query_embedding_cell_type = VESPA_HEX_TENSOR_CELL_TYPE or EmbeddingPrecision.FLOAT
 
     schema = template.render(
         multi_tenant=True,
         schema_name=index_name,
         dim=dim,
         embedding_precision=EmbeddingPrecision.FLOAT.value,
+        query_embedding_cell_type=query_embedding_cell_type.value,
     )
 
     with open(index_filename, "w", encoding="utf-8") as f:
@@ -56,6 +56,38 @@ MIN_THREADS_ML_MODELS = int(os.environ.get("MIN_THREADS_ML_MODELS") or 1)
 # or intent classification
 INDEXING_ONLY = os.environ.get("INDEXING_ONLY", "").lower() == "true"
 
+# Coalesce concurrent local embedding / reranking requests to the model server into
+# a single forward pass. Requests with the same model settings are held for up to
+# MODEL_SERVER_MICRO_BATCH_MAX_WAIT_MS or until the max batch size is reached.
+MODEL_SERVER_MICRO_BATCHING_ENABLED = (
+    os.environ.get("MODEL_SERVER_MICRO_BATCHING_ENABLED", "").lower() == "true"
+)
+MODEL_SERVER_MICRO_BATCH_MAX_WAIT_MS = float(
+    os.environ.get("MODEL_SERVER_MICRO_BATCH_MAX_WAIT_MS") or 5
+)
+# Max number of texts in a coalesced embedding batch
+MODEL_SERVER_EMBED_MICRO_BATCH_SIZE = int(
+    os.environ.get("MODEL_SERVER_EMBED_MICRO_BATCH_SIZE") or 128
+)
+# Max number of query / document pairs in a coalesced reranking batch
+MODEL_SERVER_RERANK_MICRO_BATCH_SIZE = int(
+    os.environ.get("MODEL_SERVER_RERANK_MICRO_BATCH_SIZE") or 256
+)
+
+# Batch texts for local embedding models by token length instead of in arrival order,
+# so short texts (mini-chunks, titles) are not padded to the length of full chunks.
+# Batches are formed under a token budget rather than a fixed number of texts.
+EMBEDDING_LENGTH_BUCKETING_ENABLED = (
+    os.environ.get("EMBEDDING_LENGTH_BUCKETING_ENABLED", "").lower() == "true"
+)
+# Max padded tokens (texts * longest text) per batch. Defaults to the worst case of
+# the fixed size batches, i.e. batch size * max sequence length
+EMBEDDING_BATCH_MAX_TOKENS = int(os.environ.get("EMBEDDING_BATCH_MAX_TOKENS") or 0)
+# Upper bound on the number of (short) texts in a single length bucketed batch
+EMBEDDING_LENGTH_BUCKETED_MAX_BATCH_SIZE = int(
+    os.environ.get("EMBEDDING_LENGTH_BUCKETED_MAX_BATCH_SIZE") or 128
+)
+
 # The process needs to have this for the log file to write to
 # otherwise, it will not create additional log files
 # This should just be the filename base without extension or path.
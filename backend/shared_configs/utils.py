@@ -9,3 +9,32 @@ def batch_list(
     batch_size: int,
 ) -> list[list[T]]:
     return [lst[i : i + batch_size] for i in range(0, len(lst), batch_size)]
+
+
+def batch_indices_by_token_budget(
+    lengths: list[int],
+    max_batch_tokens: int,
+    max_batch_size: int,
+) -> list[list[int]]:
+    """Groups items of similar length together, so that batches which are padded to
+    their longest member waste as little compute on padding as possible.
+
+    Items are sorted by length and packed into batches whose padded size
+    (number of items * longest item) stays within `max_batch_tokens`. An item longer
+    than the budget gets a batch of its own. Returns the original indices of the
+    items in each batch, the caller is responsible for restoring the order."""
+    batches: list[list[int]] = []
+    current_batch: list[int] = []
+    for idx in sorted(range(len(lengths)), key=lambda i: lengths[i]):
+        # items are sorted ascending, so this item is the longest of the batch
+        padded_tokens = (len(current_batch) + 1) * lengths[idx]
+        if current_batch and (
+            padded_tokens > max_batch_tokens or len(current_batch) >= max_batch_size
+        ):
+            batches.append(current_batch)
+            current_batch = []
+        current_batch.append(idx)
+
+    if current_batch:
+        batches.append(current_batch)
+    return batches
@@ -0,0 +1,114 @@
+from collections.abc import Generator
+from unittest.mock import Mock
+from unittest.mock import patch
+from uuid import uuid4
+
+import pytest
+from redis.exceptions import RedisError
+
+from ee.onyx.access.access import _get_acl_for_user
+from ee.onyx.access.acl_cache import _LocalACLCache
+from ee.onyx.access.acl_cache import invalidate_acl_cache
+
+_ACCESS = "ee.onyx.access.access"
+_ACL_CACHE = "ee.onyx.access.acl_cache"
+_TENANT_ID = "tenant"
+
+
+class _FakeRedis:
+    """The hash commands used by the ACL cache"""
+
+    def __init__(self) -> None:
+        self.hashes: dict[str, dict[str, bytes]] = {}
+
+    def hget(self, name: str, key: str) -> bytes | None:
+        return self.hashes.get(name, {}).get(key)
+
+    def hset(self, name: str, key: str, value: str) -> None:
+        self.hashes.setdefault(name, {})[key] = value.encode()
+
+    def hdel(self, name: str, *keys: str) -> None:
+        for key in keys:
+            self.hashes.get(name, {}).pop(key, None)
+
+    def delete(self, name: str) -> None:
+        self.hashes.pop(name, None)
+
+
+@pytest.fixture
+def redis_client() -> Generator[_FakeRedis, None, None]:
+    redis_client = _FakeRedis()
+    with (
+        patch(f"{_ACL_CACHE}.get_redis_client", return_value=redis_client),
+        patch(f"{_ACL_CACHE}.get_current_tenant_id", return_value=_TENANT_ID),
+        patch(
+            f"{_ACL_CACHE}._local_acl_cache",
+            _LocalACLCache(max_entries=100, ttl_seconds=60),
+        ),
+    ):
+        yield redis_client
+
+
+@pytest.fixture
+def fetch_user_groups() -> Generator[Mock, None, None]:
+    with (
+        patch(f"{_ACCESS}.fetch_user_groups_for_user") as fetch_user_groups,
+        patch(f"{_ACCESS}.fetch_external_groups_for_user", return_value=[]),
+    ):
+        group = Mock()
+        group.name = "engineering"
+        fetch_user_groups.return_value = [group]
+        yield fetch_user_groups
+
+
+def _user() -> Mock:
+    return Mock(id=uuid4(), email="user@example.com")
+
+
+def test_acl_is_cached(redis_client: _FakeRedis, fetch_user_groups: Mock) -> None:
+    user = _user()
+    acl = _get_acl_for_user(user, Mock())
+    assert "group:engineering" in acl
+
+    # callers can modify the returned set
+    acl.add("modified")
+    assert _get_acl_for_user(user, Mock()) == acl - {"modified"}
+    assert fetch_user_groups.call_count == 1
+
+    # other processes find it in Redis
+    with patch(
+        f"{_ACL_CACHE}._local_acl_cache",
+        _LocalACLCache(max_entries=100, ttl_seconds=60),
+    ):
+        assert "group:engineering" in _get_acl_for_user(user, Mock())
+    assert fetch_user_groups.call_count == 1
+
+
+def test_invalidation(redis_client: _FakeRedis, fetch_user_groups: Mock) -> None:
+    user = _user()
+    other_user = _user()
+    _get_acl_for_user(user, Mock())
+    _get_acl_for_user(other_user, Mock())
+
+    invalidate_acl_cache(user_ids=[user.id])
+    _get_acl_for_user(user, Mock())
+    _get_acl_for_user(other_user, Mock())
+    assert fetch_user_groups.call_count == 3
+
+    # every user of the tenant
+    invalidate_acl_cache()
+    assert redis_client.hashes == {}
+    _get_acl_for_user(user, Mock())
+    _get_acl_for_user(other_user, Mock())
+    assert fetch_user_groups.call_count == 5
+
+
+def test_redis_failures_fall_back_to_the_db(
+    redis_client: _FakeRedis, fetch_user_groups: Mock
+) -> None:
+    with (
+        patch.object(redis_client, "hget", side_effect=RedisError),
+        patch.object(redis_client, "hset", side_effect=RedisError),
+    ):
+        assert "group:engineering" in _get_acl_for_user(_user(), Mock())
+    assert fetch_user_groups.call_count == 1
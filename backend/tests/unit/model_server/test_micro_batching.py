@@ -0,0 +1,83 @@
+import asyncio
+import threading
+
+import pytest
+
+from model_server.micro_batching import MicroBatcher
+
+
+class _RecordingBatchFn:
+    def __init__(self) -> None:
+        self.batches: list[list[str]] = []
+        self._lock = threading.Lock()
+
+    def __call__(self, items: list[str]) -> list[str]:
+        with self._lock:
+            self.batches.append(items)
+        return [item.upper() for item in items]
+
+
+@pytest.mark.asyncio
+async def test_concurrent_requests_are_coalesced() -> None:
+    run_batch = _RecordingBatchFn()
+    batcher: MicroBatcher[str, str] = MicroBatcher(
+        run_batch=run_batch, max_batch_size=100, max_wait_seconds=0.05, kind="test"
+    )
+
+    results = await asyncio.gather(
+        batcher.submit(["a", "b"]), batcher.submit(["c"]), batcher.submit(["d", "e"])
+    )
+
+    # results are scattered back to the right callers, in order
+    assert list(results) == [["A", "B"], ["C"], ["D", "E"]]
+    assert run_batch.batches == [["a", "b", "c", "d", "e"]]
+
+
+@pytest.mark.asyncio
+async def test_batch_is_flushed_at_max_size() -> None:
+    run_batch = _RecordingBatchFn()
+    batcher: MicroBatcher[str, str] = MicroBatcher(
+        run_batch=run_batch, max_batch_size=3, max_wait_seconds=10, kind="test"
+    )
+
+    # would wait for 10 seconds if the size limit did not trigger a flush
+    results = await asyncio.wait_for(
+        asyncio.gather(
+            batcher.submit(["a", "b"]),
+            batcher.submit(["c"]),
+            batcher.submit(["d", "e", "f", "g"]),
+        ),
+        timeout=5,
+    )
+
+    assert list(results) == [["A", "B"], ["C"], ["D", "E", "F", "G"]]
+    # oversized requests are not split
+    assert run_batch.batches == [["a", "b", "c"], ["d", "e", "f", "g"]]
+
+
+@pytest.mark.asyncio
+async def test_errors_are_propagated_to_every_request() -> None:
+    def _fail(items: list[str]) -> list[str]:
+        raise RuntimeError("model exploded")
+
+    batcher: MicroBatcher[str, str] = MicroBatcher(
+        run_batch=_fail, max_batch_size=100, max_wait_seconds=0.01, kind="test"
+    )
+
+    results = await asyncio.gather(
+        batcher.submit(["a"]), batcher.submit(["b"]), return_exceptions=True
+    )
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+
+@pytest.mark.asyncio
+async def test_mismatched_output_length_is_an_error() -> None:
+    batcher: MicroBatcher[str, str] = MicroBatcher(
+        run_batch=lambda items: items[:-1],
+        max_batch_size=100,
+        max_wait_seconds=0.01,
+        kind="test",
+    )
+
+    with pytest.raises(RuntimeError):
+        await batcher.submit(["a", "b"])
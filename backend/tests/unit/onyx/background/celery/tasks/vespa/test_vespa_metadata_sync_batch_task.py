@@ -0,0 +1,167 @@
+from collections.abc import Generator
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+from unittest.mock import patch
+
+import httpx
+import pytest
+from celery.exceptions import Retry
+
+from onyx.background.celery.tasks.vespa.tasks import vespa_metadata_sync_batch_task
+
+_TASKS = "onyx.background.celery.tasks.vespa.tasks"
+
+
+def _doc(doc_id: str) -> SimpleNamespace:
+    return SimpleNamespace(id=doc_id, boost=0, hidden=False, chunk_count=2)
+
+
+def _bad_request() -> httpx.HTTPStatusError:
+    request = httpx.Request("PUT", "http://vespa/document/v1")
+    return httpx.HTTPStatusError(
+        "bad request", request=request, response=httpx.Response(400, request=request)
+    )
+
+
+class _Mocks:
+    def __init__(self, patches: dict[str, MagicMock], retry: MagicMock) -> None:
+        self.patches = patches
+        self.retry = retry
+
+    @property
+    def update_single(self) -> MagicMock:
+        return self.patches["RetryDocumentIndex"].return_value.update_single
+
+    @property
+    def synced_doc_ids(self) -> list[str]:
+        return self.patches["mark_documents_as_synced"].call_args.args[0]
+
+
+@pytest.fixture
+def mocks() -> Generator[_Mocks, None, None]:
+    names = [
+        "get_session_with_current_tenant",
+        "get_active_search_settings",
+        "get_default_document_index",
+        "HttpxPool",
+        "RetryDocumentIndex",
+        "get_documents_by_ids",
+        "fetch_document_sets_for_documents",
+        "get_access_for_documents",
+        "get_access_for_document",
+        "mark_documents_as_synced",
+    ]
+    patchers = [patch(f"{_TASKS}.{name}") for name in names]
+    patches = dict(zip(names, [patcher.start() for patcher in patchers]))
+
+    patches["get_documents_by_ids"].side_effect = lambda db_session, doc_ids: [
+        _doc(doc_id) for doc_id in doc_ids
+    ]
+    patches["fetch_document_sets_for_documents"].return_value = []
+    patches["get_access_for_documents"].side_effect = lambda document_ids, db_session: {
+        doc_id: MagicMock(name=f"access_{doc_id}") for doc_id in document_ids
+    }
+    patches["RetryDocumentIndex"].return_value.update_single.return_value = 2
+
+    # `retry` raises the celery exception, like it does in a worker
+    with patch.object(
+        vespa_metadata_sync_batch_task, "retry", side_effect=Retry()
+    ) as retry:
+        yield _Mocks(patches, retry)
+
+    for patcher in patchers:
+        patcher.stop()
+
+
+def _run(document_ids: list[str]) -> bool:
+    return vespa_metadata_sync_batch_task(document_ids=document_ids, tenant_id="t")
+
+
+def test_batch_sync_succeeds(mocks: _Mocks) -> None:
+    assert _run(["a", "b", "c"])
+
+    assert mocks.synced_doc_ids == ["a", "b", "c"]
+    assert mocks.update_single.call_count == 3
+    mocks.retry.assert_not_called()
+
+
+def test_batch_sync_retries_only_the_failed_documents(mocks: _Mocks) -> None:
+    def _update_single(document_id: str, **kwargs: object) -> int:
+        if document_id == "b":
+            raise httpx.ConnectError("vespa is down")
+        return 2
+
+    mocks.update_single.side_effect = _update_single
+
+    with pytest.raises(Retry):
+        _run(["a", "b", "c"])
+
+    # the others are still marked as synced
+    assert mocks.synced_doc_ids == ["a", "c"]
+    assert mocks.retry.call_args.kwargs["kwargs"] == dict(
+        document_ids=["b"], tenant_id="t"
+    )
+
+
+def test_batch_sync_does_not_retry_bad_requests(mocks: _Mocks) -> None:
+    def _update_single(document_id: str, **kwargs: object) -> int:
+        if document_id == "b":
+            raise _bad_request()
+        return 2
+
+    mocks.update_single.side_effect = _update_single
+
+    assert not _run(["a", "b"])
+    assert mocks.synced_doc_ids == ["a"]
+    mocks.retry.assert_not_called()
+
+
+def test_batch_sync_skips_deleted_documents_and_falls_back_for_access(
+    mocks: _Mocks,
+) -> None:
+    # "gone" was deleted since the task was queued
+    mocks.patches["get_documents_by_ids"].side_effect = lambda db_session, doc_ids: [
+        _doc(doc_id) for doc_id in doc_ids if doc_id != "gone"
+    ]
+    # "b" is missing from the batched access lookup
+    mocks.patches["get_access_for_documents"].side_effect = (
+        lambda document_ids, db_session: {"a": MagicMock(name="access_a")}
+    )
+    access_b = MagicMock(name="access_b")
+    mocks.patches["get_access_for_document"].return_value = access_b
+
+    assert _run(["a", "gone", "b"])
+
+    assert mocks.synced_doc_ids == ["a", "b"]
+    mocks.patches["get_access_for_document"].assert_called_once()
+    access_kwargs = mocks.patches["get_access_for_document"].call_args.kwargs
+    assert access_kwargs["document_id"] == "b"
+    fields_by_doc_id = {
+        call.args[0]: call.kwargs["fields"]
+        for call in mocks.update_single.call_args_list
+    }
+    assert fields_by_doc_id["b"].access is access_b
+
+
+def test_batch_sync_retries_the_whole_batch_on_unexpected_errors(
+    mocks: _Mocks,
+) -> None:
+    error = RuntimeError("db went away")
+    mocks.patches["get_documents_by_ids"].side_effect = error
+
+    with pytest.raises(Retry):
+        _run(["a", "b"])
+
+    assert mocks.retry.call_args.kwargs["exc"] is error
+    # same arguments, i.e. the whole batch
+    assert "kwargs" not in mocks.retry.call_args.kwargs
+
+
+def test_batch_sync_gives_up_after_max_retries(mocks: _Mocks) -> None:
+    mocks.patches["get_documents_by_ids"].side_effect = RuntimeError("db went away")
+
+    # already retried max_retries times
+    with patch.object(vespa_metadata_sync_batch_task, "max_retries", 0):
+        assert not _run(["a", "b"])
+
+    mocks.retry.assert_not_called()
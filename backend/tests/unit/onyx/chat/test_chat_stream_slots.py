@@ -0,0 +1,85 @@
+import gc
+import threading
+from collections.abc import AsyncIterator
+from collections.abc import Generator
+from collections.abc import Iterator
+from contextlib import nullcontext
+from typing import Any
+from unittest.mock import Mock
+from unittest.mock import patch
+
+import pytest
+
+from onyx.chat.models import OnyxAnswerPiece
+from onyx.chat.process_message import astream_chat_message_objects
+from onyx.chat.process_message import reserve_chat_stream_slot
+
+_PROCESS_MESSAGE = "onyx.chat.process_message"
+
+
+@pytest.fixture
+def slots() -> Generator[threading.BoundedSemaphore, None, None]:
+    semaphore = threading.BoundedSemaphore(2)
+    with patch(f"{_PROCESS_MESSAGE}._chat_stream_slots", semaphore):
+        yield semaphore
+
+
+def test_reserve_rejects_when_saturated(slots: threading.BoundedSemaphore) -> None:
+    first = reserve_chat_stream_slot()
+    second = reserve_chat_stream_slot()
+    assert first is not None and second is not None
+    assert reserve_chat_stream_slot() is None
+
+    # releasing twice frees a single slot
+    first.release()
+    first.release()
+    third = reserve_chat_stream_slot()
+    assert third is not None
+    assert reserve_chat_stream_slot() is None
+
+
+def test_released_when_dropped_before_starting(
+    slots: threading.BoundedSemaphore,
+) -> None:
+    slot = reserve_chat_stream_slot()
+    assert slot is not None
+
+    async def _never_started() -> AsyncIterator[str]:
+        yield "packet"
+
+    stream = _never_started()
+    slot.release_when_dropped(stream)
+    del stream
+    gc.collect()
+
+    assert reserve_chat_stream_slot() is not None
+    assert reserve_chat_stream_slot() is not None
+
+
+@pytest.mark.asyncio
+async def test_released_once_the_pipeline_finishes(
+    slots: threading.BoundedSemaphore,
+) -> None:
+    def _pipeline(**kwargs: Any) -> Iterator[OnyxAnswerPiece]:
+        yield OnyxAnswerPiece(answer_piece="hello")
+
+    slot = reserve_chat_stream_slot()
+    assert slot is not None
+    reserve_chat_stream_slot()
+
+    with (
+        patch(f"{_PROCESS_MESSAGE}.stream_chat_message_objects", _pipeline),
+        patch(
+            f"{_PROCESS_MESSAGE}.get_session_context_manager",
+            lambda: nullcontext(Mock()),
+        ),
+    ):
+        packets = [
+            packet
+            async for packet in astream_chat_message_objects(
+                new_msg_req=Mock(), user=None, slot=slot
+            )
+        ]
+
+    assert packets == [OnyxAnswerPiece(answer_piece="hello")]
+    assert reserve_chat_stream_slot() is not None
@@ -1,5 +1,8 @@
+from unittest.mock import Mock
+
 import pytest
 
+from onyx.chat.prune_and_merge import _count_section_content_tokens
 from onyx.chat.prune_and_merge import _merge_sections
 from onyx.configs.constants import DocumentSource
 from onyx.context.search.models import InferenceChunk
@@ -224,3 +227,30 @@ def test_merge_minimal_sections(
     merged_sections = _merge_sections(sections)
     assert merged_sections[0].combined_content == expected_content
     assert merged_sections[0].center_chunk == expected_center_chunk
+
+
+def test_count_section_content_tokens_uses_chunk_token_counts() -> None:
+    # one token per word, but the counts computed at indexing time are used
+    tokenizer = Mock(family="words")
+    tokenizer.encode.side_effect = lambda text: text.split()
+    chunks = [
+        create_inference_chunk("doc3", chunk_id, f"Counted content {chunk_id}", None)
+        for chunk_id in range(3)
+    ]
+    for chunk in chunks:
+        chunk.content_token_counts = {"words": 10}
+    section = inference_section_from_chunks(center_chunk=chunks[0], chunks=chunks)
+
+    # 3 chunks + the 2 newlines joining them
+    assert section is not None
+    assert _count_section_content_tokens(section, tokenizer) == 32
+    tokenizer.encode.assert_not_called()
+
+    # trimmed sections no longer match their chunks
+    section.combined_content = "Counted content"
+    assert _count_section_content_tokens(section, tokenizer) == 2
+
+    # counts of other tokenizer families do not apply
+    tokenizer.family = "other"
+    section.combined_content = "\n".join(chunk.content for chunk in chunks)
+    assert _count_section_content_tokens(section, tokenizer) == 9
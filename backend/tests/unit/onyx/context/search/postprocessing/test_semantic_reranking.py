@@ -0,0 +1,228 @@
+from collections.abc import Generator
+from unittest.mock import Mock
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+
+from onyx.configs.constants import DocumentSource
+from onyx.context.search.models import InferenceChunk
+from onyx.context.search.models import RerankingDetails
+from onyx.context.search.models import RerankMetricsContainer
+from onyx.context.search.postprocessing.postprocessing import semantic_reranking
+from onyx.context.search.utils import normalize_query
+from onyx.document_index.document_index_utils import (
+    translate_boost_count_to_multiplier,
+)
+from onyx.document_index.document_index_utils import (
+    translate_boost_counts_to_multipliers,
+)
+from onyx.natural_language_processing.rerank_score_cache import (
+    build_rerank_score_cache_key,
+)
+from onyx.natural_language_processing.rerank_score_cache import RerankScoreCache
+
+_POSTPROCESSING = "onyx.context.search.postprocessing.postprocessing"
+_RERANK_MODEL = "rerank-model"
+_CASCADE_MODEL = "cascade-model"
+
+
+def _chunk(
+    document_id: str,
+    chunk_id: int,
+    content: str,
+    boost: int = 0,
+    recency_bias: float = 1.0,
+) -> InferenceChunk:
+    return InferenceChunk(
+        chunk_id=chunk_id,
+        document_id=document_id,
+        semantic_identifier=document_id,
+        title=None,
+        blurb="",
+        content=content,
+        source_links=None,
+        section_continuation=False,
+        source_type=DocumentSource.WEB,
+        boost=boost,
+        recency_bias=recency_bias,
+        score=None,
+        hidden=False,
+        metadata={},
+        match_highlights=[],
+        updated_at=None,
+        image_file_name=None,
+        doc_summary="",
+        chunk_context="",
+    )
+
+
+def _score(passage: str) -> float:
+    # the passages end in the relevance of the chunk
+    return float(passage.rsplit(" ", 1)[-1]) / 10
+
+
+@pytest.fixture
+def predicted_passages() -> Generator[dict[str, list[list[str]]], None, None]:
+    """Passages sent to each model, per call"""
+    calls: dict[str, list[list[str]]] = {_RERANK_MODEL: [], _CASCADE_MODEL: []}
+
+    def _model(model_name: str, **kwargs: object) -> Mock:
+        def _predict(query: str, passages: list[str]) -> list[float]:
+            # scored with the query the cached scores are keyed on
+            assert query == normalize_query(query)
+            calls[model_name].append(passages)
+            return [_score(passage) for passage in passages]
+
+        model = Mock(model_name=model_name, provider_type=None, api_url=None)
+        model.predict.side_effect = _predict
+        return model
+
+    with (
+        patch(f"{_POSTPROCESSING}.RerankingModel", side_effect=_model),
+        patch(
+            f"{_POSTPROCESSING}.get_rerank_score_cache",
+            return_value=RerankScoreCache(max_entries=100),
+        ),
+    ):
+        yield calls
+
+
+def _rerank(
+    query: str, chunks: list[InferenceChunk], num_rerank: int = 10
+) -> tuple[list[InferenceChunk], list[int], RerankMetricsContainer]:
+    metrics: list[RerankMetricsContainer] = []
+    ranked_chunks, ranked_indices = semantic_reranking(
+        query_str=query,
+        rerank_settings=RerankingDetails(
+            rerank_model_name=_RERANK_MODEL,
+            rerank_api_url=None,
+            rerank_provider_type=None,
+            num_rerank=num_rerank,
+        ),
+        chunks=chunks,
+        rerank_metrics_callback=metrics.append,
+    )
+    return ranked_chunks, ranked_indices, metrics[0]
+
+
+def test_cached_scores_are_not_predicted_again(
+    predicted_passages: dict[str, list[list[str]]],
+) -> None:
+    chunks = [_chunk("a", 0, "alpha 3"), _chunk("b", 0, "beta 9")]
+    ranked_chunks, ranked_indices, metrics = _rerank("what is onyx", chunks)
+    assert [chunk.document_id for chunk in ranked_chunks] == ["b", "a"]
+    assert ranked_indices == [1, 0]
+    assert metrics.num_cached_scores == {"rerank": 0}
+    assert "rerank" in metrics.stage_latencies
+
+    # same query modulo whitespace, one new chunk and one with updated content
+    chunks = [
+        _chunk("a", 0, "alpha 3"),
+        _chunk("b", 0, "beta 1"),
+        _chunk("c", 0, "gamma 5"),
+    ]
+    ranked_chunks, ranked_indices, metrics = _rerank(" what  is onyx", chunks)
+
+    assert predicted_passages[_RERANK_MODEL] == [
+        ["a\nalpha 3", "b\nbeta 9"],
+        ["b\nbeta 1", "c\ngamma 5"],
+    ]
+    assert [chunk.document_id for chunk in ranked_chunks] == ["c", "a", "b"]
+    assert metrics.num_cached_scores == {"rerank": 1}
+
+    # fully cached
+    _, _, metrics = _rerank("what is onyx", chunks)
+    assert len(predicted_passages[_RERANK_MODEL]) == 2
+    assert metrics.num_cached_scores == {"rerank": 3}
+    assert metrics.stage_latencies == {}
+
+
+def test_boosts_and_recency_are_applied(
+    predicted_passages: dict[str, list[list[str]]],
+) -> None:
+    chunks = [
+        _chunk("a", 0, "alpha 6"),
+        _chunk("b", 0, "beta 5", boost=10),
+        _chunk("c", 0, "gamma 6", recency_bias=0.5),
+        _chunk("d", 0, "delta 6"),
+        _chunk("e", 0, "epsilon 2", boost=-10),
+    ]
+    ranked_chunks, ranked_indices, metrics = _rerank("query", chunks)
+
+    # ties keep their retrieval order
+    assert ranked_indices == [1, 0, 3, 2, 4]
+
+    scores = [0.6, 0.5, 0.6, 0.6, 0.2]
+    multipliers = [
+        translate_boost_count_to_multiplier(chunk.boost) * chunk.recency_bias
+        for chunk in chunks
+    ]
+    expected_scores = [
+        (score - 0.2) * multiplier + 0.2
+        for score, multiplier in zip(scores, multipliers)
+    ]
+    assert [chunk.score for chunk in ranked_chunks] == pytest.approx(
+        [expected_scores[i] for i in ranked_indices]
+    )
+    assert metrics.raw_similarity_scores == pytest.approx(
+        [scores[i] for i in ranked_indices]
+    )
+    # scores are converted back to python floats, np.float64 subclasses float
+    assert all(
+        isinstance(chunk.score, float) and not isinstance(chunk.score, np.floating)
+        for chunk in ranked_chunks
+    )
+
+
+def test_vectorized_boost_multipliers() -> None:
+    boosts = list(range(-50, 51))
+    assert translate_boost_counts_to_multipliers(
+        np.array(boosts, dtype=np.float64)
+    ).tolist() == pytest.approx(
+        [translate_boost_count_to_multiplier(boost) for boost in boosts]
+    )
+
+
+def test_cascade_prunes_candidates(
+    predicted_passages: dict[str, list[list[str]]],
+) -> None:
+    chunks = [
+        _chunk(f"doc{i}", 0, f"text {score}") for i, score in enumerate([2, 8, 5, 1, 7])
+    ]
+
+    with (
+        patch(f"{_POSTPROCESSING}.RERANK_CASCADE_MODEL_NAME", _CASCADE_MODEL),
+        patch(f"{_POSTPROCESSING}.RERANK_CASCADE_NUM_CANDIDATES", 3),
+    ):
+        ranked_chunks, ranked_indices, metrics = _rerank("query", chunks, num_rerank=4)
+
+    assert len(predicted_passages[_CASCADE_MODEL][0]) == 4
+    # the best 3 of the cascade go to the reranking model in retrieval order
+    assert predicted_passages[_RERANK_MODEL] == [
+        ["doc0\ntext 2", "doc1\ntext 8", "doc2\ntext 5"]
+    ]
+    assert ranked_indices == [1, 2, 0, 3]
+    assert [chunk.score for chunk in ranked_chunks][-1] is None
+    assert metrics.num_pruned == 1
+    assert set(metrics.stage_latencies) == {"cascade", "rerank"}
+
+
+def test_cache_key() -> None:
+    def _key(**overrides: str) -> str:
+        kwargs = dict(
+            model_name="model",
+            provider_type=None,
+            api_url=None,
+            query="what is onyx",
+            document_id="doc",
+            chunk_id=0,
+            passage="content",
+        )
+        kwargs.update(overrides)
+        return build_rerank_score_cache_key(**kwargs)  # type: ignore[arg-type]
+
+    assert _key() == _key(query="what  is\tonyx ")
+    assert _key() != _key(passage="updated content")
+    assert _key() != _key(model_name="other-model")
+    assert _key() != _key(document_id="other-doc")
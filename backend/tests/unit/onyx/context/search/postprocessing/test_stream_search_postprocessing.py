@@ -0,0 +1,175 @@
+import threading
+from collections.abc import Generator
+from unittest.mock import Mock
+from unittest.mock import patch
+
+import pytest
+
+from onyx.chat.models import SectionRelevancePiece
+from onyx.configs.constants import DocumentSource
+from onyx.context.search.enums import LLMEvaluationType
+from onyx.context.search.enums import SearchType
+from onyx.context.search.models import IndexFilters
+from onyx.context.search.models import InferenceChunk
+from onyx.context.search.models import InferenceSection
+from onyx.context.search.models import RerankingDetails
+from onyx.context.search.models import SearchQuery
+from onyx.context.search.postprocessing.postprocessing import search_postprocessing
+from onyx.context.search.postprocessing.postprocessing import (
+    stream_search_postprocessing,
+)
+
+_POSTPROCESSING = "onyx.context.search.postprocessing.postprocessing"
+
+
+def _section(document_id: str) -> InferenceSection:
+    chunk = InferenceChunk(
+        chunk_id=0,
+        document_id=document_id,
+        semantic_identifier=document_id,
+        title=None,
+        blurb="",
+        content=document_id,
+        source_links=None,
+        section_continuation=False,
+        source_type=DocumentSource.WEB,
+        boost=0,
+        recency_bias=1.0,
+        score=None,
+        hidden=False,
+        metadata={},
+        match_highlights=[],
+        updated_at=None,
+        image_file_name=None,
+        doc_summary="",
+        chunk_context="",
+    )
+    return InferenceSection(
+        center_chunk=chunk, chunks=[chunk], combined_content=document_id
+    )
+
+
+def _search_query(rerank: bool, max_llm_filter_sections: int = 2) -> SearchQuery:
+    return SearchQuery(
+        query="what is onyx",
+        processed_keywords=[],
+        search_type=SearchType.SEMANTIC,
+        evaluation_type=LLMEvaluationType.BASIC,
+        filters=IndexFilters(access_control_list=None),
+        chunks_above=0,
+        chunks_below=0,
+        rerank_settings=(
+            RerankingDetails(
+                rerank_model_name="rerank-model",
+                rerank_api_url=None,
+                rerank_provider_type=None,
+                num_rerank=10,
+            )
+            if rerank
+            else None
+        ),
+        hybrid_alpha=0.5,
+        recency_bias_multiplier=1.0,
+        max_llm_filter_sections=max_llm_filter_sections,
+    )
+
+
+class _Evaluations:
+    """Relevance evaluations which only complete once released, "b" is not relevant"""
+
+    def __init__(self) -> None:
+        self.released: dict[str, threading.Event] = {}
+
+    def evaluate(self, query: str, section_content: str, **kwargs: object) -> bool:
+        assert self.released[section_content].wait(timeout=5)
+        return section_content != "b"
+
+    def release(self, *document_ids: str) -> None:
+        for document_id in document_ids:
+            self.released[document_id].set()
+
+
+@pytest.fixture
+def evaluations() -> Generator[_Evaluations, None, None]:
+    evaluations = _Evaluations()
+    evaluations.released = {document_id: threading.Event() for document_id in "abc"}
+    with (
+        patch(f"{_POSTPROCESSING}.llm_eval_section", side_effect=evaluations.evaluate),
+        patch(f"{_POSTPROCESSING}.DISABLE_LLM_DOC_RELEVANCE", False),
+        patch(
+            f"{_POSTPROCESSING}.get_search_time_image_analysis_enabled",
+            return_value=False,
+        ),
+    ):
+        yield evaluations
+    # never leave threads of a failed test waiting
+    evaluations.release(*"abc")
+
+
+def _relevance(piece: object) -> tuple[str, bool]:
+    assert isinstance(piece, SectionRelevancePiece)
+    return piece.document_id, piece.relevant
+
+
+def test_sections_are_yielded_before_the_evaluations(
+    evaluations: _Evaluations,
+) -> None:
+    sections = [_section("a"), _section("b"), _section("c")]
+    stream = stream_search_postprocessing(
+        _search_query(rerank=False), sections, llm=Mock()
+    )
+
+    assert next(stream) == sections
+
+    evaluations.release("b")
+    assert _relevance(next(stream)) == ("b", False)
+    evaluations.release("a")
+    assert _relevance(next(stream)) == ("a", True)
+    # only the first max_llm_filter_sections are evaluated
+    assert list(stream) == []
+
+
+def test_reranked_sections_are_yielded_before_late_evaluations(
+    evaluations: _Evaluations,
+) -> None:
+    sections = [_section("a"), _section("b"), _section("c")]
+    reranked_sections = sections[::-1]
+    reranked = threading.Event()
+
+    def _rerank_sections(*args: object) -> list[InferenceSection]:
+        assert reranked.wait(timeout=5)
+        return reranked_sections
+
+    with patch(f"{_POSTPROCESSING}.rerank_sections", side_effect=_rerank_sections):
+        stream = stream_search_postprocessing(
+            _search_query(rerank=True), sections, llm=Mock()
+        )
+
+        # evaluations completing before the reranking come right after the sections
+        evaluations.release("b")
+        threading.Timer(0.1, reranked.set).start()
+        assert next(stream) == reranked_sections
+        assert _relevance(next(stream)) == ("b", False)
+
+        evaluations.release("a")
+        assert _relevance(next(stream)) == ("a", True)
+        assert list(stream) == []
+
+
+def test_search_postprocessing_collects_the_relevance(
+    evaluations: _Evaluations,
+) -> None:
+    evaluations.release(*"abc")
+    sections = [_section("a"), _section("b"), _section("c")]
+
+    results = list(
+        search_postprocessing(_search_query(rerank=False), sections, llm=Mock())
+    )
+
+    assert results[0] == sections
+    # sections which were not evaluated are not relevant
+    assert [_relevance(piece) for piece in results[1]] == [
+        ("a", True),
+        ("b", False),
+        ("c", False),
+    ]
@@ -0,0 +1,108 @@
+import pytest
+
+from onyx.configs.constants import DocumentSource
+from onyx.context.search.enums import RetrievalFusionMethod
+from onyx.context.search.models import InferenceChunkUncleaned
+from onyx.context.search.retrieval.fusion import fuse_retrieval_results
+
+
+def _chunk(
+    document_id: str, chunk_id: int, score: float | None
+) -> InferenceChunkUncleaned:
+    return InferenceChunkUncleaned(
+        chunk_id=chunk_id,
+        document_id=document_id,
+        semantic_identifier=document_id,
+        title=None,
+        blurb="",
+        content=f"{document_id} {chunk_id}",
+        source_links=None,
+        section_continuation=False,
+        source_type=DocumentSource.WEB,
+        boost=0,
+        recency_bias=1.0,
+        score=score,
+        hidden=False,
+        metadata={},
+        match_highlights=[],
+        updated_at=None,
+        image_file_name=None,
+        doc_summary="",
+        chunk_context="",
+        metadata_suffix=None,
+        large_chunk_reference_ids=[],
+    )
+
+
+def _ids(chunks: list[InferenceChunkUncleaned]) -> list[tuple[str, int]]:
+    return [(chunk.document_id, chunk.chunk_id) for chunk in chunks]
+
+
+def _scores(chunks: list[InferenceChunkUncleaned]) -> list[float | None]:
+    return [chunk.score for chunk in chunks]
+
+
+def _keys(chunks: list[InferenceChunkUncleaned]) -> list[tuple[str, int, float | None]]:
+    return [(chunk.document_id, chunk.chunk_id, chunk.score) for chunk in chunks]
+
+
+def test_max_keeps_the_best_hit_of_each_chunk() -> None:
+    base = [_chunk("a", 0, 0.9), _chunk("b", 0, 0.5), _chunk("c", 1, None)]
+    keyword = [_chunk("b", 0, 0.7), _chunk("a", 0, 0.9), _chunk("d", 0, 0.5)]
+
+    fused = fuse_retrieval_results([base, keyword])
+
+    # ties keep the first seen chunk / hit first
+    assert _keys(fused) == [
+        ("a", 0, 0.9),
+        ("b", 0, 0.7),
+        ("d", 0, 0.5),
+        ("c", 1, None),
+    ]
+    assert fused[0] is base[0]
+    assert fused[1] is keyword[0]
+    assert fuse_retrieval_results([base, keyword], top_k=2) == fused[:2]
+
+
+def test_rrf() -> None:
+    base = [_chunk("a", 0, 0.9), _chunk("b", 0, 0.8)]
+    keyword = [_chunk("b", 0, 0.3), _chunk("c", 0, 0.2)]
+
+    fused = fuse_retrieval_results(
+        [base, keyword], method=RetrievalFusionMethod.RRF, rrf_k=1
+    )
+
+    assert _ids(fused) == [("b", 0), ("a", 0), ("c", 0)]
+    assert _scores(fused) == pytest.approx([1 / 3 + 1 / 2, 1 / 2, 1 / 3])
+    # the fused scores are set on copies, the hits of the retrievals are untouched
+    assert fused[0] == base[1].model_copy(update={"score": 1 / 3 + 1 / 2})
+    assert _scores(base) == [0.9, 0.8]
+    assert _scores(keyword) == [0.3, 0.2]
+
+    weighted = fuse_retrieval_results(
+        [base, keyword], method=RetrievalFusionMethod.RRF, weights=[3, 1], rrf_k=1
+    )
+    assert _ids(weighted)[0] == ("a", 0)
+    assert _scores(weighted)[0] == pytest.approx(3 / 2)
+
+
+def test_weighted_score_fusion() -> None:
+    base = [_chunk("a", 0, 30), _chunk("b", 0, 20), _chunk("c", 0, 10)]
+    # a single hit or equal scores normalize to 1
+    keyword = [_chunk("c", 0, 0.1)]
+
+    fused = fuse_retrieval_results(
+        [base, [], keyword],
+        method=RetrievalFusionMethod.WEIGHTED,
+        weights=[1, 1, 0.75],
+    )
+
+    assert _ids(fused) == [("a", 0), ("c", 0), ("b", 0)]
+    assert _scores(fused) == pytest.approx([1, 0.75, 0.5])
+
+
+def test_edge_cases() -> None:
+    assert fuse_retrieval_results([[], []], method=RetrievalFusionMethod.RRF) == []
+
+    with pytest.raises(ValueError):
+        fuse_retrieval_results([[_chunk("a", 0, 1)]], weights=[1, 1])
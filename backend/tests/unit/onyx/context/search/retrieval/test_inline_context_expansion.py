@@ -0,0 +1,181 @@
+from unittest.mock import Mock
+from unittest.mock import patch
+
+import pytest
+
+from onyx.configs.constants import DocumentSource
+from onyx.context.search.enums import LLMEvaluationType
+from onyx.context.search.enums import SearchType
+from onyx.context.search.models import IndexFilters
+from onyx.context.search.models import InferenceChunkUncleaned
+from onyx.context.search.models import SearchQuery
+from onyx.context.search.retrieval.search_runner import doc_index_retrieval
+from onyx.context.search.retrieval.search_runner import PrefetchedChunkContext
+from onyx.document_index.interfaces import ChunkContextWindow
+from onyx.document_index.interfaces import ContextFetchClaims
+from onyx.document_index.interfaces import HybridRetrievalResult
+from onyx.document_index.interfaces import VespaChunkRequest
+from onyx.document_index.vespa.chunk_retrieval import build_context_chunk_requests
+
+
+def _chunk(
+    document_id: str,
+    chunk_id: int,
+    score: float | None = None,
+    large_chunk_reference_ids: list[int] | None = None,
+) -> InferenceChunkUncleaned:
+    return InferenceChunkUncleaned(
+        chunk_id=chunk_id,
+        document_id=document_id,
+        semantic_identifier=document_id,
+        title=None,
+        blurb="",
+        content=f"{document_id} {chunk_id}",
+        source_links=None,
+        section_continuation=False,
+        source_type=DocumentSource.WEB,
+        boost=0,
+        recency_bias=1.0,
+        score=score,
+        hidden=False,
+        metadata={},
+        match_highlights=[],
+        updated_at=None,
+        image_file_name=None,
+        doc_summary="",
+        chunk_context="",
+        metadata_suffix=None,
+        large_chunk_reference_ids=large_chunk_reference_ids or [],
+    )
+
+
+def _search_query() -> SearchQuery:
+    return SearchQuery(
+        query="what is onyx",
+        processed_keywords=[],
+        search_type=SearchType.SEMANTIC,
+        evaluation_type=LLMEvaluationType.SKIP,
+        filters=IndexFilters(access_control_list=None),
+        chunks_above=1,
+        chunks_below=1,
+        rerank_settings=None,
+        hybrid_alpha=0.5,
+        recency_bias_multiplier=1.0,
+        max_llm_filter_sections=0,
+        precomputed_query_embedding=[0.1, 0.2],
+    )
+
+
+def test_build_context_chunk_requests_merges_windows() -> None:
+    hits = [
+        _chunk("doc1", 4),
+        _chunk("doc1", 6),
+        _chunk("doc1", 20),
+        _chunk("doc2", 0),
+        _chunk("doc3", 8, large_chunk_reference_ids=[4, 5, 6, 7]),
+    ]
+
+    assert build_context_chunk_requests(
+        hits, ChunkContextWindow(chunks_above=1, chunks_below=1)
+    ) == [
+        VespaChunkRequest(document_id="doc1", min_chunk_ind=3, max_chunk_ind=7),
+        VespaChunkRequest(document_id="doc1", min_chunk_ind=19, max_chunk_ind=21),
+        VespaChunkRequest(document_id="doc2", min_chunk_ind=0, max_chunk_ind=1),
+        VespaChunkRequest(document_id="doc3", min_chunk_ind=3, max_chunk_ind=8),
+    ]
+    # without a window only the chunks referenced by large chunks are needed
+    assert build_context_chunk_requests(hits, ChunkContextWindow()) == [
+        VespaChunkRequest(document_id="doc3", min_chunk_ind=4, max_chunk_ind=7),
+    ]
+
+
+@pytest.mark.parametrize("context_fetched", [True, False])
+def test_large_chunks_resolved_from_context(context_fetched: bool) -> None:
+    hits = [
+        _chunk("doc1", 2, score=0.5),
+        _chunk("doc2", 8, score=0.9, large_chunk_reference_ids=[0, 1]),
+    ]
+    context = [_chunk("doc1", 1), _chunk("doc1", 3), _chunk("doc2", 0)]
+    context += [_chunk("doc2", 1), _chunk("doc2", 2)]
+
+    document_index = Mock()
+    document_index.hybrid_retrieval_with_context.return_value = HybridRetrievalResult(
+        top_chunks=hits, context_chunks=context if context_fetched else None
+    )
+    document_index.id_based_retrieval.return_value = [
+        _chunk("doc2", 0),
+        _chunk("doc2", 1),
+    ]
+    prefetched_context = PrefetchedChunkContext()
+
+    with patch(
+        "onyx.context.search.retrieval.search_runner.INLINE_CONTEXT_EXPANSION", True
+    ):
+        chunks = doc_index_retrieval(
+            query=_search_query(),
+            document_index=document_index,
+            db_session=Mock(),
+            prefetched_context=prefetched_context,
+        )
+
+    assert [(chunk.document_id, chunk.chunk_id, chunk.score) for chunk in chunks] == [
+        ("doc2", 0, 0.9),
+        ("doc2", 1, 0.9),
+        ("doc1", 2, 0.5),
+    ]
+    assert document_index.hybrid_retrieval_with_context.call_args.kwargs[
+        "context_window"
+    ] == ChunkContextWindow(chunks_above=1, chunks_below=1)
+
+    if context_fetched:
+        document_index.id_based_retrieval.assert_not_called()
+        assert prefetched_context.covered == {("doc1", 2), ("doc2", 0), ("doc2", 1)}
+        assert set(prefetched_context.chunks) == {
+            (chunk.document_id, chunk.chunk_id) for chunk in context
+        }
+        # the chunks handed out for the large chunk are copies, not the context chunks
+        assert prefetched_context.chunks[("doc2", 0)].score is None
+    else:
+        document_index.id_based_retrieval.assert_called_once()
+        assert not prefetched_context.covered
+        assert not prefetched_context.chunks
+
+
+def test_context_claimed_once_across_retrievals() -> None:
+    claims = ContextFetchClaims()
+
+    assert claims.claim([_chunk("doc1", 2), _chunk("doc2", 0)]) == [
+        _chunk("doc1", 2),
+        _chunk("doc2", 0),
+    ]
+    # hits already claimed by another retrieval of the query are left out
+    assert claims.claim([_chunk("doc2", 0), _chunk("doc2", 5)]) == [_chunk("doc2", 5)]
+    assert claims.claim([_chunk("doc1", 2)]) == []
+
+
+def test_covered_only_for_claimed_hits() -> None:
+    hits = [_chunk("doc1", 2, score=0.5), _chunk("doc2", 4, score=0.9)]
+    document_index = Mock()
+    # the context of doc2 4 was claimed by another retrieval whose fetch failed
+    document_index.hybrid_retrieval_with_context.return_value = HybridRetrievalResult(
+        top_chunks=hits,
+        context_chunks=[_chunk("doc1", 1), _chunk("doc1", 3)],
+        context_hits=hits[:1],
+    )
+    prefetched_context = PrefetchedChunkContext()
+
+    with patch(
+        "onyx.context.search.retrieval.search_runner.INLINE_CONTEXT_EXPANSION", True
+    ):
+        doc_index_retrieval(
+            query=_search_query(),
+            document_index=document_index,
+            db_session=Mock(),
+            prefetched_context=prefetched_context,
+        )
+
+    assert isinstance(
+        document_index.hybrid_retrieval_with_context.call_args.kwargs["context_claims"],
+        ContextFetchClaims,
+    )
+    assert prefetched_context.covered == {("doc1", 2)}
@@ -0,0 +1,78 @@
+from collections.abc import Generator
+from unittest.mock import Mock
+from unittest.mock import patch
+
+import pytest
+
+from onyx.context.search.retrieval.search_runner import _encode_queries
+from onyx.context.search.utils import normalize_query
+from onyx.natural_language_processing.embedding_cache import InMemoryEmbeddingCache
+from onyx.natural_language_processing.embedding_cache import TieredEmbeddingCache
+
+
+@pytest.fixture
+def mock_embedding_model() -> Generator[Mock, None, None]:
+    with patch("onyx.context.search.retrieval.search_runner.EmbeddingModel") as mock:
+        mock.from_db_model.return_value.encode.side_effect = lambda texts, **_: [
+            [float(len(text))] for text in texts
+        ]
+        yield mock
+
+
+def _search_settings(settings_id: int = 1) -> Mock:
+    search_settings = Mock()
+    search_settings.id = settings_id
+    search_settings.model_name = "test-model"
+    search_settings.provider_type = None
+    search_settings.deployment_name = None
+    search_settings.normalize = True
+    search_settings.query_prefix = "query: "
+    search_settings.reduced_dimension = None
+    return search_settings
+
+
+def test_normalize_query() -> None:
+    assert normalize_query("  what is\n\tonyx?  ") == "what is onyx?"
+    # NFD "é" is normalized to the composed form
+    assert normalize_query("cafe\u0301") == "caf\u00e9"
+
+
+def test_query_embeddings_are_cached(mock_embedding_model: Mock) -> None:
+    cache = InMemoryEmbeddingCache(max_entries=100)
+    encode = mock_embedding_model.from_db_model.return_value.encode
+
+    first = _encode_queries(["hello  world", "foo"], _search_settings(), cache)
+    assert first == [[11.0], [3.0]]
+    assert encode.call_count == 1
+
+    # whitespace variants hit the cache, only the new query goes to the model
+    second = _encode_queries(
+        [" hello world ", "foo", "bar!"], _search_settings(), cache
+    )
+    assert second == [[11.0], [3.0], [4.0]]
+    assert encode.call_count == 2
+    assert encode.call_args.args[0] == ["bar!"]
+    assert cache.stats.hits == 2
+
+
+def test_new_search_settings_miss_the_cache(mock_embedding_model: Mock) -> None:
+    cache = InMemoryEmbeddingCache(max_entries=100)
+    encode = mock_embedding_model.from_db_model.return_value.encode
+
+    _encode_queries(["hello"], _search_settings(settings_id=1), cache)
+    _encode_queries(["hello"], _search_settings(settings_id=2), cache)
+    assert encode.call_count == 2
+
+
+def test_tiered_cache_fills_local_from_shared() -> None:
+    local = InMemoryEmbeddingCache(max_entries=100)
+    shared = InMemoryEmbeddingCache(max_entries=100)
+    shared.put_many({"a": [1.0]})
+    cache = TieredEmbeddingCache(local=local, shared=shared)
+
+    assert cache.get_many(["a", "b"]) == [[1.0], None]
+    assert local.get_many(["a"]) == [[1.0]]
+
+    cache.put_many({"b": [2.0]})
+    assert shared.get_many(["b"]) == [[2.0]]
+    assert cache.stats.hits == 1 and cache.stats.misses == 1
@@ -0,0 +1,113 @@
+from unittest.mock import Mock
+from unittest.mock import patch
+
+from onyx.context.search.enums import LLMEvaluationType
+from onyx.context.search.enums import SearchType
+from onyx.context.search.models import IndexFilters
+from onyx.context.search.models import QueryExpansions
+from onyx.context.search.models import SearchQuery
+from onyx.context.search.retrieval.search_runner import plan_query_embeddings
+from onyx.context.search.retrieval.search_runner import retrieve_chunks
+from shared_configs.model_server_models import Embedding
+
+_SEARCH_RUNNER = "onyx.context.search.retrieval.search_runner"
+
+
+def _search_query(
+    query: str,
+    precomputed_query_embedding: Embedding | None = None,
+    expanded_queries: QueryExpansions | None = None,
+) -> SearchQuery:
+    return SearchQuery(
+        query=query,
+        processed_keywords=[],
+        search_type=SearchType.SEMANTIC,
+        evaluation_type=LLMEvaluationType.SKIP,
+        filters=IndexFilters(access_control_list=None),
+        chunks_above=0,
+        chunks_below=0,
+        rerank_settings=None,
+        hybrid_alpha=0.5,
+        recency_bias_multiplier=1.0,
+        max_llm_filter_sections=0,
+        precomputed_query_embedding=precomputed_query_embedding,
+        expanded_queries=expanded_queries,
+    )
+
+
+def _fake_embeddings(texts: list[str], db_session: object) -> list[Embedding]:
+    return [[float(len(text))] for text in texts]
+
+
+def test_plan_embeds_queries_and_expansions_in_one_call() -> None:
+    expansions = QueryExpansions(
+        keywords_expansions=["onyx"], semantic_expansions=["what does onyx do", "x"]
+    )
+    queries = [
+        _search_query("what is onyx", expanded_queries=expansions),
+        _search_query("was ist onyx", expanded_queries=expansions),
+        _search_query("cached", precomputed_query_embedding=[0.5]),
+    ]
+
+    with patch(
+        f"{_SEARCH_RUNNER}.get_query_embeddings", side_effect=_fake_embeddings
+    ) as get_query_embeddings:
+        planned = plan_query_embeddings(queries, Mock())
+
+    # the shared expansion is embedded once and only the first one is searched with
+    get_query_embeddings.assert_called_once()
+    assert get_query_embeddings.call_args.args[0] == [
+        "what is onyx",
+        "what does onyx do",
+        "was ist onyx",
+    ]
+    assert [query.precomputed_query_embedding for query in planned] == [
+        [12.0],
+        [12.0],
+        [0.5],
+    ]
+    assert [query.precomputed_semantic_expansion_embeddings for query in planned] == [
+        [[17.0]],
+        [[17.0]],
+        None,
+    ]
+    assert planned[2] is queries[2]
+
+    # already planned queries need no further call
+    with patch(f"{_SEARCH_RUNNER}.get_query_embeddings") as get_query_embeddings:
+        assert plan_query_embeddings(planned, Mock()) == planned
+    get_query_embeddings.assert_not_called()
+
+
+def test_multilingual_rephrases_share_one_embedding_call() -> None:
+    query = _search_query("what is onyx", precomputed_query_embedding=[0.5])
+    retrieved_queries: list[SearchQuery] = []
+
+    def _doc_index_retrieval(
+        query: SearchQuery, *args: object, **kwargs: object
+    ) -> list:
+        retrieved_queries.append(query)
+        return []
+
+    with (
+        patch(
+            f"{_SEARCH_RUNNER}.get_multilingual_expansion",
+            return_value=["English", "German"],
+        ),
+        patch(
+            f"{_SEARCH_RUNNER}.multilingual_query_expansion",
+            return_value=["was ist onyx"],
+        ),
+        patch(f"{_SEARCH_RUNNER}.doc_index_retrieval", _doc_index_retrieval),
+        patch(
+            f"{_SEARCH_RUNNER}.get_query_embeddings", side_effect=_fake_embeddings
+        ) as get_query_embeddings,
+    ):
+        retrieve_chunks(query=query, document_index=Mock(), db_session=Mock())
+
+    # the embedding of the original query is reused
+    get_query_embeddings.assert_called_once()
+    assert get_query_embeddings.call_args.args[0] == ["was ist onyx"]
+    assert {
+        query.query: query.precomputed_query_embedding for query in retrieved_queries
+    } == {"what is onyx": [0.5], "was ist onyx": [12.0]}
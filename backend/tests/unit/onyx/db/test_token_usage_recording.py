@@ -0,0 +1,71 @@
+from collections.abc import Generator
+from unittest.mock import Mock
+from unittest.mock import patch
+from uuid import uuid4
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from onyx.db.token_limit import record_chat_message_token_usage
+
+_TOKEN_LIMIT = "onyx.db.token_limit"
+
+
+@pytest.fixture
+def token_budget() -> Generator[Mock, None, None]:
+    with (
+        patch(f"{_TOKEN_LIMIT}.RedisTokenBudget") as token_budget_cls,
+        patch(f"{_TOKEN_LIMIT}.get_current_tenant_id", return_value="tenant"),
+        patch(f"{_TOKEN_LIMIT}.any_rate_limit_exists", return_value=True),
+    ):
+        yield token_budget_cls.return_value
+
+
+@pytest.fixture
+def db_session() -> Generator[Session, None, None]:
+    with Session(create_engine("sqlite://")) as db_session:
+        # like the flush of the message, starts the transaction
+        db_session.execute(text("SELECT 1"))
+        # a chat session without a user, only the tenant wide counter is updated
+        with patch.object(db_session, "get", return_value=Mock(user_id=None)):
+            yield db_session
+
+
+def test_usage_is_recorded_once_committed(
+    token_budget: Mock, db_session: Session
+) -> None:
+    record_chat_message_token_usage(uuid4(), 100, db_session)
+    record_chat_message_token_usage(uuid4(), 20, db_session)
+    token_budget.record_usage.assert_not_called()
+
+    db_session.commit()
+    assert [call.args[:2] for call in token_budget.record_usage.call_args_list] == [
+        (["global"], 100),
+        (["global"], 20),
+    ]
+
+    # nothing left to record on the next commit
+    db_session.commit()
+    assert token_budget.record_usage.call_count == 2
+
+
+def test_rolled_back_usage_is_not_recorded(
+    token_budget: Mock, db_session: Session
+) -> None:
+    record_chat_message_token_usage(uuid4(), 100, db_session)
+    db_session.rollback()
+    db_session.commit()
+
+    token_budget.record_usage.assert_not_called()
+
+
+def test_usage_is_not_recorded_without_rate_limits(
+    token_budget: Mock, db_session: Session
+) -> None:
+    with patch(f"{_TOKEN_LIMIT}.any_rate_limit_exists", return_value=False):
+        record_chat_message_token_usage(uuid4(), 100, db_session)
+    db_session.commit()
+
+    token_budget.record_usage.assert_not_called()
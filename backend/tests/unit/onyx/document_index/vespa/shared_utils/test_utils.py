@@ -1,3 +1,7 @@
+import numpy as np
+
+from onyx.db.enums import EmbeddingPrecision
+from onyx.document_index.vespa.shared_utils.utils import encode_hex_tensor
 from onyx.document_index.vespa.shared_utils.utils import remove_invalid_unicode_chars
 
 
@@ -18,3 +22,31 @@ def test_remove_invalid_unicode_chars() -> None:
     sanitized = remove_invalid_unicode_chars(text_with_multiple_illegal)
     assert all(c not in sanitized for c in ["\x00", "\ufddb", "\ufffe"])
     assert sanitized == "Hello World!"
+
+
+def test_encode_hex_tensor() -> None:
+    values = [1.0, -2.5, 0.1]
+    assert (
+        encode_hex_tensor(values, EmbeddingPrecision.FLOAT)
+        == "3F800000C02000003DCCCCCD"
+    )
+    assert encode_hex_tensor(values, EmbeddingPrecision.BFLOAT16) == "3F80C0203DCD"
+
+    # bfloat16 rounds to nearest, ties to even
+    assert encode_hex_tensor([1.00390625], EmbeddingPrecision.BFLOAT16) == "3F80"
+    assert encode_hex_tensor([1.01171875], EmbeddingPrecision.BFLOAT16) == "3F82"
+
+
+def test_encode_hex_tensor_round_trips() -> None:
+    values = np.random.default_rng(0).standard_normal(768).astype(np.float32)
+
+    float_hex = encode_hex_tensor(values.tolist(), EmbeddingPrecision.FLOAT)
+    assert len(float_hex) == 768 * 8
+    assert np.array_equal(np.frombuffer(bytes.fromhex(float_hex), ">f4"), values)
+
+    bfloat16_hex = encode_hex_tensor(values.tolist(), EmbeddingPrecision.BFLOAT16)
+    assert len(bfloat16_hex) == 768 * 4
+    decoded = (
+        np.frombuffer(bytes.fromhex(bfloat16_hex), ">u2").astype(np.uint32) << 16
+    ).view(np.float32)
+    assert np.allclose(decoded, values, rtol=2**-8)
@@ -0,0 +1,177 @@
+import json
+import random
+import re
+import threading
+from collections.abc import Iterator
+from dataclasses import dataclass
+from dataclasses import field
+from unittest.mock import patch
+
+import httpx
+import pytest
+
+from onyx.context.search.models import IndexFilters
+from onyx.document_index.interfaces import DocumentIndexPartialRetrievalError
+from onyx.document_index.interfaces import VespaChunkRequest
+from onyx.document_index.vespa.chunk_retrieval import batch_search_api_retrieval
+from onyx.document_index.vespa.query_client import VespaQueryClientPool
+from onyx.document_index.vespa_constants import MAX_ID_SEARCH_QUERY_SIZE
+
+_INDEX_NAME = "danswer_chunk"
+# every document of the fake index has this many chunks
+_NUM_CHUNKS = 10
+
+_SEARCH_CONDITION = re.compile(
+    r'document_id contains "([^"]+)" and chunk_id >= (\d+) and chunk_id <= (\d+)'
+)
+_VISIT_DOCUMENT_ID = re.compile(r"document_id=='([^']+)'")
+
+
+def _fields(document_id: str, chunk_id: int) -> dict:
+    return {
+        "document_id": document_id,
+        "chunk_id": chunk_id,
+        "content": f"{document_id} {chunk_id}",
+        "semantic_identifier": document_id,
+        "section_continuation": False,
+        "source_type": "web",
+    }
+
+
+@dataclass
+class _FakeVespa:
+    """Serves id based searches / visits, documents starting with "fail" error out"""
+
+    num_requests: int = 0
+    max_in_flight: int = 0
+    _in_flight: int = 0
+    _lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        with self._lock:
+            self.num_requests += 1
+            self._in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self._in_flight)
+        try:
+            # random latency so that requests complete out of order
+            threading.Event().wait(random.uniform(0.005, 0.03))
+            if request.method == "POST":
+                return self._search(json.loads(request.content)["yql"])
+            return self._visit(request.url.params["selection"])
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    def _search(self, yql: str) -> httpx.Response:
+        conditions = _SEARCH_CONDITION.findall(yql)
+        if any(document_id.startswith("fail") for document_id, _, _ in conditions):
+            return httpx.Response(500)
+
+        hits = [
+            {"fields": _fields(document_id, chunk_id)}
+            for document_id, start, end in conditions
+            for chunk_id in range(int(start), min(int(end), _NUM_CHUNKS - 1) + 1)
+        ]
+        return httpx.Response(200, json={"root": {"children": hits}})
+
+    def _visit(self, selection: str) -> httpx.Response:
+        match = _VISIT_DOCUMENT_ID.search(selection)
+        assert match is not None
+        document_id = match.group(1)
+        if document_id.startswith("fail"):
+            return httpx.Response(500)
+
+        documents = [
+            {"fields": _fields(document_id, chunk_id)}
+            for chunk_id in range(_NUM_CHUNKS)
+        ]
+        return httpx.Response(200, json={"documents": documents})
+
+
+@pytest.fixture
+def fake_vespa() -> Iterator[_FakeVespa]:
+    fake = _FakeVespa()
+    VespaQueryClientPool.close()
+    VespaQueryClientPool._client = httpx.Client(
+        transport=httpx.MockTransport(fake.handle)
+    )
+    # no waiting between the retries of failed searches
+    with patch("retry.api.time"):
+        yield fake
+    VespaQueryClientPool.close()
+
+
+def _retrieve(
+    chunk_requests: list[VespaChunkRequest], max_concurrency: int = 8
+) -> list[tuple[str, int]]:
+    chunks = batch_search_api_retrieval(
+        index_name=_INDEX_NAME,
+        chunk_requests=chunk_requests,
+        filters=IndexFilters(access_control_list=None),
+        max_concurrency=max_concurrency,
+    )
+    return [(chunk.document_id, chunk.chunk_id) for chunk in chunks]
+
+
+def _capped(document_id: str, start: int, end: int) -> VespaChunkRequest:
+    return VespaChunkRequest(
+        document_id=document_id, min_chunk_ind=start, max_chunk_ind=end
+    )
+
+
+def test_results_keep_request_order(fake_vespa: _FakeVespa) -> None:
+    # each request fills a batched search on its own
+    chunk_requests = [
+        _capped(f"doc{i}", 0, MAX_ID_SEARCH_QUERY_SIZE - 1) for i in range(6)
+    ]
+    chunk_requests.insert(2, VespaChunkRequest(document_id="full_doc"))
+
+    expected = [
+        (f"doc{i}", chunk_id) for i in range(6) for chunk_id in range(_NUM_CHUNKS)
+    ] + [("full_doc", chunk_id) for chunk_id in range(_NUM_CHUNKS)]
+    for _ in range(3):
+        assert _retrieve(chunk_requests) == expected
+
+    assert fake_vespa.num_requests == 3 * 7
+
+
+def test_concurrency_is_capped(fake_vespa: _FakeVespa) -> None:
+    chunk_requests = [
+        _capped(f"doc{i}", 0, MAX_ID_SEARCH_QUERY_SIZE - 1) for i in range(8)
+    ]
+
+    _retrieve(chunk_requests, max_concurrency=3)
+    assert 1 < fake_vespa.max_in_flight <= 3
+
+    fake_vespa.max_in_flight = 0
+    _retrieve(chunk_requests, max_concurrency=1)
+    assert fake_vespa.max_in_flight == 1
+
+
+def test_small_requests_share_one_search(fake_vespa: _FakeVespa) -> None:
+    # within a search the chunks are ordered by chunk id
+    assert _retrieve([_capped("doc1", 2, 3), _capped("doc2", 0, 0)]) == [
+        ("doc2", 0),
+        ("doc1", 2),
+        ("doc1", 3),
+    ]
+    assert fake_vespa.num_requests == 1
+
+
+def test_partial_failure(fake_vespa: _FakeVespa) -> None:
+    failed_search = _capped("fail_search", 0, MAX_ID_SEARCH_QUERY_SIZE - 1)
+    failed_visit = VespaChunkRequest(document_id="fail_visit")
+
+    # failed visits are only logged
+    assert _retrieve([_capped("doc1", 0, 1), failed_visit]) == [
+        ("doc1", 0),
+        ("doc1", 1),
+    ]
+
+    with pytest.raises(DocumentIndexPartialRetrievalError) as exc_info:
+        _retrieve([failed_search, _capped("doc1", 0, 1), failed_visit])
+
+    assert exc_info.value.failed_chunk_requests == [failed_search, failed_visit]
+    assert [
+        (chunk.document_id, chunk.chunk_id) for chunk in exc_info.value.retrieved_chunks
+    ] == [("doc1", 0), ("doc1", 1)]
@@ -0,0 +1,216 @@
+import asyncio
+import contextvars
+from collections import Counter
+from collections.abc import Callable
+from collections.abc import Generator
+
+import httpx
+import pytest
+
+from onyx.document_index.vespa import feed
+from onyx.document_index.vespa.feed import AdaptiveInflightLimiter
+from onyx.document_index.vespa.feed import feed_vespa_operations
+from onyx.document_index.vespa.feed import VespaFeedClientPool
+from onyx.document_index.vespa.feed import VespaFeedError
+from onyx.document_index.vespa.feed import VespaFeedOperation
+
+
+@pytest.fixture(autouse=True)
+def no_retry_delay(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(feed, "_retry_delay", lambda attempt: 0)
+
+
+def _client_factory(
+    handler: Callable[[httpx.Request], httpx.Response],
+) -> Callable[[], httpx.AsyncClient]:
+    return lambda: httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+def _operations(num_docs: int, chunks_per_doc: int) -> list[VespaFeedOperation]:
+    return [
+        VespaFeedOperation(
+            method="POST",
+            url=f"http://vespa/document/v1/default/test/docid/{doc}_{chunk}",
+            document_id=f"doc_{doc}",
+            body={"fields": {"content": "hello"}},
+        )
+        for doc in range(num_docs)
+        for chunk in range(chunks_per_doc)
+    ]
+
+
+def test_feed_all_operations_succeed() -> None:
+    received: list[str] = []
+
+    def _handler(request: httpx.Request) -> httpx.Response:
+        received.append(request.url.path)
+        assert request.headers["Content-Type"] == "application/json"
+        return httpx.Response(200, json={})
+
+    result = feed_vespa_operations(
+        _operations(num_docs=10, chunks_per_doc=5),
+        client_factory=_client_factory(_handler),
+    )
+
+    assert result.num_operations == 50
+    assert len(received) == 50
+    assert not result.failed_document_ids
+    assert result.succeeded_document_ids == {f"doc_{i}" for i in range(10)}
+
+
+def test_feed_retries_throttled_operations() -> None:
+    attempts: Counter[str] = Counter()
+
+    def _handler(request: httpx.Request) -> httpx.Response:
+        attempts[request.url.path] += 1
+        # every operation is throttled twice before going through
+        if attempts[request.url.path] <= 2:
+            return httpx.Response(429)
+        return httpx.Response(200, json={})
+
+    result = feed_vespa_operations(
+        _operations(num_docs=3, chunks_per_doc=2),
+        client_factory=_client_factory(_handler),
+    )
+
+    assert not result.failed_document_ids
+    assert result.num_throttled == 12
+    assert all(count == 3 for count in attempts.values())
+
+
+def test_feed_reports_failures_per_document() -> None:
+    def _handler(request: httpx.Request) -> httpx.Response:
+        # a single bad chunk fails the whole document, but only that document
+        if request.url.path.endswith("/1_2"):
+            return httpx.Response(400, text="bad field")
+        return httpx.Response(200, json={})
+
+    result = feed_vespa_operations(
+        _operations(num_docs=3, chunks_per_doc=4),
+        client_factory=_client_factory(_handler),
+    )
+
+    assert list(result.failed_document_ids) == ["doc_1"]
+    assert "bad field" in result.failed_document_ids["doc_1"]
+    assert result.succeeded_document_ids == {"doc_0", "doc_2"}
+
+    with pytest.raises(VespaFeedError):
+        result.raise_for_failures("index")
+
+
+def test_feed_gives_up_after_max_retries() -> None:
+    def _handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(503)
+
+    result = feed_vespa_operations(
+        _operations(num_docs=1, chunks_per_doc=1),
+        max_retries=3,
+        client_factory=_client_factory(_handler),
+    )
+
+    assert result.num_throttled == 4
+    assert list(result.failed_document_ids) == ["doc_0"]
+
+
+def test_feed_respects_max_inflight() -> None:
+    in_flight = 0
+    max_seen = 0
+
+    async def _handler(request: httpx.Request) -> httpx.Response:
+        nonlocal in_flight, max_seen
+        in_flight += 1
+        max_seen = max(max_seen, in_flight)
+        await asyncio.sleep(0.001)
+        in_flight -= 1
+        return httpx.Response(200, json={})
+
+    result = feed_vespa_operations(
+        _operations(num_docs=20, chunks_per_doc=5),
+        max_inflight=8,
+        client_factory=lambda: httpx.AsyncClient(
+            transport=httpx.MockTransport(_handler)
+        ),
+    )
+
+    assert not result.failed_document_ids
+    assert 1 < max_seen <= 8
+
+
+@pytest.fixture
+def shared_feed_clients(
+    monkeypatch: pytest.MonkeyPatch,
+) -> Generator[list[httpx.AsyncClient], None, None]:
+    """Makes the shared feed client a mock one, yields every client created."""
+    clients: list[httpx.AsyncClient] = []
+
+    def _handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, json={})
+
+    def _create_client(max_connections: int) -> httpx.AsyncClient:
+        client = httpx.AsyncClient(transport=httpx.MockTransport(_handler))
+        clients.append(client)
+        return client
+
+    monkeypatch.setattr(feed, "get_vespa_async_http_client", _create_client)
+    monkeypatch.setattr(VespaFeedClientPool, "_async_client", None)
+    yield clients
+    VespaFeedClientPool._async_client = None
+
+
+def test_feeds_share_the_client(shared_feed_clients: list[httpx.AsyncClient]) -> None:
+    for _ in range(3):
+        result = feed_vespa_operations(_operations(num_docs=2, chunks_per_doc=2))
+        assert result.succeeded_document_ids == {"doc_0", "doc_1"}
+
+    assert len(shared_feed_clients) == 1
+    assert not shared_feed_clients[0].is_closed
+
+
+def test_feed_from_a_running_event_loop(
+    shared_feed_clients: list[httpx.AsyncClient],
+) -> None:
+    async def _index() -> None:
+        result = feed_vespa_operations(_operations(num_docs=2, chunks_per_doc=2))
+        assert result.num_operations == 4
+
+    asyncio.run(_index())
+
+
+def test_feed_runs_in_the_callers_context(
+    shared_feed_clients: list[httpx.AsyncClient],
+) -> None:
+    tenant_id = contextvars.ContextVar("tenant_id", default="public")
+    seen_tenant_ids: list[str] = []
+
+    def _operations_for_tenant() -> Generator[VespaFeedOperation, None, None]:
+        for operation in _operations(num_docs=1, chunks_per_doc=2):
+            seen_tenant_ids.append(tenant_id.get())
+            yield operation
+
+    token = tenant_id.set("tenant_a")
+    try:
+        feed_vespa_operations(_operations_for_tenant())
+    finally:
+        tenant_id.reset(token)
+
+    assert seen_tenant_ids == ["tenant_a", "tenant_a"]
+
+
+def test_limiter_backs_off_and_recovers() -> None:
+    limiter = AdaptiveInflightLimiter(max_inflight=16)
+
+    limiter.on_throttled()
+    limiter.on_throttled()
+    assert limiter.limit == 4
+
+    for _ in range(4):
+        limiter.on_success()
+    assert limiter.limit == 5
+
+    for _ in range(1000):
+        limiter.on_success()
+    assert limiter.limit == 16
+
+    for _ in range(10):
+        limiter.on_throttled()
+    assert limiter.limit == 1
@@ -0,0 +1,90 @@
+import asyncio
+import threading
+from collections.abc import Iterator
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+from typing import Any
+
+import pytest
+
+from onyx.document_index.vespa.query_client import async_vespa_query_request
+from onyx.document_index.vespa.query_client import vespa_query_connections
+from onyx.document_index.vespa.query_client import vespa_query_request
+from onyx.document_index.vespa.query_client import VespaQueryClientPool
+
+
+@pytest.fixture
+def stub_vespa_url() -> Iterator[str]:
+    class _Handler(BaseHTTPRequestHandler):
+        # keep-alive, so that connections can be reused
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self) -> None:
+            body = b'{"root": {"children": []}}'
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format: str, *args: Any) -> None:
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    VespaQueryClientPool.close()
+    yield f"http://127.0.0.1:{server.server_address[1]}/search/"
+    VespaQueryClientPool.close()
+    server.shutdown()
+    server.server_close()
+
+
+def _connection_count(connection: str) -> float:
+    return vespa_query_connections.labels(connection=connection)._value.get()
+
+
+def test_connections_are_reused(stub_vespa_url: str) -> None:
+    new_before = _connection_count("new")
+    reused_before = _connection_count("reused")
+
+    for _ in range(5):
+        response = vespa_query_request("GET", stub_vespa_url, operation="search")
+        assert response.status_code == 200
+
+    assert _connection_count("new") - new_before == 1
+    assert _connection_count("reused") - reused_before == 4
+
+
+def test_client_is_shared_and_recreated_after_fork_or_close() -> None:
+    client = VespaQueryClientPool.get()
+    assert VespaQueryClientPool.get() is client
+
+    VespaQueryClientPool._reset_after_fork()
+    forked_client = VespaQueryClientPool.get()
+    assert forked_client is not client
+
+    VespaQueryClientPool.close()
+    assert forked_client.is_closed
+    assert VespaQueryClientPool.get() is not forked_client
+    VespaQueryClientPool.close()
+
+
+def test_async_client_per_event_loop(stub_vespa_url: str) -> None:
+    async def _query() -> int:
+        first = VespaQueryClientPool.get_async()
+        response = await async_vespa_query_request(
+            "GET", stub_vespa_url, operation="search"
+        )
+        assert VespaQueryClientPool.get_async() is first
+        return response.status_code
+
+    async def _query_and_close() -> int:
+        status_code = await _query()
+        await VespaQueryClientPool.aclose()
+        return status_code
+
+    assert asyncio.run(_query()) == 200
+    # a new event loop gets its own client instead of one bound to a closed loop
+    assert asyncio.run(_query_and_close()) == 200
@@ -0,0 +1,115 @@
+from onyx.configs.constants import DocumentSource
+from onyx.connectors.models import Document
+from onyx.connectors.models import TextSection
+from onyx.indexing.chunk_fingerprints import build_chunk_fingerprint
+from onyx.indexing.chunk_fingerprints import build_content_fingerprint
+from onyx.indexing.chunk_fingerprints import build_document_fingerprint
+from onyx.indexing.chunk_fingerprints import diff_document_chunks
+from onyx.indexing.chunker import Chunker
+from onyx.indexing.embedder import DefaultIndexingEmbedder
+from onyx.indexing.indexing_pipeline import process_image_sections
+
+_INDEX_NAME = "danswer_chunk_test"
+
+
+def _build_document(sections: list[str], title: str = "Test Document") -> Document:
+    return Document(
+        id="test_doc",
+        source=DocumentSource.WEB,
+        semantic_identifier=title,
+        metadata={"tags": ["tag1", "tag2"]},
+        doc_updated_at=None,
+        sections=[
+            TextSection(text=text, link=f"link{i}") for i, text in enumerate(sections)
+        ],
+    )
+
+
+def _long_section(word: str) -> str:
+    return f"This section is about {word} and should fill up a whole chunk. " * 60
+
+
+def test_only_changed_chunks_are_emitted(embedder: DefaultIndexingEmbedder) -> None:
+    chunker = Chunker(tokenizer=embedder.embedding_model.tokenizer)
+    sections = [_long_section(word) for word in ("apples", "pears", "plums")]
+
+    [original] = process_image_sections([_build_document(sections)])
+    document_fingerprint = build_document_fingerprint(original, chunker, _INDEX_NAME)
+    original_chunks = chunker.chunk([original])
+    assert len(original_chunks) > 3
+    stored_fingerprints = [
+        build_chunk_fingerprint(document_fingerprint, chunk)
+        for chunk in original_chunks
+    ]
+
+    # edit only the last section
+    [updated] = process_image_sections(
+        [_build_document(sections[:2] + [_long_section("cherries")])]
+    )
+    updated_chunks = chunker.chunk([updated])
+    diff = diff_document_chunks(
+        document_id=updated.id,
+        content_fingerprint=build_content_fingerprint(document_fingerprint, updated),
+        document_fingerprint=build_document_fingerprint(updated, chunker, _INDEX_NAME),
+        chunks=updated_chunks,
+        stored_chunk_fingerprints=stored_fingerprints,
+    )
+
+    assert diff.changed_chunks
+    assert diff.unchanged_chunks
+    assert len(diff.chunk_fingerprints) == len(updated_chunks)
+    assert all("cherries" in chunk.content for chunk in diff.changed_chunks)
+    assert all("cherries" not in chunk.content for chunk in diff.unchanged_chunks)
+    assert diff.num_unchanged_chunks + len(diff.changed_chunks) == len(updated_chunks)
+
+
+def test_document_level_change_rewrites_every_chunk(
+    embedder: DefaultIndexingEmbedder,
+) -> None:
+    chunker = Chunker(tokenizer=embedder.embedding_model.tokenizer)
+    sections = [_long_section(word) for word in ("apples", "pears")]
+
+    [original] = process_image_sections([_build_document(sections)])
+    original_fingerprint = build_document_fingerprint(original, chunker, _INDEX_NAME)
+    stored_fingerprints = [
+        build_chunk_fingerprint(original_fingerprint, chunk)
+        for chunk in chunker.chunk([original])
+    ]
+
+    # the title is written into every chunk
+    [renamed] = process_image_sections([_build_document(sections, title="Renamed")])
+    renamed_fingerprint = build_document_fingerprint(renamed, chunker, _INDEX_NAME)
+    assert renamed_fingerprint != original_fingerprint
+
+    diff = diff_document_chunks(
+        document_id=renamed.id,
+        content_fingerprint=build_content_fingerprint(renamed_fingerprint, renamed),
+        document_fingerprint=renamed_fingerprint,
+        chunks=chunker.chunk([renamed]),
+        stored_chunk_fingerprints=stored_fingerprints,
+    )
+    assert not diff.unchanged_chunks
+
+    # a different index (e.g. new embedding model) must never reuse chunks
+    assert (
+        build_document_fingerprint(original, chunker, "danswer_chunk_other")
+        != original_fingerprint
+    )
+
+
+def test_content_fingerprint_tracks_sections(
+    embedder: DefaultIndexingEmbedder,
+) -> None:
+    chunker = Chunker(tokenizer=embedder.embedding_model.tokenizer)
+
+    [original] = process_image_sections([_build_document(["first", "second"])])
+    [same] = process_image_sections([_build_document(["first", "second"])])
+    [moved_text] = process_image_sections([_build_document(["firsts", "econd"])])
+
+    fingerprint = build_document_fingerprint(original, chunker, _INDEX_NAME)
+    assert build_content_fingerprint(fingerprint, original) == (
+        build_content_fingerprint(fingerprint, same)
+    )
+    assert build_content_fingerprint(fingerprint, original) != (
+        build_content_fingerprint(fingerprint, moved_text)
+    )
@@ -11,6 +11,15 @@ from onyx.indexing.embedder import DefaultIndexingEmbedder
 from onyx.indexing.models import ChunkEmbedding
 from onyx.indexing.models import DocAwareChunk
 from onyx.indexing.models import IndexChunk
+from onyx.natural_language_processing.embedding_cache import (
+    build_embedding_cache_key,
+)
+from onyx.natural_language_processing.embedding_cache import (
+    build_embedding_cache_namespace,
+)
+from onyx.natural_language_processing.embedding_cache import deserialize_embedding
+from onyx.natural_language_processing.embedding_cache import InMemoryEmbeddingCache
+from onyx.natural_language_processing.embedding_cache import serialize_embedding
 from shared_configs.enums import EmbeddingProvider
 from shared_configs.enums import EmbedTextType
 
@@ -103,3 +112,131 @@ def test_default_indexing_embedder_embed_chunks(
         tenant_id=None,
         request_id=None,
     )
+
+
+def _make_chunk(source_doc: Document, chunk_id: int, content: str) -> DocAwareChunk:
+    return DocAwareChunk(
+        chunk_id=chunk_id,
+        blurb=content,
+        content=content,
+        source_links={0: "link1"},
+        section_continuation=False,
+        source_document=source_doc,
+        title_prefix="",
+        metadata_suffix_semantic="",
+        metadata_suffix_keyword="",
+        mini_chunk_texts=None,
+        large_chunk_reference_ids=[],
+        large_chunk_id=None,
+        image_file_name=None,
+        chunk_context="",
+        doc_summary="",
+        contextual_rag_reserved_tokens=0,
+    )
+
+
+def test_default_indexing_embedder_skips_cached_chunks(
+    mock_embedding_model: Mock,
+) -> None:
+    embedding_cache = InMemoryEmbeddingCache(max_entries=100)
+    embedder = DefaultIndexingEmbedder(
+        model_name="test-model",
+        normalize=True,
+        query_prefix=None,
+        passage_prefix=None,
+        provider_type=EmbeddingProvider.OPENAI,
+        embedding_cache=embedding_cache,
+    )
+    mock_encode = mock_embedding_model.return_value.encode
+    mock_encode.side_effect = lambda texts, **kwargs: [
+        [float(len(text)), 0.0] for text in texts
+    ]
+
+    source_doc = Document(
+        id="test_doc",
+        source=DocumentSource.WEB,
+        semantic_identifier="Test Document",
+        metadata={},
+        doc_updated_at=None,
+        sections=[TextSection(text="unused", link="link1")],
+    )
+    first_run = embedder.embed_chunks(
+        [
+            _make_chunk(source_doc, 0, "first paragraph"),
+            _make_chunk(source_doc, 1, "second paragraph"),
+        ]
+    )
+    # both chunks + the title
+    assert embedding_cache.stats.misses == 3
+    assert mock_encode.call_count == 2
+
+    # the document is updated, only the second paragraph changed
+    mock_encode.reset_mock()
+    second_run = embedder.embed_chunks(
+        [
+            _make_chunk(source_doc, 0, "first paragraph"),
+            _make_chunk(source_doc, 1, "second paragraph, edited"),
+        ]
+    )
+
+    mock_encode.assert_called_once_with(
+        texts=["second paragraph, edited"],
+        text_type=EmbedTextType.PASSAGE,
+        large_chunks_present=False,
+        tenant_id=None,
+        request_id=None,
+    )
+    assert embedding_cache.stats.hits == 2
+    assert (
+        second_run[0].embeddings.full_embedding
+        == first_run[0].embeddings.full_embedding
+    )
+    assert second_run[1].embeddings.full_embedding == [24.0, 0.0]
+    assert second_run[0].title_embedding == first_run[0].title_embedding
+
+
+def test_embedding_cache_key_depends_on_model_config() -> None:
+    base_args = dict(
+        model_name="test-model",
+        provider_type=None,
+        deployment_name=None,
+        normalize=True,
+        prefix=None,
+        reduced_dimension=None,
+        text_type=EmbedTextType.PASSAGE,
+        max_seq_length=512,
+    )
+    namespace = build_embedding_cache_namespace(**base_args)  # type: ignore
+    assert namespace == build_embedding_cache_namespace(**base_args)  # type: ignore
+
+    for field, value in [
+        ("model_name", "other-model"),
+        ("normalize", False),
+        ("prefix", "search_document: "),
+        ("reduced_dimension", 256),
+        ("max_seq_length", 2048),
+    ]:
+        assert namespace != build_embedding_cache_namespace(
+            **{**base_args, field: value}  # type: ignore
+        )
+
+    assert build_embedding_cache_key(namespace, "text") != build_embedding_cache_key(
+        namespace, "text "
+    )
+
+
+def test_in_memory_embedding_cache_evicts_least_recently_used() -> None:
+    cache = InMemoryEmbeddingCache(max_entries=2)
+    cache.put_many({"a": [1.0], "b": [2.0]})
+    # touch "a" so that "b" is the least recently used entry
+    assert cache.get_many(["a"]) == [[1.0]]
+    cache.put_many({"c": [3.0]})
+
+    assert cache.get_many(["a", "b", "c"]) == [[1.0], None, [3.0]]
+    assert cache.stats.hits == 3
+    assert cache.stats.misses == 1
+
+
+def test_embedding_serialization_round_trip() -> None:
+    embedding = [0.5, -1.25, 3.0]
+    assert deserialize_embedding(serialize_embedding(embedding)) == embedding
@@ -14,6 +14,7 @@ from onyx.connectors.models import TextSection
 from onyx.indexing.chunker import Chunker
 from onyx.indexing.embedder import DefaultIndexingEmbedder
 from onyx.indexing.indexing_pipeline import _get_aggregated_chunk_boost_factor
+from onyx.indexing.indexing_pipeline import _get_content_tokenizers
 from onyx.indexing.indexing_pipeline import add_contextual_summaries
 from onyx.indexing.indexing_pipeline import filter_documents
 from onyx.indexing.indexing_pipeline import process_image_sections
@@ -338,3 +339,21 @@ def test_contextual_rag(
             count += 1
         assert chunk.doc_summary == doc_summary
         assert chunk.chunk_context == chunk_context
+
+
+@patch("onyx.indexing.indexing_pipeline.get_tokenizer")
+@patch("onyx.indexing.indexing_pipeline.get_default_llms")
+def test_get_content_tokenizers_one_per_family(
+    mock_get_default_llms: Mock, mock_get_tokenizer: Mock
+) -> None:
+    llm = Mock(config=Mock(model_name="gpt-4o", model_provider="openai"))
+    fast_llm = Mock(config=Mock(model_name="gpt-4o-mini", model_provider="openai"))
+    mock_get_default_llms.return_value = (llm, fast_llm)
+    # both models use the same vocabulary
+    tokenizer = Mock(family="tiktoken:o200k_base")
+    mock_get_tokenizer.return_value = tokenizer
+
+    assert _get_content_tokenizers() == [tokenizer]
+
+    mock_get_default_llms.side_effect = ValueError("No default LLM provider found")
+    assert _get_content_tokenizers() == []
@@ -0,0 +1,198 @@
+import threading
+import time
+from typing import Any
+
+from onyx.configs.constants import DocumentSource
+from onyx.connectors.models import Document
+from onyx.connectors.models import IndexAttemptMetadata
+from onyx.connectors.models import TextSection
+from onyx.indexing.indexing_pipeline import IndexingPipelineResult
+from onyx.indexing.pipelined_indexing import PipelinedIndexer
+from onyx.indexing.pipelined_indexing import PipelineStage
+
+
+def _make_batch(batch_ind: int, size: int = 2) -> list[Document]:
+    return [
+        Document(
+            id=f"doc_{batch_ind}_{i}",
+            sections=[TextSection(text="content", link=f"link_{batch_ind}_{i}")],
+            source=DocumentSource.MOCK_CONNECTOR,
+            semantic_identifier=f"doc_{batch_ind}_{i}",
+            metadata={},
+        )
+        for i in range(size)
+    ]
+
+
+def _metadata() -> IndexAttemptMetadata:
+    return IndexAttemptMetadata(connector_id=1, credential_id=1)
+
+
+def _passthrough(value: list[Document], _: IndexAttemptMetadata) -> list[Document]:
+    return value
+
+
+def _to_result(
+    value: list[Document], _: IndexAttemptMetadata
+) -> IndexingPipelineResult:
+    return IndexingPipelineResult(
+        new_docs=len(value), total_docs=len(value), total_chunks=0, failures=[]
+    )
+
+
+def test_results_are_returned_in_order() -> None:
+    def _jittery(value: list[Document], _: IndexAttemptMetadata) -> list[Document]:
+        # later batches finish the stage faster than earlier ones
+        time.sleep(0.01 * (3 - int(value[0].id.split("_")[1]) % 3))
+        return value
+
+    batches = [_make_batch(i) for i in range(6)]
+    completed: list[list[Document]] = []
+    with PipelinedIndexer(
+        stages=[("a", _jittery), ("b", _passthrough), ("c", _to_result)],
+        queue_depths=[2, 2, 2],
+    ) as indexer:
+        for batch in batches:
+            completed.extend(b for b, _ in indexer.submit(batch, _metadata()))
+        completed.extend(b for b, _ in indexer.drain())
+
+        assert indexer.num_in_flight == 0
+
+    assert completed == batches
+
+
+def test_stages_overlap_across_batches() -> None:
+    active_stages: set[str] = set()
+    max_concurrent_stages = 0
+    lock = threading.Lock()
+
+    def _make_stage(name: str, is_last: bool = False) -> PipelineStage:
+        def _stage(value: list[Document], md: IndexAttemptMetadata) -> Any:
+            nonlocal max_concurrent_stages
+            with lock:
+                active_stages.add(name)
+                max_concurrent_stages = max(max_concurrent_stages, len(active_stages))
+            time.sleep(0.05)
+            with lock:
+                active_stages.discard(name)
+            return _to_result(value, md) if is_last else value
+
+        return _stage
+
+    with PipelinedIndexer(
+        stages=[
+            ("chunk", _make_stage("chunk")),
+            ("embed", _make_stage("embed")),
+            ("write", _make_stage("write", is_last=True)),
+        ],
+        queue_depths=[1, 1, 1],
+    ) as indexer:
+        results = []
+        for i in range(5):
+            results.extend(indexer.submit(_make_batch(i), _metadata()))
+        results.extend(indexer.drain())
+
+    assert len(results) == 5
+    assert max_concurrent_stages == 3
+
+
+def test_stage_failure_only_fails_that_batch() -> None:
+    later_stage_batches: list[str] = []
+
+    def _fail_second_batch(
+        value: list[Document], _: IndexAttemptMetadata
+    ) -> list[Document]:
+        if value[0].id.startswith("doc_1_"):
+            raise RuntimeError("embedding failed")
+        return value
+
+    def _record(
+        value: list[Document], md: IndexAttemptMetadata
+    ) -> IndexingPipelineResult:
+        later_stage_batches.append(value[0].id)
+        return _to_result(value, md)
+
+    with PipelinedIndexer(
+        stages=[("embed", _fail_second_batch), ("write", _record)],
+        queue_depths=[1, 1],
+    ) as indexer:
+        results = []
+        for i in range(3):
+            results.extend(indexer.submit(_make_batch(i), _metadata()))
+        results.extend(indexer.drain())
+
+    assert [len(result.failures) for _, result in results] == [0, 2, 0]
+    failed_result = results[1][1]
+    assert {
+        failure.failed_document.document_id
+        for failure in failed_result.failures
+        if failure.failed_document
+    } == {"doc_1_0", "doc_1_1"}
+    assert all(
+        failure.failure_message == "embedding failed"
+        for failure in failed_result.failures
+    )
+    # the failed batch never reaches the write stage
+    assert later_stage_batches == ["doc_0_0", "doc_2_0"]
+
+
+def test_submit_blocks_when_pipeline_is_full() -> None:
+    release = threading.Event()
+
+    def _blocking(
+        value: list[Document], md: IndexAttemptMetadata
+    ) -> IndexingPipelineResult:
+        release.wait()
+        return _to_result(value, md)
+
+    indexer = PipelinedIndexer(stages=[("write", _blocking)], queue_depths=[1])
+    # first batch is picked up by the stage, second sits in the queue
+    indexer.submit(_make_batch(0), _metadata())
+    indexer.submit(_make_batch(1), _metadata())
+
+    third_submitted = threading.Event()
+    completed_on_submit: list = []
+
+    def _submit_third() -> None:
+        completed_on_submit.extend(indexer.submit(_make_batch(2), _metadata()))
+        third_submitted.set()
+
+    submitter = threading.Thread(target=_submit_third)
+    submitter.start()
+    assert not third_submitted.wait(timeout=0.2)
+
+    release.set()
+    submitter.join(timeout=5)
+    assert third_submitted.is_set()
+
+    assert len(completed_on_submit) + len(indexer.drain()) == 3
+    indexer.close()
+
+
+def test_cancel_fails_pending_batches() -> None:
+    release = threading.Event()
+    started = threading.Event()
+
+    def _blocking(value: list[Document], _: IndexAttemptMetadata) -> list[Document]:
+        started.set()
+        release.wait()
+        return value
+
+    indexer = PipelinedIndexer(
+        stages=[("embed", _blocking), ("write", _to_result)], queue_depths=[2, 2]
+    )
+    indexer.submit(_make_batch(0), _metadata())
+    indexer.submit(_make_batch(1), _metadata())
+    started.wait(timeout=5)
+
+    closer = threading.Thread(target=indexer.close, kwargs={"cancel": True})
+    closer.start()
+    # give the closer a chance to flag the cancellation before the stage unblocks
+    time.sleep(0.1)
+    release.set()
+    closer.join(timeout=5)
+    assert not closer.is_alive()
+
+    results = indexer.drain()
+    # the batch which was already in the embed stage is not written either
+    assert all(len(result.failures) == 2 for _, result in results)
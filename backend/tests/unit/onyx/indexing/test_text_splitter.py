@@ -0,0 +1,97 @@
+import pytest
+from llama_index.core.node_parser import SentenceSplitter
+
+from onyx.indexing.embedder import DefaultIndexingEmbedder
+from onyx.indexing.text_splitter import SentenceTokenSplitter
+from onyx.indexing.text_splitter import TokenizedText
+from onyx.natural_language_processing.utils import BaseTokenizer
+
+_SENTENCES = (
+    "Onyx connects to the tools your team already uses. "
+    "Documents are split into chunks, embedded and written to the index. "
+    "Mr. Smith asked whether the e.g. abbreviations confuse the sentence splitter? "
+    "They should not! "
+)
+
+
+@pytest.fixture
+def tokenizer(embedder: DefaultIndexingEmbedder) -> BaseTokenizer:
+    return embedder.embedding_model.tokenizer
+
+
+@pytest.mark.parametrize(
+    "text,chunk_size",
+    [
+        ("A single short sentence.", 64),
+        (_SENTENCES * 20, 64),
+        (_SENTENCES * 20, 13),
+        ("\n\n\n".join([_SENTENCES * 3] * 5), 100),
+        ("one, two; three, four. " * 80, 16),
+        ("averyveryverylongwordwithoutanyspaces" * 40, 32),
+    ],
+)
+def test_matches_sentence_splitter(
+    tokenizer: BaseTokenizer, text: str, chunk_size: int
+) -> None:
+    expected = SentenceSplitter(
+        tokenizer=tokenizer.tokenize, chunk_size=chunk_size, chunk_overlap=0
+    ).split_text(text)
+
+    tokenized = TokenizedText.from_text(text, tokenizer)
+    assert (
+        SentenceTokenSplitter(chunk_size=chunk_size).split_text(tokenized) == expected
+    )
+    # only splitting the start of the text gives the same first chunk
+    assert (
+        SentenceTokenSplitter(chunk_size=chunk_size).split_text(tokenized, max_chunks=1)
+        == expected[:1]
+    )
+
+
+def test_slices_keep_token_offsets(tokenizer: BaseTokenizer) -> None:
+    text = _SENTENCES * 10
+    tokenized = TokenizedText.from_text(text, tokenizer)
+    assert tokenized.count_tokens() == len(tokenizer.encode(text))
+
+    for chunk in SentenceTokenSplitter(chunk_size=40).split(tokenized):
+        assert chunk.count_tokens() <= 40
+        assert chunk.count_tokens() == len(tokenizer.encode(chunk.text))
+
+
+def test_join_matches_concatenated_text(tokenizer: BaseTokenizer) -> None:
+    separator = TokenizedText.from_text("\n\n", tokenizer)
+    parts = [
+        TokenizedText.from_text(text, tokenizer)
+        for text in ("First section.", "Second section here.", "Third.")
+    ]
+
+    joined = TokenizedText.join(separator, parts)
+    assert joined.text == "\n\n".join(part.text for part in parts)
+    assert joined.count_tokens() == len(tokenizer.encode(joined.text))
+    assert joined.slice(0, len(parts[0].text)) == parts[0]
+
+
+def test_overlap(tokenizer: BaseTokenizer) -> None:
+    text = _SENTENCES * 10
+    expected = SentenceSplitter(
+        tokenizer=tokenizer.tokenize, chunk_size=60, chunk_overlap=20
+    ).split_text(text)
+
+    assert (
+        SentenceTokenSplitter(chunk_size=60, chunk_overlap=20).split_text(
+            TokenizedText.from_text(text, tokenizer)
+        )
+        == expected
+    )
+
+
+def test_empty_text(tokenizer: BaseTokenizer) -> None:
+    assert SentenceTokenSplitter(chunk_size=10).split_text(
+        TokenizedText.from_text("", tokenizer)
+    ) == [""]
+    assert (
+        SentenceTokenSplitter(chunk_size=10).split_text(
+            TokenizedText.from_text("   \n ", tokenizer)
+        )
+        == []
+    )
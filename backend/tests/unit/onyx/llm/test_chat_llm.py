@@ -1,3 +1,5 @@
+from collections.abc import AsyncIterator
+from unittest.mock import AsyncMock
 from unittest.mock import patch
 
 import litellm
@@ -301,3 +303,57 @@ def test_multiple_tool_calls_streaming(default_multi_llm: DefaultMultiLLM) -> No
             parallel_tool_calls=False,
             mock_response=MOCK_LLM_RESPONSE,
         )
+
+
+@pytest.mark.asyncio
+async def test_ainvoke(default_multi_llm: DefaultMultiLLM) -> None:
+    mock_response = litellm.ModelResponse(
+        id="chatcmpl-123",
+        choices=[
+            litellm.Choices(
+                finish_reason="stop",
+                index=0,
+                message=litellm.Message(content="Hello there", role="assistant"),
+            )
+        ],
+        model="gpt-3.5-turbo",
+    )
+    with patch(
+        "onyx.llm.chat_llm.litellm.acompletion",
+        new=AsyncMock(return_value=mock_response),
+    ) as mock_acompletion:
+        result = await default_multi_llm.ainvoke("Hi")
+
+    assert isinstance(result, AIMessage)
+    assert result.content == "Hello there"
+    assert mock_acompletion.call_args.kwargs["stream"] is False
+    assert mock_acompletion.call_args.kwargs["messages"] == [
+        {"role": "user", "content": "Hi"}
+    ]
+
+
+@pytest.mark.asyncio
+async def test_astream(default_multi_llm: DefaultMultiLLM) -> None:
+    async def _stream() -> AsyncIterator[litellm.ModelResponse]:
+        for content, finish_reason in [("Hello", None), (" there", "stop")]:
+            yield litellm.ModelResponse(
+                id="chatcmpl-123",
+                choices=[
+                    litellm.Choices(
+                        delta=_create_delta(role="assistant", content=content),
+                        finish_reason=finish_reason,
+                        index=0,
+                    )
+                ],
+                model="gpt-3.5-turbo",
+            )
+
+    with patch(
+        "onyx.llm.chat_llm.litellm.acompletion",
+        new=AsyncMock(return_value=_stream()),
+    ) as mock_acompletion:
+        stream_result = [chunk async for chunk in default_multi_llm.astream("Hi")]
+
+    assert [chunk.content for chunk in stream_result] == ["Hello", " there"]
+    assert all(isinstance(chunk, AIMessageChunk) for chunk in stream_result)
+    assert mock_acompletion.call_args.kwargs["stream"] is True
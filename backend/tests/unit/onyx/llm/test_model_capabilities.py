@@ -0,0 +1,73 @@
+from collections.abc import Generator
+from unittest.mock import patch
+
+import pytest
+
+from onyx.llm.model_capabilities import get_model_capabilities
+from onyx.llm.model_capabilities import ModelCapabilities
+from onyx.llm.model_capabilities import refresh_model_capability_index
+from onyx.llm.utils import get_llm_max_output_tokens
+from onyx.llm.utils import get_llm_max_tokens
+from onyx.llm.utils import model_supports_image_input
+
+_MODEL_COST: dict[str, dict] = {
+    "sample_spec": {"max_tokens": "LEGACY parameter", "supports_vision": True},
+    "openai/gpt-4o": {
+        "max_tokens": 16384,
+        "max_input_tokens": 128000,
+        "max_output_tokens": 16384,
+        "supports_vision": True,
+    },
+    "llama3.2": {"max_tokens": 8192},
+}
+
+
+@pytest.fixture
+def model_cost() -> Generator[dict, None, None]:
+    model_cost = {key: dict(value) for key, value in _MODEL_COST.items()}
+    with patch("onyx.llm.model_capabilities.litellm.model_cost", model_cost):
+        refresh_model_capability_index()
+        yield model_cost
+    refresh_model_capability_index()
+
+
+def test_model_names_are_normalized(model_cost: dict) -> None:
+    gpt_4o = get_model_capabilities("gpt-4o", "openai")
+    assert gpt_4o == ModelCapabilities(
+        max_input_tokens=128000,
+        max_tokens=16384,
+        max_output_tokens=16384,
+        supports_vision=True,
+    )
+    # extra provider prefix of a model proxy
+    assert get_model_capabilities("proxy/gpt-4o", "openai") is gpt_4o
+    # ollama tag
+    assert get_model_capabilities("llama3.2:3b", "ollama") == ModelCapabilities(
+        max_input_tokens=None,
+        max_tokens=8192,
+        max_output_tokens=None,
+        supports_vision=False,
+    )
+    assert get_model_capabilities("unknown-model", "openai") is None
+
+
+def test_accessors(model_cost: dict) -> None:
+    with patch("onyx.llm.utils.GEN_AI_MAX_TOKENS", None):
+        assert get_llm_max_tokens("gpt-4o", "openai") == 128000
+        assert get_llm_max_tokens("llama3.2:3b", "ollama") == 8192
+    assert get_llm_max_output_tokens("llama3.2:3b", "ollama") == 819
+    assert model_supports_image_input("gpt-4o", "openai")
+    assert not model_supports_image_input("llama3.2", "ollama")
+    # descriptions are not taken as numbers
+    with patch("onyx.llm.utils.GEN_AI_MODEL_FALLBACK_MAX_TOKENS", 4096):
+        assert get_llm_max_output_tokens("sample_spec", "openai") == 4096
+
+
+def test_refresh_picks_up_new_models(model_cost: dict) -> None:
+    assert not model_supports_image_input("new-model", "openai")
+
+    model_cost["openai/new-model"] = {"max_tokens": 1000, "supports_vision": True}
+    # resolutions are cached until the index is refreshed
+    assert not model_supports_image_input("new-model", "openai")
+    refresh_model_capability_index()
+    assert model_supports_image_input("new-model", "openai")
@@ -0,0 +1,72 @@
+from collections.abc import Generator
+from typing import Any
+from unittest.mock import Mock
+from unittest.mock import patch
+
+import pytest
+
+from onyx.natural_language_processing.search_nlp_models import EmbeddingModel
+from shared_configs.enums import EmbedTextType
+from shared_configs.model_server_models import EmbedResponse
+
+
+@pytest.fixture
+def embedding_model() -> Generator[EmbeddingModel, None, None]:
+    with patch(
+        "onyx.natural_language_processing.search_nlp_models.get_tokenizer"
+    ) as mock_get_tokenizer:
+        # one token per word
+        mock_get_tokenizer.return_value.encode.side_effect = lambda text: text.split()
+        yield EmbeddingModel(
+            server_host="localhost",
+            server_port=9000,
+            model_name="test-model",
+            normalize=True,
+            query_prefix=None,
+            passage_prefix=None,
+            api_key=None,
+            api_url=None,
+            provider_type=None,
+        )
+
+
+def _fake_model_server(request_batches: list[list[str]]) -> Mock:
+    def _make_request(embed_request: Any, **kwargs: Any) -> EmbedResponse:
+        request_batches.append(embed_request.texts)
+        # "embedding" is the number of words
+        return EmbedResponse(
+            embeddings=[[float(len(text.split()))] for text in embed_request.texts]
+        )
+
+    return Mock(side_effect=_make_request)
+
+
+@pytest.mark.parametrize("bucketing_enabled", [True, False])
+def test_length_bucketed_batches_keep_order(
+    embedding_model: EmbeddingModel, bucketing_enabled: bool
+) -> None:
+    texts = [" ".join(["word"] * length) for length in [300, 2, 250, 3, 1, 400, 5]]
+    request_batches: list[list[str]] = []
+
+    with (
+        patch(
+            "onyx.natural_language_processing.search_nlp_models."
+            "EMBEDDING_LENGTH_BUCKETING_ENABLED",
+            bucketing_enabled,
+        ),
+        patch.object(
+            embedding_model,
+            "_make_model_server_request",
+            _fake_model_server(request_batches),
+        ),
+    ):
+        embeddings = embedding_model.encode(
+            texts, text_type=EmbedTextType.PASSAGE, local_embedding_batch_size=2
+        )
+
+    assert embeddings == [[300.0], [2.0], [250.0], [3.0], [1.0], [400.0], [5.0]]
+    if bucketing_enabled:
+        # short texts are sent together, long ones under the 2 * 512 token budget
+        assert [len(batch) for batch in request_batches] == [4, 2, 1]
+    else:
+        assert [len(batch) for batch in request_batches] == [2, 2, 2, 1]
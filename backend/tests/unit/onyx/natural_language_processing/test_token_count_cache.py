@@ -0,0 +1,91 @@
+from collections.abc import Generator
+from unittest.mock import patch
+
+import pytest
+
+from onyx.natural_language_processing.token_count_cache import (
+    build_token_count_cache_key,
+)
+from onyx.natural_language_processing.token_count_cache import count_tokens
+from onyx.natural_language_processing.token_count_cache import TokenCountCache
+from onyx.natural_language_processing.utils import BaseTokenizer
+
+
+class _WordTokenizer(BaseTokenizer):
+    """One token per word, counts the calls to `encode`"""
+
+    def __init__(self, family: str | None) -> None:
+        self._family = family
+        self.num_encodes = 0
+
+    @property
+    def family(self) -> str | None:
+        return self._family
+
+    def encode(self, string: str) -> list[int]:
+        self.num_encodes += 1
+        return [len(word) for word in string.split()]
+
+    def tokenize(self, string: str) -> list[str]:
+        return string.split()
+
+    def decode(self, tokens: list[int]) -> str:
+        raise NotImplementedError
+
+
+@pytest.fixture
+def token_count_cache() -> Generator[TokenCountCache, None, None]:
+    cache = TokenCountCache(max_entries=2)
+    with patch(
+        "onyx.natural_language_processing.token_count_cache.get_token_count_cache",
+        return_value=cache,
+    ):
+        yield cache
+
+
+def test_count_tokens_is_cached(token_count_cache: TokenCountCache) -> None:
+    tokenizer = _WordTokenizer(family="words")
+
+    assert count_tokens("a b c", tokenizer) == 3
+    assert count_tokens("a b c", tokenizer) == 3
+    assert tokenizer.num_encodes == 1
+
+    # same family, e.g. another model with the same vocabulary
+    other_tokenizer = _WordTokenizer(family="words")
+    assert count_tokens("a b c", other_tokenizer) == 3
+    assert other_tokenizer.num_encodes == 0
+
+
+def test_count_tokens_without_family_is_not_cached(
+    token_count_cache: TokenCountCache,
+) -> None:
+    tokenizer = _WordTokenizer(family=None)
+
+    assert count_tokens("a b c", tokenizer) == 3
+    assert count_tokens("a b c", tokenizer) == 3
+    assert tokenizer.num_encodes == 2
+    assert len(token_count_cache) == 0
+
+
+def test_token_count_cache_evicts_least_recently_used() -> None:
+    cache = TokenCountCache(max_entries=2)
+    first, second, third = (
+        build_token_count_cache_key("words", text) for text in ["a", "b", "c"]
+    )
+
+    cache.put(first, 1)
+    cache.put(second, 2)
+    assert cache.get(first) == 1
+    cache.put(third, 3)
+
+    assert cache.get(second) is None
+    assert cache.get(first) == 1
+    assert cache.get(third) == 3
+
+
+def test_token_count_cache_key_depends_on_family() -> None:
+    assert build_token_count_cache_key("a", "text") != build_token_count_cache_key(
+        "b", "text"
+    )
+    # lone surrogates (e.g. from badly decoded files) can still be hashed
+    build_token_count_cache_key("a", "\ud800")
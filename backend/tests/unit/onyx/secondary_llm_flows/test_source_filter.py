@@ -0,0 +1,68 @@
+import json
+from collections.abc import Generator
+from unittest.mock import Mock
+from unittest.mock import patch
+
+import pytest
+from langchain_core.messages import AIMessage
+
+from onyx.configs.constants import DocumentSource
+from onyx.secondary_llm_flows.filter_extraction_cache import FilterExtractionCache
+from onyx.secondary_llm_flows.source_filter import extract_source_filter
+from onyx.secondary_llm_flows.source_filter import mentioned_document_sources
+
+_VALID_SOURCES = [
+    DocumentSource.SLACK,
+    DocumentSource.GOOGLE_DRIVE,
+    DocumentSource.GITHUB,
+    DocumentSource.CONFLUENCE,
+]
+
+
+@pytest.mark.parametrize(
+    "query,expected",
+    [
+        ("How do I reset my password?", []),
+        ("onboarding docs in Confluence", [DocumentSource.CONFLUENCE]),
+        ("specs on Google Drive", [DocumentSource.GOOGLE_DRIVE]),
+        ("specs on googledrive", [DocumentSource.GOOGLE_DRIVE]),
+        ("repositories with flaky tests", [DocumentSource.GITHUB]),
+        (
+            "what did slack say about the wiki",
+            [DocumentSource.SLACK, DocumentSource.CONFLUENCE],
+        ),
+        # not a connected source
+        ("tickets about billing", []),
+    ],
+)
+def test_mentioned_document_sources(query: str, expected: list[DocumentSource]) -> None:
+    assert mentioned_document_sources(query, _VALID_SOURCES) == expected
+
+
+@pytest.fixture
+def source_filter_cache() -> Generator[FilterExtractionCache, None, None]:
+    cache: FilterExtractionCache = FilterExtractionCache(max_entries=10, ttl_seconds=60)
+    with patch(
+        "onyx.secondary_llm_flows.source_filter.get_source_filter_cache",
+        return_value=cache,
+    ), patch(
+        "onyx.secondary_llm_flows.source_filter.fetch_unique_document_sources",
+        return_value=_VALID_SOURCES,
+    ):
+        yield cache
+
+
+def test_extract_source_filter_only_asks_llm_for_mentioned_sources(
+    source_filter_cache: FilterExtractionCache,
+) -> None:
+    llm = Mock()
+    llm.config.model_name = "test-model"
+    llm.invoke.return_value = AIMessage(content=json.dumps({"sources": ["slack"]}))
+
+    assert extract_source_filter("How do I reset my password?", llm, Mock()) is None
+    llm.invoke.assert_not_called()
+
+    query = "What did the Slack channel decide?"
+    assert extract_source_filter(query, llm, Mock()) == [DocumentSource.SLACK]
+    assert extract_source_filter(query, llm, Mock()) == [DocumentSource.SLACK]
+    assert llm.invoke.call_count == 1
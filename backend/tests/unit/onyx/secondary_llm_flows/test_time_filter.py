@@ -0,0 +1,91 @@
+import json
+from collections.abc import Generator
+from datetime import datetime
+from datetime import timedelta
+from datetime import timezone
+from unittest.mock import Mock
+from unittest.mock import patch
+
+import pytest
+from langchain_core.messages import AIMessage
+
+from onyx.secondary_llm_flows.filter_extraction_cache import FilterExtractionCache
+from onyx.secondary_llm_flows.time_filter import extract_time_filter
+from onyx.secondary_llm_flows.time_filter import extract_time_filter_by_rules
+
+# a Thursday
+_NOW = datetime(2025, 5, 15, 12, tzinfo=timezone.utc)
+
+
+@pytest.mark.parametrize(
+    "query,expected",
+    [
+        ("How do I reset my password?", (None, False)),
+        ("What's the latest on project Corgies?", (None, True)),
+        (
+            "What documents in Confluence were written in the last two quarters",
+            (_NOW - timedelta(days=2 * 91.25), False),
+        ),
+        ("deploys from 3 weeks ago", (_NOW - timedelta(weeks=3), False)),
+        ("incidents this week", (datetime(2025, 5, 12, tzinfo=timezone.utc), False)),
+        ("yesterday's outage", (datetime(2025, 5, 14, tzinfo=timezone.utc), False)),
+        (
+            "Which customer asked about security features in February of 2022?",
+            (datetime(2022, 2, 1, tzinfo=timezone.utc), False),
+        ),
+        # the latest March, even with a recency bias the cutoff wins
+        (
+            "latest changes since March",
+            (datetime(2025, 3, 1, tzinfo=timezone.utc), False),
+        ),
+        ("since December", (datetime(2024, 12, 1, tzinfo=timezone.utc), False)),
+        ("roadmap in 2023", (datetime(2023, 1, 1, tzinfo=timezone.utc), False)),
+        ("since 03/01/2024", (datetime(2024, 3, 1, tzinfo=timezone.utc), False)),
+        # not a year
+        ("docs since 2023-03-01", (datetime(2023, 3, 1, tzinfo=timezone.utc), False)),
+        # "may" and names are not dates
+        ("what may break during upgrades", None),
+        ("notes from May about onboarding", (None, False)),
+        # unsure, left to the LLM
+        ("What happened before the launch?", None),
+        ("Q3 planning", None),
+        ("the last step of the deploy", None),
+        ("since feb 30", None),
+        ("docs from the past 5000 years", None),
+        ("docs from 99999999999 days ago", None),
+        ("last week and in 2023", None),
+    ],
+)
+def test_extract_time_filter_by_rules(
+    query: str, expected: tuple[datetime | None, bool] | None
+) -> None:
+    assert extract_time_filter_by_rules(query, now=_NOW) == expected
+
+
+@pytest.fixture
+def time_filter_cache() -> Generator[FilterExtractionCache, None, None]:
+    cache: FilterExtractionCache = FilterExtractionCache(max_entries=10, ttl_seconds=60)
+    with patch(
+        "onyx.secondary_llm_flows.time_filter.get_time_filter_cache",
+        return_value=cache,
+    ):
+        yield cache
+
+
+def test_extract_time_filter_only_asks_llm_when_unsure(
+    time_filter_cache: FilterExtractionCache,
+) -> None:
+    llm = Mock()
+    llm.config.model_name = "test-model"
+    llm.invoke.return_value = AIMessage(
+        content=json.dumps({"filter_type": "hard cutoff", "date": "03/01/2024"})
+    )
+
+    assert extract_time_filter("How do I reset my password?", llm) == (None, False)
+    llm.invoke.assert_not_called()
+
+    expected = (datetime(2024, 3, 1, tzinfo=timezone.utc), False)
+    assert extract_time_filter("What changed after the launch?", llm) == expected
+    # cached per normalized query
+    assert extract_time_filter("what changed  after the launch?", llm) == expected
+    assert llm.invoke.call_count == 1
@@ -0,0 +1,120 @@
+from collections.abc import Generator
+from datetime import datetime
+from datetime import timedelta
+from datetime import timezone
+from unittest.mock import Mock
+from unittest.mock import patch
+from uuid import uuid4
+
+import pytest
+import redis
+from redis.exceptions import RedisError
+
+from onyx.redis.redis_pool import get_raw_redis_client
+from onyx.redis.redis_token_budget import RedisTokenBudget
+from onyx.server.query_and_chat.token_limit import _is_over_token_budget
+
+_TOKEN_LIMIT = "onyx.server.query_and_chat.token_limit"
+
+
+def _rate_limit(period_hours: int, token_budget: int) -> Mock:
+    return Mock(period_hours=period_hours, token_budget=token_budget)
+
+
+def _redis_is_available() -> bool:
+    try:
+        return bool(get_raw_redis_client().ping())
+    except redis.RedisError:
+        return False
+
+
+@pytest.fixture
+def token_budget() -> Generator[Mock, None, None]:
+    with (
+        patch(f"{_TOKEN_LIMIT}.RedisTokenBudget") as token_budget_cls,
+        patch(f"{_TOKEN_LIMIT}.get_current_tenant_id", return_value="tenant"),
+    ):
+        yield token_budget_cls.return_value
+
+
+def test_budget_is_checked_against_the_counter(token_budget: Mock) -> None:
+    rate_limits = [_rate_limit(1, 10), _rate_limit(24, 100)]
+    fetch_usage = Mock()
+
+    token_budget.get_windowed_usage.return_value = [5_000, 99_000]
+    assert not _is_over_token_budget("global", rate_limits, fetch_usage)
+
+    token_budget.get_windowed_usage.return_value = [10_000, 10_000]
+    assert _is_over_token_budget("global", rate_limits, fetch_usage)
+
+    scope, window_starts, ttl_seconds = token_budget.get_windowed_usage.call_args.args
+    assert scope == "global"
+    assert window_starts[1] < window_starts[0]
+    assert ttl_seconds == 24 * 60 * 60
+    fetch_usage.assert_not_called()
+
+
+def test_cold_counter_is_reconstructed_from_postgres(token_budget: Mock) -> None:
+    rate_limits = [_rate_limit(1, 10), _rate_limit(24, 100)]
+    now = datetime.now(tz=timezone.utc)
+    usage = [(now - timedelta(hours=2), 95_000), (now, 5_000)]
+    fetch_usage = Mock(return_value=usage)
+
+    token_budget.get_windowed_usage.return_value = None
+    token_budget.begin_reconstruct.return_value = "rebuild_token"
+    fetch_usage.side_effect = lambda cutoff_time: (
+        # the counter must be claimed before Postgres is read
+        token_budget.begin_reconstruct.assert_called_once_with("global", 24 * 60 * 60)
+        or usage
+    )
+    assert _is_over_token_budget("global", rate_limits, fetch_usage)
+
+    (cutoff_time,) = fetch_usage.call_args.args
+    # the start of the longest window
+    assert abs(now - timedelta(hours=24) - cutoff_time) < timedelta(minutes=1)
+    token_budget.reconstruct.assert_called_once_with(
+        "global", usage, cutoff_time, 24 * 60 * 60, "rebuild_token"
+    )
+
+
+def test_redis_failures_fall_back_to_postgres(token_budget: Mock) -> None:
+    fetch_usage = Mock(return_value=[(datetime.now(tz=timezone.utc), 10_000)])
+    token_budget.get_windowed_usage.side_effect = RedisError
+
+    assert _is_over_token_budget("global", [_rate_limit(1, 10)], fetch_usage)
+    fetch_usage.assert_called_once()
+
+
+@pytest.mark.skipif(not _redis_is_available(), reason="Redis is not available")
+def test_redis_token_budget() -> None:
+    token_budget = RedisTokenBudget(tenant_id=f"test_{uuid4().hex}")
+    scope = "user:test"
+    now = datetime.now(tz=timezone.utc)
+    window_starts = [now - timedelta(hours=1), now - timedelta(hours=24)]
+
+    # usage is not recorded for counters which were not reconstructed yet
+    token_budget.record_usage([scope], 1, now)
+    assert token_budget.get_windowed_usage(scope, window_starts, 60) is None
+
+    usage = [(now - timedelta(hours=30), 1_000), (now - timedelta(hours=2), 200)]
+    stale_rebuild_token = token_budget.begin_reconstruct(scope, ttl_seconds=60)
+    rebuild_token = token_budget.begin_reconstruct(scope, ttl_seconds=60)
+    # recorded while Postgres is read, kept by the reconstruction
+    token_budget.record_usage([scope], 30, now)
+    assert token_budget.get_windowed_usage(scope, window_starts, 60) is None
+
+    # the counter was claimed again by a later check
+    assert not token_budget.reconstruct(
+        scope, usage, now - timedelta(hours=24), 60, stale_rebuild_token
+    )
+    assert token_budget.reconstruct(
+        scope, usage, now - timedelta(hours=24), 60, rebuild_token
+    )
+    token_budget.record_usage([scope], 4, now)
+    assert token_budget.get_windowed_usage(scope, window_starts, 60) == [34, 234]
+
+    # a longer window than the counter covers needs a reconstruction
+    assert (
+        token_budget.get_windowed_usage(scope, [now - timedelta(hours=48)], 60) is None
+    )
+    token_budget.redis_client.delete(token_budget._counter_key(scope))
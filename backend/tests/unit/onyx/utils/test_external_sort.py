@@ -0,0 +1,59 @@
+import random
+
+import pytest
+
+from onyx.utils.external_sort import ExternalIdSorter
+from onyx.utils.external_sort import sorted_difference
+
+
+def test_external_sorter_spills_and_merges() -> None:
+    ids = [f"doc_{i}" for i in range(1000)]
+    # duplicates across and within runs must be collapsed
+    shuffled = ids + random.sample(ids, 200)
+    random.shuffle(shuffled)
+
+    with ExternalIdSorter(run_size=64) as sorter:
+        sorter.add_many(shuffled)
+        assert sorter.num_runs > 1
+        assert list(sorter.iter_sorted()) == sorted(ids)
+
+
+def test_external_sorter_in_memory() -> None:
+    with ExternalIdSorter(run_size=100) as sorter:
+        sorter.add_many(["b", "a", "c", "a"])
+        assert sorter.num_runs == 0
+        assert list(sorter.iter_sorted()) == ["a", "b", "c"]
+
+
+def test_external_sorter_handles_arbitrary_ids() -> None:
+    ids = [
+        "with\nnewline",
+        "with\r\nwindows newline",
+        '"starts with a quote',
+        'with "quotes"',
+        "ünïcødé",
+        "https://a.com/x?y=1",
+        "",
+    ]
+    with ExternalIdSorter(run_size=2) as sorter:
+        sorter.add_many(ids)
+        assert list(sorter.iter_sorted()) == sorted(ids)
+
+
+def test_sorted_difference() -> None:
+    indexed = sorted(f"doc_{i}" for i in range(0, 100))
+    in_source = sorted(f"doc_{i}" for i in range(0, 150, 3))
+
+    assert list(sorted_difference(iter(indexed), iter(in_source))) == sorted(
+        set(indexed) - set(in_source)
+    )
+    assert list(sorted_difference(iter(indexed), iter([]))) == indexed
+    assert list(sorted_difference(iter([]), iter(in_source))) == []
+
+
+def test_sorted_difference_rejects_unsorted_input() -> None:
+    with pytest.raises(ValueError):
+        list(sorted_difference(iter(["a", "c", "b"]), iter(["a"])))
+
+    with pytest.raises(ValueError):
+        list(sorted_difference(iter(["a", "z"]), iter(["b", "a", "c"])))
@@ -1,3 +1,4 @@
+import asyncio
 import contextvars
 import threading
 import time
@@ -7,7 +8,10 @@ from concurrent.futures import ThreadPoolExecutor
 
 import pytest
 
+from onyx.utils.threadpool_concurrency import FunctionCall
+from onyx.utils.threadpool_concurrency import iterate_in_executor
 from onyx.utils.threadpool_concurrency import parallel_yield
+from onyx.utils.threadpool_concurrency import run_functions_in_parallel_as_completed
 from onyx.utils.threadpool_concurrency import run_in_background
 from onyx.utils.threadpool_concurrency import run_with_timeout
 from onyx.utils.threadpool_concurrency import ThreadSafeDict
@@ -389,3 +393,82 @@ def test_parallel_yield_non_blocking() -> None:
     # Verify no values are missing
     assert len(results) == 300  # Should have all values from 0 to 299
     assert sorted(results) == list(range(300))
+
+
+def test_run_functions_in_parallel_as_completed() -> None:
+    """Results are yielded in completion order, while slower calls are still running."""
+    release_slow = threading.Event()
+
+    def slow() -> str:
+        release_slow.wait(timeout=5)
+        return "slow"
+
+    def failing() -> str:
+        raise ValueError("failure")
+
+    slow_call = FunctionCall(slow)
+    fast_call = FunctionCall(lambda: "fast")
+    failing_call = FunctionCall(failing)
+
+    results = run_functions_in_parallel_as_completed(
+        [slow_call, fast_call, failing_call], allow_failures=True
+    )
+    first_results = {next(results), next(results)}
+    assert first_results == {
+        (fast_call.result_id, "fast"),
+        (failing_call.result_id, None),
+    }
+
+    release_slow.set()
+    assert list(results) == [(slow_call.result_id, "slow")]
+
+    with pytest.raises(ValueError, match="failure"):
+        list(run_functions_in_parallel_as_completed([failing_call]))
+
+
+@pytest.mark.asyncio
+async def test_iterate_in_executor() -> None:
+    """Items are yielded on the event loop, with the context of the caller"""
+    test_context_var.set("caller_value")
+
+    def numbers(stopped: threading.Event) -> Iterator[str]:
+        for i in range(3):
+            yield f"{test_context_var.get()}_{i}"
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        items = [item async for item in iterate_in_executor(numbers, executor)]
+    assert items == ["caller_value_0", "caller_value_1", "caller_value_2"]
+
+
+@pytest.mark.asyncio
+async def test_iterate_in_executor_propagates_exceptions() -> None:
+    def failing(stopped: threading.Event) -> Iterator[int]:
+        yield 1
+        raise ValueError("failure")
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        items = []
+        with pytest.raises(ValueError, match="failure"):
+            async for item in iterate_in_executor(failing, executor):
+                items.append(item)
+    assert items == [1]
+
+
+@pytest.mark.asyncio
+async def test_iterate_in_executor_stops_when_the_caller_stops() -> None:
+    """The iterator sees the stop and still runs to completion"""
+    finished = threading.Event()
+
+    def until_stopped(stopped: threading.Event) -> Iterator[int]:
+        i = 0
+        while not stopped.wait(timeout=0.01):
+            yield i
+            i += 1
+        finished.set()
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        items = iterate_in_executor(until_stopped, executor)
+        assert await items.__anext__() == 0
+        await items.aclose()
+
+        assert await asyncio.to_thread(finished.wait, 5)
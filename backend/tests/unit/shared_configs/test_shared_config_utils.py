@@ -0,0 +1,26 @@
+from shared_configs.utils import batch_indices_by_token_budget
+
+
+def test_batch_indices_by_token_budget() -> None:
+    lengths = [500, 10, 12, 480, 11, 100, 9, 510]
+
+    batches = batch_indices_by_token_budget(
+        lengths, max_batch_tokens=1024, max_batch_size=3
+    )
+
+    # every index exactly once
+    assert sorted(idx for batch in batches for idx in batch) == list(range(8))
+    # similar lengths end up together, short texts are not padded to long ones
+    assert batches == [[6, 1, 4], [2, 5], [3, 0], [7]]
+    for batch in batches:
+        assert len(batch) * max(lengths[idx] for idx in batch) <= 1024
+
+
+def test_batch_indices_by_token_budget_oversized_item() -> None:
+    # an item over the budget still gets embedded, in a batch of its own
+    assert batch_indices_by_token_budget(
+        [2000, 5], max_batch_tokens=1024, max_batch_size=8
+    ) == [[1], [0]]
+    assert (
+        batch_indices_by_token_budget([], max_batch_tokens=1024, max_batch_size=8) == []
+    )